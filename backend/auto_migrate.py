@@ -89,6 +89,25 @@ def run_migrations(engine: Engine):
                         except Exception as e:
                             logger.error(f"Failed to add column {col_name}: {e}")
 
+        # --- accounts migrations ---
+        if "accounts" in table_names:
+            existing_columns = [c["name"] for c in inspector.get_columns("accounts")]
+            
+            columns_to_add = [
+                ("interest_rate", "FLOAT"),
+                ("minimum_payment", "FLOAT"),
+            ]
+            
+            with engine.connect() as conn:
+                for col_name, col_def in columns_to_add:
+                    if col_name not in existing_columns:
+                        logger.info(f"Auto-Migration: Adding column '{col_name}' to 'accounts' table...")
+                        try:
+                             conn.execute(text(f"ALTER TABLE accounts ADD COLUMN {col_name} {col_def}"))
+                             conn.commit()
+                        except Exception as e:
+                            logger.error(f"Failed to add column {col_name}: {e}")
+
         # --- trades table creation ---
         if "trades" not in table_names:
             logger.info("Auto-Migration: Creating 'trades' table...")
@@ -157,7 +176,104 @@ def run_migrations(engine: Engine):
                 except Exception as e:
                     logger.error(f"Failed to create background_jobs table: {e}")
 
+        # --- background_jobs queue columns ---
+        # Fresh inspector: the table may have just been created above
+        try:
+            existing_columns = [c["name"] for c in inspect(engine).get_columns("background_jobs")]
+        except Exception:
+            existing_columns = None
+        if existing_columns is not None:
+            json_type = "JSONB" if engine.dialect.name == "postgresql" else "TEXT"
+            columns_to_add = [
+                ("kind", "VARCHAR"),
+                ("payload", json_type),
+                ("attempts", "INTEGER DEFAULT 0"),
+                ("max_attempts", "INTEGER DEFAULT 3"),
+                ("worker_id", "VARCHAR"),
+                ("heartbeat_at", "TIMESTAMP"),
+                ("run_after", "TIMESTAMP"),
+                ("cancel_requested", "BOOLEAN DEFAULT FALSE"),
+            ]
+            with engine.connect() as conn:
+                for col_name, col_def in columns_to_add:
+                    if col_name not in existing_columns:
+                        logger.info(f"Auto-Migration: Adding column '{col_name}' to 'background_jobs' table...")
+                        try:
+                            conn.execute(text(f"ALTER TABLE background_jobs ADD COLUMN {col_name} {col_def}"))
+                            conn.commit()
+                        except Exception as e:
+                            logger.error(f"Failed to add column {col_name}: {e}")
+                try:
+                    # Workers claim the oldest queued job: WHERE status = 'queued' ORDER BY created_at
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON background_jobs(status, created_at)"))
+                    conn.commit()
+                except Exception as e:
+                    logger.error(f"Failed to create idx_jobs_status_created: {e}")
+
+        # --- transactions keyset index ---
+        # Backs cursor pagination on GET /transactions: WHERE user_id = ? AND (date, id) < (?, ?)
+        if "transactions" in table_names:
+            existing_indexes = [i["name"] for i in inspector.get_indexes("transactions")]
+            if "idx_transactions_user_date_id" not in existing_indexes:
+                logger.info("Auto-Migration: Creating index 'idx_transactions_user_date_id'...")
+                with engine.connect() as conn:
+                    try:
+                        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_transactions_user_date_id ON transactions(user_id, date DESC, id DESC)"))
+                        conn.commit()
+                    except Exception as e:
+                        logger.error(f"Failed to create idx_transactions_user_date_id: {e}")
+
+        # --- transaction hash unique index ---
+        # Import dedupe: hashes rows imported before fingerprints, then (user_id, transaction_hash) UNIQUE
+        if "transactions" in table_names:
+            from .services.transaction_hashes import ensure_hash_index
+            ensure_hash_index(engine)
+
+        # --- transaction search index ---
+        # FTS5 (SQLite) / tsvector + pg_trgm (PostgreSQL); idempotent
+        if "transactions" in table_names:
+            from .services.search import ensure_search_index
+            ensure_search_index(engine)
+
+        # --- transaction_rollups backfill ---
+        # create_all() adds the table; populate it once for existing transactions
+        if "transaction_rollups" in table_names and "transactions" in table_names:
+            with engine.connect() as conn:
+                has_rollups = conn.execute(text("SELECT 1 FROM transaction_rollups LIMIT 1")).first()
+                has_transactions = conn.execute(text("SELECT 1 FROM transactions LIMIT 1")).first()
+
+            if has_transactions and not has_rollups:
+                logger.info("Auto-Migration: Backfilling 'transaction_rollups'...")
+                from sqlalchemy.orm import Session
+                from .services.rollups import rebuild_rollups
+                try:
+                    with Session(bind=engine) as session:
+                        rows = rebuild_rollups(session)
+                        session.commit()
+                    logger.info(f"Auto-Migration: Backfilled {rows} rollup rows.")
+                except Exception as e:
+                    logger.error(f"Failed to backfill transaction_rollups: {e}")
+
+
+        # --- transaction_tags backfill ---
+        # create_all() adds the table; index existing comma-separated tags once
+        if "transaction_tags" in table_names and "transactions" in table_names:
+            with engine.connect() as conn:
+                has_tag_rows = conn.execute(text("SELECT 1 FROM transaction_tags LIMIT 1")).first()
+                has_tagged = conn.execute(text("SELECT 1 FROM transactions WHERE tags IS NOT NULL AND tags != '' LIMIT 1")).first()
+
+            if has_tagged and not has_tag_rows:
+                logger.info("Auto-Migration: Backfilling 'transaction_tags'...")
+                from sqlalchemy.orm import Session
+                from .services.transaction_tags import rebuild_transaction_tags
+                try:
+                    with Session(bind=engine) as session:
+                        rows = rebuild_transaction_tags(session)
+                        session.commit()
+                    logger.info(f"Auto-Migration: Backfilled {rows} transaction tag rows.")
+                except Exception as e:
+                    logger.error(f"Failed to backfill transaction_tags: {e}")
+
 
     except Exception as e:
         logger.error(f"Migration check failed: {e}")
-
@@ -1,15 +1,22 @@
 """
-Redis caching utility for expensive operations.
-Falls back gracefully if Redis is not available.
+Caching utility for expensive operations.
+Response caching uses a bounded in-process tier in front of Redis, and
+falls back to the in-process tier alone if Redis is not available
+(single-worker installs only; see cache_mode).
 """
 
 import os
 import json
+import time
 import logging
+import threading
+from collections import OrderedDict
 from typing import Optional, Any, Callable
 from functools import wraps
 import hashlib
 
+from fastapi.encoders import jsonable_encoder
+
 logger = logging.getLogger(__name__)
 
 # Lazy Redis connection - only import if REDIS_URL is set
@@ -91,6 +98,8 @@ def cached(prefix: str, ttl: int = 300):
 def invalidate_cache(pattern: str):
     """
     Invalidate all cache keys matching a pattern.
+    Uses SCAN rather than KEYS so Redis is not blocked; prefer generation
+    bumps (see bump_generation) for per-user invalidation on hot paths.
     
     Args:
         pattern: Redis key pattern (e.g., "analytics:*")
@@ -100,14 +109,419 @@ def invalidate_cache(pattern: str):
         return
     
     try:
-        keys = redis.keys(pattern)
-        if keys:
-            redis.delete(*keys)
-            logger.info(f"Invalidated {len(keys)} cache keys matching {pattern}")
+        deleted = 0
+        batch = []
+        for key in redis.scan_iter(match=pattern, count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                deleted += redis.delete(*batch)
+                batch = []
+        if batch:
+            deleted += redis.delete(*batch)
+        if deleted:
+            logger.info(f"Invalidated {deleted} cache keys matching {pattern}")
     except Exception as e:
         logger.warning(f"Cache invalidation failed: {e}")
 
 
+# --- In-process tier ---
+
+_MISSING = object()
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU cache with per-entry TTL.
+    
+    Sits in front of Redis so hot reads skip the network round trip and the
+    json.loads. Bounded by entry count and by the approximate serialized size
+    of the stored values. Thread-safe.
+    
+    Values are shared between callers and must be treated as read-only.
+    """
+    
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, key: str) -> Any:
+        """Return the cached value, or _MISSING."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+            expires_at, size, value = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return _MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key: str, value: Any, ttl: int, size: int = 0):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+    
+    def delete_matching(self, predicate: Callable[[str], bool]) -> int:
+        """Drop every key for which predicate(key) is true."""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+    
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+    
+    def _remove(self, key: str):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+
+_local_cache = LocalCache(
+    max_entries=int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "1024")),
+    max_bytes=int(os.getenv("CACHE_LOCAL_MAX_MB", "64")) * 1024 * 1024,
+)
+
+
+def _multi_worker() -> bool:
+    """Whether several server processes share requests (WEB_CONCURRENCY / WORKERS)."""
+    for name in ("WEB_CONCURRENCY", "WORKERS"):
+        value = os.getenv(name, "")
+        if value.isdigit() and int(value) > 1:
+            return True
+    return False
+
+
+def cache_mode() -> str:
+    """
+    Active caching mode, from CACHE_MODE (default "auto"):
+    - "redis": in-process tier in front of Redis (auto, when REDIS_URL connects)
+    - "memory": in-process tier only (auto, when Redis is unavailable and a
+      single worker serves requests). Generations are per process, so with
+      several workers it is only used when set explicitly.
+    - "off": no response caching (auto, without Redis under several workers)
+    """
+    mode = os.getenv("CACHE_MODE", "auto").lower()
+    if mode in ("off", "memory"):
+        return mode
+    if get_redis() is None:
+        return "off" if mode == "redis" or _multi_worker() else "memory"
+    return "redis"
+
+
+# --- Per-user data generations ---
+# Cached responses embed the user's current generation in their key.
+# Bumping the generation makes every older entry unreachable in O(1);
+# stale entries simply expire via their TTL or fall out of the LRU.
+#
+# Each worker also remembers generations locally. With Redis, a bump is
+# published on INVALIDATION_CHANNEL and every worker's listener drops its
+# copy; if the listener is down, local copies are only trusted briefly.
+# Every drop advances _invalidation_seq, and a generation read from Redis is
+# only remembered if no drop happened while it was in flight, so a forget
+# can't be undone by a read that started before it.
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+GENERATION_TTL = 30           # seconds, while the pub/sub listener is running
+GENERATION_TTL_UNSUBSCRIBED = 1
+LISTENER_RETRY_SECONDS = 30
+
+_local_generations = {}  # user_id -> (generation, fetched_at)
+_generations_lock = threading.Lock()
+_invalidation_seq = 0    # advanced whenever remembered generations are dropped
+_bump_listeners = []     # callables(user_id, generation) run after this worker bumps
+_extra_tiers = {}        # name -> LocalCache holding other per-user derived data
+_listener_thread = None
+_listener_retry_at = 0.0
+
+
+def _generation_key(user_id) -> str:
+    return f"gen:{user_id}"
+
+
+def _forget_user(user_id):
+    """Drop this worker's generation and in-process entries for a user."""
+    global _invalidation_seq
+    user_id = str(user_id)
+    with _generations_lock:
+        _local_generations.pop(user_id, None)
+        _invalidation_seq += 1
+    marker = f":{user_id}:"
+    _local_cache.delete_matching(lambda key: marker in key)
+
+
+def _listen_for_invalidations(pubsub):
+    global _listener_thread, _invalidation_seq
+    try:
+        for message in pubsub.listen():
+            if message.get("type") == "message":
+                _forget_user(message["data"])
+    except Exception as e:
+        logger.warning(f"Cache invalidation listener stopped: {e}")
+    finally:
+        _listener_thread = None
+        with _generations_lock:
+            _local_generations.clear()
+            _invalidation_seq += 1
+
+
+def _ensure_listener(redis):
+    """Start this worker's pub/sub listener once (retried after failures)."""
+    global _listener_thread, _listener_retry_at
+    if _listener_thread is not None or time.monotonic() < _listener_retry_at:
+        return
+    with _generations_lock:
+        if _listener_thread is not None:
+            return
+        try:
+            pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+        except Exception as e:
+            _listener_retry_at = time.monotonic() + LISTENER_RETRY_SECONDS
+            logger.warning(f"Cache invalidation listener unavailable: {e}")
+            return
+        _listener_thread = threading.Thread(
+            target=_listen_for_invalidations, args=(pubsub,),
+            name="cache-invalidation", daemon=True
+        )
+        _listener_thread.start()
+
+
+def get_generation(user_id) -> Optional[str]:
+    """Current data generation for a user (None when caching is off)."""
+    mode = cache_mode()
+    if mode == "off":
+        return None
+    
+    user_id = str(user_id)
+    now = time.monotonic()
+    ttl = GENERATION_TTL if _listener_thread is not None else GENERATION_TTL_UNSUBSCRIBED
+    with _generations_lock:
+        local = _local_generations.get(user_id)
+        seq = _invalidation_seq
+    if local is not None and (mode == "memory" or now - local[1] < ttl):
+        return local[0]
+    
+    if mode == "memory":
+        generation = "0"
+    else:
+        redis = get_redis()
+        _ensure_listener(redis)
+        key = _generation_key(user_id)
+        generation = redis.get(key)
+        if generation is None:
+            # Seed with a timestamp so an evicted counter never reuses old keys
+            redis.set(key, int(time.time() * 1000), nx=True)
+            generation = redis.get(key)
+    
+    with _generations_lock:
+        if seq != _invalidation_seq:
+            # A bump was seen while reading; this value may predate it, so don't keep it
+            return _local_generations.get(user_id, (generation,))[0]
+        _local_generations.setdefault(user_id, (generation, now))
+        return _local_generations[user_id][0]
+
+
+def bump_generation(user_id):
+    """Invalidate all cached responses for a user by advancing their generation."""
+    mode = cache_mode()
+    if mode == "off":
+        return
+    
+    if mode == "memory":
+        with _generations_lock:
+            current = _local_generations.get(str(user_id), ("0", 0.0))[0]
+        generation = str(int(current) + 1)
+    else:
+        try:
+            redis = get_redis()
+            key = _generation_key(user_id)
+            pipe = redis.pipeline()
+            pipe.set(key, int(time.time() * 1000), nx=True)
+            pipe.incr(key)
+            pipe.publish(INVALIDATION_CHANNEL, str(user_id))
+            generation = str(pipe.execute()[1])
+        except Exception as e:
+            logger.warning(f"Cache generation bump failed: {e}")
+            _forget_user(user_id)
+            _notify_bump(user_id, None)
+            return
+    
+    _forget_user(user_id)
+    with _generations_lock:
+        _local_generations[str(user_id)] = (generation, time.monotonic())
+    _notify_bump(user_id, generation)
+
+
+def on_generation_bump(listener: Callable[[Any, Optional[str]], None]):
+    """
+    Register ``listener(user_id, generation)`` to run after this worker bumps
+    a user's generation (``generation`` is None if the bump failed). Bumps by
+    other workers are not reported; they show up as a changed get_generation().
+    """
+    _bump_listeners.append(listener)
+    return listener
+
+
+def _notify_bump(user_id, generation):
+    for listener in _bump_listeners:
+        try:
+            listener(user_id, generation)
+        except Exception as e:
+            logger.warning(f"Cache bump listener failed: {e}")
+
+
+def register_local_tier(name: str, tier: "LocalCache") -> "LocalCache":
+    """Include another in-process LocalCache in clear_local_cache() and cache_stats()."""
+    _extra_tiers[name] = tier
+    return tier
+
+
+def memoize_for_user(prefix: str, user_id, build: Callable[[], Any], ttl: int = 3600) -> Any:
+    """
+    Per-worker memoization of a derived per-user object (e.g. an index built
+    from the user's rows), kept in the in-process tier and keyed on the user's
+    data generation so any bump rebuilds it. Builds every time when caching is off.
+    """
+    try:
+        generation = get_generation(user_id)
+    except Exception as e:
+        logger.warning(f"Cache error: {e}")
+        generation = None
+    if generation is None:
+        return build()
+    
+    key = f"{prefix}:{user_id}:{generation}"
+    value = _local_cache.get(key)
+    if value is _MISSING:
+        value = build()
+        _local_cache.set(key, value, ttl)
+    return value
+
+
+def clear_local_cache():
+    """Reset this worker's in-process tier and remembered generations."""
+    global _invalidation_seq
+    _local_cache.clear()
+    for tier in _extra_tiers.values():
+        tier.clear()
+    with _generations_lock:
+        _local_generations.clear()
+        _invalidation_seq += 1
+
+
+def cache_stats() -> dict:
+    """Mode, in-process tier counters and listener state for this worker."""
+    return {
+        "mode": cache_mode(),
+        "local": _local_cache.stats(),
+        **{name: tier.stats() for name, tier in _extra_tiers.items()},
+        "invalidation_listener": _listener_thread is not None,
+    }
+
+
+def cached_response(prefix: str, ttl: int = 300):
+    """
+    Decorator to cache a FastAPI endpoint's JSON response per user.
+    
+    The key is built from the prefix, the user id, the user's data generation
+    and the endpoint's query parameters (``db`` and ``current_user`` are
+    excluded). Lookups go to the in-process tier first, then Redis.
+    Write paths call CacheManager.invalidate_user_analytics().
+    
+    Usage:
+        @router.get("/sankey")
+        @cached_response("analytics:sankey", ttl=CacheManager.TTL_MEDIUM)
+        def get_sankey_data(..., db: Session = Depends(get_db), current_user = Depends(...)):
+            ...
+    """
+    def decorator(func: Callable):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            user = kwargs.get("current_user")
+            if user is None:
+                return func(*args, **kwargs)
+            
+            params = {k: v for k, v in kwargs.items() if k not in ("db", "current_user")}
+            redis = None
+            
+            try:
+                generation = get_generation(user.id)
+                if generation is None:
+                    return func(*args, **kwargs)
+                key = f"{prefix}:{user.id}:{generation}:{cache_key(**params)}"
+                
+                value = _local_cache.get(key)
+                if value is not _MISSING:
+                    return value
+                
+                if cache_mode() == "redis":
+                    redis = get_redis()
+                    cached_value = redis.get(key)
+                    if cached_value is not None:
+                        logger.debug(f"Cache hit: {key}")
+                        value = json.loads(cached_value)
+                        _local_cache.set(key, value, ttl, len(cached_value))
+                        return value
+            except Exception as e:
+                logger.warning(f"Cache error: {e}")
+                return func(*args, **kwargs)
+            
+            # Encode the same way FastAPI would, so hits and misses are identical
+            result = jsonable_encoder(func(*args, **kwargs))
+            
+            try:
+                payload = json.dumps(result)
+                _local_cache.set(key, result, ttl, len(payload))
+                if redis is not None:
+                    redis.setex(key, ttl, payload)
+                logger.debug(f"Cache set: {key}")
+            except Exception as e:
+                logger.warning(f"Cache error: {e}")
+            
+            return result
+        
+        return wrapper
+    return decorator
+
+
 class CacheManager:
     """Centralized cache management for the application."""
     
@@ -124,12 +538,17 @@ class CacheManager:
     PREFIX_USER = "user"
     
     @staticmethod
-    def invalidate_user_analytics(user_id: int):
-        """Invalidate all analytics caches for a user."""
-        invalidate_cache(f"analytics:*:{user_id}:*")
+    def invalidate_user_analytics(user_id):
+        """Invalidate all analytics caches for a user (O(1) generation bump)."""
+        bump_generation(user_id)
     
     @staticmethod
-    def invalidate_user_transactions(user_id: int):
+    def invalidate_user_transactions(user_id):
         """Invalidate transaction-related caches for a user."""
-        invalidate_cache(f"txn:*:{user_id}:*")
-        invalidate_cache(f"analytics:*:{user_id}:*")
+        # Transaction and analytics responses share the user's generation
+        bump_generation(user_id)
+    
+    @staticmethod
+    def stats() -> dict:
+        """Cache statistics for this worker."""
+        return cache_stats()
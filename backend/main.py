@@ -83,6 +83,9 @@ from .routers import (
     net_worth, auth, market, rules, goals, taxes, 
     connections, investments, notifications, export, api_keys, household, achievements
 )
+from .services import rollups  # noqa: F401 - registers transaction rollup session events
+from .services import transaction_tags  # noqa: F401 - registers transaction tag session events
+from .services import job_queue
 
 # Crteate tables with error handling to enforce startup
 try:
@@ -276,6 +279,11 @@ api_router.include_router(achievements.router)
 # Include the API router in the main app
 app.include_router(api_router)
 
+# Background jobs (CSV imports): each API process runs a small worker pool
+# unless JOB_WORKERS=0, in which case `python -m backend.worker` does the work
+app.add_event_handler("startup", job_queue.start_workers)
+app.add_event_handler("shutdown", job_queue.stop_workers)
+
 
 @app.get("/")
 def read_root():
@@ -5,6 +5,10 @@
 CREATE INDEX IF NOT EXISTS idx_transactions_user_date 
 ON transactions(user_id, date DESC);
 
+-- Keyset pagination for the transaction list: (date, id) < (cursor_date, cursor_id)
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date_id 
+ON transactions(user_id, date DESC, id DESC);
+
 -- Index for transactions by bucket (category analysis)
 CREATE INDEX IF NOT EXISTS idx_transactions_bucket 
 ON transactions(bucket_id);
@@ -0,0 +1,39 @@
+"""
+Migration: Backfill Transaction Hashes
+======================================
+Fingerprints transactions imported before duplicate detection existed, then
+creates the unique (user_id, transaction_hash) index that imports dedupe against.
+Genuine repeats (same date, description and amount) keep a NULL hash.
+Safe to run multiple times (idempotent).
+
+Usage (from /app directory in container):
+    cd /app && python -m backend.migrations.backfill_transaction_hashes            # all users
+    cd /app && python -m backend.migrations.backfill_transaction_hashes <user_id>  # one user
+"""
+import sys
+
+from backend.database import SessionLocal, engine
+from backend.services.transaction_hashes import backfill_transaction_hashes, ensure_hash_index
+
+
+def run_migration(user_id=None):
+    db = SessionLocal()
+    try:
+        rows = backfill_transaction_hashes(db, user_id=user_id)
+        db.commit()
+        scope = f"user {user_id}" if user_id else "all users"
+        print(f"Hashed {rows} transactions for {scope}.")
+    except Exception as e:
+        db.rollback()
+        print(f"Transaction hash backfill failed: {e}")
+        raise
+    finally:
+        db.close()
+
+    if not ensure_hash_index(engine):
+        raise SystemExit("Could not create the transaction hash index; see the log.")
+    print("Transaction hash index is in place.")
+
+
+if __name__ == "__main__":
+    run_migration(sys.argv[1] if len(sys.argv) > 1 else None)
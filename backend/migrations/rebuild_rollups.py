@@ -0,0 +1,36 @@
+"""
+Migration: Rebuild Transaction Rollups
+======================================
+Recomputes the transaction_rollups table from the transactions table.
+Use it to backfill after deploying the rollup table, or to repair drift.
+Safe to run multiple times (idempotent).
+
+Usage (from /app directory in container):
+    cd /app && python -m backend.migrations.rebuild_rollups            # all users
+    cd /app && python -m backend.migrations.rebuild_rollups <user_id>  # one user
+"""
+import sys
+
+from backend.database import Base, SessionLocal, engine
+from backend.services.rollups import rebuild_rollups
+
+
+def run_migration(user_id=None):
+    Base.metadata.create_all(bind=engine, tables=[Base.metadata.tables["transaction_rollups"]])
+
+    db = SessionLocal()
+    try:
+        rows = rebuild_rollups(db, user_id=user_id)
+        db.commit()
+        scope = f"user {user_id}" if user_id else "all users"
+        print(f"Rebuilt {rows} rollup rows for {scope}.")
+    except Exception as e:
+        db.rollback()
+        print(f"Rollup rebuild failed: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    run_migration(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,36 @@
+"""
+Migration: Rebuild Transaction Tags
+===================================
+Recomputes the transaction_tags table from the comma-separated Transaction.tags column.
+Use it to backfill after deploying the tag table, or to repair drift.
+Safe to run multiple times (idempotent).
+
+Usage (from /app directory in container):
+    cd /app && python -m backend.migrations.rebuild_transaction_tags            # all users
+    cd /app && python -m backend.migrations.rebuild_transaction_tags <user_id>  # one user
+"""
+import sys
+
+from backend.database import Base, SessionLocal, engine
+from backend.services.transaction_tags import rebuild_transaction_tags
+
+
+def run_migration(user_id=None):
+    Base.metadata.create_all(bind=engine, tables=[Base.metadata.tables["transaction_tags"]])
+
+    db = SessionLocal()
+    try:
+        rows = rebuild_transaction_tags(db, user_id=user_id)
+        db.commit()
+        scope = f"user {user_id}" if user_id else "all users"
+        print(f"Rebuilt {rows} transaction tag rows for {scope}.")
+    except Exception as e:
+        db.rollback()
+        print(f"Transaction tag rebuild failed: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    run_migration(sys.argv[1] if len(sys.argv) > 1 else None)
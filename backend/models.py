@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float, DateTime, Date, LargeBinary, Table, Text
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float, DateTime, Date, LargeBinary, Table, Text, Index
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy.sql import func
 from sqlalchemy import JSON
@@ -72,12 +72,13 @@ class Job(Base):
     """
     Persist background job status (e.g. for CSV imports) so multiple
     Gunicorn workers can access the shared state.
+    Also the queue itself: workers claim 'queued' rows (services/job_queue.py).
     """
     __tablename__ = "background_jobs"
 
     id = Column(String, primary_key=True) # UUID string
     user_id = Column(String, ForeignKey("profiles.id"), index=True)
-    status = Column(String, default="processing") # processing, complete, failed
+    status = Column(String, default="processing") # queued, processing, complete, failed, cancelled
     progress = Column(Integer, default=0)
     total = Column(Integer, default=0)
     message = Column(String)
@@ -87,6 +88,32 @@ class Job(Base):
     error = Column(String, nullable=True)
     created_at = Column(DateTime, default=func.now())
 
+    # Queue fields
+    kind = Column(String, nullable=True)  # Registered handler name, e.g. "csv_import"
+    payload = Column(JSON, nullable=True)  # Handler arguments
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    worker_id = Column(String, nullable=True)  # Worker pool holding the job
+    heartbeat_at = Column(DateTime, nullable=True)  # Refreshed while running; stale = worker died
+    run_after = Column(DateTime, nullable=True)  # Retry backoff
+    cancel_requested = Column(Boolean, default=False)
+
+    __table_args__ = (
+        Index("idx_jobs_status_created", "status", "created_at"),
+    )
+
+
+class JobChunk(Base):
+    """
+    Staged results of a streaming background job, one row per processed
+    chunk, so previews are readable while the rest of the file is still parsing.
+    """
+    __tablename__ = "background_job_chunks"
+
+    job_id = Column(String, ForeignKey("background_jobs.id", ondelete="CASCADE"), primary_key=True)
+    seq = Column(Integer, primary_key=True)  # 0-based chunk number
+    rows = Column(JSON)  # Preview transactions of this chunk
+
 
 
 class Tag(Base):
@@ -142,6 +169,43 @@ class Transaction(Base):
     user = relationship("User", back_populates="transactions")
     children = relationship("Transaction", backref=backref("parent", remote_side=[id]))
 
+    __table_args__ = (
+        # Imports dedupe against this index (INSERT ... ON CONFLICT DO NOTHING);
+        # NULL hashes (manual entries) never conflict
+        Index("uq_transactions_user_hash", "user_id", "transaction_hash", unique=True),
+    )
+
+class TransactionTag(Base):
+    """
+    One row per (transaction, tag), normalized from the comma-separated
+    Transaction.tags column, which stays the source of truth.
+    Maintained in the same unit of work as transaction writes (services/transaction_tags.py).
+    """
+    __tablename__ = "transaction_tags"
+
+    # Primary key order doubles as the (user_id, tag) -> transaction lookup index
+    user_id = Column(String, primary_key=True)
+    tag = Column(String, primary_key=True)  # Trimmed, lower-cased
+    transaction_id = Column(Integer, ForeignKey("transactions.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+class TransactionRollup(Base):
+    """
+    Monthly transaction aggregates per (user, month, bucket, spender, account).
+    Maintained in the same unit of work as transaction writes (services/rollups.py).
+    NULL keys are stored as 0 / '' so the composite primary key stays unique.
+    """
+    __tablename__ = "transaction_rollups"
+
+    user_id = Column(String, primary_key=True)
+    month = Column(Date, primary_key=True)  # First day of the month
+    bucket_id = Column(Integer, primary_key=True, default=0)  # 0 = uncategorized
+    spender = Column(String, primary_key=True, default="")
+    account_id = Column(Integer, primary_key=True, default=0)  # 0 = no account
+
+    expense_sum = Column(Float, default=0.0)  # Sum of negative amounts
+    income_sum = Column(Float, default=0.0)   # Sum of positive amounts
+    txn_count = Column(Integer, default=0)
+
 class Account(Base):
     __tablename__ = "accounts"
     
@@ -158,6 +222,10 @@ class Account(Base):
     target_balance = Column(Float, nullable=True)
     target_date = Column(Date, nullable=True)
     
+    # Debt Fields (Liabilities)
+    interest_rate = Column(Float, nullable=True) # Annual %
+    minimum_payment = Column(Float, nullable=True) # Per month
+    
     user = relationship("User") # Relationship
     holdings = relationship("InvestmentHolding", back_populates="account")
     trades = relationship("Trade", back_populates="account")
@@ -283,6 +351,20 @@ class Subscription(Base):
     user = relationship("User") 
     bucket = relationship("BudgetBucket")
     parent = relationship("Subscription", remote_side=[id], backref="children")
+
+class RecurringScan(Base):
+    """
+    Incremental state of the recurring-payment detector (services/recurring.py).
+    Only transactions with id > last_transaction_id are scanned on the next run;
+    the row is dropped whenever an already-scanned transaction is edited or deleted.
+    """
+    __tablename__ = "recurring_scans"
+
+    user_id = Column(String, ForeignKey("profiles.id"), primary_key=True)
+    last_transaction_id = Column(Integer, default=0)
+    groups = Column(JSON)  # "E|merchant" -> {"name": ..., "obs": [[iso date, abs amount, bucket_id], ...]}
+    updated_at = Column(DateTime, default=func.now())
+
 class TaxSettings(Base):
     __tablename__ = "tax_settings"
     
@@ -1,11 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, extract, case, or_
+from sqlalchemy import func, extract, case, and_, literal_column
 from typing import List, Optional
 from datetime import datetime, timedelta, date
-import statistics
+import numpy as np
 from ..database import get_db
 from .. import models, schemas, auth
+from ..cache import cached_response, CacheManager
+from ..services import rollups
+from ..services import columnar
+from ..services import anomalies as anomaly_stats
+from ..services import budget_progress as budget_sets
+from ..services import recurring
+from ..services import transaction_tags
+from ..services import schedule
+from ..services import forecast as forecast_sim
+from ..services import debt as debt_engine
+from ..services.bucket_tree import get_bucket_tree
 
 router = APIRouter(
     prefix="/analytics",
@@ -13,6 +25,7 @@ router = APIRouter(
 )
 
 @router.get("/dashboard")
+@cached_response("analytics:dashboard", ttl=CacheManager.TTL_MEDIUM)
 def get_dashboard_data(
     start_date: str = Query(..., description="ISO Date string"), 
     end_date: str = Query(..., description="ISO Date string"),
@@ -32,39 +45,22 @@ def get_dashboard_data(
     user = current_user
     buckets = db.query(models.BudgetBucket).filter(models.BudgetBucket.user_id == user.id).all()
     
-    # 2. Optimized Aggregation for Current Range
-    # Query: SELECT bucket_id, SUM(amount) FROM transactions WHERE ... GROUP BY bucket_id
-    query = db.query(
-        models.Transaction.bucket_id, 
-        func.sum(models.Transaction.amount)
-    ).filter(
-        models.Transaction.user_id == user.id,
-        models.Transaction.date >= s_date,
-        models.Transaction.date <= e_date
-    )
+    # Build bucket lookup for group checking
+    bucket_map = {b.id: b for b in buckets}
+    tree = get_bucket_tree(db, user.id)
 
-    if spender != "Combined":
-        query = query.filter(models.Transaction.spender == spender)
+    spender_filter = spender if spender != "Combined" else None
 
-    if account_id:
-        query = query.filter(models.Transaction.account_id == account_id)
+    # 2. Single aggregation pass (see _dashboard_bucket_rows)
+    rollover_buckets = [b for b in buckets if b.is_rollover]
+    rollover_ids = {b.id for b in rollover_buckets}
+    ytd_start = datetime(s_date.year, 1, 1) if rollover_buckets and s_date.month > 1 else None
+    bucket_rows, ytd_results = _dashboard_bucket_rows(
+        db, user.id, tree, s_date, e_date, spender_filter, account_id, tags, ytd_start, rollover_ids
+    )
 
-    if tags:
-        tag_list = [t.strip() for t in tags.split(',') if t.strip()]
-        if tag_list:
-            tag_filters = [models.Transaction.tags.ilike(f"%{t}%") for t in tag_list]
-            query = query.filter(or_(*tag_filters))
-        
-    # Result: List of (bucket_id, total_amount)
-    # Note: We need separate sums for Income vs Expense if we want precise accuracy, 
-    # but typically bucket spending is just Sum of Expenses (negative inputs).
-    # Let's fetch pure sum. Expenses are negative.
-    
-    # Actually, for the "Spent" bar, we only care about expenses.
-    # Refunds (positive) should offset expenses. 
-    # So simple SUM is correct.
-    
-    results = query.group_by(models.Transaction.bucket_id).all()
+    # Net per bucket: refunds (positive) offset expenses (negative)
+    results = [(bid, expense + income) for bid, expense, income, _, _ in bucket_rows]
     
     # Track spent (expenses) and income separately for rollup
     spend_map = {}
@@ -75,77 +71,15 @@ def get_dashboard_data(
         spend_map[bid] = -total if total < 0 else 0 
         inc_map[bid] = total if total > 0 else 0
         
-    # Hierarchy Rollup: Sum child spending into parent
-    # 1. Build children map
-    children_map = {b.id: [] for b in buckets}
-    for b in buckets:
-        if b.parent_id and b.parent_id in children_map:
-            children_map[b.parent_id].append(b.id)
-            
-    # 2. Recursive Rollup
-    rollup_spend_map = {}
-    rollup_inc_map = {}
-    
-    def calculate_rollup(bid):
-        if bid in rollup_spend_map:
-            return rollup_spend_map[bid], rollup_inc_map[bid]
-            
-        # Start with own spending/income
-        t_spent = spend_map.get(bid, 0.0)
-        t_inc = inc_map.get(bid, 0.0)
-        
-        # Add children spending/income
-        children = children_map.get(bid, [])
-        for child_id in children:
-            c_s, c_i = calculate_rollup(child_id)
-            t_spent += c_s
-            t_inc += c_i
-            
-        rollup_spend_map[bid] = t_spent
-        rollup_inc_map[bid] = t_inc
-        return t_spent, t_inc
-        
-    # Calculate for all
-    for b in buckets:
-        calculate_rollup(b.id)
+    # Hierarchy Rollup: Sum child spending into parent (precomputed subtrees)
+    spend_map = tree.rollup(spend_map)
+    income_map = tree.rollup(inc_map)
         
-    spend_map = rollup_spend_map
-    income_map = rollup_inc_map
-        
-    # 3. Rollover Logic (Optimized N+1 fix)
-    # If any bucket is rollover, we need YTD spending before s_date.
+    # 3. Rollover Logic
+    # If any bucket is rollover, we need YTD spending before s_date (from the pass above).
     rollover_map = {} # bid -> rollover_amount
     
-    rollover_buckets = [b for b in buckets if b.is_rollover]
-    if rollover_buckets and s_date.month > 1:
-        ytd_start = datetime(s_date.year, 1, 1)
-        
-        # Batch Query for YTD Spending (ALL rollover buckets at once)
-        rollover_ids = [b.id for b in rollover_buckets]
-        
-        ytd_query = db.query(
-            models.Transaction.bucket_id,
-            func.sum(models.Transaction.amount)
-        ).filter(
-            models.Transaction.user_id == user.id,
-            models.Transaction.bucket_id.in_(rollover_ids),
-            models.Transaction.date >= ytd_start,
-            models.Transaction.date < s_date # Strictly before view start
-        )
-
-        # Apply same filters to rollover calculation
-        if spender != "Combined":
-            ytd_query = ytd_query.filter(models.Transaction.spender == spender)
-        if account_id:
-             ytd_query = ytd_query.filter(models.Transaction.account_id == account_id)
-        if tags:
-            tag_list = [t.strip() for t in tags.split(',') if t.strip()]
-            if tag_list:
-                tag_filters = [models.Transaction.tags.ilike(f"%{t}%") for t in tag_list]
-                ytd_query = ytd_query.filter(or_(*tag_filters))
-
-        ytd_results = ytd_query.group_by(models.Transaction.bucket_id).all()
-        
+    if ytd_start:
         ytd_spend_map = {bid: abs(total) if total < 0 else 0 for bid, total in ytd_results}
         
         # Calculate Rollover
@@ -161,34 +95,11 @@ def get_dashboard_data(
     # True Income = positive amounts from Income-group buckets only
     # Net Expenses = all non-transfer, non-income, non-investment bucket amounts
     
-    # Step 1: Get net amounts by bucket to separate income from expenses
-    bucket_totals_query = db.query(
-        models.Transaction.bucket_id,
-        func.sum(models.Transaction.amount).label("net_amount")
-    ).filter(
-        models.Transaction.user_id == user.id,
-        models.Transaction.date >= s_date,
-        models.Transaction.date <= e_date,
-        ~models.Transaction.bucket.has(models.BudgetBucket.is_transfer == True),
-        ~models.Transaction.bucket.has(models.BudgetBucket.is_investment == True)  # Exclude investments from expenses
-    )
-    
-    if spender != "Combined":
-        bucket_totals_query = bucket_totals_query.filter(models.Transaction.spender == spender)
-    
-    if account_id:
-        bucket_totals_query = bucket_totals_query.filter(models.Transaction.account_id == account_id)
-
-    if tags:
-        tag_list = [t.strip() for t in tags.split(',') if t.strip()]
-        if tag_list:
-            tag_filters = [models.Transaction.tags.ilike(f"%{t}%") for t in tag_list]
-            bucket_totals_query = bucket_totals_query.filter(or_(*tag_filters))
-
-    bucket_totals = bucket_totals_query.group_by(models.Transaction.bucket_id).all()
-    
-    # Build bucket lookup for group checking
-    bucket_map = {b.id: b for b in buckets}
+    # Step 1: Net amounts by bucket, excluding transfers and investments
+    bucket_totals = [
+        (bid, expense + income) for bid, expense, income, is_transfer, is_investment in bucket_rows
+        if not (is_transfer or is_investment)
+    ]
     
     # Separate true income from net expenses
     total_income = 0.0
@@ -202,13 +113,8 @@ def get_dashboard_data(
             elif net_amount and net_amount < 0:
                 total_net_expenses += abs(net_amount)
         elif bid in bucket_map:
-            bucket = bucket_map[bid]
             # Check if bucket is in Income group (or parent is)
-            is_income_group = bucket.group == "Income"
-            if not is_income_group and bucket.parent_id and bucket.parent_id in bucket_map:
-                is_income_group = bucket_map[bucket.parent_id].group == "Income"
-            
-            if is_income_group:
+            if tree.is_income(bid):
                 # Income bucket - positive amounts are income
                 if net_amount and net_amount > 0:
                     total_income += net_amount
@@ -281,7 +187,7 @@ def get_dashboard_data(
         upcoming_recurring = 0.0
             
         # Determine if this is a parent category (has children)
-        is_parent = len(children_map.get(b.id, [])) > 0
+        is_parent = tree.has_children(b.id)
         
         final_buckets.append({
             "id": b.id,
@@ -350,12 +256,167 @@ def get_dashboard_data(
         }
     }
 
+
+def _dashboard_bucket_rows(
+    db: Session, user_id: str, tree, s_date: datetime, e_date: datetime,
+    spender_filter: Optional[str], account_id: Optional[int], tags: Optional[str],
+    ytd_start: Optional[datetime], rollover_ids: set
+):
+    """
+    Per-bucket sums for the dashboard: rows of (bucket_id, expense sum (negative),
+    income sum (positive), is_transfer, is_investment), plus (bucket_id, net) YTD
+    totals before ``s_date`` for rollover buckets when ``ytd_start`` is set.
+
+    Whole-month ranges without a tag filter are served from the monthly rollup
+    table, other untagged ranges from the in-memory columns when enabled, and the
+    rest by one SQL pass; all three return the same rows.
+    """
+    month_span = None if tags else rollups.whole_month_span(s_date, e_date)
+    store = None if (tags or month_span) else columnar.get_columns(db, user_id)
+    ytd_results = []
+
+    if month_span:
+        # Pre-aggregated monthly rows
+        bucket_rows = [
+            (
+                bid, expense, income,
+                tree.is_transfer(bid),
+                tree.is_investment(bid)
+            )
+            for bid, expense, income in rollups.rollup_totals(
+                db, user_id, *month_span, spender=spender_filter, account_id=account_id
+            )
+        ]
+        if ytd_start:
+            # View starts on the 1st, so Jan..previous month is whole months too
+            ytd_rows = rollups.rollup_totals(
+                db, user_id, ytd_start.date(), rollups.month_start(s_date - timedelta(days=1)),
+                spender=spender_filter, account_id=account_id
+            )
+            ytd_results = [
+                (bid, expense + income) for bid, expense, income in ytd_rows
+                if bid in rollover_ids
+            ]
+    elif store is not None:
+        # Same sums from the column store: one mask per range, np.bincount per bucket
+        scanned = store.select(
+            start=ytd_start or s_date, before=rollups.day_after(e_date),
+            spender=spender_filter, account_id=account_id
+        )
+        in_view = scanned & store.select(start=s_date)
+        expense = store.bucket_sums(in_view & (store.amount < 0))
+        income = store.bucket_sums(in_view & (store.amount > 0))
+        before_view = store.bucket_sums(scanned & ~in_view)
+        present = store.bucket_counts(scanned) > 0
+
+        bucket_rows = []
+        for i, bid in enumerate(store.bucket_ids):
+            if not present[i]:
+                continue
+            bucket_rows.append((bid, float(expense[i]), float(income[i]), tree.is_transfer(bid), tree.is_investment(bid)))
+            if ytd_start and bid in rollover_ids:
+                ytd_results.append((bid, float(before_view[i])))
+    else:
+        # SELECT bucket_id, SUM(CASE ...), ..., is_transfer, is_investment
+        # FROM transactions LEFT JOIN budget_buckets ... GROUP BY bucket_id, flags
+        amount = models.Transaction.amount
+        in_view = models.Transaction.date >= s_date
+        columns = [
+            models.Transaction.bucket_id,
+            func.sum(case((and_(in_view, amount < 0), amount), else_=0.0)),
+            func.sum(case((and_(in_view, amount > 0), amount), else_=0.0)),
+            models.BudgetBucket.is_transfer,
+            models.BudgetBucket.is_investment,
+        ]
+        if ytd_start:
+            # Rollover needs YTD spending strictly before the view start; widen the
+            # scan to Jan 1st and split the two ranges with CASE
+            columns.append(func.sum(case((in_view, 0.0), else_=amount)))
+
+        query = db.query(*columns).outerjoin(
+            models.BudgetBucket, models.Transaction.bucket_id == models.BudgetBucket.id
+        ).filter(
+            models.Transaction.user_id == user_id,
+            models.Transaction.date >= (ytd_start or s_date),
+            models.Transaction.date < rollups.day_after(e_date)
+        )
+
+        if spender_filter is not None:
+            query = query.filter(models.Transaction.spender == spender_filter)
+
+        if account_id:
+            query = query.filter(models.Transaction.account_id == account_id)
+
+        tag_clause = transaction_tags.tag_filter(user_id, tags)
+        if tag_clause is not None:
+            query = query.filter(tag_clause)
+
+        bucket_rows = []
+        for row in query.group_by(
+            models.Transaction.bucket_id,
+            models.BudgetBucket.is_transfer,
+            models.BudgetBucket.is_investment
+        ).all():
+            bid = row[0]
+            bucket_rows.append((bid, row[1] or 0.0, row[2] or 0.0, bool(row[3]), bool(row[4])))
+            if ytd_start and bid in rollover_ids:
+                ytd_results.append((bid, row[5] or 0.0))
+
+    return bucket_rows, ytd_results
+
+
+def _period_start(dt: datetime, period: str) -> datetime:
+    """Truncate a datetime to the start of its day/week/month bucket."""
+    dt = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "week":
+        return dt - timedelta(days=dt.weekday())
+    if period == "month":
+        return dt.replace(day=1)
+    return dt
+
+
+def _period_step(dt: datetime, period: str) -> timedelta:
+    """Length of the bucket starting at ``dt``."""
+    if period == "week":
+        return timedelta(days=7)
+    if period == "month":
+        next_month = datetime(dt.year + (dt.month // 12), dt.month % 12 + 1, 1)
+        return next_month - dt
+    return timedelta(days=1)
+
+
+def _period_start_expr(db: Session, period: str, column):
+    """
+    SQL expression truncating ``column`` to its bucket start.
+    Uses date_trunc on PostgreSQL and strftime/date modifiers on SQLite.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        # Literal (whitelisted) unit so SELECT and GROUP BY render identically
+        return func.date_trunc(literal_column(f"'{period}'"), column)
+    if period == "week":
+        # Monday of the week (ISO weeks, matching date_trunc('week'))
+        return func.date(column, "weekday 0", "-6 days")
+    if period == "month":
+        return func.strftime("%Y-%m-01", column)
+    return func.strftime("%Y-%m-%d", column)
+
+
+def _period_key(value) -> date:
+    """Normalise a bucket value (datetime on Postgres, string on SQLite) to a date."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
 @router.get("/history")
+@cached_response("analytics:history", ttl=CacheManager.TTL_MEDIUM)
 def get_analytics_history(
     start_date: str = Query(..., description="ISO Date string"), 
     end_date: str = Query(..., description="ISO Date string"),
     spender: str = Query(default="Combined"), # Combined, User A, User B
-    interval: str = Query(default="month"), # 'day' or 'month'
+    interval: str = Query(default="month"), # 'day', 'week' or 'month'
     account_id: Optional[int] = Query(None), # Filter by Account
     bucket_id: Optional[int] = Query(None),
     bucket_ids: Optional[str] = Query(None), # Comma-separated bucket IDs (expands to include children)
@@ -383,20 +444,6 @@ def get_analytics_history(
     user = current_user
     if not user: raise HTTPException(status_code=404, detail="User not found")
     
-    # --- Helper Iterators ---
-    def month_year_iter(start, end):
-        ym_start = 12 * start.year + start.month - 1
-        ym_end = 12 * end.year + end.month - 1
-        for ym in range(ym_start, ym_end + 1):
-            y, m = divmod(ym, 12)
-            yield y, m + 1
-            
-    def day_iter(start, end):
-        current = start
-        while current <= end:
-            yield current
-            current += timedelta(days=1)
-            
     # Calculate Limit based on filters
     # Note: Using CURRENT limits for history (limitation of current data model)
     buckets_query = db.query(models.BudgetBucket).filter(models.BudgetBucket.user_id == user.id)
@@ -413,49 +460,13 @@ def get_analytics_history(
             # Use exactly the IDs provided - no hierarchy expansion
             subtree_ids = set(selected_ids)
         else:
-            # Fetch all hierarchy info for user
-            hierarchy = db.query(models.BudgetBucket.id, models.BudgetBucket.parent_id).filter(models.BudgetBucket.user_id == user.id).all()
-            
-            # Build adjacency list
-            adj = {}
-            for bid, pid in hierarchy:
-                if pid:
-                    adj.setdefault(pid, []).append(bid)
-            
-            # For each selected bucket, find all descendants
-            subtree_ids = set(selected_ids)
-            queue = list(selected_ids)
-            while queue:
-                curr = queue.pop(0)
-                children = adj.get(curr, [])
-                for child in children:
-                    if child not in subtree_ids:
-                        subtree_ids.add(child)
-                        queue.append(child)
+            # Selected buckets plus all their descendants
+            subtree_ids = get_bucket_tree(db, user.id).subtree(selected_ids)
         
         buckets_query = buckets_query.filter(models.BudgetBucket.id.in_(subtree_ids))
     elif bucket_id:
-        # Hierarchy: Find all descendants of the selected bucket
-        # 1. Fetch all hierarchy info for user
-        hierarchy = db.query(models.BudgetBucket.id, models.BudgetBucket.parent_id).filter(models.BudgetBucket.user_id == user.id).all()
-        
-        # 2. Build adjacency list
-        adj = {}
-        for bid, pid in hierarchy:
-            if pid:
-                adj.setdefault(pid, []).append(bid)
-        
-        # 3. BFS traversal to find all descendant IDs
-        subtree_ids = {bucket_id}
-        queue = [bucket_id]
-        while queue:
-            curr = queue.pop(0)
-            children = adj.get(curr, [])
-            for child in children:
-                if child not in subtree_ids:
-                    subtree_ids.add(child)
-                    queue.append(child)
-                    
+        # Hierarchy: the selected bucket and all its descendants
+        subtree_ids = get_bucket_tree(db, user.id).subtree(bucket_id)
         buckets_query = buckets_query.filter(models.BudgetBucket.id.in_(subtree_ids))
     elif group:
         buckets_query = buckets_query.filter(models.BudgetBucket.group == group)
@@ -510,15 +521,18 @@ def get_analytics_history(
             
             monthly_limit_total += base_bucket_limit
     
-    # Convert Limit to Daily if interval is day
+    # Normalise interval: anything unrecognised falls back to monthly buckets
+    period = interval if interval in ("day", "week") else "month"
+
+    # Convert Limit to the bucket size (limits are stored per month)
     effective_limit_total = monthly_limit_total
-    if interval == 'day':
+    if period == 'day':
         effective_limit_total = monthly_limit_total / 30.44 # Approx daily limit
+    elif period == 'week':
+        effective_limit_total = monthly_limit_total * 7 / 30.44
     
     logger.info(f"Optimized Limit Calc: {effective_limit_total} (Interval: {interval}) across {len(relevant_buckets)} buckets")
     
-    history_data = []
-    
     # Pre-process exclusion IDs
     excluded_ids_set = set()
     if exclude_bucket_ids:
@@ -527,149 +541,139 @@ def get_analytics_history(
          except ValueError:
             pass # Ignore malformed
 
-    # Branch Logic based on Interval
-    if interval == 'day':
-        # --- DAILY AGGREGATION ---
-        for current_day in day_iter(s_date, e_date):
-            day_start = current_day.replace(hour=0, minute=0, second=0, microsecond=0)
-            day_end = current_day.replace(hour=23, minute=59, second=59, microsecond=999999)
-            
-            # Query Txns
-            query = db.query(func.sum(models.Transaction.amount)).filter(
-                models.Transaction.user_id == user.id,
-                models.Transaction.date >= day_start,
-                models.Transaction.date <= day_end,
-                models.Transaction.amount < 0 # Only expenses
-            )
-            
-            if spender != "Combined":
-                query = query.filter(models.Transaction.spender == spender)
-            if account_id:
-                query = query.filter(models.Transaction.account_id == account_id)
-            if tags:
-                tag_list = [t.strip() for t in tags.split(',') if t.strip()]
-                if tag_list:
-                    tag_filters = [models.Transaction.tags.ilike(f"%{t}%") for t in tag_list]
-                    query = query.filter(or_(*tag_filters))
-            
-            # Apply Inclusions
-            if bucket_id or bucket_ids or group:
-                 query = query.filter(models.Transaction.bucket_id.in_(relevant_bucket_ids))
-            
-            # Apply Exclusions
-            if excluded_ids_set:
-                 query = query.filter(models.Transaction.bucket_id.notin_(excluded_ids_set))
+    # Query range covers whole buckets (e.g. full months for the monthly view)
+    range_start = _period_start(s_date, period)
+    range_end = _period_start(e_date, period)
+    range_end += _period_step(range_end, period)
+
+    bucket_filtered = bool(bucket_id or bucket_ids or group)
+    store = None if (tags or period == "month") else columnar.get_columns(db, user.id)
+    totals = {}
+
+    if period == "month" and not tags:
+        # Whole months: read pre-aggregated rollup rows instead of scanning transactions
+        transfer_ids = {
+            bid for (bid,) in db.query(models.BudgetBucket.id).filter(
+                models.BudgetBucket.user_id == user.id,
+                models.BudgetBucket.is_transfer == True
+            ).all()
+        }
+        rollup_rows = rollups.rollup_totals(
+            db, user.id, range_start.date(), rollups.month_start(range_end - timedelta(days=1)),
+            group_by=("month", "bucket_id"),
+            spender=spender if spender != "Combined" else None,
+            account_id=account_id
+        )
+        sums = {}
+        for month, bid, expense, income in rollup_rows:
+            if excluded_ids_set and (bid is None or bid in excluded_ids_set):
+                continue
+            if bucket_filtered and bid not in relevant_bucket_ids:
+                continue
+            is_transfer = bid in transfer_ids
+            spent, inc = sums.get(month, (0.0, 0.0))
+            if not is_transfer:
+                spent += expense
+            if bucket_filtered or not is_transfer:
+                inc += income
+            sums[month] = (spent, inc)
+        totals = {month: (abs(spent), inc) for month, (spent, inc) in sums.items()}
+    elif store is not None:
+        # Day/week buckets from the column store, with the conditions of the SQL below
+        scanned = store.select(
+            start=range_start, before=range_end,
+            spender=spender if spender != "Combined" else None, account_id=account_id
+        )
+        if excluded_ids_set:
+            # NOT IN drops uncategorized rows too
+            scanned &= ~store.in_buckets(excluded_ids_set | {None})
+        not_transfer = ~store.in_buckets(get_bucket_tree(db, user.id).transfer_ids)
+        spent_rows = scanned & (store.amount < 0) & not_transfer
+        income_rows = scanned & (store.amount > 0)
+        if bucket_filtered:
+            relevant = store.in_buckets(relevant_bucket_ids)
+            spent_rows &= relevant
+            income_rows &= relevant
+        else:
+            income_rows &= not_transfer
 
-            # Exclude Transfers
-            query = query.filter(
-                ~models.Transaction.bucket.has(models.BudgetBucket.is_transfer == True)
-            )
-                 
-            spent = query.scalar() or 0.0
-            spent = abs(spent)
-            
-            history_data.append({
-                "date": day_start.strftime("%Y-%m-%d"),
-                "label": day_start.strftime("%d"), # Just day number for chart
-                "fullDate": day_start.isoformat(),
-                "limit": effective_limit_total,
-                "spent": spent,
-                "income": 0 
-            })
-            
-            # Fetch Income for Day
-            inc_query = db.query(func.sum(models.Transaction.amount)).filter(
-                models.Transaction.user_id == user.id,
-                models.Transaction.date >= day_start,
-                models.Transaction.date <= day_end,
-                models.Transaction.amount > 0 # Income
-            )
-            
-            if not bucket_id and not bucket_ids and not group:
-                 # Global view: Include all income (except transfers)
-                 inc_query = inc_query.filter(
-                    ~models.Transaction.bucket.has(models.BudgetBucket.is_transfer == True)
-                 )
-            elif group == "Income":
-                 pass 
-            else:
-                 inc_query = inc_query.filter(models.Transaction.bucket_id.in_(relevant_bucket_ids))
+        keys, sums = store.period_sums(period, spent_rows, income_rows)
+        totals = {key: (abs(float(spent)), float(income)) for key, spent, income in zip(keys, *sums)}
+    else:
+        # Single grouped query: spent and income per bucket via conditional aggregation
+        # (Replaces two SUM queries per day/month)
+        period_col = _period_start_expr(db, period, models.Transaction.date).label("period")
+        not_transfer = func.coalesce(models.BudgetBucket.is_transfer, False) == False
 
-            if spender != "Combined": inc_query = inc_query.filter(models.Transaction.spender == spender)
-            if account_id: inc_query = inc_query.filter(models.Transaction.account_id == account_id)
-            if excluded_ids_set: inc_query = inc_query.filter(models.Transaction.bucket_id.notin_(excluded_ids_set))
-            
-            income = inc_query.scalar() or 0.0
-            history_data[-1]["income"] = income
+        spent_conds = [models.Transaction.amount < 0, not_transfer]
+        income_conds = [models.Transaction.amount > 0]
 
+        tag_clause = transaction_tags.tag_filter(user.id, tags)
+        if tag_clause is not None:
+            spent_conds.append(tag_clause)
 
-    else:
-        # --- MONTHLY AGGREGATION ---
-        for year, month in month_year_iter(s_date, e_date):
-            # Transaction Range for this month
-            m_start = datetime(year, month, 1)
-            if month == 12:
-                m_end = datetime(year + 1, 1, 1)
-            else:
-                m_end = datetime(year, month + 1, 1)
-                
-            # Query Txns
-            query = db.query(func.sum(models.Transaction.amount)).filter(
-                models.Transaction.user_id == user.id,
-                models.Transaction.date >= m_start,
-                models.Transaction.date < m_end,
-                models.Transaction.amount < 0 # Only expenses
-            )
-            
-            if spender != "Combined":
-                query = query.filter(models.Transaction.spender == spender)
-            if account_id:
-                query = query.filter(models.Transaction.account_id == account_id)
-            if tags:
-                tag_list = [t.strip() for t in tags.split(',') if t.strip()]
-                if tag_list:
-                    tag_filters = [models.Transaction.tags.ilike(f"%{t}%") for t in tag_list]
-                    query = query.filter(or_(*tag_filters))
-            if bucket_id or bucket_ids or group:
-                 query = query.filter(models.Transaction.bucket_id.in_(relevant_bucket_ids))
-            
-            # Apply Exclusions
-            if excluded_ids_set:
-                 query = query.filter(models.Transaction.bucket_id.notin_(excluded_ids_set))
+        if bucket_filtered:
+            spent_conds.append(models.Transaction.bucket_id.in_(relevant_bucket_ids))
+            income_conds.append(models.Transaction.bucket_id.in_(relevant_bucket_ids))
+        else:
+            # Global view: Include all income (except transfers)
+            income_conds.append(not_transfer)
+
+        query = db.query(
+            period_col,
+            func.sum(case((and_(*spent_conds), models.Transaction.amount), else_=0.0)).label("spent"),
+            func.sum(case((and_(*income_conds), models.Transaction.amount), else_=0.0)).label("income")
+        ).outerjoin(
+            models.BudgetBucket, models.Transaction.bucket_id == models.BudgetBucket.id
+        ).filter(
+            models.Transaction.user_id == user.id,
+            models.Transaction.date >= range_start,
+            models.Transaction.date < range_end
+        )
 
-            query = query.filter(
-                ~models.Transaction.bucket.has(models.BudgetBucket.is_transfer == True)
-            )
-                 
-            spent = query.scalar() or 0.0
-            spent = abs(spent)
-            
-            # Fetch Income for Month (Consistency update)
-            inc_query = db.query(func.sum(models.Transaction.amount)).filter(
-                models.Transaction.user_id == user.id,
-                models.Transaction.date >= m_start,
-                models.Transaction.date < m_end,
-                models.Transaction.amount > 0
-            )
-            if not bucket_id and not bucket_ids and not group:
-                 inc_query = inc_query.filter(
-                    ~models.Transaction.bucket.has(models.BudgetBucket.is_transfer == True)
-                 )
-            else:
-                 inc_query = inc_query.filter(models.Transaction.bucket_id.in_(relevant_bucket_ids))
-            if spender != "Combined": inc_query = inc_query.filter(models.Transaction.spender == spender)
-            if account_id: inc_query = inc_query.filter(models.Transaction.account_id == account_id)
-            if excluded_ids_set: inc_query = inc_query.filter(models.Transaction.bucket_id.notin_(excluded_ids_set))
-            
-            income = inc_query.scalar() or 0.0
-            
-            history_data.append({
-                "date": m_start.strftime("%Y-%m-%d"),
-                "label": m_start.strftime("%b %Y"),
+        if spender != "Combined":
+            query = query.filter(models.Transaction.spender == spender)
+        if account_id:
+            query = query.filter(models.Transaction.account_id == account_id)
+        if excluded_ids_set:
+            query = query.filter(models.Transaction.bucket_id.notin_(excluded_ids_set))
+
+        for period_value, spent, income in query.group_by(period_col).all():
+            totals[_period_key(period_value)] = (abs(spent or 0.0), income or 0.0)
+
+    # Zero-fill missing buckets in Python
+    history_data = []
+    current = range_start
+    while current < range_end:
+        spent, income = totals.get(current.date(), (0.0, 0.0))
+        if period == 'day':
+            point = {
+                "date": current.strftime("%Y-%m-%d"),
+                "label": current.strftime("%d"), # Just day number for chart
+                "fullDate": current.isoformat(),
+                "limit": effective_limit_total,
+                "spent": spent,
+                "income": income
+            }
+        elif period == 'week':
+            point = {
+                "date": current.strftime("%Y-%m-%d"),
+                "label": current.strftime("%d %b"),
+                "fullDate": current.isoformat(),
+                "limit": effective_limit_total,
+                "spent": spent,
+                "income": income
+            }
+        else:
+            point = {
+                "date": current.strftime("%Y-%m-%d"),
+                "label": current.strftime("%b %Y"),
                 "limit": monthly_limit_total,
                 "spent": spent,
                 "income": income
-            })
+            }
+        history_data.append(point)
+        current += _period_step(current, period)
 
         
     logger.info(f"History calculation complete. Returning {len(history_data)} points.")
@@ -681,6 +685,7 @@ def get_analytics_history(
 def get_calendar_data(
     start_date: str = Query(..., description="ISO Date string"), 
     end_date: str = Query(..., description="ISO Date string"),
+    response_format: str = Query("full", alias="format", pattern="^(full|columnar|daily)$", description="full (transaction objects), columnar (parallel arrays) or daily (per-day totals)"),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
@@ -691,6 +696,13 @@ def get_calendar_data(
         raise HTTPException(status_code=400, detail="Invalid date format. Use ISO format.")
         
     user = current_user
+
+    # Lightweight shapes: plain column tuples, no ORM objects or per-row models
+    # (returned as a Response so response_model validation is skipped)
+    if response_format == "columnar":
+        return JSONResponse(_calendar_columns(db, user.id, s_date, e_date))
+    if response_format == "daily":
+        return JSONResponse(_calendar_days(db, user.id, s_date, e_date))
     
     # Fetch all transactions in range
     txns = db.query(models.Transaction)\
@@ -708,6 +720,92 @@ def get_calendar_data(
     return txns
 
 
+def _calendar_columns(db: Session, user_id: str, s_date: datetime, e_date: datetime) -> dict:
+    """
+    Calendar transactions as parallel arrays, with the referenced buckets (and
+    their parents) sent once in a lookup keyed by id.
+    """
+    T = models.Transaction
+    rows = db.query(
+        T.id, T.date, T.description, T.amount, T.bucket_id, T.spender, T.account_id
+    ).filter(
+        T.user_id == user_id,
+        T.date >= s_date,
+        T.date <= e_date
+    ).order_by(T.date.asc()).all()
+
+    columns = [list(col) for col in zip(*rows)] if rows else [[] for _ in range(7)]
+    ids, dates, descriptions, amounts, bucket_ids, spenders, account_ids = columns
+
+    bucket_rows = {
+        row.id: row for row in db.query(
+            models.BudgetBucket.id, models.BudgetBucket.name, models.BudgetBucket.icon_name,
+            models.BudgetBucket.group, models.BudgetBucket.parent_id,
+            models.BudgetBucket.is_transfer, models.BudgetBucket.is_investment
+        ).filter(models.BudgetBucket.user_id == user_id).all()
+    }
+    referenced = {bid for bid in bucket_ids if bid in bucket_rows}
+    referenced |= {bucket_rows[bid].parent_id for bid in referenced if bucket_rows[bid].parent_id in bucket_rows}
+
+    return {
+        "format": "columnar",
+        "count": len(ids),
+        "columns": {
+            "id": ids,
+            "date": [d.isoformat() if d else None for d in dates],
+            # Escaped as in the full Transaction schema
+            "description": [schemas.sanitize_text(d, max_length=500) or "" for d in descriptions],
+            "amount": amounts,
+            "bucket_id": bucket_ids,
+            "spender": [schemas.sanitize_text(s, max_length=500) or "" for s in spenders],
+            "account_id": account_ids,
+        },
+        "buckets": {
+            str(bid): {
+                "name": schemas.sanitize_text(bucket_rows[bid].name, max_length=200) or "",
+                "icon_name": bucket_rows[bid].icon_name,
+                "group": bucket_rows[bid].group,
+                "parent_id": bucket_rows[bid].parent_id,
+                "is_transfer": bool(bucket_rows[bid].is_transfer),
+                "is_investment": bool(bucket_rows[bid].is_investment),
+            }
+            for bid in sorted(referenced)
+        },
+    }
+
+
+def _calendar_days(db: Session, user_id: str, s_date: datetime, e_date: datetime) -> dict:
+    """Per-day expense / income totals and counts, transfers excluded, grouped in SQL."""
+    day_col = _period_start_expr(db, "day", models.Transaction.date).label("day")
+    amount = models.Transaction.amount
+    rows = db.query(
+        day_col,
+        func.sum(case((amount < 0, -amount), else_=0.0)),
+        func.sum(case((amount > 0, amount), else_=0.0)),
+        func.count(models.Transaction.id)
+    ).outerjoin(
+        models.BudgetBucket, models.Transaction.bucket_id == models.BudgetBucket.id
+    ).filter(
+        models.Transaction.user_id == user_id,
+        models.Transaction.date >= s_date,
+        models.Transaction.date <= e_date,
+        func.coalesce(models.BudgetBucket.is_transfer, False) == False
+    ).group_by(day_col).order_by(day_col).all()
+
+    return {
+        "format": "daily",
+        "days": [
+            {
+                "date": _period_key(day).isoformat(),
+                "expenses": round(expenses or 0.0, 2),
+                "income": round(income or 0.0, 2),
+                "count": count
+            }
+            for day, expenses, income, count in rows
+        ],
+    }
+
+
 @router.get("/subscriptions", response_model=List[schemas.Subscription])
 def get_subscriptions(
     db: Session = Depends(get_db),
@@ -741,6 +839,7 @@ def create_subscription(
     )
     db.add(db_sub)
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     db.refresh(db_sub)
     return db_sub
 
@@ -774,6 +873,7 @@ def update_subscription(
         setattr(db_sub, key, value)
         
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     db.refresh(db_sub)
     return db_sub
 
@@ -789,6 +889,7 @@ def delete_subscription(
         
     db.delete(db_sub)
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     return {"ok": True}
 
 @router.get("/subscriptions/suggested")
@@ -803,97 +904,19 @@ def get_suggested_subscriptions(
     if exclude_existing:
         subs = db.query(models.Subscription).filter(models.Subscription.user_id == user.id).all()
         for s in subs:
-            keyword = (s.description_keyword or s.name).lower()
-            existing_keywords.add(keyword)
+            keyword = (s.description_keyword or s.name or "").lower()
+            if keyword:
+                existing_keywords.add(keyword)
 
-    # 1. Fetch last 12 months of transactions
-    one_year_ago = datetime.now() - timedelta(days=365)
-    
-    all_txns = db.query(models.Transaction).filter(
-        models.Transaction.user_id == user.id,
-        models.Transaction.date >= one_year_ago
-    ).order_by(models.Transaction.date.desc()).all()
-    
+    # 1. Recurring groups over the last 12 months (only new transactions are scanned)
     recommendations = []
-    
-    # Helper to process a group of transactions
-    def process_group(txns_list, txn_type):
-        from collections import defaultdict
-        groups = defaultdict(list)
-        
-        for t in txns_list:
-            key = t.description.strip().lower()
-            groups[key].append(t)
-            
-        for name, items in groups.items():
-            if len(items) < 3: continue 
-            
-            if exclude_existing and name in existing_keywords:
-                continue
-            
-            # Sort by date
-            items.sort(key=lambda x: x.date)
-            
-            # Check Amount Consistency
-            amounts = [abs(x.amount) for x in items]
-            avg_amount = sum(amounts) / len(amounts)
-            
-            # Allow 15% variance
-            is_consistent_amount = all(abs(a - avg_amount) < (avg_amount * 0.15) for a in amounts) 
-            
-            if not is_consistent_amount: continue
-    
-            # Check Frequency
-            dates = [x.date for x in items]
-            intervals = [(dates[i] - dates[i-1]).days for i in range(1, len(dates))]
-                
-            avg_interval = sum(intervals) / len(intervals)
-            
-            frequency = None
-            
-            # Ranges
-            if 6 <= avg_interval <= 8:
-                frequency = "Weekly"
-                nom_interval = 7
-            elif 13 <= avg_interval <= 15:
-                frequency = "Bi-Weekly"
-                nom_interval = 14
-            elif 25 <= avg_interval <= 35:
-                frequency = "Monthly"
-                nom_interval = 30
-            elif 360 <= avg_interval <= 370:
-                frequency = "Yearly"
-                nom_interval = 365
-                
-            if frequency:
-                last_date = dates[-1]
-                next_due = last_date + timedelta(days=int(nom_interval))
-                
-                # Confidence
-                variance_score = sum(abs(a - avg_amount) for a in amounts) / (len(amounts) * avg_amount)
-                confidence = "High" if variance_score < 0.05 else "Medium"
-                
-                recommendations.append({
-                    "name": items[0].description, 
-                    "description_keyword": name,
-                    "amount": avg_amount,
-                    "type": txn_type,
-                    "frequency": frequency,
-                    "annual_cost": avg_amount * (365/nom_interval),
-                    "next_due": next_due,
-                    "confidence": confidence,
-                    "last_payment_date": last_date,
-                    "bucket_id": items[-1].bucket_id  # Inherit category from most recent transaction
-                })
+    for candidate in recurring.detect_recurring(db, user.id):
+        name = candidate["description_keyword"]
+        # Keywords are substring matches, so either side containing the other is the same merchant
+        if any(keyword in name or name in keyword for keyword in existing_keywords):
+            continue
+        recommendations.append(candidate)
 
-    # Pass 1: Expenses
-    expenses = [t for t in all_txns if t.amount < 0]
-    process_group(expenses, "Expense")
-    
-    # Pass 2: Income
-    income = [t for t in all_txns if t.amount > 0]
-    process_group(income, "Income")
-            
     return recommendations
 
 
@@ -907,48 +930,10 @@ def get_debt_projection(
     current_user: models.User = Depends(auth.get_current_user)
 ):
     # Logic for Amortization
-    # We will simulate two scenarios: Base (Min Payment) and Accelerated (Min + Extra)
-    
-    def calculate_amortization(bal, rate, payment):
-        monthly_rate = (rate / 100) / 12
-        schedule = []
-        total_interest = 0.0
-        months = 0
-        
-        # Guard against infinite loop if payment < interest
-        first_month_interest = bal * monthly_rate
-        if payment <= first_month_interest:
-             # Just return 1 year projection to show it growing/stagnant
-             for i in range(12):
-                 interest = bal * monthly_rate
-                 principal = payment - interest
-                 bal -= principal
-                 total_interest += interest
-                 schedule.append({"month": i+1, "balance": max(0, bal), "interest": interest, "principal": principal})
-             return {"schedule": schedule, "total_interest": float('inf'), "months": float('inf')}
-
-        while bal > 0.01 and months < 360: # Cap at 30 years for safety
-            interest = bal * monthly_rate
-            principal = payment - interest
-            
-            if bal < principal: # Final payment
-                principal = bal
-                payment = interest + principal
-            
-            bal -= principal
-            total_interest += interest
-            months += 1
-            schedule.append({
-                "month": months,
-                "balance": max(0, bal),
-                "interest": interest, 
-                "principal": principal
-            })
-            
-        return {"schedule": schedule, "total_interest": total_interest, "months": months}
-
-    base = calculate_amortization(current_balance, interest_rate, minimum_payment)
-    accelerated = calculate_amortization(current_balance, interest_rate, minimum_payment + extra_payment)
+    # We will compute two scenarios: Base (Min Payment) and Accelerated (Min + Extra)
+    # Each schedule comes from the closed-form annuity formula (services/debt.py)
+    base = debt_engine.amortization_schedule(current_balance, interest_rate, minimum_payment)
+    accelerated = debt_engine.amortization_schedule(current_balance, interest_rate, minimum_payment + extra_payment)
     
     return {
         "base_plan": base,
@@ -960,8 +945,126 @@ def get_debt_projection(
     }
 
 
+@router.get("/debt_payoff")
+@cached_response("analytics:debt_payoff", ttl=CacheManager.TTL_MEDIUM)
+def get_debt_payoff(
+    extra_payment: float = Query(0.0, ge=0, description="Monthly amount on top of all minimum payments"),
+    order: Optional[str] = Query(None, description="Comma-separated account ids for the custom strategy"),
+    max_months: int = Query(debt_engine.MAX_MONTHS, ge=12, le=1200),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    Compare payoff strategies for all active liability accounts at once.
+
+    Every strategy pays the same monthly budget (all minimums plus
+    ``extra_payment``); they differ in which debt receives the remainder.
+    "minimum" is the baseline where freed-up minimums are not reused.
+    Accounts without a minimum payment assume interest plus 1% of the balance
+    (at least 25).
+    """
+    accounts = db.query(models.Account).filter(
+        models.Account.user_id == current_user.id,
+        models.Account.type == "Liability",
+        models.Account.is_active == True,
+        models.Account.balance != 0
+    ).order_by(models.Account.id).all()
+
+    debts = []
+    for a in accounts:
+        balance = abs(a.balance or 0.0)
+        rate = a.interest_rate or 0.0
+        assumed = not a.minimum_payment or a.minimum_payment <= 0
+        minimum = a.minimum_payment if not assumed else max(
+            balance * float(debt_engine.monthly_rate(rate)) + balance * 0.01, 25.0
+        )
+        debts.append({
+            "id": a.id,
+            "name": a.name,
+            "category": a.category,
+            "balance": round(balance, 2),
+            "interest_rate": rate,
+            "minimum_payment": round(minimum, 2),
+            "minimum_payment_assumed": assumed
+        })
+
+    if not debts:
+        return {"debts": [], "monthly_budget": 0.0, "strategies": {}, "recommended": None, "savings": None}
+
+    balances = np.array([d["balance"] for d in debts])
+    rates = np.array([d["interest_rate"] for d in debts])
+    minimums = np.array([d["minimum_payment"] for d in debts])
+
+    plans = {
+        "minimum": (debt_engine.priority_order(balances, rates, "avalanche"), False),
+        "avalanche": (debt_engine.priority_order(balances, rates, "avalanche"), True),
+        "snowball": (debt_engine.priority_order(balances, rates, "snowball"), True),
+    }
+    if order:
+        index_of = {d["id"]: i for i, d in enumerate(debts)}
+        try:
+            custom = [index_of[int(x)] for x in order.split(",") if x.strip() and int(x) in index_of]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="order must be a comma-separated list of account ids")
+        plans["custom"] = (debt_engine.priority_order(balances, rates, "custom", custom), True)
+
+    strategies = {}
+    for name, (priority, rollover) in plans.items():
+        result = debt_engine.simulate_payoff(
+            balances, rates, minimums, extra_payment if rollover else 0.0, priority, rollover, max_months
+        )
+        interest_by_debt = result["interest"].sum(axis=0)
+        payoff_order = sorted(
+            (
+                {
+                    "id": debts[i]["id"],
+                    "name": debts[i]["name"],
+                    "month": int(result["payoff_month"][i]) if result["payoff_month"][i] >= 0 else None,
+                    "interest": round(float(interest_by_debt[i]), 2)
+                }
+                for i in range(len(debts))
+            ),
+            key=lambda x: (x["month"] is None, x["month"] or 0)
+        )
+        strategies[name] = {
+            "months": result["months"],
+            "total_interest": round(float(result["interest"].sum()), 2),
+            "total_paid": round(float(result["payments"].sum()), 2),
+            "order": [debts[i]["id"] for i in priority],
+            "payoff_order": payoff_order,
+            "schedule": [
+                {"month": m + 1, "balance": round(float(b), 2), "interest": round(float(i), 2), "payment": round(float(p), 2)}
+                for m, (b, i, p) in enumerate(zip(
+                    result["balances"].sum(axis=1), result["interest"].sum(axis=1), result["payments"].sum(axis=1)
+                ))
+            ]
+        }
+
+    finished = [n for n in strategies if n != "minimum" and strategies[n]["months"] is not None]
+    recommended = min(finished, key=lambda n: (strategies[n]["total_interest"], strategies[n]["months"])) if finished else None
+    savings = None
+    baseline = strategies["minimum"]
+    if recommended and baseline["months"] is not None:
+        savings = {
+            "interest_saved": round(baseline["total_interest"] - strategies[recommended]["total_interest"], 2),
+            "time_saved_months": baseline["months"] - strategies[recommended]["months"]
+        }
+
+    return {
+        "debts": debts,
+        "monthly_budget": round(float(minimums.sum()) + extra_payment, 2),
+        "strategies": strategies,
+        "recommended": recommended,
+        "savings": savings
+    }
+
+
 @router.get("/anomalies")
+@cached_response("analytics:anomalies", ttl=CacheManager.TTL_MEDIUM)
 def get_anomalies(
+    method: str = Query("zscore", pattern="^(zscore|mad)$", description="zscore (mean/stdev) or mad (median/MAD, robust)"),
+    sensitivity: float = Query(2.0, gt=0, le=10, description="Deviations above the baseline that count as anomalous"),
+    large_percentile: Optional[float] = Query(None, gt=50, lt=100, description="Use this percentile of recent expenses as the large-transaction threshold"),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
@@ -969,7 +1072,7 @@ def get_anomalies(
     today = datetime.now()
     
     # Get bucket IDs to exclude from anomaly detection (transfers and one-offs)
-    excluded_bucket_ids = [b.id for b in db.query(models.BudgetBucket).filter(
+    excluded_bucket_ids = [b.id for b in db.query(models.BudgetBucket.id).filter(
         models.BudgetBucket.user_id == user.id,
         (models.BudgetBucket.is_transfer == True) | (models.BudgetBucket.is_one_off == True)
     ).all()]
@@ -977,98 +1080,112 @@ def get_anomalies(
     # 1. Large Transactions (Dynamic Threshold based on last 90 days)
     ninety_days_ago = today - timedelta(days=90)
     
-    # Fetch all expenses in last 90 days (excluding transfers and one-offs)
-    recent_txns = db.query(models.Transaction).filter(
+    # Expenses in last 90 days (excluding transfers and one-offs), aggregated in SQL
+    recent_filters = [
         models.Transaction.user_id == user.id,
         models.Transaction.date >= ninety_days_ago,
         models.Transaction.amount < 0,
-        ~models.Transaction.bucket_id.in_(excluded_bucket_ids) if excluded_bucket_ids else True
-    ).all()
+    ]
+    if excluded_bucket_ids:
+        recent_filters.append(~models.Transaction.bucket_id.in_(excluded_bucket_ids))
     
     anomalies = []
     
-    if recent_txns:
-        amounts = [abs(t.amount) for t in recent_txns]
-        if len(amounts) > 1:
-            mean_amt = statistics.mean(amounts)
-            std_amt = statistics.stdev(amounts)
-            # Threshold: Mean + 2 Standard Deviations (approx 95th percentile)
-            # Minimum threshold of $100 to avoid noise
-            large_threshold = max(200.0, mean_amt + (2 * std_amt))
+    store = columnar.get_columns(db, user.id)
+    if store is not None:
+        recent = store.select(start=ninety_days_ago) & (store.amount < 0)
+        if excluded_bucket_ids:
+            # NOT IN drops uncategorized rows too
+            recent &= ~store.in_buckets(excluded_bucket_ids + [None])
+        recent_sizes = np.abs(store.amount[recent])
+        count, mean_amt, std_amt = anomaly_stats.size_moments(recent_sizes)
+    else:
+        count, mean_amt, std_amt = anomaly_stats.amount_moments(db, recent_filters)
+    if count:
+        if large_percentile is not None:
+            # Minimum threshold of $200 to avoid noise
+            if store is not None:
+                percentile_amt = anomaly_stats.size_percentile(
+                    recent_sizes, large_percentile, continuous=db.get_bind().dialect.name == "postgresql"
+                )
+            else:
+                percentile_amt = anomaly_stats.amount_percentile(db, recent_filters, large_percentile, count=count)
+            large_threshold = max(200.0, percentile_amt or 0.0)
+        elif count > 1:
+            # Threshold: Mean + N Standard Deviations (N=2 is approx 95th percentile)
+            # Minimum threshold of $200 to avoid noise
+            large_threshold = max(200.0, mean_amt + (sensitivity * std_amt))
         else:
             large_threshold = 500.0 # Fallback
+        high_threshold = mean_amt + (sensitivity + 1) * std_amt
             
-        # Find large txns in last 30 days
+        # Find large txns in last 30 days (only the matching rows are fetched)
         thirty_days_ago = today - timedelta(days=30)
-        for t in recent_txns:
-            if t.date >= thirty_days_ago and abs(t.amount) > large_threshold:
-                anomalies.append({
-                    "type": "large_transaction",
-                    "severity": "high" if abs(t.amount) > (mean_amt + 3*std_amt) else "medium",
-                    "message": f"Large expense detected: {t.description}",
-                    "amount": abs(t.amount),
-                    "date": t.date,
-                    "details": f"Amount ${abs(t.amount):.0f} exceeds typical range (Threshold: ${large_threshold:.0f})"
-                })
+        large_txns = db.query(
+            models.Transaction.description,
+            models.Transaction.amount,
+            models.Transaction.date
+        ).filter(
+            *recent_filters,
+            models.Transaction.date >= thirty_days_ago,
+            func.abs(models.Transaction.amount) > large_threshold
+        ).all()
+        
+        for description, amount, txn_date in large_txns:
+            anomalies.append({
+                "type": "large_transaction",
+                "severity": "high" if abs(amount) > high_threshold else "medium",
+                "message": f"Large expense detected: {description}",
+                "amount": abs(amount),
+                "date": txn_date,
+                "details": f"Amount ${abs(amount):.0f} exceeds typical range (Threshold: ${large_threshold:.0f})"
+            })
 
     # 2. Category Spikes (Dynamic based on last 6 months)
-    # Fetch 6 months history
+    # Monthly expense totals per bucket come straight from the rollup table
     six_months_ago = (today.replace(day=1) - timedelta(days=180)).replace(day=1)
+    current_month = rollups.month_start(today)
     
-    hist_txns = db.query(models.Transaction).filter(
-        models.Transaction.user_id == user.id,
-        models.Transaction.date >= six_months_ago,
-        models.Transaction.bucket_id.isnot(None),
-        models.Transaction.amount < 0
-    ).all()
+    # Get Bucket Names
+    buckets = {b.id: b.name for b in db.query(models.BudgetBucket.id, models.BudgetBucket.name).filter(models.BudgetBucket.user_id == user.id).all()}
+    excluded = set(excluded_bucket_ids)
     
-    # Aggregate by Bucket and Month (excluding transfers)
-    bucket_monthly = {} # bid -> { 'yyyy-mm': total }
-    from collections import defaultdict
-    bucket_monthly = defaultdict(lambda: defaultdict(float))
+    monthly = rollups.rollup_totals(
+        db, user.id, six_months_ago.date(), date.max, group_by=("bucket_id", "month")
+    )
     
-    for t in hist_txns:
-        # Skip transfer buckets and one-offs
-        if t.bucket_id in excluded_bucket_ids:
+    # Matrix of history months (current month excluded); NaN = no spending that month
+    current_totals = {}
+    history_rows = {}
+    history_months = sorted({month for bid, month, expense, _ in monthly if month != current_month and expense < 0})
+    month_index = {month: i for i, month in enumerate(history_months)}
+    for bid, month, expense, _ in monthly:
+        if bid is None or bid in excluded or bid not in buckets or expense >= 0:
             continue
-        month_key = t.date.strftime("%Y-%m")
-        bucket_monthly[t.bucket_id][month_key] += abs(t.amount)
-        
-    current_month_key = today.strftime("%Y-%m")
-    
-    # Get Bucket Names
-    buckets = {b.id: b.name for b in db.query(models.BudgetBucket).filter(models.BudgetBucket.user_id == user.id).all()}
-    
-    for bid, months_data in bucket_monthly.items():
-        if bid not in buckets: continue
-        
-        current_val = months_data.get(current_month_key, 0.0)
-        if current_val == 0: continue
-        
-        # Get history values (excluding current month)
-        history_vals = [val for m, val in months_data.items() if m != current_month_key]
-        
-        # If sparsely populated, treat missing months as 0? 
-        # Better: compare against available history.
-        if not history_vals: continue
-        
-        # Calculate stats
-        avg_val = statistics.mean(history_vals)
-        if len(history_vals) > 1:
-            std_val = statistics.stdev(history_vals)
-            spike_threshold = avg_val + (2 * std_val)
+        if month == current_month:
+            current_totals[bid] = -expense
         else:
-            spike_threshold = avg_val * 1.5 # Fallback
-            
-        # Ignore small amounts (< $50 or < 20% over avg)
-        if current_val < 50: continue
-        
-        if current_val > spike_threshold:
+            row = history_rows.setdefault(bid, np.full(len(history_months), np.nan))
+            row[month_index[month]] = -expense
+    
+    # Only buckets with spending this month and some history to compare against
+    candidates = [bid for bid in sorted(current_totals) if bid in history_rows]
+    if candidates:
+        history = np.vstack([history_rows[bid] for bid in candidates])
+        current = np.array([current_totals[bid] for bid in candidates])
+        baseline, threshold, high_threshold = anomaly_stats.spike_thresholds(history, method, sensitivity)
+        
+        # Ignore small amounts (< $50)
+        flagged = np.nonzero((current >= 50) & (current > threshold))[0]
+        for i in flagged:
+            bid = candidates[i]
+            current_val = float(current[i])
+            avg_val = float(baseline[i])
             pct = int((current_val / avg_val) * 100) if avg_val > 0 else 100
             
             anomalies.append({
                 "type": "category_spike",
-                "severity": "high" if current_val > (avg_val + 3 * (std_val if len(history_vals) > 1 else 0)) else "medium",
+                "severity": "high" if current_val > high_threshold[i] else "medium",
                 "message": f"High spending in '{buckets[bid]}'",
                 "amount": current_val,
                 "date": today,
@@ -1096,6 +1213,7 @@ def get_transaction_stats(
 
 
 @router.get("/sankey")
+@cached_response("analytics:sankey", ttl=CacheManager.TTL_MEDIUM)
 def get_sankey_data(
     start_date: str = Query(..., description="ISO Date string"), 
     end_date: str = Query(..., description="ISO Date string"),
@@ -1118,36 +1236,51 @@ def get_sankey_data(
     # Get buckets for group lookup
     all_buckets = db.query(models.BudgetBucket).filter(models.BudgetBucket.user_id == user.id).all()
     bucket_map = {b.id: b for b in all_buckets}
+    # Hierarchy index for income-group and root-parent lookups
+    tree = get_bucket_tree(db, user.id)
+    
+    # Whole-month ranges read one set of pre-aggregated rows for all the net-by-bucket views below
+    month_span = rollups.whole_month_span(s_date, e_date)
+    # Scans include the whole end day, matching the rollup rows
+    end_bound = rollups.day_after(e_date)
+    rollup_rows = None
+    net_by_bucket = None
+    if month_span:
+        rollup_rows = rollups.rollup_totals(
+            db, user.id, *month_span,
+            spender=spender if spender != "Combined" else None
+        )
+        net_by_bucket = []
+        for bid, expense, income in rollup_rows:
+            bucket = bucket_map.get(bid)
+            if bucket and (bucket.is_transfer or bucket.is_investment or (exclude_one_offs and bucket.is_one_off)):
+                continue
+            net_by_bucket.append((bid, expense + income))
     
-    # Helper to check if bucket is income group
-    def is_income_group(bucket):
-        if bucket.group == "Income":
-            return True
-        if bucket.parent_id and bucket.parent_id in bucket_map:
-            return bucket_map[bucket.parent_id].group == "Income"
-        return False
-    
-    # Query net amounts by bucket
-    bucket_totals_query = db.query(
-        models.Transaction.bucket_id,
-        func.sum(models.Transaction.amount).label("net_amount")
-    ).filter(
-        models.Transaction.user_id == user.id,
-        models.Transaction.date >= s_date,
-        models.Transaction.date <= e_date,
-        ~models.Transaction.bucket.has(models.BudgetBucket.is_transfer == True),
-        ~models.Transaction.bucket.has(models.BudgetBucket.is_investment == True)
-    )
+    if net_by_bucket is not None:
+        bucket_totals = net_by_bucket
+    else:
+        # Query net amounts by bucket
+        bucket_totals_query = db.query(
+            models.Transaction.bucket_id,
+            func.sum(models.Transaction.amount).label("net_amount")
+        ).filter(
+            models.Transaction.user_id == user.id,
+            models.Transaction.date >= s_date,
+            models.Transaction.date < end_bound,
+            ~models.Transaction.bucket.has(models.BudgetBucket.is_transfer == True),
+            ~models.Transaction.bucket.has(models.BudgetBucket.is_investment == True)
+        )
     
-    if spender != "Combined":
-        bucket_totals_query = bucket_totals_query.filter(models.Transaction.spender == spender)
+        if spender != "Combined":
+            bucket_totals_query = bucket_totals_query.filter(models.Transaction.spender == spender)
 
-    if exclude_one_offs:
-        bucket_totals_query = bucket_totals_query.filter(
-            ~models.Transaction.bucket.has(models.BudgetBucket.is_one_off == True)
-        )
+        if exclude_one_offs:
+            bucket_totals_query = bucket_totals_query.filter(
+                ~models.Transaction.bucket.has(models.BudgetBucket.is_one_off == True)
+            )
         
-    bucket_totals = bucket_totals_query.group_by(models.Transaction.bucket_id).all()
+        bucket_totals = bucket_totals_query.group_by(models.Transaction.bucket_id).all()
     
     # Calculate totals: true income and net expenses
     total_income = 0.0
@@ -1161,8 +1294,7 @@ def get_sankey_data(
             elif net_amount and net_amount < 0:
                 total_expenses += abs(net_amount)
         elif bid in bucket_map:
-            bucket = bucket_map[bid]
-            if is_income_group(bucket):
+            if tree.is_income(bid):
                 # Income bucket - positive amounts are income
                 if net_amount and net_amount > 0:
                     total_income += net_amount
@@ -1173,56 +1305,44 @@ def get_sankey_data(
     
     # 2. Fetch NET Spending by Bucket (expenses minus refunds)
     # This allows refunds to offset expenses within the same bucket
-    expense_query = db.query(
-        models.Transaction.bucket_id,
-        func.sum(models.Transaction.amount)  # Sum all transactions (negative = expense, positive = refund)
-    ).filter(
-        models.Transaction.user_id == user.id,
-        models.Transaction.date >= s_date,
-        models.Transaction.date <= e_date,
-        # Include both expenses AND refunds for expense buckets
-        # (we'll filter to only show buckets with net negative later)
-    )
+    if net_by_bucket is not None:
+        expense_results = net_by_bucket
+    else:
+        expense_query = db.query(
+            models.Transaction.bucket_id,
+            func.sum(models.Transaction.amount)  # Sum all transactions (negative = expense, positive = refund)
+        ).filter(
+            models.Transaction.user_id == user.id,
+            models.Transaction.date >= s_date,
+            models.Transaction.date < end_bound,
+            # Include both expenses AND refunds for expense buckets
+            # (we'll filter to only show buckets with net negative later)
+        )
     
-    if spender != "Combined":
-        expense_query = expense_query.filter(models.Transaction.spender == spender)
-
-    # Exclude Transfer and Investment buckets from expense view
-    # NOTE: Income group filtering is done in Python below to match is_income_bucket logic
-    expense_query = expense_query.filter(
-        ~models.Transaction.bucket.has(models.BudgetBucket.is_transfer == True),
-        ~models.Transaction.bucket.has(models.BudgetBucket.is_investment == True)
-    )
+        if spender != "Combined":
+            expense_query = expense_query.filter(models.Transaction.spender == spender)
 
-    if exclude_one_offs:
+        # Exclude Transfer and Investment buckets from expense view
+        # NOTE: Income group filtering is done in Python below via tree.is_income
         expense_query = expense_query.filter(
-            ~models.Transaction.bucket.has(models.BudgetBucket.is_one_off == True)
+            ~models.Transaction.bucket.has(models.BudgetBucket.is_transfer == True),
+            ~models.Transaction.bucket.has(models.BudgetBucket.is_investment == True)
         )
+
+        if exclude_one_offs:
+            expense_query = expense_query.filter(
+                ~models.Transaction.bucket.has(models.BudgetBucket.is_one_off == True)
+            )
         
-    expense_results = expense_query.group_by(models.Transaction.bucket_id).all()
-    
-    # 3. Get Bucket Details for Names/Groups FIRST (needed for is_income_bucket)
-    buckets = db.query(models.BudgetBucket).filter(models.BudgetBucket.user_id == user.id).all()
-    bucket_map = {b.id: b for b in buckets}
+        expense_results = expense_query.group_by(models.Transaction.bucket_id).all()
     
-    # Helper to check if a bucket belongs to Income group (check self AND parent)
-    def is_income_bucket(bucket):
-        if bucket.group == "Income":
-            return True
-        # Check parent bucket's group (for inherited categories)
-        if bucket.parent_id and bucket.parent_id in bucket_map:
-            parent = bucket_map[bucket.parent_id]
-            if parent.group == "Income":
-                return True
-        return False
-    
-    # Map bucket_id -> NET spent (only include expense buckets with net negative balance)
-    # Filter out Income-group buckets using consistent is_income_bucket logic
+    # 3. Map bucket_id -> NET spent (only include expense buckets with net negative balance)
+    # Filter out Income-group buckets (self or parent in Income, via the bucket tree)
     bucket_spend = {}
     for bid, amt in expense_results:
         if bid is None or amt is None or amt >= 0:
             continue
-        if bid in bucket_map and is_income_bucket(bucket_map[bid]):
+        if bid in bucket_map and tree.is_income(bid):
             continue  # Skip Income-group buckets
         bucket_spend[bid] = abs(amt)
     
@@ -1246,28 +1366,31 @@ def get_sankey_data(
     # --- INCOME BREAKDOWN BY BUCKET ---
     # Query NET amounts by bucket for income streams (matching dashboard logic)
     # This uses net amounts (income - any expenses in bucket) rather than just positive transactions
-    income_by_bucket_query = db.query(
-        models.Transaction.bucket_id,
-        func.sum(models.Transaction.amount)  # NET amount (can be positive or negative)
-    ).filter(
-        models.Transaction.user_id == user.id,
-        models.Transaction.date >= s_date,
-        models.Transaction.date <= e_date,
-        ~models.Transaction.bucket.has(models.BudgetBucket.is_transfer == True),
-        ~models.Transaction.bucket.has(models.BudgetBucket.is_investment == True)
-    )
+    if net_by_bucket is not None:
+        income_results = net_by_bucket
+    else:
+        income_by_bucket_query = db.query(
+            models.Transaction.bucket_id,
+            func.sum(models.Transaction.amount)  # NET amount (can be positive or negative)
+        ).filter(
+            models.Transaction.user_id == user.id,
+            models.Transaction.date >= s_date,
+            models.Transaction.date < end_bound,
+            ~models.Transaction.bucket.has(models.BudgetBucket.is_transfer == True),
+            ~models.Transaction.bucket.has(models.BudgetBucket.is_investment == True)
+        )
     
-    if spender != "Combined":
-        income_by_bucket_query = income_by_bucket_query.filter(models.Transaction.spender == spender)
+        if spender != "Combined":
+            income_by_bucket_query = income_by_bucket_query.filter(models.Transaction.spender == spender)
 
-    if exclude_one_offs:
-        income_by_bucket_query = income_by_bucket_query.filter(
-            ~models.Transaction.bucket.has(models.BudgetBucket.is_one_off == True)
-        )
+        if exclude_one_offs:
+            income_by_bucket_query = income_by_bucket_query.filter(
+                ~models.Transaction.bucket.has(models.BudgetBucket.is_one_off == True)
+            )
         
-    income_results = income_by_bucket_query.group_by(models.Transaction.bucket_id).all()
+        income_results = income_by_bucket_query.group_by(models.Transaction.bucket_id).all()
     
-    # NOTE: is_income_bucket is already defined above (reused for consistency)
+    # NOTE: Income-group membership comes from the same bucket tree as above
     
     # Track income by category - using NET amounts for consistency with dashboard
     income_by_bucket = {}
@@ -1284,7 +1407,7 @@ def get_sankey_data(
         elif bid in bucket_map:
             bucket = bucket_map[bid]
             # Only include Income-group buckets with net positive amounts
-            if is_income_bucket(bucket) and net_amount > 0:
+            if tree.is_income(bid) and net_amount > 0:
                 # IMPORTANT: Avoid collision with central "Income" node
                 # If bucket is named "Income", merge into "Other Income" instead
                 if bucket.name == "Income":
@@ -1321,22 +1444,13 @@ def get_sankey_data(
     parent_spend = {}  # parent_id -> total_amount
     parent_children = {}  # parent_id -> [{name, amount}, ...] for drill-down
     
-    # Helper to find root parent bucket
-    def get_root_parent(bucket):
-        """Find the top-level parent bucket (or self if no parent)"""
-        if bucket.parent_id is None:
-            return bucket
-        parent = bucket_map.get(bucket.parent_id)
-        if parent:
-            return get_root_parent(parent)
-        return bucket
-    
     # Aggregate spending into parent categories AND track children
     for bid, amount in bucket_spend.items():
         if bid not in bucket_map: 
             continue
         bucket = bucket_map[bid]
-        root = get_root_parent(bucket)
+        # Top-level parent bucket (or self if no parent)
+        root = bucket_map[tree.root(bid)]
         
         if root.id not in parent_spend:
             parent_spend[root.id] = 0.0
@@ -1458,21 +1572,29 @@ def get_sankey_data(
     
     
     # Investment Logic - Query investment transactions separately
-    investment_query = db.query(
-        func.sum(models.Transaction.amount)
-    ).filter(
-        models.Transaction.user_id == user.id,
-        models.Transaction.date >= s_date,
-        models.Transaction.date <= e_date,
-        models.Transaction.amount < 0,  # Outgoing money to investments
-        models.Transaction.bucket.has(models.BudgetBucket.is_investment == True)
-    )
+    if rollup_rows is not None:
+        investment_total = sum(
+            expense for bid, expense, income in rollup_rows
+            if bid in bucket_map and bucket_map[bid].is_investment
+        )
+    else:
+        investment_query = db.query(
+            func.sum(models.Transaction.amount)
+        ).filter(
+            models.Transaction.user_id == user.id,
+            models.Transaction.date >= s_date,
+            models.Transaction.date < end_bound,
+            models.Transaction.amount < 0,  # Outgoing money to investments
+            models.Transaction.bucket.has(models.BudgetBucket.is_investment == True)
+        )
     
-    if spender != "Combined":
-        investment_query = investment_query.filter(models.Transaction.spender == spender)
+        if spender != "Combined":
+            investment_query = investment_query.filter(models.Transaction.spender == spender)
+    
+        investment_res = investment_query.first()
+        investment_total = investment_res[0]
     
-    investment_res = investment_query.first()
-    total_investments = abs(investment_res[0] or 0.0)
+    total_investments = abs(investment_total or 0.0)
 
     # --- RECONCILIATION LOGIC ---
     # Calculate actual outflows shown in the Sankey
@@ -1550,7 +1672,8 @@ def get_sankey_data(
 
 @router.get("/cashflow-projection")
 def get_cashflow_projection(
-    months: int = 3,
+    months: int = Query(3, ge=1, le=120),
+    interval: str = Query("day", pattern="^(day|week|month)$"),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
@@ -1576,80 +1699,10 @@ def get_cashflow_projection(
         models.Subscription.is_active == True
     ).all()
     
-    # 3. Simulate Forward
+    # 3. Simulate Forward: generate each subscription's due dates and accumulate them
     today = date.today()
     end_date = today + timedelta(days=30 * months)
-    
-    projection = []
-    running_balance = start_balance
-    
-    # Iterate day by day
-    # Optimization: iterate only subscription days? No, we want a daily line chart usually, or at least sparse points.
-    # Daily iteration is fast enough for 3-12 months (90-365 iterations).
-    
-    current_d = today
-    while current_d <= end_date:
-        daily_flow = 0.0
-        
-        for sub in subs:
-            # Check if sub is due today
-            is_due = False
-            
-            # Base logic on next_due_date
-            # Simple assumption: next_due_date is valid anchor.
-            # Handle Weekly, Monthly, Yearly
-            
-            # Normalize dates to avoid years-ago next_due_date issues? 
-            # Ideally next_due_date is updated. If not, we project based on intervals from it.
-            
-            anchor = sub.next_due_date
-            if not anchor: continue
-            
-            if sub.frequency == "Weekly":
-                delta = (current_d - anchor).days
-                if delta >= 0 and delta % 7 == 0:
-                    is_due = True
-            elif sub.frequency == "Bi-Weekly": # Every 2 weeks
-                delta = (current_d - anchor).days
-                if delta >= 0 and delta % 14 == 0:
-                    is_due = True
-            elif sub.frequency == "Monthly":
-                # Matches day of month
-                # Handle short months? (e.g. 31st due date in Feb)
-                # Simple logic: if anchor.day == current_d.day
-                # But if anchor day > current_d month length, it usually processes on last day?
-                # MVP: exact day match.
-                if current_d.day == anchor.day:
-                    pass # Potential match, but need to check if it's in future relative to anchor? 
-                    # If anchor is in past, yes.
-                    # We assume it repeats monthly from anchor.
-                    # Also need to check if current_d >= anchor.
-                    if current_d >= anchor:
-                         is_due = True
-            elif sub.frequency == "Yearly":
-                if current_d.month == anchor.month and current_d.day == anchor.day and current_d.year >= anchor.year:
-                    is_due = True
-
-            if is_due:
-                # Assume amount is expense (positive value). Subtract it.
-                # If negative, it adds (income). But typically subs are expenses.
-                # TODO: add type to Subscription for distinct income. For now, assume expense.
-                if sub.type == "Income":
-                     daily_flow += sub.amount
-                else:
-                     daily_flow -= sub.amount # Default to Expense
-
-        running_balance += daily_flow
-        
-        projection.append({
-            "date": current_d.isoformat(),
-            "balance": running_balance,
-            "flow": daily_flow
-        })
-        
-        current_d += timedelta(days=1)
-        
-    return projection
+    return schedule.cashflow_series(subs, today, end_date, start_balance, interval)
 
 @router.get("/networth-projection")
 def get_networth_projection(
@@ -1701,6 +1754,7 @@ def get_networth_projection(
 # --- Budget Progress (comprehensive view with history and member breakdown) ---
 
 @router.get("/budget-progress")
+@cached_response("analytics:budget_progress", ttl=CacheManager.TTL_MEDIUM)
 def get_budget_progress(
     months: int = Query(6, ge=1, le=12, description="Months of history for sparklines"),
     spender: str = Query(default="Combined", description="Filter by spender"),
@@ -1763,7 +1817,7 @@ def get_budget_progress(
     
     # Separate parent vs child buckets - only parent buckets will be shown as cards
     parent_buckets = [b for b in buckets if b.parent_id is None]
-    child_buckets = [b for b in buckets if b.parent_id is not None]
+    tree = get_bucket_tree(db, user.id)
     
     # Build parent -> children map for rollup
     # EXTENSION: If a child has a different group than parent, AND parent is not is_group_budget,
@@ -1771,18 +1825,17 @@ def get_budget_progress(
     children_map = {}
     orphaned_children = []
     
-    for child in child_buckets:
-        parent = bucket_map.get(child.parent_id)
-        if not parent: continue # Should not happen via FK
-        
-        # Check if child should be separated
-        # Condition: Different group AND Parent doesn't force a combined budget
-        if child.group != parent.group:
-            orphaned_children.append(child)
-        else:
-            if child.parent_id not in children_map:
-                children_map[child.parent_id] = []
-            children_map[child.parent_id].append(child)
+    for parent in buckets:
+        for child_id in tree.children(parent.id):
+            child = bucket_map.get(child_id)
+            if not child: continue # Transfer/hidden children are excluded above
+            
+            # Check if child should be separated
+            # Condition: Different group AND Parent doesn't force a combined budget
+            if child.group != parent.group:
+                orphaned_children.append(child)
+            else:
+                children_map.setdefault(parent.id, []).append(child)
             
     # Add orphaned children to the main processing list (treated as parents/top-level)
     parent_buckets.extend(orphaned_children)
@@ -1824,8 +1877,10 @@ def get_budget_progress(
     
     # Map: bucket_id -> member_id -> limit_amount
     bucket_member_limits = {}
+    bucket_limits = {}  # bucket_id -> [BudgetLimit] (instead of lazy-loading b.limits per card)
     member_id_to_name = {m.id: m.name for m in members}
     for limit in all_limits:
+        bucket_limits.setdefault(limit.bucket_id, []).append(limit)
         if limit.bucket_id not in bucket_member_limits:
             bucket_member_limits[limit.bucket_id] = {}
         if limit.member_id and limit.member_id in member_id_to_name:
@@ -1833,27 +1888,24 @@ def get_budget_progress(
             bucket_member_limits[limit.bucket_id][member_name] = limit.amount
     
     
-    # ===== CURRENT MONTH SPENDING =====
-    current_query = db.query(
-        models.Transaction.bucket_id,
-        models.Transaction.spender,
-        func.sum(models.Transaction.amount)
-    ).filter(
-        models.Transaction.user_id == user.id,
-        models.Transaction.bucket_id.in_(bucket_ids),
-        models.Transaction.date >= current_start,
-        models.Transaction.date <= current_end
-        # models.Transaction.amount < 0  # REMOVED: Include refunds (positive) to offset spending
+    # ===== SPENDING: SELECTED PERIOD + 12-MONTH HISTORY =====
+    # History always shows the most recent 12 months, with months in the selected
+    # period highlighted (is_selected=True). Period totals by (bucket, spender) and
+    # history by (bucket, month) come from one grouped statement.
+    today = date.today()
+    twelve_months_ago = (today.replace(day=1) - timedelta(days=11*30)).replace(day=1)
+    history_end_date = today.replace(day=1)  # First of current month
+    if today.month == 12:
+        history_end_last = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
+    else:
+        history_end_last = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
+
+    current_results, history_results = budget_sets.spending_sets(
+        db, user.id, current_start, current_end, twelve_months_ago, history_end_date,
+        bucket_ids=bucket_ids,
+        spender=spender if spender != "Combined" else None
     )
     
-    if spender != "Combined":
-        current_query = current_query.filter(models.Transaction.spender == spender)
-    
-    current_results = current_query.group_by(
-        models.Transaction.bucket_id, 
-        models.Transaction.spender
-    ).all()
-    
     # Aggregate by bucket and by member (using mapped names to avoid duplicates)
     bucket_spent = {}  # bucket_id -> total
     bucket_by_member = {}  # bucket_id -> {mapped_member_name: amount}
@@ -1873,48 +1925,15 @@ def get_budget_progress(
             bucket_by_member[bid] = {}
         bucket_by_member[bid][mapped_name] = bucket_by_member[bid].get(mapped_name, 0) + amt
     
-    # ===== HISTORY (always 12 months, with selected period highlighted) =====
-    # Always show the most recent 12 months, regardless of selected period
-    # Mark months that fall within the selected period with is_selected=True
-    
-    # Calculate 12-month window ending at current month
-    today = date.today()
-    twelve_months_ago = (today.replace(day=1) - timedelta(days=11*30)).replace(day=1)
-    history_end_date = today.replace(day=1)  # First of current month
-    if today.month == 12:
-        history_end_last = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
-    else:
-        history_end_last = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
-    
-    history_query = db.query(
-        models.Transaction.bucket_id,
-        extract('year', models.Transaction.date).label('year'),
-        extract('month', models.Transaction.date).label('month'),
-        func.sum(models.Transaction.amount)
-    ).filter(
-        models.Transaction.user_id == user.id,
-        models.Transaction.bucket_id.in_(bucket_ids),
-        models.Transaction.date >= twelve_months_ago,
-        models.Transaction.date <= history_end_last
-        # Net spending (expenses + refunds)
-    )
-    
-    if spender != "Combined":
-        history_query = history_query.filter(models.Transaction.spender == spender)
-    
-    history_results = history_query.group_by(
-        models.Transaction.bucket_id, 'year', 'month'
-    ).all()
-    
     # Build history map: bucket_id -> {month_key: amount}
     bucket_history = {}
-    for bid, yr, mo, total in history_results:
-        if bid is None:
+    for bid, month, net in history_results:
+        if bid is None or bid not in bucket_map:
             continue
         if bid not in bucket_history:
             bucket_history[bid] = {}
-        key = f"{int(yr)}-{int(mo):02d}"
-        bucket_history[bid][key] = -total if total else 0
+        key = month.strftime("%Y-%m")
+        bucket_history[bid][key] = -net if net else 0
     
     # Generate 12 month labels with is_selected flag
     month_labels = []
@@ -1999,17 +2018,17 @@ def get_budget_progress(
         # If is_group_budget=False: Budget is sum of child limits (parent is just a container)
         if b.is_group_budget or getattr(b, 'is_shared', False) or not children:
             # Parent-level budget OR Shared budget OR no children - use parent's limits only
-            base_limit = sum_limits(b.limits)
+            base_limit = sum_limits(bucket_limits.get(b.id))
             limit = base_limit * delta_months
         else:
             # Children have their own budgets - sum only child limits
             limit = 0
             for child in children:
-                child_base = sum_limits(child.limits)
+                child_base = sum_limits(bucket_limits.get(child.id))
                 limit += (child_base * delta_months)
             # If children have no limits but parent does, fallback to parent
             if limit == 0:
-                base_limit = sum_limits(b.limits)
+                base_limit = sum_limits(bucket_limits.get(b.id))
                 limit = base_limit * delta_months
         
         # Calculate percentage
@@ -2035,7 +2054,7 @@ def get_budget_progress(
             # Count each child's status for scoring
             for child in children:
                 child_spent = bucket_spent.get(child.id, 0)
-                child_base_limit = sum_limits(child.limits)
+                child_base_limit = sum_limits(bucket_limits.get(child.id))
                 child_limit = child_base_limit * delta_months
                 
                 if child_limit > 0:
@@ -2125,7 +2144,7 @@ def get_budget_progress(
         children_data = []
         for child in children:
             child_spent = bucket_spent.get(child.id, 0)
-            child_base_limit = sum_limits(child.limits)
+            child_base_limit = sum_limits(bucket_limits.get(child.id))
             child_limit = child_base_limit * delta_months
             if child_spent > 0 or child_limit > 0:
                 children_data.append({
@@ -2415,8 +2434,12 @@ def get_group_spending(
 
 
 @router.get("/forecast")
+@cached_response("analytics:forecast", ttl=CacheManager.TTL_MEDIUM)
 def get_cash_flow_forecast(
-    months: int = 12,
+    months: int = Query(12, ge=1, le=120),
+    mode: str = Query("budget", pattern="^(budget|probabilistic)$"),
+    paths: int = Query(10000, ge=100, le=50000),
+    seed: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
@@ -2430,6 +2453,11 @@ def get_cash_flow_forecast(
     - Net monthly: Income - Expenses
     
     Returns monthly projections for the next 12 months.
+
+    mode=probabilistic replaces the straight line with a Monte Carlo simulation
+    of ``paths`` paths drawn from each bucket's monthly history, returning
+    P10/P50/P90 balance bands and the probability of a negative balance per
+    month (see services/forecast.py). ``seed`` makes a run reproducible.
     """
     from dateutil.relativedelta import relativedelta
     
@@ -2454,6 +2482,9 @@ def get_cash_flow_forecast(
         for a in liquid_accounts
     ]
     
+    if mode == "probabilistic":
+        return _probabilistic_forecast(db, user, today, months, paths, seed, current_balance, accounts_summary)
+
     # =========================================================================
     # 2. MONTHLY BUDGETED INCOME (from Budget Buckets with group='Income')
     # =========================================================================
@@ -2591,6 +2622,100 @@ def get_cash_flow_forecast(
     }
 
 
+def _probabilistic_forecast(db, user, today, months, paths, seed, current_balance, accounts_summary):
+    """Monte Carlo variant of get_cash_flow_forecast (mode=probabilistic)."""
+    from calendar import monthrange
+    from dateutil.relativedelta import relativedelta
+
+    bucket_ids, history = forecast_sim.bucket_history(db, user.id, today)
+    tables = forecast_sim.quantile_tables(history)
+    balances = forecast_sim.simulate_balances(
+        current_balance, tables, months, paths, np.random.default_rng(seed)
+    )
+    bands = forecast_sim.balance_bands(balances)
+
+    bucket_names = {
+        b.id: b.name for b in db.query(models.BudgetBucket.id, models.BudgetBucket.name).filter(
+            models.BudgetBucket.user_id == user.id
+        )
+    }
+    means = history.mean(axis=1) if history.size else np.zeros(0)
+    stdevs = history.std(axis=1, ddof=1) if history.shape[1] > 1 else np.zeros(len(bucket_ids))
+    income_breakdown = []
+    expense_breakdown = []
+    for bid, mean, stdev in zip(bucket_ids, means, stdevs):
+        entry = {
+            "name": bucket_names.get(bid, "Uncategorized"),
+            "monthly_average": round(abs(float(mean)), 2),
+            "monthly_stdev": round(float(stdev), 2)
+        }
+        (income_breakdown if mean > 0 else expense_breakdown).append(entry)
+    expense_breakdown.sort(key=lambda x: x["monthly_average"], reverse=True)
+
+    monthly_income = float(means[means > 0].sum())
+    monthly_expenses = float(-means[means < 0].sum())
+    net_monthly = monthly_income - monthly_expenses
+
+    current_month_end = date(today.year, today.month, monthrange(today.year, today.month)[1])
+    forecast = [{
+        "month": 0,
+        "label": current_month_end.strftime("%b-%y"),
+        "date": current_month_end.isoformat(),
+        "balance": round(current_balance, 2),
+        "p10": round(current_balance, 2),
+        "p50": round(current_balance, 2),
+        "p90": round(current_balance, 2),
+        "prob_negative": 1.0 if current_balance < 0 else 0.0,
+        "is_current": True
+    }]
+    for m in range(1, months + 1):
+        future_month_date = today + relativedelta(months=m)
+        end_of_month = date(future_month_date.year, future_month_date.month,
+                            monthrange(future_month_date.year, future_month_date.month)[1])
+        i = m - 1
+        forecast.append({
+            "month": m,
+            "label": end_of_month.strftime("%b-%y"),
+            "date": end_of_month.isoformat(),
+            "balance": round(float(bands["p50"][i]), 2),
+            "p10": round(float(bands["p10"][i]), 2),
+            "p50": round(float(bands["p50"][i]), 2),
+            "p90": round(float(bands["p90"][i]), 2),
+            "prob_negative": round(float(bands["prob_negative"][i]), 4),
+            "is_current": False
+        })
+
+    median_path = [point["p50"] for point in forecast]
+    lowest_month = int(np.argmin(median_path))
+    months_until_danger = next(
+        (point["month"] for point in forecast[1:] if point["prob_negative"] >= 0.5), None
+    )
+    insights = {
+        "net_monthly": round(net_monthly, 2),
+        "is_positive": net_monthly >= 0,
+        "lowest_balance": median_path[lowest_month],
+        "lowest_balance_month": lowest_month,
+        "months_until_negative": months_until_danger,
+        "projected_end_balance": median_path[-1],
+        "prob_negative_any": round(bands["prob_negative_any"], 4)
+    }
+
+    return {
+        "mode": "probabilistic",
+        "paths": paths,
+        "history_months": history.shape[1],
+        "current_balance": round(current_balance, 2),
+        "accounts": accounts_summary,
+        "monthly_income": round(monthly_income, 2),
+        "monthly_expenses": round(monthly_expenses, 2),
+        "net_monthly": round(net_monthly, 2),
+        "income_breakdown": income_breakdown,
+        "expense_breakdown": expense_breakdown,
+        "forecast": forecast,
+        "insights": insights
+    }
+
+
 def _frequency_to_monthly_multiplier(frequency: str) -> float:
     """Convert subscription frequency to monthly equivalent multiplier."""
     if frequency == "Weekly":
@@ -2613,6 +2738,7 @@ def _frequency_to_monthly_multiplier(frequency: str) -> float:
 # --- Performance Tab (Spreadsheet View) ---
 
 @router.get("/performance")
+@cached_response("analytics:performance", ttl=CacheManager.TTL_MEDIUM)
 def get_performance_data(
     spender: str = Query(default="Combined", description="Filter by spender: Combined, Joint, or member name"),
     db: Session = Depends(get_db),
@@ -2653,14 +2779,13 @@ def get_performance_data(
     
     # Separate parent and child buckets
     parent_buckets = [b for b in buckets if b.parent_id is None]
-    child_buckets = [b for b in buckets if b.parent_id is not None]
     
-    # Build parent -> children map
-    children_map = {}
-    for child in child_buckets:
-        if child.parent_id not in children_map:
-            children_map[child.parent_id] = []
-        children_map[child.parent_id].append(child)
+    # Build parent -> children map (direct children that passed the filters above)
+    tree = get_bucket_tree(db, user.id)
+    children_map = {
+        parent.id: [bucket_map[c] for c in tree.children(parent.id) if c in bucket_map]
+        for parent in parent_buckets
+    }
     
     # Fetch members for spender filter
     members = db.query(models.HouseholdMember).filter(
@@ -2676,36 +2801,24 @@ def get_performance_data(
     for m in members:
         spender_to_member[m.name] = m.name
     
-    # Fetch spend data grouped by bucket, year, month
-    history_query = db.query(
-        models.Transaction.bucket_id,
-        extract('year', models.Transaction.date).label('year'),
-        extract('month', models.Transaction.date).label('month'),
-        func.sum(models.Transaction.amount)
-    ).filter(
-        models.Transaction.user_id == user.id,
-        models.Transaction.bucket_id.in_(bucket_ids),
-        models.Transaction.date >= history_start,
-        models.Transaction.date <= history_end
+    # Fetch spend data grouped by bucket and month (whole months -> rollup table)
+    history_results = rollups.rollup_totals(
+        db, user.id, history_start, history_end,
+        group_by=("bucket_id", "month"),
+        spender=spender if spender != "Combined" else None
     )
     
-    if spender != "Combined":
-        history_query = history_query.filter(models.Transaction.spender == spender)
-    
-    history_results = history_query.group_by(
-        models.Transaction.bucket_id, 'year', 'month'
-    ).all()
-    
     # Build history map: bucket_id -> {"YYYY-MM": amount}
     bucket_history = {}
-    for bid, yr, mo, total in history_results:
-        if bid is None:
+    for bid, month, expense, income in history_results:
+        if bid is None or bid not in bucket_map:
             continue
         if bid not in bucket_history:
             bucket_history[bid] = {}
-        key = f"{int(yr)}-{int(mo):02d}"
+        key = month.strftime("%Y-%m")
+        net = expense + income
         # Invert sign: expenses are negative in DB, we want positive values
-        bucket_history[bid][key] = -total if total else 0
+        bucket_history[bid][key] = -net if net else 0
     
     # Generate 12 month labels
     month_labels = []
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from .. import models, auth
+from ..cache import CacheManager
 from ..database import get_db
 from ..services.basiq import BasiqService
 from pydantic import BaseModel
@@ -123,6 +124,7 @@ async def sync_connection(
                     db.add(new_txn)
         
         db.commit()
+        CacheManager.invalidate_user_analytics(current_user.id)
         return {"status": "success", "synced_accounts": len(data["accounts"]), "synced_transactions": len(data["transactions"])}
         
     except Exception as e:
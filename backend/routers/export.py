@@ -5,6 +5,7 @@ from typing import Optional, List
 import csv
 import io
 import json
+import zlib
 from datetime import datetime
 
 from .. import models, schemas
@@ -16,85 +17,333 @@ router = APIRouter(
     tags=["export"]
 )
 
+# Rows fetched per round trip (server-side cursor) and written per response chunk
+_EXPORT_BATCH = 1000
+
+_CSV_HEADER = ["Date", "Description", "Amount", "Type", "Category", "Account", "Notes"]
+
+
+def _named_transactions(query, *columns):
+    """
+    ``query`` joined to bucket and account names, selecting only ``columns``
+    and reading them off a server-side cursor ``_EXPORT_BATCH`` rows at a time.
+    """
+    return query.outerjoin(
+        models.BudgetBucket, models.Transaction.bucket_id == models.BudgetBucket.id
+    ).outerjoin(
+        models.Account, models.Transaction.account_id == models.Account.id
+    ).with_entities(*columns).order_by(
+        models.Transaction.date.desc()
+    ).execution_options(yield_per=_EXPORT_BATCH)
+
+
+def _export_rows(query):
+    """Yield (date, description, amount, category, account, notes) tuples for the transactions in ``query``."""
+    rows = _named_transactions(
+        query,
+        models.Transaction.date,
+        models.Transaction.description,
+        models.Transaction.amount,
+        models.BudgetBucket.name,
+        models.Account.name,
+        models.Transaction.notes
+    )
+    for date, description, amount, category, account, notes in rows:
+        yield date, description, amount or 0.0, category or "Uncategorized", account or "Unknown", notes
+
+
+def _csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(_CSV_HEADER)
+    # Send the header straight away so the download starts before the first batch
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
+
+    for i, (date, description, amount, category, account, notes) in enumerate(rows, 1):
+        writer.writerow([
+            date,
+            description,
+            amount,
+            "Income" if amount > 0 else "Expense",
+            category,
+            account,
+            notes or ""
+        ])
+        if i % _EXPORT_BATCH == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+def _json_record(date, description, amount, category, account, notes) -> dict:
+    return {
+        "date": date.isoformat() if date else None,
+        "description": description,
+        "amount": float(amount),
+        "category": category,
+        "account": account,
+        "type": "income" if amount > 0 else "expense",
+        "notes": notes
+    }
+
+
+def _ndjson_chunks(rows):
+    batch = []
+    for row in rows:
+        batch.append(json.dumps(_json_record(*row)))
+        if len(batch) >= _EXPORT_BATCH:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+
+def _json_chunks(rows):
+    """A JSON array of the same records as NDJSON, written incrementally."""
+    yield "["
+    prefix = "\n  "
+    batch = []
+    for row in rows:
+        batch.append(json.dumps(_json_record(*row)))
+        if len(batch) >= _EXPORT_BATCH:
+            yield prefix + ",\n  ".join(batch)
+            prefix = ",\n  "
+            batch = []
+    if batch:
+        yield prefix + ",\n  ".join(batch)
+    yield "\n]\n"
+
+
+def _gzip_chunks(chunks):
+    """Gzip a stream of text chunks on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# --- Columnar (Parquet / Arrow IPC) ---
+
+# Rows per Parquet row group / Arrow record batch; bounds export memory
+_ROW_GROUP = 50_000
+
+# format -> (media type, file extension)
+_COLUMNAR_FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Parquet/Arrow export requires pyarrow")
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file that hands back what was written since the last drain.
+    The position keeps counting across drains, so Parquet footer offsets stay valid.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _record_batches(rows, schema):
+    """Group row tuples into Arrow record batches of ``_ROW_GROUP`` rows, typed by ``schema``."""
+    import pyarrow as pa
+
+    def to_batch(chunk):
+        columns = zip(*chunk)
+        return pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema
+        )
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= _ROW_GROUP:
+            yield to_batch(chunk)
+            chunk = []
+    if chunk:
+        yield to_batch(chunk)
+
+
+def _columnar_chunks(rows, schema, format: str):
+    """Write rows as Parquet row groups or an Arrow IPC stream, yielding bytes after each batch."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    if format == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    for batch in _record_batches(rows, schema):
+        writer.write_batch(batch)
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
+
+
+def _columnar_response(rows, schema, format: str, basename: str):
+    media_type, extension = _COLUMNAR_FORMATS[format]
+    return StreamingResponse(
+        _columnar_chunks(rows, schema, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={basename}_{datetime.now().strftime('%Y%m%d')}.{extension}"}
+    )
+
+
+def _transaction_schema():
+    import pyarrow as pa
+    label = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ("id", pa.int64()),
+        ("date", pa.timestamp("us")),
+        ("description", pa.string()),
+        ("amount", pa.float64()),
+        ("category", label),
+        ("account", label),
+        ("spender", label),
+        ("notes", pa.string()),
+    ])
+
+
+def _net_worth_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("date", pa.date32()),
+        ("net_worth", pa.float64()),
+        ("total_assets", pa.float64()),
+        ("total_liabilities", pa.float64()),
+    ])
+
+
+def _account_balance_schema():
+    import pyarrow as pa
+    label = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ("date", pa.date32()),
+        ("account_id", pa.int64()),
+        ("account", label),
+        ("type", label),
+        ("category", label),
+        ("balance", pa.float64()),
+    ])
+
+
 @router.get("/transactions")
 def export_transactions(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    format: str = Query("csv", enum=["csv", "json"]),
-    db: Session = Depends(get_db)
+    format: str = Query("csv", enum=["csv", "json", "ndjson", "parquet", "arrow"]),
+    gzip: bool = Query(False, description="Download as a gzip-compressed file (text formats)"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
 ):
+    """
+    Stream the current user's transactions as CSV, JSON, NDJSON, Parquet or Arrow
+    IPC in constant memory. Rows are read through a server-side cursor and written
+    as they arrive.
+    """
     # Base query
-    query = db.query(models.Transaction)
+    query = db.query(models.Transaction).filter(models.Transaction.user_id == current_user.id)
     
     # Filter by date if provided
     if start_date:
         query = query.filter(models.Transaction.date >= start_date)
     if end_date:
         query = query.filter(models.Transaction.date <= end_date)
-        
-    transactions = query.order_by(models.Transaction.date.desc()).all()
-    
-    if format == "json":
-        data = [
-            {
-                "date": t.date.isoformat() if t.date else None,
-                "description": t.description,
-                "amount": float(t.amount),
-                "category": t.bucket.name if t.bucket else "Uncategorized",
-                "account": t.account.name if t.account else "Unknown",
-                "type": "income" if t.amount > 0 else "expense",
-                "notes": t.notes
-            }
-            for t in transactions
-        ]
-        
-        # Create a generator-like stream for JSON
-        json_str = json.dumps(data, indent=2)
-        return StreamingResponse(
-            io.StringIO(json_str),
-            media_type="application/json",
-            headers={"Content-Disposition": f"attachment; filename=transactions_export_{datetime.now().strftime('%Y%m%d')}.json"}
+
+    if format in _COLUMNAR_FORMATS:
+        _require_pyarrow()
+        rows = _named_transactions(
+            query,
+            models.Transaction.id,
+            models.Transaction.date,
+            models.Transaction.description,
+            models.Transaction.amount,
+            models.BudgetBucket.name,
+            models.Account.name,
+            models.Transaction.spender,
+            models.Transaction.notes
         )
-        
+        return _columnar_response(rows, _transaction_schema(), format, "transactions_export")
+
+    rows = _export_rows(query)
+    if format == "json":
+        chunks, media_type = _json_chunks(rows), "application/json"
+    elif format == "ndjson":
+        chunks, media_type = _ndjson_chunks(rows), "application/x-ndjson"
     else: # CSV
-        stream = io.StringIO()
-        writer = csv.writer(stream)
-        
-        # Write header
-        writer.writerow(["Date", "Description", "Amount", "Type", "Category", "Account", "Notes"])
-        
-        # Write data
-        for t in transactions:
-            writer.writerow([
-                t.date,
-                t.description,
-                t.amount,
-                "Income" if t.amount > 0 else "Expense",
-                t.bucket.name if t.bucket else "Uncategorized",
-                t.account.name if t.account else "Unknown",
-                t.notes or ""
-            ])
-            
-        stream.seek(0)
-        return StreamingResponse(
-            iter([stream.getvalue()]),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename=transactions_export_{datetime.now().strftime('%Y%m%d')}.csv"}
-        )
+        chunks, media_type = _csv_chunks(rows), "text/csv"
+
+    filename = f"transactions_export_{datetime.now().strftime('%Y%m%d')}.{format}"
+    if gzip:
+        chunks, media_type, filename = _gzip_chunks(chunks), "application/gzip", filename + ".gz"
+
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
 
 @router.get("/net-worth")
 def export_net_worth(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    db: Session = Depends(get_db)
+    format: str = Query("csv", enum=["csv", "parquet", "arrow"]),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
 ):
-    # Fetch history
-    query = db.query(models.NetWorthSnapshot)
+    # Fetch the current user's history
+    query = db.query(models.NetWorthSnapshot).filter(models.NetWorthSnapshot.user_id == current_user.id)
     
     if start_date:
         query = query.filter(models.NetWorthSnapshot.date >= start_date)
     if end_date:
         query = query.filter(models.NetWorthSnapshot.date <= end_date)
+
+    if format in _COLUMNAR_FORMATS:
+        _require_pyarrow()
+        rows = query.with_entities(
+            models.NetWorthSnapshot.date,
+            models.NetWorthSnapshot.net_worth,
+            models.NetWorthSnapshot.total_assets,
+            models.NetWorthSnapshot.total_liabilities
+        ).order_by(models.NetWorthSnapshot.date.desc()).execution_options(yield_per=_EXPORT_BATCH)
+        return _columnar_response(rows, _net_worth_schema(), format, "net_worth_history")
         
     snapshots = query.order_by(models.NetWorthSnapshot.date.desc()).all()
     
@@ -121,6 +370,60 @@ def export_net_worth(
     )
 
 
+@router.get("/account-balances")
+def export_account_balances(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    format: str = Query("csv", enum=["csv", "parquet", "arrow"]),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Per-account balances at each net worth snapshot, oldest first."""
+    query = db.query(models.AccountBalance).join(
+        models.NetWorthSnapshot, models.AccountBalance.snapshot_id == models.NetWorthSnapshot.id
+    ).outerjoin(
+        models.Account, models.AccountBalance.account_id == models.Account.id
+    ).filter(models.NetWorthSnapshot.user_id == current_user.id)
+
+    if start_date:
+        query = query.filter(models.NetWorthSnapshot.date >= start_date)
+    if end_date:
+        query = query.filter(models.NetWorthSnapshot.date <= end_date)
+
+    rows = query.with_entities(
+        models.NetWorthSnapshot.date,
+        models.AccountBalance.account_id,
+        models.Account.name,
+        models.Account.type,
+        models.Account.category,
+        models.AccountBalance.balance
+    ).order_by(
+        models.NetWorthSnapshot.date, models.AccountBalance.account_id
+    ).execution_options(yield_per=_EXPORT_BATCH)
+
+    if format in _COLUMNAR_FORMATS:
+        _require_pyarrow()
+        return _columnar_response(rows, _account_balance_schema(), format, "account_balances")
+
+    def csv_chunks():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["Date", "Account ID", "Account", "Type", "Category", "Balance"])
+        for i, row in enumerate(rows, 1):
+            writer.writerow(row)
+            if i % _EXPORT_BATCH == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        yield buffer.getvalue()
+
+    return StreamingResponse(
+        csv_chunks(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename=account_balances_{datetime.now().strftime('%Y%m%d')}.csv"}
+    )
+
+
 @router.get("/report/pdf")
 def export_report_pdf(
     start_date: str = Query(..., description="ISO Date string"),
@@ -2,29 +2,39 @@ import logging
 import shutil
 import os
 import tempfile
-import hashlib
-import uuid
 import threading
 import time
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Form, BackgroundTasks
+from sqlalchemy import Integer, String, cast, column, func, update, values as sa_values
 from sqlalchemy.orm import Session, joinedload
 from typing import List
 
 from ..database import get_db, SessionLocal
 from .. import models, schemas, auth
+from ..cache import CacheManager
 from ..services.pdf_parser import parse_pdf
 from ..services.categorizer import Categorizer
-from ..services.csv_service import parse_preview, process_csv
+from ..services import job_queue
+from ..services.csv_service import iter_transactions, parse_preview, process_csv
 from ..services.notification_service import NotificationService
+from ..services.transaction_hashes import existing_hashes, generate_transaction_hash, insert_new_transactions
 
 logger = logging.getLogger(__name__)
 
 # File upload limits
 MAX_FILE_SIZE_MB = 10
 MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024  # 10MB
+# Streamed CSV imports are spooled to disk and parsed in chunks
+MAX_STREAM_FILE_SIZE_MB = 200
+MAX_STREAM_FILE_SIZE_BYTES = MAX_STREAM_FILE_SIZE_MB * 1024 * 1024
+SPOOL_BLOCK_BYTES = 1024 * 1024
+# Must be shared with the job workers when they run in a separate container
+IMPORT_SPOOL_DIR = os.getenv("IMPORT_SPOOL_DIR") or None
+# Rows per UPDATE ... FROM (VALUES ...) when confirming edits
+CONFIRM_CHUNK = 1000
 
 router = APIRouter(
     prefix="/ingest",
@@ -34,26 +44,10 @@ router = APIRouter(
 categorizer = Categorizer()
 
 # ============== JOB STORE FOR BACKGROUND PROCESSING ==============
-# Job tracking moved to database
+# Job rows are created by services/job_queue.enqueue; these update them
 # _job_store removed
 _job_lock = threading.Lock()
 
-def create_job(db: Session, user_id: str, total_transactions: int) -> str:
-    """Create a new processing job in DB and return its ID."""
-    job_id = str(uuid.uuid4())
-    job = models.Job(
-        id=job_id,
-        user_id=str(user_id),
-        status='processing',
-        progress=0,
-        total=total_transactions,
-        message='Starting...',
-        duplicate_count=0
-    )
-    db.add(job)
-    db.commit()
-    return job_id
-
 def update_job_progress(db: Session, job_id: str, progress: int, message: str = None):
     """Update job progress."""
     job = db.query(models.Job).filter(models.Job.id == job_id).first()
@@ -80,6 +74,23 @@ def complete_job(db: Session, job_id: str, result: list):
         job.result = result # JSONB will handle list/dict
         db.commit()
 
+def stage_job_rows(db: Session, job_id: str, seq: int, rows: list, duplicate_count: int = 0):
+    """Stage one processed chunk of results; readable before the job completes."""
+    db.add(models.JobChunk(job_id=job_id, seq=seq, rows=rows))
+    job = db.query(models.Job).filter(models.Job.id == job_id).first()
+    if job:
+        job.duplicate_count = duplicate_count
+    db.commit()
+
+def get_job_rows(db: Session, job_id: str, since: int = 0) -> tuple:
+    """Staged results from chunk ``since`` onwards. Returns (rows, next_since)."""
+    chunks = db.query(models.JobChunk).filter(
+        models.JobChunk.job_id == job_id,
+        models.JobChunk.seq >= since
+    ).order_by(models.JobChunk.seq).all()
+    rows = [row for chunk in chunks for row in (chunk.rows or [])]
+    return rows, (chunks[-1].seq + 1 if chunks else since)
+
 def fail_job(db: Session, job_id: str, error_message: str):
     """Mark job as failed."""
     job = db.query(models.Job).filter(models.Job.id == job_id).first()
@@ -88,24 +99,34 @@ def fail_job(db: Session, job_id: str, error_message: str):
         job.error = error_message
         db.commit()
 
-def get_job_status(db: Session, user_id: str, job_id: str) -> dict:
-    """Get current job status from DB."""
+def get_job_status(db: Session, user_id: str, job_id: str, since: int = None) -> dict:
+    """
+    Get current job status from DB.
+    With ``since``, also returns the rows staged from that chunk on ('rows',
+    'next_since') so a client can show results while the job is still running.
+    """
     job = db.query(models.Job).filter(
         models.Job.id == job_id, 
         models.Job.user_id == str(user_id)
     ).first()
     
     if job:
-        return {
+        status = {
             'job_id': job.id,
             'status': job.status,
             'progress': job.progress,
             'total': job.total,
             'message': job.message,
             'error': job.error,
-            'duplicate_count': 0, # Simplify or add col to model if needed
-            'result': job.result if job.status == 'complete' else None
+            'duplicate_count': job.duplicate_count or 0,
+            'result': None
         }
+        if since is not None:
+            status['rows'], status['next_since'] = get_job_rows(db, job.id, since)
+        elif job.status == 'complete':
+            # Streamed jobs keep their results in the staged chunks
+            status['result'] = job.result if job.result is not None else get_job_rows(db, job.id)[0]
+        return status
     return None
 
 def cleanup_old_jobs(db: Session, user_id: str, max_age_hours: int = 1):
@@ -116,14 +137,38 @@ def cleanup_old_jobs(db: Session, user_id: str, max_age_hours: int = 1):
 # ============================================================
 
 
-def generate_transaction_hash(user_id: int, date, raw_description: str, amount: float) -> str:
+async def spool_upload(file: UploadFile) -> Tuple[str, int]:
     """
-    Generate a unique fingerprint for duplicate detection.
-    Uses: user_id + date + raw_description + absolute amount
+    Copy an upload to a temp file without holding it in memory.
+    Returns (path, data_rows) where data_rows counts lines after the header.
     """
-    date_str = date.isoformat() if hasattr(date, 'isoformat') else str(date)
-    key = f"{user_id}|{date_str}|{raw_description.lower().strip()}|{abs(round(amount, 2))}"
-    return hashlib.sha256(key.encode()).hexdigest()[:16]
+    if IMPORT_SPOOL_DIR:
+        os.makedirs(IMPORT_SPOOL_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="import-", suffix=".csv", dir=IMPORT_SPOOL_DIR)
+    size = 0
+    lines = 0
+    last = b"\n"
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                block = await file.read(SPOOL_BLOCK_BYTES)
+                if not block:
+                    break
+                size += len(block)
+                if size > MAX_STREAM_FILE_SIZE_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large. Maximum size is {MAX_STREAM_FILE_SIZE_MB}MB."
+                    )
+                lines += block.count(b"\n")
+                last = block[-1:]
+                out.write(block)
+    except BaseException:
+        os.remove(path)
+        raise
+    if last != b"\n":
+        lines += 1  # No trailing newline on the last row
+    return path, max(lines - 1, 0)
 
 
 async def validate_file_size(file: UploadFile) -> bytes:
@@ -167,18 +212,12 @@ def process_transactions_preview(extracted_data, user, db, spender, skip_duplica
             )
             incoming_hashes[i] = txn_hash
         
-        # Fetch existing hashes for this user
-        existing_hashes = set(
-            h[0] for h in db.query(models.Transaction.transaction_hash)
-            .filter(
-                models.Transaction.user_id == user.id,
-                models.Transaction.transaction_hash.isnot(None)
-            ).all()
-        )
+        # Look up only the incoming hashes for this user
+        existing = existing_hashes(db, user.id, incoming_hashes.values())
         
         # Filter out duplicates
         for i, data in enumerate(extracted_data):
-            if incoming_hashes[i] not in existing_hashes:
+            if incoming_hashes[i] not in existing:
                 non_duplicate_data.append((data, incoming_hashes[i]))
             else:
                 duplicate_count += 1
@@ -317,11 +356,12 @@ def process_transactions_preview(extracted_data, user, db, spender, skip_duplica
 
 
 def process_transactions_preview_with_progress(
-    extracted_data, user, db, spender, skip_duplicates=True, progress_callback=None
+    extracted_data, user, db, spender, skip_duplicates=True, progress_callback=None, id_offset=0
 ):
     """
     Same as process_transactions_preview but with progress callback for async jobs.
     progress_callback(progress: int, message: str) is called periodically.
+    id_offset shifts the temp IDs so chunks of one import never share an ID.
     """
     from ..services.ai_categorizer import get_ai_categorizer
     
@@ -343,16 +383,10 @@ def process_transactions_preview_with_progress(
             )
             incoming_hashes[i] = txn_hash
         
-        existing_hashes = set(
-            h[0] for h in db.query(models.Transaction.transaction_hash)
-            .filter(
-                models.Transaction.user_id == user.id,
-                models.Transaction.transaction_hash.isnot(None)
-            ).all()
-        )
+        existing = existing_hashes(db, user.id, incoming_hashes.values())
         
         for i, data in enumerate(extracted_data):
-            if incoming_hashes[i] not in existing_hashes:
+            if incoming_hashes[i] not in existing:
                 non_duplicate_data.append((data, incoming_hashes[i]))
             else:
                 duplicate_count += 1
@@ -490,7 +524,7 @@ def process_transactions_preview_with_progress(
             }
 
         preview_txn = {
-            'id': -(i + 1),
+            'id': -(id_offset + i + 1),
             'user_id': str(user.id),
             'date': data["date"].isoformat() if hasattr(data["date"], 'isoformat') else str(data["date"]),
             'description': result['clean_desc'],
@@ -538,6 +572,7 @@ async def ingest_csv(
     map_amount: str = Form(None), # Optional now
     map_debit: str = Form(None), # New
     map_credit: str = Form(None), # New
+    date_format: str = Form(None),  # strftime format; inferred when omitted
     spender: str = Form("Joint"),
     skip_duplicates: bool = Form(True),  # New: duplicate detection
     db: Session = Depends(get_db), 
@@ -549,7 +584,8 @@ async def ingest_csv(
         "description": map_desc, 
         "amount": map_amount,
         "debit": map_debit,
-        "credit": map_credit
+        "credit": map_credit,
+        "date_format": date_format
     }
     
     try:
@@ -575,70 +611,82 @@ async def ingest_csv(
 # ============== ASYNC PROCESSING ENDPOINTS ==============
 
 def process_csv_background(
-    job_id: str, user_id: str, content: bytes, mapping: Dict[str, str], spender: str, skip_duplicates: bool
+    job_id: str, user_id: str, path: str, mapping: Dict[str, str], spender: str, skip_duplicates: bool
 ):
-    # Job creation moved to start_csv_import within DB session context because we need the session
-    db = None
-    error_msg = None
-    result_transactions = []
+    """
+    Job queue handler for "csv_import": streams a spooled CSV through dedupe and
+    categorization one chunk at a time, staging each chunk's previews as soon as
+    it is done. Unexpected errors propagate so the queue can retry the job; the
+    spooled file is removed by the queue once the job is finished.
+    """
+    db = SessionLocal()
     try:
-        # Create a new database session for this thread
-        db = SessionLocal()
         user = db.query(models.User).filter(models.User.id == str(user_id)).first()
         
-        # ... logic ...
-        
-        # Initialize buckets cache
-        # ...
-
-        
         if not user:
             fail_job(db, job_id, "User not found")
             return
         
+        # A retry starts over; drop whatever the previous attempt staged
+        db.query(models.JobChunk).filter(models.JobChunk.job_id == job_id).delete(synchronize_session=False)
         update_job_progress(db, job_id, 0, "Parsing CSV...")
         
-        # Parse CSV
+        rows_read = 0
+        parsed = 0
+        staged = 0
+        rejected = 0
+        duplicate_count = 0
         try:
-            extracted_data = process_csv(content, mapping)
-        except Exception as e:
+            for seq, (extracted_data, rejects, chunk_rows) in enumerate(iter_transactions(path, mapping)):
+                if job_queue.cancel_requested(db, job_id):
+                    raise job_queue.JobCancelled()
+                if rejects:
+                    rejected += len(rejects)
+                    logger.info(f"CSV import {job_id}: rejected {len(rejects)} rows, first: {rejects[:5]}")
+                
+                # Process with progress updates, offset by the rows already done
+                preview_txns, chunk_duplicates = process_transactions_preview_with_progress(
+                    extracted_data, user, db, spender, skip_duplicates,
+                    progress_callback=lambda p, m, done=rows_read: update_job_progress(db, job_id, done + p, m),
+                    id_offset=staged
+                )
+                rows_read += chunk_rows
+                parsed += len(extracted_data)
+                staged += len(preview_txns)
+                duplicate_count += chunk_duplicates
+                stage_job_rows(db, job_id, seq, preview_txns, duplicate_count)
+                
+                skipped = f", {rejected} malformed rows skipped" if rejected else ""
+                update_job_progress(db, job_id, rows_read, f"Processed {rows_read} rows ({staged} new{skipped})")
+        except ValueError as e:
+            # Bad mapping or unreadable file: retrying will not help
             fail_job(db, job_id, f"CSV parsing error: {str(e)}")
             return
         
-        if not extracted_data:
+        if not parsed:
             complete_job(db, job_id, [])
-            return
-        
-        # Update job total with actual count
-        update_job_total(db, job_id, len(extracted_data))
-        update_job_progress(db, job_id, 0, f"Processing {len(extracted_data)} transactions...")
-        
-        # Process with progress updates
-        preview_txns, duplicate_count = process_transactions_preview_with_progress(
-            extracted_data, user, db, spender, skip_duplicates,
-            progress_callback=lambda p, m: update_job_progress(db, job_id, p, m)
-        )
-        
-        result_transactions = preview_txns
-        if result_transactions:
-            complete_job(db, job_id, result_transactions)
+        elif staged:
+            complete_job(db, job_id, None)
         else:
-            if not error_msg:
-                 error_msg = "No transactions found"
-            fail_job(db, job_id, error_msg)
-
+            fail_job(db, job_id, "No transactions found")
+    except job_queue.JobCancelled:
+        raise
     except Exception as e:
         logger.error(f"Background CSV processing failed: {str(e)}")
-        # We need a fresh session to record failure if the main one is broken
-        try:
-            db_fail = SessionLocal()
-            fail_job(db_fail, job_id, str(e))
-            db_fail.close()
-        except:
-            pass
+        raise
     finally:
-        if db:
-            db.close()
+        db.close()
+
+
+def remove_spooled_file(payload: Dict[str, Any]):
+    """Job queue cleanup for "csv_import": delete the spooled upload."""
+    try:
+        os.remove(payload["path"])
+    except (KeyError, OSError):
+        pass
+
+
+job_queue.register("csv_import", process_csv_background, cleanup=remove_spooled_file)
 
 
 @router.post("/csv/start")
@@ -649,6 +697,7 @@ async def start_csv_import(
     map_amount: str = Form(None),
     map_debit: str = Form(None),
     map_credit: str = Form(None),
+    date_format: str = Form(None),
     spender: str = Form("Joint"),
     skip_duplicates: bool = Form(True),
     db: Session = Depends(get_db), 
@@ -659,39 +708,35 @@ async def start_csv_import(
         if not file.filename.lower().endswith('.csv'):
             raise HTTPException(status_code=400, detail="Only CSV files are supported")
         
-        content = await validate_file_size(file)
+        # Spooled to disk and streamed in chunks; the row count comes from the spool
+        path, total_rows = await spool_upload(file)
         mapping = {
             "date": map_date, 
             "description": map_desc, 
             "amount": map_amount,
             "debit": map_debit,
-            "credit": map_credit
+            "credit": map_credit,
+            "date_format": date_format
         }
         
-        # Quick parse to get transaction count for progress tracking
-        try:
-            preview = parse_preview(content)
-            total_rows = preview.get('row_count', 100)  # Estimate if not available
-        except:
-            total_rows = 100  # Default estimate
-        
         # Clean up old jobs for this user
         cleanup_old_jobs(db, current_user.id)
         
-        # Create job in DB
-        job_id = create_job(db, current_user.id, total_rows)
-        
-        # Start background thread
-        thread = threading.Thread(
-            target=process_csv_background,
-            args=(job_id, current_user.id, content, mapping, spender, skip_duplicates)
-        )
-        thread.daemon = True
-        thread.start()
+        # Queue the job; a worker (this process's pool or a separate worker) picks it up
+        try:
+            job_id = job_queue.enqueue(db, current_user.id, "csv_import", {
+                "path": path,
+                "mapping": mapping,
+                "spender": spender,
+                "skip_duplicates": skip_duplicates
+            }, total=total_rows)
+        except Exception:
+            remove_spooled_file({"path": path})
+            raise
         
         return {
             "job_id": job_id,
-            "status": "processing",
+            "status": "queued",
             "message": "Import started",
             "total": total_rows
         }
@@ -705,12 +750,34 @@ async def start_csv_import(
 
 
 @router.get("/csv/status/{job_id}")
-def check_csv_status(job_id: str, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
-    status = get_job_status(db, current_user.id, job_id)
+def check_csv_status(
+    job_id: str,
+    since: Optional[int] = None,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Job progress. Pass ``since`` (the previous response's ``next_since``, 0 at
+    first) to receive previews incrementally in ``rows`` instead of all at the end.
+    """
+    status = get_job_status(db, current_user.id, job_id, since)
     if not status:
         raise HTTPException(status_code=404, detail="Job not found")
     return status
 
+
+@router.post("/csv/cancel/{job_id}")
+def cancel_csv_import(
+    job_id: str,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Cancel an import. Queued jobs stop at once; running jobs at the next chunk."""
+    status = job_queue.cancel(db, current_user.id, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job_id": job_id, "status": status}
+
 # ============================================================
 
 @router.post("/upload", response_model=List[schemas.Transaction])
@@ -756,6 +823,45 @@ async def upload_statement(
     return preview_txns
 
 
+def apply_confirmed_edits(db: Session, user_id: str, edits: Dict[int, Dict[str, Any]]) -> List[int]:
+    """
+    Apply confirm-time edits to existing transactions with one
+    UPDATE ... FROM (VALUES ...) per chunk, marking them verified.
+    edits: {transaction_id: {"bucket_id", "spender", "assigned_to", "tags"}}
+    Returns the ids that belong to the user and were updated.
+    """
+    txn = models.Transaction
+    ids = list(edits)
+    updated = []
+    for start in range(0, len(ids), CONFIRM_CHUNK):
+        chunk = ids[start:start + CONFIRM_CHUNK]
+        edited = sa_values(
+            column("id", Integer), column("bucket_id", Integer), column("spender", String),
+            column("assigned_to", String), column("tags", String),
+            name="edits"
+        ).data([
+            (txn_id, edits[txn_id]["bucket_id"], edits[txn_id]["spender"],
+             edits[txn_id]["assigned_to"], edits[txn_id]["tags"])
+            for txn_id in chunk
+        ]).cte("edits")
+        # Casts: Postgres types an all-NULL VALUES column as text
+        result = db.execute(
+            update(txn)
+            .where(txn.id == edited.c.id, txn.user_id == user_id)
+            .values(
+                bucket_id=cast(edited.c.bucket_id, Integer),
+                spender=func.coalesce(cast(edited.c.spender, String), txn.spender),
+                assigned_to=func.nullif(func.coalesce(cast(edited.c.assigned_to, String), txn.assigned_to), ""),
+                tags=func.coalesce(cast(edited.c.tags, String), txn.tags),
+                is_verified=True,
+            )
+            .returning(txn.id)
+            .execution_options(synchronize_session=False)
+        )
+        updated.extend(result.scalars().all())
+    return updated
+
+
 @router.post("/confirm", response_model=List[schemas.Transaction])
 def confirm_transactions(updates: List[schemas.TransactionConfirm], db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
     """
@@ -766,92 +872,77 @@ def confirm_transactions(updates: List[schemas.TransactionConfirm], db: Session
     from datetime import datetime
     
     confirmed_ids = []
+    new_rows = {}
+    edits = {}
     
-    for update in updates:
-        if update.id < 0:
+    for item in updates:
+        if item.id < 0:
             # NEW TRANSACTION FROM PREVIEW - Create in DB
-            if not all([update.date, update.description, update.amount is not None]):
-                logger.warning(f"Skipping preview transaction {update.id}: missing required fields")
+            if not all([item.date, item.description, item.amount is not None]):
+                logger.warning(f"Skipping preview transaction {item.id}: missing required fields")
                 continue
             
             # Parse date
             try:
-                txn_date = datetime.fromisoformat(update.date.replace('Z', '+00:00'))
+                txn_date = datetime.fromisoformat(item.date.replace('Z', '+00:00'))
             except:
-                txn_date = datetime.strptime(update.date, "%Y-%m-%d")
+                txn_date = datetime.strptime(item.date, "%Y-%m-%d")
             
-            # --- DEDUPLICATION CHECK ---
-            # Even though preview does this, we must check again in case of retry/double-submit
             txn_hash = generate_transaction_hash(
                 current_user.id, 
                 txn_date, 
-                update.raw_description or update.description, 
-                update.amount
+                item.raw_description or item.description, 
+                item.amount
             )
-            
-            existing = db.query(models.Transaction).filter(
-                models.Transaction.user_id == str(current_user.id),
-                models.Transaction.transaction_hash == txn_hash
-            ).first()
-            
-            if existing:
-                logger.info(f"Skipping duplicate transaction on confirm: {update.description}")
-                continue
-            # ---------------------------
-
-            db_txn = models.Transaction(
-                date=txn_date,
-
-                description=update.description,
-                raw_description=update.raw_description or update.description,
-                amount=update.amount,
-                user_id=current_user.id,
-                bucket_id=update.bucket_id,
-                is_verified=True,  # User confirmed = verified
-                spender=update.spender or "Joint",
-                goal_id=update.goal_id,
-                tags=update.tags,
-                assigned_to=update.assigned_to,
-                transaction_hash=txn_hash 
-            )
-
-            db.add(db_txn)
-            db.flush()  # Get the ID without committing
-            confirmed_ids.append(db_txn.id)
+            # Keyed by hash: a row repeated within the request is inserted once
+            new_rows.setdefault(txn_hash, {
+                "date": txn_date,
+                "description": item.description,
+                "raw_description": item.raw_description or item.description,
+                "amount": item.amount,
+                "user_id": current_user.id,
+                "bucket_id": item.bucket_id,
+                "is_verified": True,  # User confirmed = verified
+                "spender": item.spender or "Joint",
+                "goal_id": item.goal_id,
+                "tags": item.tags,
+                "assigned_to": item.assigned_to,
+                "transaction_hash": txn_hash,
+            })
             
             # Note: Auto-rule creation has been removed.
             # Rules are now created explicitly via Smart Rules page or CreateRuleModal.
         else:
-            # EXISTING TRANSACTION - Update
-            txn = db.query(models.Transaction).filter(
-                models.Transaction.id == update.id, 
-                models.Transaction.user_id == current_user.id
-            ).first()
-            
-            if txn:
-                txn.bucket_id = update.bucket_id
-                if update.spender:
-                    txn.spender = update.spender
-                if update.assigned_to is not None:
-                    txn.assigned_to = update.assigned_to if update.assigned_to else None
-                if update.tags is not None:
-                    txn.tags = update.tags
-                txn.is_verified = True
-                confirmed_ids.append(txn.id)
-                
-                # Note: No auto-learning for existing transaction updates
-                # These are often corrections, not patterns to learn from
+            # EXISTING TRANSACTION - Update (applied in bulk below)
+            # Note: No auto-learning for existing transaction updates
+            # These are often corrections, not patterns to learn from
+            edits[item.id] = {
+                "bucket_id": item.bucket_id,
+                "spender": item.spender or None,  # None keeps the current value
+                "assigned_to": item.assigned_to,  # None keeps
+                "tags": item.tags,  # None keeps
+            }
     
-    db.commit()
+    if edits:
+        confirmed_ids.extend(apply_confirmed_edits(db, current_user.id, edits))
     
-    # Check budget exceeded for affected buckets
-    affected_bucket_ids = set()
-    for update in updates:
-        if update.bucket_id:
-            affected_bucket_ids.add(update.bucket_id)
+    # --- DEDUPLICATION ---
+    # Even though preview does this, the unique (user_id, transaction_hash) index
+    # catches retries/double-submits: conflicting rows are skipped by the INSERT
+    if new_rows:
+        inserted_ids = insert_new_transactions(db, list(new_rows.values()))
+        confirmed_ids.extend(inserted_ids)
+        skipped = len(new_rows) - len(inserted_ids)
+        if skipped:
+            logger.info(f"Skipped {skipped} duplicate transactions on confirm")
     
-    for bucket_id in affected_bucket_ids:
-        NotificationService.check_budget_exceeded(db, current_user.id, bucket_id)
+    db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
+    
+    # Check budget exceeded for affected buckets, all in one pass
+    affected_bucket_ids = {item.bucket_id for item in updates if item.bucket_id}
+    if affected_bucket_ids:
+        NotificationService.check_budgets_exceeded(db, current_user.id, affected_bucket_ids)
     
     # Return confirmed transactions
     if confirmed_ids:
@@ -862,15 +953,4 @@ def confirm_transactions(updates: List[schemas.TransactionConfirm], db: Session
         return results
     return []
 
-# Helper function
-def generate_transaction_hash(user_id, date, raw_description: str, amount: float) -> str:
-    """
-    Generate a unique fingerprint for duplicate detection.
-    Uses: user_id + date + raw_description + absolute amount
-    """
-    date_str = date.isoformat() if hasattr(date, 'isoformat') else str(date)
-    # Ensure raw_description is string, handle None
-    desc_str = (raw_description or "").lower().strip()
-    key = f"{user_id}|{date_str}|{desc_str}|{abs(round(amount, 2))}"
-    return hashlib.sha256(key.encode()).hexdigest()[:16]
 
@@ -6,6 +6,7 @@ from pydantic import BaseModel
 from datetime import date
 from ..database import get_db
 from .. import models, schemas, auth
+from ..cache import CacheManager
 from ..services.notification_service import NotificationService
 import yfinance as yf
 import csv
@@ -424,6 +425,7 @@ def create_account(account: schemas.AccountCreate, db: Session = Depends(get_db)
     # Ensure targets are passed if in dict
     db.add(db_account)
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     db.refresh(db_account)
     return db_account
     return db_account
@@ -506,6 +508,7 @@ def update_account_balance_history(
         db.add(balance_record)
     
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     
     # 4. Recalculate
     recalculate_snapshot(db, snapshot.id)
@@ -569,6 +572,10 @@ def update_account(account_id: int, account_update: schemas.AccountCreate, db: S
     db_account.is_active = account_update.is_active
     db_account.target_balance = account_update.target_balance
     db_account.target_date = account_update.target_date
+    # Debt terms are only changed when sent, so older clients don't clear them
+    for key, value in account_update.dict(exclude_unset=True).items():
+        if key in ("interest_rate", "minimum_payment"):
+            setattr(db_account, key, value)
     
     # Handle Balance Update (Manual Accounts)
     if account_update.balance is not None:
@@ -626,6 +633,7 @@ def update_account(account_id: int, account_update: schemas.AccountCreate, db: S
         latest_snapshot.net_worth = new_assets - new_liabilities
     
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     db.refresh(db_account)
     return db_account
 
@@ -638,6 +646,7 @@ def delete_account(account_id: int, db: Session = Depends(get_db), current_user:
     # Soft delete
     db_account.is_active = False
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     return {"ok": True}
 
 # --- Snapshots ---
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from .. import models, schemas, auth
+from ..cache import CacheManager
 from ..database import get_db
 
 router = APIRouter(
@@ -355,6 +356,7 @@ def run_rules(
             count += 1
             
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     
     return {"message": f"Successfully updated {count} transactions", "count": count}
 
@@ -6,6 +6,8 @@ import os
 import shutil
 
 from .. import models, schemas, auth
+from ..cache import CacheManager
+from ..services.bucket_tree import get_bucket_tree
 from ..database import get_db
 
 router = APIRouter(
@@ -99,6 +101,7 @@ def create_member(member: schemas.HouseholdMemberCreate, db: Session = Depends(g
     )
     db.add(db_member)
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     db.refresh(db_member)
     return db_member
 
@@ -117,6 +120,7 @@ def update_member(member_id: int, member: schemas.HouseholdMemberCreate, db: Ses
     db_member.avatar = member.avatar
     
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     db.refresh(db_member)
     return db_member
 
@@ -144,6 +148,7 @@ def delete_member(member_id: int, db: Session = Depends(get_db), current_user: m
     
     db.delete(db_member)
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     return {"ok": True}
 
 # --- Budget Buckets ---
@@ -178,6 +183,7 @@ def get_buckets(db: Session = Depends(get_db), current_user: models.User = Depen
             )
             db.add(db_bucket)
         db.commit()
+        CacheManager.invalidate_user_analytics(user.id)
     
     # Use joinedload to eagerly load tags
     return db.query(models.BudgetBucket)\
@@ -204,8 +210,7 @@ def get_buckets_tree(db: Session = Depends(get_db), current_user: models.User =
         .order_by(models.BudgetBucket.display_order)\
         .all()
     
-    # Build tree structure using a map for O(N) lookup
-    # First, create all dicts and store in a map
+    # Create all dicts and store in a map
     id_to_dict = {}
     for bucket in all_buckets:
         id_to_dict[bucket.id] = {
@@ -227,32 +232,13 @@ def get_buckets_tree(db: Session = Depends(get_db), current_user: models.User =
             "children": []
         }
     
-    tree = []
+    # Nest children using the cached hierarchy index (display order, self-references
+    # and cycles are already resolved there)
+    index = get_bucket_tree(db, user.id)
     for bucket_id, bucket_dict in id_to_dict.items():
-        parent_id = bucket_dict["parent_id"]
-        # Prevent self-reference in tree building (bucket cannot be its own child)
-        if parent_id and parent_id in id_to_dict and parent_id != bucket_id:
-            id_to_dict[parent_id]["children"].append(bucket_dict)
-        else:
-            tree.append(bucket_dict)
-            
-    # Sort by display_order within each level, protecting against cycles
-    def sort_tree(nodes, visited=None):
-        if visited is None:
-            visited = set()
-            
-        nodes.sort(key=lambda x: x.get("display_order", 0))
-        for node in nodes:
-            node_id = node["id"]
-            if node_id in visited:
-                continue # Prevent infinite recursion
-            visited.add(node_id)
-            
-            if node["children"]:
-                sort_tree(node["children"], visited)
+        bucket_dict["children"] = [id_to_dict[c] for c in index.children(bucket_id) if c in id_to_dict]
     
-    sort_tree(tree)
-    return tree
+    return [id_to_dict[r] for r in index.roots if r in id_to_dict]
 
 
 @router.post("/buckets/reorder")
@@ -284,6 +270,7 @@ def reorder_buckets(
             bucket.display_order = new_order
     
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     return {"ok": True}
 
 
@@ -374,6 +361,7 @@ def create_bucket(bucket: schemas.BudgetBucketCreate, db: Session = Depends(get_
             process_limits(db, db_bucket, bucket.limits)
             
         db.commit()
+        CacheManager.invalidate_user_analytics(current_user.id)
         db.refresh(db_bucket)
         return db_bucket
     except Exception as e:
@@ -416,6 +404,7 @@ def update_bucket(bucket_id: int, bucket: schemas.BudgetBucketCreate, db: Sessio
         process_limits(db, db_bucket, bucket.limits)
     
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     db.refresh(db_bucket)
     return db_bucket
 
@@ -438,6 +427,7 @@ def delete_bucket(bucket_id: int, db: Session = Depends(get_db), current_user: m
     
     db.delete(db_bucket)
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     return {"ok": True}
 
 # --- Notification Settings ---
@@ -1,49 +1,72 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Body
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import extract, or_, func
+from sqlalchemy import extract, or_, and_, tuple_, update as sa_update
 from typing import List, Optional
 from datetime import datetime
+import base64
+import binascii
+import json
 from ..database import get_db
 from .. import models, schemas, auth
+from ..cache import CacheManager
+from ..services import search as transaction_search
+from ..services import transaction_tags
 
 router = APIRouter(
     prefix="/transactions",
     tags=["transactions"],
 )
 
-@router.get("/")
-def get_transactions(
-    skip: int = 0,
-    limit: int = 100,
-    bucket_id: Optional[int] = None,
-    verified: Optional[bool] = None,
-    month: Optional[int] = None,
-    year: Optional[int] = None,
+def _encode_cursor(sort_by: str, sort_dir: str, txn: models.Transaction) -> str:
+    """Opaque keyset token: the sort key and id of the last row on a page."""
+    value = getattr(txn, sort_by)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort_by, sort_dir, value, txn.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort_by: str, sort_dir: str):
+    """Return (value, id) from a cursor token issued for the same sort order."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        c_sort, c_dir, value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+        if sort_by == "date" and value is not None:
+            value = datetime.fromisoformat(value)
+        last_id = int(last_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if (c_sort, c_dir) != (sort_by, sort_dir):
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested sort order")
+    return value, last_id
+
+
+def _apply_filters(
+    db: Session,
+    query,
+    user_id: str,
     search: Optional[str] = None,
+    bucket_id: Optional[int] = None,
     spender: Optional[str] = None,
-    assigned_to: Optional[str] = None, # "ANY" for all assigned, or specific name
+    account_id: Optional[int] = None,
+    tags: Optional[str] = None,
+    assigned_to: Optional[str] = None,
+    verified: Optional[bool] = None,
     min_amount: Optional[float] = None,
     max_amount: Optional[float] = None,
+    month: Optional[int] = None,
+    year: Optional[int] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    account_id: Optional[int] = None,  # New filter
-    tags: Optional[str] = None,        # New filter
-    sort_by: Optional[str] = Query(None, regex="^(date|amount|description)$"),
-    sort_dir: Optional[str] = Query(None, regex="^(asc|desc)$"),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
 ):
-    query = db.query(models.Transaction).options(joinedload(models.Transaction.bucket)).filter(models.Transaction.user_id == current_user.id)
-    
-    # Search filter (description or raw_description)
+    """
+    Apply the transaction list filters to a Transaction query.
+    Returns (query, rank_order); rank_order is set when a search can be ranked.
+    """
+    # Search filter (description or raw_description), via the full-text index when present
+    rank_order = None
     if search:
-        search_term = f"%{search.lower()}%"
-        query = query.filter(
-            or_(
-                func.lower(models.Transaction.description).like(search_term),
-                func.lower(models.Transaction.raw_description).like(search_term)
-            )
-        )
+        query, rank_order = transaction_search.apply_search(db, query, search)
     
     if bucket_id is not None:
         query = query.filter(models.Transaction.bucket_id == bucket_id)
@@ -54,11 +77,9 @@ def get_transactions(
     if account_id:
         query = query.filter(models.Transaction.account_id == account_id)
 
-    if tags:
-        tag_list = [t.strip() for t in tags.split(',') if t.strip()]
-        if tag_list:
-            tag_filters = [models.Transaction.tags.ilike(f"%{t}%") for t in tag_list]
-            query = query.filter(or_(*tag_filters))
+    tag_clause = transaction_tags.tag_filter(user_id, tags)
+    if tag_clause is not None:
+        query = query.filter(tag_clause)
 
     if assigned_to:
         if assigned_to == "ANY":
@@ -98,37 +119,94 @@ def get_transactions(
         except ValueError:
             pass
     
-    # Get total count before pagination
-    total = query.count()
+    return query, rank_order
+
+
+@router.get("/")
+def get_transactions(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,      # Keyset pagination token from a previous page's next_cursor
+    include_total: bool = False,       # Exact count of the filtered set (extra COUNT query)
+    bucket_id: Optional[int] = None,
+    verified: Optional[bool] = None,
+    month: Optional[int] = None,
+    year: Optional[int] = None,
+    search: Optional[str] = None,
+    spender: Optional[str] = None,
+    assigned_to: Optional[str] = None, # "ANY" for all assigned, or specific name
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    account_id: Optional[int] = None,  # New filter
+    tags: Optional[str] = None,        # New filter
+    sort_by: Optional[str] = Query(None, pattern="^(date|amount|description|relevance)$"),
+    sort_dir: Optional[str] = Query(None, pattern="^(asc|desc)$"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    query = db.query(models.Transaction).options(joinedload(models.Transaction.bucket)).filter(models.Transaction.user_id == current_user.id)
+    
+    query, rank_order = _apply_filters(
+        db, query, current_user.id,
+        search=search, bucket_id=bucket_id, spender=spender, account_id=account_id, tags=tags,
+        assigned_to=assigned_to, verified=verified, min_amount=min_amount, max_amount=max_amount,
+        month=month, year=year, start_date=start_date, end_date=end_date
+    )
+    
+    # Exact count is opt-in: it scans the whole filtered set on every page
+    total = query.count() if include_total else None
+    
+    # Sorting: (sort column, id) so the order is total and pages can resume by keyset.
+    # NULL sorts as the greatest value (PostgreSQL's default), so the default
+    # date-descending scan matches idx_transactions_user_date_id.
+    # "relevance" ranks search matches (best first) and pages by offset only.
+    relevance = sort_by == "relevance" and rank_order is not None
+    sort_by = "date" if sort_by in (None, "relevance") else sort_by
+    sort_dir = sort_dir or "desc"
+    sort_column = getattr(models.Transaction, sort_by)
+    id_column = models.Transaction.id
+    if relevance:
+        query = query.order_by(rank_order, sort_column.desc().nulls_first(), id_column.desc())
+    elif sort_dir == "asc":
+        query = query.order_by(sort_column.asc().nulls_last(), id_column.asc())
+    else:
+        query = query.order_by(sort_column.desc().nulls_first(), id_column.desc())
     
-    # Sorting
-    if sort_by:
-        sort_column = getattr(models.Transaction, sort_by)
+    if cursor and relevance:
+        raise HTTPException(status_code=400, detail="Cursor pagination is not available when sorting by relevance")
+    if cursor:
+        # Resume after the last row: WHERE (sort_col, id) < (last_value, last_id) for desc
+        last_value, last_id = _decode_cursor(cursor, sort_by, sort_dir)
+        key = tuple_(sort_column, id_column)
         if sort_dir == "asc":
-            query = query.order_by(sort_column.asc())
+            if last_value is None:
+                query = query.filter(sort_column.is_(None), id_column > last_id)
+            else:
+                query = query.filter(or_(key > tuple_(last_value, last_id), sort_column.is_(None)))
         else:
-            query = query.order_by(sort_column.desc())
-    else:
-        # Default sort by date descending
-        query = query.order_by(models.Transaction.date.desc())
+            if last_value is None:
+                query = query.filter(or_(and_(sort_column.is_(None), id_column < last_id), sort_column.isnot(None)))
+            else:
+                query = query.filter(key < tuple_(last_value, last_id))
+        skip = 0
     
-    # DEBUG LOGGING
-    print(f"DEBUG: get_transactions called with start_date={start_date}, end_date={end_date}")
-    try:
-        from sqlalchemy.dialects import postgresql
-        # query_str = str(query.statement.compile(dialect=postgresql.dialect()))
-        # print(f"DEBUG: Query: {query_str}")
-        pass
-    except Exception as e:
-        print(f"DEBUG: Could not print query: {e}")
-
-    transactions = query.offset(skip).limit(limit).all()
-    print(f"DEBUG: Found {len(transactions)} transactions")
+    # One extra row tells us whether another page exists without counting
+    rows = query.offset(skip).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    transactions = rows[:limit]
+    
+    if total is None and not cursor and not has_more and (transactions or skip == 0):
+        # Whole remainder fits on this page, so the count is known for free
+        total = skip + len(transactions)
     
     # Return with metadata
     return {
         "items": transactions,
         "total": total,
+        "has_more": has_more,
+        "next_cursor": _encode_cursor(sort_by, sort_dir, transactions[-1]) if has_more and not relevance else None,
         "skip": skip,
         "limit": limit
     }
@@ -165,6 +243,7 @@ def create_transaction(
     
     db.add(db_transaction)
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     db.refresh(db_transaction)
     return db_transaction
 
@@ -197,6 +276,7 @@ def update_transaction(
         txn.assigned_to = update.assigned_to if update.assigned_to else None
         
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     db.refresh(txn)
     
     # Reload to ensure bucket relation is fresh
@@ -239,6 +319,7 @@ def delete_all_transactions(
         models.Transaction.user_id == current_user.id
     ).delete(synchronize_session=False)
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     return {"message": f"Deleted {count} transactions", "count": count}
 
 @router.delete("/{transaction_id}")
@@ -250,6 +331,7 @@ def delete_transaction(transaction_id: int, db: Session = Depends(get_db), curre
         
     db.delete(txn)
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     return {"message": "Transaction deleted"}
 
 @router.post("/{transaction_id}/split", response_model=List[schemas.Transaction])
@@ -301,6 +383,7 @@ def split_transaction(
         created_transactions.append(child)
         
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     for t in created_transactions:
         db.refresh(t)
         
@@ -321,6 +404,7 @@ def batch_delete_transactions(
         models.Transaction.user_id == current_user.id
     ).delete(synchronize_session=False)
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     return {"message": f"Deleted {len(transaction_ids)} transactions"}
 
 @router.post("/batch-update")
@@ -356,4 +440,87 @@ def batch_update_transactions(
     ).update(update_fields, synchronize_session=False)
     
     db.commit()
+    CacheManager.invalidate_user_analytics(current_user.id)
     return {"message": f"Updated {count} transactions", "count": count}
+
+@router.patch("/bulk")
+def bulk_patch_transactions(
+    payload: schemas.TransactionBulkPatch,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    Apply partial updates to many transactions in one database transaction.
+    Body is either { "updates": [{"id": 1, "bucket_id": 5}, ...] } or
+    { "filter": {...}, "patch": {"bucket_id": 5, "tags": "work"} }.
+    Per-row patches are written as one executemany UPDATE by primary key and a
+    shared patch as a single UPDATE ... WHERE id IN (...), so the rollup, tag and
+    columnar listeners run once per request.
+    """
+    list_mode = payload.updates is not None
+    if list_mode == (payload.filter is not None or payload.patch is not None):
+        raise HTTPException(status_code=400, detail="Provide either 'updates', or 'filter' and 'patch'")
+
+    rows = []  # list mode: one {"id": ..., **patch} per transaction
+    values, matched = {}, []  # filter mode: one patch for every matched id
+    if list_mode:
+        requested = {}
+        for item in payload.updates:
+            requested[item.id] = item.model_dump(exclude_unset=True, exclude={"id"})
+        owned = {row.id for row in db.query(models.Transaction.id).filter(
+            models.Transaction.id.in_(list(requested)),
+            models.Transaction.user_id == current_user.id
+        )} if requested else set()
+        rows = [
+            dict(patch, id=txn_id) for txn_id, patch in requested.items()
+            if txn_id in owned and patch
+        ]
+        missing_ids = sorted(set(requested) - owned)
+    else:
+        if payload.filter is None or payload.patch is None:
+            raise HTTPException(status_code=400, detail="Both 'filter' and 'patch' are required")
+        criteria = payload.filter.model_dump(exclude_none=True)
+        values = payload.patch.model_dump(exclude_unset=True)
+        if not criteria:
+            raise HTTPException(status_code=400, detail="Filter must include at least one condition")
+        if not values:
+            raise HTTPException(status_code=400, detail="No update fields provided")
+        ids = criteria.pop("ids", None)
+        query = db.query(models.Transaction.id).filter(models.Transaction.user_id == current_user.id)
+        if ids is not None:
+            query = query.filter(models.Transaction.id.in_(ids))
+        query, _ = _apply_filters(db, query, current_user.id, **criteria)
+        matched = [row.id for row in query]
+        missing_ids = []
+
+    # Buckets must belong to the user
+    bucket_ids = {patch.get("bucket_id") for patch in rows + [values]} - {None}
+    if bucket_ids:
+        found = db.query(models.BudgetBucket.id).filter(
+            models.BudgetBucket.id.in_(bucket_ids),
+            models.BudgetBucket.user_id == current_user.id
+        ).count()
+        if found != len(bucket_ids):
+            raise HTTPException(status_code=400, detail="Invalid bucket_id")
+
+    for patch in rows + [values]:
+        if "assigned_to" in patch and not patch["assigned_to"]:
+            patch["assigned_to"] = None  # "" clears the assignment
+
+    if rows:
+        # Ownership was checked above; rows only name the user's own ids
+        db.execute(sa_update(models.Transaction), rows)
+        updated_ids = [row["id"] for row in rows]
+    elif matched:
+        db.query(models.Transaction).filter(
+            models.Transaction.id.in_(matched),
+            models.Transaction.user_id == current_user.id
+        ).update(values, synchronize_session=False)
+        updated_ids = matched
+    else:
+        updated_ids = []
+
+    if updated_ids:
+        db.commit()
+        CacheManager.invalidate_user_analytics(current_user.id)
+    return {"updated_ids": sorted(updated_ids), "count": len(updated_ids), "missing_ids": missing_ids}
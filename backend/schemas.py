@@ -222,6 +222,57 @@ class TransactionUpdate(BaseModel):
             return ''  # Preserve empty string for clearing
         return sanitize_text(v, max_length=500) if v else None
 
+class TransactionPatch(BaseModel):
+    """
+    Partial update: only fields present in the request are written. Null clears
+    bucket_id, goal_id, assigned_to, tags and notes; the other fields must be set.
+    """
+    date: Optional[datetime] = None
+    bucket_id: Optional[int] = None
+    is_verified: Optional[bool] = None
+    description: Optional[str] = None
+    spender: Optional[str] = None
+    goal_id: Optional[int] = None
+    assigned_to: Optional[str] = None  # "" or null clears the assignment
+    tags: Optional[str] = None
+    notes: Optional[str] = None
+
+    @field_validator('description', 'spender', 'assigned_to', 'tags', 'notes')
+    @classmethod
+    def sanitize_text_fields(cls, v: Optional[str]) -> Optional[str]:
+        return sanitize_text(v, max_length=500) if v else None
+
+    @field_validator('date', 'is_verified', 'description', 'spender')
+    @classmethod
+    def reject_null(cls, v):
+        # Aggregations assume these columns are never NULL
+        if v is None:
+            raise ValueError('cannot be null or empty')
+        return v
+
+class TransactionPatchItem(TransactionPatch):
+    id: int
+
+class TransactionBulkFilter(BaseModel):
+    """Selects transactions for a bulk patch; same semantics as the GET /transactions filters."""
+    ids: Optional[List[int]] = None
+    bucket_id: Optional[int] = None
+    verified: Optional[bool] = None
+    search: Optional[str] = None
+    spender: Optional[str] = None
+    account_id: Optional[int] = None
+    tags: Optional[str] = None
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    start_date: Optional[str] = None  # YYYY-MM-DD
+    end_date: Optional[str] = None    # YYYY-MM-DD, inclusive
+
+class TransactionBulkPatch(BaseModel):
+    """Either ``updates`` (per-row patches) or ``filter`` plus one shared ``patch``."""
+    updates: Optional[List[TransactionPatchItem]] = None
+    filter: Optional[TransactionBulkFilter] = None
+    patch: Optional[TransactionPatch] = None
+
 class Transaction(TransactionBase):
     id: int
     user_id: str
@@ -308,6 +359,8 @@ class AccountBase(BaseModel):
     target_date: Optional[date] = None
     connection_id: Optional[str] = None
     balance: Optional[float] = 0.0  # Added to support manual updates
+    interest_rate: Optional[float] = None  # Annual %, liabilities only
+    minimum_payment: Optional[float] = None  # Monthly, liabilities only
 
 class AccountCreate(AccountBase):
     pass
@@ -0,0 +1,116 @@
+"""
+Anomaly Detection
+
+Statistics behind /analytics/anomalies. Amounts are aggregated in SQL (moments,
+percentiles and the monthly rollup table) so no transaction rows are hydrated,
+or from the in-memory column store when it is loaded; per-bucket spike
+thresholds are computed for all buckets at once with NumPy.
+
+Methods:
+- "zscore": mean + sensitivity * sample standard deviation
+- "mad":    median + sensitivity * scaled median absolute deviation, which is
+            robust to a single extreme month skewing the baseline
+"""
+import math
+import warnings
+from typing import Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .. import models
+
+# Scales MAD to be comparable with a standard deviation for normal data
+MAD_SCALE = 1.4826
+# Multiplier used when there is no spread to measure (one month of history, or all equal)
+FALLBACK_MULTIPLIER = 1.5
+
+
+def amount_moments(db: Session, filters) -> Tuple[int, float, float]:
+    """
+    (count, mean, sample stdev) of abs(amount) over transactions matching
+    ``filters``, computed from SUM(x) and SUM(x^2) in one aggregate query.
+    """
+    size = func.abs(models.Transaction.amount)
+    count, total, total_sq = db.query(
+        func.count(models.Transaction.id),
+        func.sum(size),
+        func.sum(size * size)
+    ).filter(*filters).one()
+    return _moments(count or 0, total or 0.0, total_sq or 0.0)
+
+
+def size_moments(sizes: np.ndarray) -> Tuple[int, float, float]:
+    """amount_moments over an array of abs(amount) values (column store path)."""
+    return _moments(len(sizes), float(sizes.sum()), float(np.dot(sizes, sizes)))
+
+
+def _moments(count: int, total: float, total_sq: float) -> Tuple[int, float, float]:
+    if count == 0:
+        return 0, 0.0, 0.0
+    mean = total / count
+    if count == 1:
+        return count, mean, 0.0
+    variance = (total_sq - count * mean * mean) / (count - 1)
+    return count, mean, math.sqrt(max(variance, 0.0))
+
+
+def amount_percentile(db: Session, filters, percentile: float, count: Optional[int] = None) -> Optional[float]:
+    """
+    ``percentile`` (0-100) of abs(amount) over transactions matching ``filters``.
+    Postgres uses percentile_cont; other dialects select the nearest-rank row
+    with ORDER BY ... OFFSET, so rows are never loaded into Python.
+    """
+    size = func.abs(models.Transaction.amount)
+    fraction = percentile / 100.0
+
+    if db.get_bind().dialect.name == "postgresql":
+        return db.query(
+            func.percentile_cont(fraction).within_group(size)
+        ).filter(*filters).scalar()
+
+    if count is None:
+        count = db.query(func.count(models.Transaction.id)).filter(*filters).scalar() or 0
+    if count == 0:
+        return None
+    offset = min(count - 1, max(0, math.ceil(fraction * count) - 1))
+    return db.query(size).filter(*filters).order_by(size).offset(offset).limit(1).scalar()
+
+
+def size_percentile(sizes: np.ndarray, percentile: float, continuous: bool = False) -> Optional[float]:
+    """
+    amount_percentile over an array of abs(amount) values: interpolated like
+    percentile_cont when ``continuous``, otherwise the same nearest-rank value.
+    """
+    if len(sizes) == 0:
+        return None
+    return float(np.percentile(sizes, percentile, method="linear" if continuous else "inverted_cdf"))
+
+
+def spike_thresholds(history: np.ndarray, method: str = "zscore", sensitivity: float = 2.0):
+    """
+    Per-row baseline and thresholds for a (buckets x months) matrix of monthly
+    totals, with NaN where a bucket had no spending that month.
+
+    Returns (baseline, threshold, high_threshold) arrays; values above
+    ``threshold`` are spikes and above ``high_threshold`` are high severity.
+    """
+    counts = np.sum(~np.isnan(history), axis=1)
+
+    with warnings.catch_warnings():
+        # Rows with a single month have no spread; handled by the fallback below
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        if method == "mad":
+            baseline = np.nanmedian(history, axis=1)
+            spread = np.nanmedian(np.abs(history - baseline[:, None]), axis=1) * MAD_SCALE
+            measurable = spread > 0
+        else:
+            baseline = np.nanmean(history, axis=1)
+            spread = np.nanstd(history, axis=1, ddof=1)
+            measurable = counts > 1
+
+    spread = np.where(measurable, spread, 0.0)
+    threshold = np.where(measurable, baseline + sensitivity * spread, baseline * FALLBACK_MULTIPLIER)
+    high_threshold = np.where(measurable, baseline + (sensitivity + 1) * spread, baseline)
+    return baseline, threshold, high_threshold
@@ -0,0 +1,167 @@
+"""
+Bucket Hierarchy Index
+
+``BucketTree`` precomputes one user's parent/child bucket structure: children,
+ancestors, flattened subtree id sets, income-group resolution and the
+transfer/investment flags. Analytics endpoints and the settings tree use it
+instead of walking the hierarchy on every request.
+
+Trees are memoized per worker and keyed on the user's cache generation.
+Any flush that touches a BudgetBucket bumps that generation on commit, so a
+tree is built once per user per bucket version (transaction writes also bump
+the generation, which simply triggers a rebuild).
+"""
+from itertools import chain
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..cache import CacheManager, bump_generation, memoize_for_user
+
+
+class BucketTree:
+    """Immutable index over one user's buckets."""
+
+    def __init__(self, rows: Iterable[tuple]):
+        """
+        Args:
+            rows: (id, parent_id, group, is_transfer, is_investment, display_order) tuples
+        """
+        rows = list(rows)
+        self.ids: FrozenSet[int] = frozenset(row[0] for row in rows)
+        self.group: Dict[int, Optional[str]] = {}
+        self.parent: Dict[int, Optional[int]] = {}
+        self.transfer_ids: FrozenSet[int] = frozenset(row[0] for row in rows if row[3])
+        self.investment_ids: FrozenSet[int] = frozenset(row[0] for row in rows if row[4])
+
+        order = {}
+        for bid, parent_id, group, _, _, display_order in rows:
+            self.group[bid] = group
+            order[bid] = display_order or 0
+            # A bucket cannot be its own parent; unknown parents make it a root
+            self.parent[bid] = parent_id if parent_id in self.ids and parent_id != bid else None
+
+        children: Dict[int, List[int]] = {bid: [] for bid in self.ids}
+        for bid, parent_id in self.parent.items():
+            if parent_id is not None:
+                children[parent_id].append(bid)
+        self._children: Dict[int, Tuple[int, ...]] = {
+            bid: tuple(sorted(kids, key=lambda k: (order[k], k))) for bid, kids in children.items()
+        }
+        self.roots: Tuple[int, ...] = tuple(sorted(
+            (bid for bid, parent_id in self.parent.items() if parent_id is None),
+            key=lambda k: (order[k], k)
+        ))
+
+        self._ancestors: Dict[int, Tuple[int, ...]] = {}
+        for bid in self.ids:
+            chain_ids = []
+            seen = {bid}
+            parent_id = self.parent[bid]
+            while parent_id is not None and parent_id not in seen:
+                chain_ids.append(parent_id)
+                seen.add(parent_id)
+                parent_id = self.parent[parent_id]
+            self._ancestors[bid] = tuple(chain_ids)
+
+        descendants: Dict[int, set] = {bid: set() for bid in self.ids}
+        for bid, ancestors in self._ancestors.items():
+            for ancestor in ancestors:
+                descendants[ancestor].add(bid)
+        self._subtree: Dict[int, FrozenSet[int]] = {
+            bid: frozenset(kids | {bid}) for bid, kids in descendants.items()
+        }
+
+        # Income group: the bucket itself or its direct parent is in "Income"
+        self.income_ids: FrozenSet[int] = frozenset(
+            bid for bid in self.ids
+            if self.group[bid] == "Income"
+            or (self.parent[bid] is not None and self.group[self.parent[bid]] == "Income")
+        )
+
+    def children(self, bucket_id: int) -> Tuple[int, ...]:
+        """Direct children, in display order."""
+        return self._children.get(bucket_id, ())
+
+    def has_children(self, bucket_id: int) -> bool:
+        return bool(self._children.get(bucket_id))
+
+    def ancestors(self, bucket_id: int) -> Tuple[int, ...]:
+        """Parent, grandparent, ... up to the root."""
+        return self._ancestors.get(bucket_id, ())
+
+    def root(self, bucket_id: int) -> int:
+        """Top-level bucket of ``bucket_id`` (itself if it has no parent)."""
+        ancestors = self._ancestors.get(bucket_id)
+        return ancestors[-1] if ancestors else bucket_id
+
+    def subtree(self, bucket_ids) -> FrozenSet[int]:
+        """
+        ``bucket_ids`` plus all of their descendants. Accepts one id or an
+        iterable; ids not in the tree are kept as-is.
+        """
+        if isinstance(bucket_ids, int):
+            return self._subtree.get(bucket_ids, frozenset((bucket_ids,)))
+        result = set()
+        for bid in bucket_ids:
+            result |= self._subtree.get(bid, {bid})
+        return frozenset(result)
+
+    def descendants(self, bucket_id: int) -> FrozenSet[int]:
+        return self.subtree(bucket_id) - {bucket_id}
+
+    def is_income(self, bucket_id: int) -> bool:
+        return bucket_id in self.income_ids
+
+    def is_transfer(self, bucket_id: int) -> bool:
+        return bucket_id in self.transfer_ids
+
+    def is_investment(self, bucket_id: int) -> bool:
+        return bucket_id in self.investment_ids
+
+    def rollup(self, values: Dict[int, float]) -> Dict[int, float]:
+        """Per-bucket totals including all descendants, for every bucket in the tree."""
+        return {
+            bid: sum(values.get(member, 0.0) for member in subtree)
+            for bid, subtree in self._subtree.items()
+        }
+
+
+def build_bucket_tree(db: Session, user_id) -> BucketTree:
+    B = models.BudgetBucket
+    rows = db.query(
+        B.id, B.parent_id, B.group, B.is_transfer, B.is_investment, B.display_order
+    ).filter(B.user_id == user_id).all()
+    return BucketTree(rows)
+
+
+def get_bucket_tree(db: Session, user_id) -> BucketTree:
+    """Memoized BucketTree for a user (rebuilt after any bucket write)."""
+    return memoize_for_user(
+        "bucket_tree", user_id, lambda: build_bucket_tree(db, user_id), ttl=CacheManager.TTL_LONG
+    )
+
+
+# --- Invalidation ---
+
+@event.listens_for(Session, "after_flush")
+def _track_bucket_writes(session, flush_context):
+    users = {
+        obj.user_id for obj in chain(session.new, session.dirty, session.deleted)
+        if isinstance(obj, models.BudgetBucket) and obj.user_id is not None
+    }
+    if users:
+        session.info.setdefault("bucket_tree_users", set()).update(users)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_bucket_trees(session):
+    for user_id in session.info.pop("bucket_tree_users", ()):
+        bump_generation(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_bucket_writes(session):
+    session.info.pop("bucket_tree_users", None)
@@ -0,0 +1,107 @@
+"""
+Budget Progress Aggregation
+
+Spending behind /analytics/budget-progress in a single statement: the
+selected period's net per (bucket, spender), which gives the category totals
+and the member breakdown, and the net per (bucket, month) for the sparklines.
+
+On PostgreSQL both are one scan with
+``GROUP BY GROUPING SETS ((bucket_id, spender), (bucket_id, month))`` and
+conditional sums for the two date ranges. Other dialects have no grouping
+sets, so two grouped subqueries are combined with UNION ALL; that is still one
+statement and one round trip.
+
+Periods covering whole calendar months read the monthly rollup table; other
+periods scan transactions directly.
+"""
+from datetime import date
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, case, func, literal, null, or_, select, tuple_, union_all
+from sqlalchemy.orm import Session
+
+from .. import models
+from . import rollups
+
+PERIOD_SET = 0
+HISTORY_SET = 1
+
+
+def spending_sets(
+    db: Session,
+    user_id: str,
+    period_start: date,
+    period_end: date,
+    first_month: date,
+    last_month: date,
+    bucket_ids: Iterable[int],
+    spender: Optional[str] = None,
+) -> Tuple[List[tuple], List[tuple]]:
+    """
+    Net amounts (negative = spending) for ``period_start``..``period_end`` and
+    for the months ``first_month``..``last_month`` (inclusive), limited to
+    ``bucket_ids`` and optionally to one spender.
+
+    Returns (period_rows, history_rows): (bucket_id, spender, net) and
+    (bucket_id, month, net) tuples. Groups without rows in their range are
+    left out.
+    """
+    bucket_ids = list(bucket_ids)
+    dialect = db.get_bind().dialect.name
+    month_span = rollups.whole_month_span(period_start, period_end)
+
+    if month_span:
+        R = models.TransactionRollup
+        bucket_col, spender_col, month_col = R.bucket_id, R.spender, R.month
+        amount = R.expense_sum + R.income_sum
+        in_period = R.month.between(*month_span)
+        in_history = R.month.between(first_month, last_month)
+        filters = [R.user_id == user_id, R.bucket_id.in_(bucket_ids)]
+        if spender is not None:
+            filters.append(R.spender == spender)
+    else:
+        T = models.Transaction
+        bucket_col, spender_col = T.bucket_id, T.spender
+        month_col = rollups._month_expr(dialect, T.date)
+        amount = T.amount
+        in_period = and_(T.date >= period_start, T.date < rollups.day_after(period_end))
+        in_history = and_(T.date >= first_month, T.date < rollups.next_month(last_month))
+        filters = [T.user_id == user_id, T.bucket_id.in_(bucket_ids)]
+        if spender is not None:
+            filters.append(T.spender == spender)
+
+    if dialect == "postgresql":
+        stmt = select(
+            func.grouping(spender_col).label("grouping_set"),
+            bucket_col, spender_col, month_col,
+            func.sum(case((in_period, amount), else_=0.0)),
+            func.count(case((in_period, 1))),
+            func.sum(case((in_history, amount), else_=0.0)),
+            func.count(case((in_history, 1))),
+        ).where(*filters, or_(in_period, in_history)).group_by(
+            func.grouping_sets(tuple_(bucket_col, spender_col), tuple_(bucket_col, month_col))
+        )
+        rows = [
+            (kind, bid, spndr, month, *((period, n_period) if kind == PERIOD_SET else (history, n_history)))
+            for kind, bid, spndr, month, period, n_period, history, n_history in db.execute(stmt)
+        ]
+    else:
+        period_stmt = select(
+            literal(PERIOD_SET), bucket_col, spender_col, null(),
+            func.sum(amount), func.count()
+        ).where(*filters, in_period).group_by(bucket_col, spender_col)
+        history_stmt = select(
+            literal(HISTORY_SET), bucket_col, null(), month_col,
+            func.sum(amount), func.count()
+        ).where(*filters, in_history).group_by(bucket_col, month_col)
+        rows = db.execute(union_all(period_stmt, history_stmt)).all()
+
+    period_rows, history_rows = [], []
+    for kind, bid, spndr, month, net, count in rows:
+        if not count:
+            continue
+        if kind == PERIOD_SET:
+            period_rows.append((bid or None, spndr or None, net or 0.0))
+        else:
+            history_rows.append((bid or None, rollups._as_date(month), net or 0.0))
+    return period_rows, history_rows
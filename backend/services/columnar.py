@@ -0,0 +1,413 @@
+"""
+Columnar Transaction Store
+
+Optional per-worker copy of each active user's transactions as NumPy columns:
+id, date, amount, bucket id, spender code, account id and a flags byte.
+Analytics endpoints that aggregate arbitrary date ranges (dashboard, history,
+anomalies) filter these with boolean masks and group with ``np.bincount``
+instead of running a grouped SQL scan on every request.
+
+A user's columns are loaded with one query on first use and kept in a bounded
+LRU tier (COLUMNAR_CACHE_MAX_MB / COLUMNAR_CACHE_MAX_USERS, sized by the arrays'
+bytes). Committed ORM writes are applied to loaded columns instead of forcing
+a reload: new and edited transactions are upserted, deleted ones removed, and
+the store then follows the generation bump its own commit triggers. Writes it
+cannot replay (bulk UPDATE/DELETE, bucket deletion), bumps from other workers
+and bumps with no applied commit behind them invalidate it, so the next read
+reloads.
+
+Disabled with COLUMNAR_CACHE=off, and whenever response caching is off (there
+is no generation to validate against); callers then keep their SQL paths.
+"""
+import os
+import threading
+from datetime import date, datetime, timezone
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..cache import CacheManager, LocalCache, get_generation, on_generation_bump, register_local_tier
+from .rollups import bulk_write_criteria
+
+FLAG_VERIFIED = 1
+FLAG_SPLIT_CHILD = 2
+FLAG_TAGGED = 4
+
+_DATE = "datetime64[us]"
+
+# Attributes held in the columns; edits to anything else are ignored
+_COLUMN_ATTRS = (
+    "date", "amount", "bucket_id", "spender", "account_id", "is_verified",
+    "parent_transaction_id", "tags", "bucket", "account", "parent",
+)
+
+
+def _datetime64(value) -> np.datetime64:
+    """Naive datetime64 for comparisons; aware values are converted to UTC."""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return np.datetime64(value, "us")
+
+
+def _flags(is_verified, parent_transaction_id, tags) -> int:
+    return (
+        (FLAG_VERIFIED if is_verified else 0)
+        | (FLAG_SPLIT_CHILD if parent_transaction_id is not None else 0)
+        | (FLAG_TAGGED if tags else 0)
+    )
+
+
+class TransactionColumns:
+    """
+    Immutable column arrays for one user's transactions, ordered by id.
+
+    ``bucket`` and ``account`` use 0 for "none"; ``spender`` holds codes into
+    ``spenders``. Writes produce a new instance via ``patched``.
+    """
+
+    def __init__(self, ids, dates, amounts, buckets, spender_codes, spenders, accounts, flags, generation=None):
+        self.id = np.asarray(ids, dtype=np.int64)
+        self.date = np.asarray(dates, dtype=_DATE)
+        self.amount = np.asarray(amounts, dtype=np.float64)
+        self.bucket = np.asarray(buckets, dtype=np.int32)
+        self.spender = np.asarray(spender_codes, dtype=np.int16)
+        self.spenders: Tuple[Optional[str], ...] = tuple(spenders)
+        self.account = np.asarray(accounts, dtype=np.int32)
+        self.flags = np.asarray(flags, dtype=np.uint8)
+        self.generation = generation
+
+        # Dense bucket codes for np.bincount; bucket_keys[code] is the bucket id (0 = none)
+        self.bucket_keys, codes = np.unique(self.bucket, return_inverse=True)
+        self.bucket_code = codes.astype(np.int32)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple], generation=None) -> "TransactionColumns":
+        """
+        Args:
+            rows: (id, date, amount, bucket_id, spender, account_id, flags) tuples ordered by id
+        """
+        rows = list(rows)
+        spenders: Dict[Optional[str], int] = {}
+        return cls(
+            [r[0] for r in rows],
+            np.array([r[1] for r in rows], dtype=_DATE),
+            [r[2] or 0.0 for r in rows],
+            [r[3] or 0 for r in rows],
+            [spenders.setdefault(r[4], len(spenders)) for r in rows],
+            list(spenders),
+            [r[5] or 0 for r in rows],
+            [r[6] for r in rows],
+            generation,
+        )
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.id, self.date, self.amount, self.bucket, self.spender, self.account, self.flags, self.bucket_code)
+        return sum(a.nbytes for a in arrays)
+
+    @property
+    def bucket_ids(self) -> List[Optional[int]]:
+        """Bucket id for each bucket code, with None for uncategorized."""
+        return [int(b) or None for b in self.bucket_keys]
+
+    # --- Filters ---
+
+    def select(self, start=None, before=None, through=None, spender: Optional[str] = None,
+               account_id: Optional[int] = None) -> np.ndarray:
+        """
+        Row mask for ``start <= date`` and ``date < before`` / ``date <= through``,
+        optionally for one spender and one account. Rows without a date never match
+        a date bound, as in SQL.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= self.date >= _datetime64(start)
+        if before is not None:
+            mask &= self.date < _datetime64(before)
+        if through is not None:
+            mask &= self.date <= _datetime64(through)
+        if spender is not None:
+            code = self.spenders.index(spender) if spender in self.spenders else -1
+            mask &= self.spender == code
+        if account_id:
+            mask &= self.account == account_id
+        return mask
+
+    def in_buckets(self, bucket_ids: Iterable[Optional[int]]) -> np.ndarray:
+        """Row mask for transactions in any of ``bucket_ids`` (None matches uncategorized)."""
+        return np.isin(self.bucket, [bid or 0 for bid in bucket_ids])
+
+    # --- Aggregation ---
+
+    def bucket_sums(self, mask: np.ndarray) -> np.ndarray:
+        """Sum of amounts under ``mask`` per bucket code (aligned with ``bucket_ids``)."""
+        return np.bincount(
+            self.bucket_code[mask], weights=self.amount[mask], minlength=len(self.bucket_keys)
+        )
+
+    def bucket_counts(self, mask: np.ndarray) -> np.ndarray:
+        return np.bincount(self.bucket_code[mask], minlength=len(self.bucket_keys))
+
+    def period_starts(self, period: str) -> np.ndarray:
+        """Start day of each row's day / week (Monday) / month as datetime64[D]."""
+        days = self.date.astype("datetime64[D]")
+        if period == "week":
+            return days - (days.astype(np.int64) + 3) % 7
+        if period == "month":
+            return days.astype("datetime64[M]").astype("datetime64[D]")
+        return days
+
+    def period_sums(self, period: str, *masks: np.ndarray) -> Tuple[List[date], np.ndarray]:
+        """
+        (period start dates, len(masks) x periods sums) over periods holding
+        at least one row of any mask.
+        """
+        rows = np.logical_or.reduce(masks) if masks else np.zeros(len(self), dtype=bool)
+        keys, codes = np.unique(self.period_starts(period)[rows], return_inverse=True)
+        sums = np.array([
+            np.bincount(codes, weights=np.where(mask[rows], self.amount[rows], 0.0), minlength=len(keys))
+            for mask in masks
+        ]).reshape(len(masks), len(keys))
+        return keys.astype(object).tolist(), sums
+
+    # --- Writes ---
+
+    def patched(self, upserts: Dict[int, tuple], deleted: Iterable[int]) -> "TransactionColumns":
+        """
+        Copy with rows replaced or appended from ``upserts`` (id -> (date, amount,
+        bucket_id, spender, account_id, flags)) and ``deleted`` ids removed.
+        """
+        drop = np.isin(self.id, list(set(deleted) | set(upserts)))
+        keep = ~drop
+        spenders = list(self.spenders)
+        codes = {name: code for code, name in enumerate(spenders)}
+
+        new_ids = np.fromiter(upserts, dtype=np.int64, count=len(upserts))
+        values = list(upserts.values())
+        new_spenders = []
+        for v in values:
+            if v[3] not in codes:
+                codes[v[3]] = len(spenders)
+                spenders.append(v[3])
+            new_spenders.append(codes[v[3]])
+
+        ids = np.concatenate([self.id[keep], new_ids])
+        order = np.argsort(ids, kind="stable")
+        return TransactionColumns(
+            ids[order],
+            np.concatenate([self.date[keep], np.array([v[0] for v in values], dtype=_DATE)])[order],
+            np.concatenate([self.amount[keep], [v[1] or 0.0 for v in values]])[order],
+            np.concatenate([self.bucket[keep], np.array([v[2] or 0 for v in values], dtype=np.int32)])[order],
+            np.concatenate([self.spender[keep], np.array(new_spenders, dtype=np.int16)])[order],
+            spenders,
+            np.concatenate([self.account[keep], np.array([v[4] or 0 for v in values], dtype=np.int32)])[order],
+            np.concatenate([self.flags[keep], np.array([v[5] for v in values], dtype=np.uint8)])[order],
+            self.generation,
+        )
+
+
+def load_columns(db: Session, user_id, generation=None) -> TransactionColumns:
+    """Read all of a user's transactions into columns with one query."""
+    txn = models.Transaction
+    rows = db.query(
+        txn.id, txn.date, txn.amount, txn.bucket_id, txn.spender, txn.account_id,
+        txn.is_verified, txn.parent_transaction_id, txn.tags
+    ).filter(txn.user_id == user_id).order_by(txn.id).all()
+    return TransactionColumns.from_rows(
+        ((r[0], r[1], r[2], r[3], r[4], r[5], _flags(r[6], r[7], r[8])) for r in rows), generation
+    )
+
+
+# --- Store ---
+
+_stores = register_local_tier("columnar", LocalCache(
+    max_entries=int(os.getenv("COLUMNAR_CACHE_MAX_USERS", "256")),
+    max_bytes=int(os.getenv("COLUMNAR_CACHE_MAX_MB", "128")) * 1024 * 1024,
+))
+_lock = threading.Lock()
+_write_counts: Dict[str, int] = {}  # user_id -> writes applied, so loads racing a write are not kept
+_patched: set = set()  # users whose store absorbed a commit since their last generation bump
+
+
+def enabled() -> bool:
+    return os.getenv("COLUMNAR_CACHE", "on").lower() not in ("off", "0", "false")
+
+
+def _cached(user_id: str) -> Optional[TransactionColumns]:
+    store = _stores.get(user_id)
+    return store if isinstance(store, TransactionColumns) else None
+
+
+def _drop(user_id: str):
+    _stores.delete_matching(lambda key: key == user_id)
+
+
+def get_columns(db: Session, user_id) -> Optional[TransactionColumns]:
+    """
+    The user's columns at their current generation, loading them if needed.
+    None when the store is disabled or caching is off.
+    """
+    if not enabled():
+        return None
+    try:
+        generation = get_generation(user_id)
+    except Exception:
+        generation = None
+    if generation is None:
+        return None
+
+    user_id = str(user_id)
+    store = _cached(user_id)
+    if store is not None and store.generation == generation:
+        return store
+
+    writes = _write_counts.get(user_id, 0)
+    store = load_columns(db, user_id, generation)
+    with _lock:
+        # A write committed while loading may already have patched the old copy
+        if _write_counts.get(user_id, 0) == writes:
+            _stores.set(user_id, store, CacheManager.TTL_LONG, size=store.nbytes)
+            _patched.discard(user_id)
+    return store
+
+
+def _apply_writes(user_id: str, upserts: Dict[int, tuple], deleted: set):
+    with _lock:
+        _write_counts[user_id] = _write_counts.get(user_id, 0) + 1
+        store = _cached(user_id)
+        if store is not None:
+            store = store.patched(upserts, deleted)
+            _stores.set(user_id, store, CacheManager.TTL_LONG, size=store.nbytes)
+            _patched.add(user_id)
+
+
+def _evict(user_id: str):
+    with _lock:
+        _write_counts[user_id] = _write_counts.get(user_id, 0) + 1
+        _patched.discard(user_id)
+        _drop(user_id)
+
+
+@on_generation_bump
+def _follow_generation(user_id, generation):
+    """
+    Keep a store across a bump only when a committed write was applied to it
+    since the last one; any other bump (e.g. a write that bypassed the
+    session events) drops it.
+    """
+    user_id = str(user_id)
+    with _lock:
+        applied = user_id in _patched
+        _patched.discard(user_id)
+        store = _cached(user_id)
+        if store is None:
+            return
+        try:
+            follows = applied and int(generation) == int(store.generation) + 1
+        except (TypeError, ValueError):
+            follows = False
+        if follows:
+            store.generation = generation
+        else:
+            _drop(user_id)
+
+
+# --- Write tracking ---
+
+def _pending(session) -> Tuple[Dict[str, Dict[int, Optional[tuple]]], set]:
+    return (
+        session.info.setdefault("columnar_writes", {}),
+        session.info.setdefault("columnar_evict", set()),
+    )
+
+
+def _row(obj) -> tuple:
+    return (
+        obj.date, obj.amount, obj.bucket_id, obj.spender, obj.account_id,
+        _flags(obj.is_verified, obj.parent_transaction_id, obj.tags),
+    )
+
+
+def apply_inserted(session: Session, inserted: Dict[int, Dict]):
+    """
+    Record transactions inserted with a Core INSERT, which bypasses the session
+    events below, so the columns are patched when the session commits.
+    ``inserted`` maps new ids to the inserted values.
+    """
+    writes, _ = _pending(session)
+    for txn_id, row in inserted.items():
+        writes.setdefault(str(row.get("user_id")), {})[txn_id] = (
+            row.get("date"), row.get("amount"), row.get("bucket_id"), row.get("spender"),
+            row.get("account_id"),
+            _flags(row.get("is_verified"), row.get("parent_transaction_id"), row.get("tags")),
+        )
+
+
+@event.listens_for(Session, "after_flush")
+def _track_transaction_writes(session, flush_context):
+    writes, evict = _pending(session)
+    for obj in chain(session.new, session.dirty):
+        if isinstance(obj, models.Transaction):
+            state = inspect(obj)
+            owner = state.attrs.user_id.history
+            if owner.deleted:
+                # Moved between users: reload both rather than patch
+                evict.update(str(u) for u in chain(owner.deleted, owner.added) if u is not None)
+            elif obj in session.new or any(state.attrs[name].history.has_changes() for name in _COLUMN_ATTRS):
+                writes.setdefault(str(obj.user_id), {})[obj.id] = _row(obj)
+    for obj in session.deleted:
+        if isinstance(obj, models.Transaction):
+            writes.setdefault(str(obj.user_id), {})[obj.id] = None
+        elif isinstance(obj, models.BudgetBucket):
+            # Deleting a bucket nulls bucket_id on its transactions
+            evict.add(str(obj.user_id))
+
+
+@event.listens_for(Session, "do_orm_execute", insert=True)
+def _track_bulk_writes(orm_execute_state):
+    """Bulk UPDATE/DELETE cannot be replayed; the affected users reload after commit."""
+    # Registered first and never returns a result, so the rollup listener still runs
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not models.Transaction:
+        return None
+    if not _stores.stats()["entries"]:
+        return None
+
+    session = orm_execute_state.session
+    txn = models.Transaction.__table__
+    stmt = select(txn.c.user_id).distinct()
+    whereclause = bulk_write_criteria(orm_execute_state)
+    if whereclause is not None:
+        stmt = stmt.where(whereclause)
+    _, evict = _pending(session)
+    evict.update(str(u) for u in session.connection().execute(stmt).scalars() if u is not None)
+    return None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed_writes(session):
+    writes = session.info.pop("columnar_writes", {})
+    evict = session.info.pop("columnar_evict", set())
+    for user_id in evict:
+        _evict(user_id)
+    for user_id, rows in writes.items():
+        if user_id in evict:
+            continue
+        upserts = {txn_id: row for txn_id, row in rows.items() if row is not None}
+        deleted = {txn_id for txn_id, row in rows.items() if row is None}
+        _apply_writes(user_id, upserts, deleted)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_writes(session):
+    session.info.pop("columnar_writes", None)
+    session.info.pop("columnar_evict", None)
@@ -1,7 +1,20 @@
 import pandas as pd
 import io
-from typing import List, Dict, Any
-from dateutil import parser as date_parser
+import logging
+import re
+import warnings
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from pandas.tseries.api import guess_datetime_format
+
+logger = logging.getLogger(__name__)
+
+# Leading YYYY-MM-DD: always year-month-day, never day-first
+_ISO_DATE = re.compile(r"^\d{4}-\d{1,2}-\d{1,2}")
+# Currency symbols, thousands separators and stray whitespace in amount cells
+_NON_NUMERIC = r"[$,\s]"
+# Rows per chunk when streaming a CSV from disk
+CHUNK_ROWS = 5000
+_READ_OPTIONS = dict(dtype=str, keep_default_na=False, skipinitialspace=True)
 
 def parse_preview(file_bytes: bytes) -> Dict[str, Any]:
     """
@@ -28,16 +41,61 @@ def process_csv(file_bytes: bytes, mapping: Dict[str, str]) -> List[Dict[str, An
     """
     Reads entire CSV and maps columns to Transaction format.
     mapping: { "date": "ColName", "description": "ColName", "amount": "ColName" }
+    Malformed rows are skipped (see read_transactions for the reject list).
+    """
+    transactions, rejects = read_transactions(file_bytes, mapping)
+    if rejects:
+        logger.info(f"Skipped {len(rejects)} malformed CSV rows")
+    return transactions
+
+
+def read_transactions(file_bytes: bytes, mapping: Dict[str, str]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Reads entire CSV and maps columns to Transaction format, column by column.
+    mapping: { "date": "ColName", "description": "ColName", "amount": "ColName",
+               "debit": "ColName", "credit": "ColName", "date_format": "%d/%m/%Y" }
+    Returns (transactions, rejects). Each reject is
+    { "row": <line number in the file>, "field": "date" | "amount", "value": <raw cell>, "error": <reason> }.
     """
     try:
-        df = pd.read_csv(io.BytesIO(file_bytes), skipinitialspace=True)
+        df = pd.read_csv(io.BytesIO(file_bytes), **_READ_OPTIONS)
     except Exception:
-        df = pd.read_csv(io.BytesIO(file_bytes), engine='python', skipinitialspace=True)
-        
-    df = df.fillna("")
-    
-    transactions = []
-    
+        df = pd.read_csv(io.BytesIO(file_bytes), engine='python', **_READ_OPTIONS)
+    return map_transactions(df, mapping)
+
+
+def iter_transactions(
+    path: str, mapping: Dict[str, str], chunksize: int = CHUNK_ROWS
+) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]]:
+    """
+    Streams a CSV file from disk ``chunksize`` rows at a time, so memory stays
+    bounded by the chunk rather than the file.
+    Yields (transactions, rejects, rows_read) per chunk, like read_transactions.
+    Without a chosen ``date_format`` the format is inferred once, from the first
+    date in the file, and used for every chunk, as when the file is read whole.
+    """
+    try:
+        reader = pd.read_csv(path, chunksize=chunksize, **_READ_OPTIONS)
+    except Exception:
+        reader = pd.read_csv(path, chunksize=chunksize, engine='python', **_READ_OPTIONS)
+
+    mapping = dict(mapping)
+    col_date = mapping.get("date")
+    first_line = 2
+    with reader:
+        for df in reader:
+            if not mapping.get("date_format") and col_date in df.columns:
+                mapping["date_format"] = _infer_date_format(df[col_date].fillna("").astype(str).str.strip())
+            transactions, rejects = map_transactions(df, mapping, first_line)
+            first_line += len(df)
+            yield transactions, rejects, len(df)
+
+
+def map_transactions(df: pd.DataFrame, mapping: Dict[str, str], first_line: int = 2) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Maps a DataFrame of raw CSV cells (strings) to transactions.
+    ``first_line`` is the file line number of the frame's first row, used in rejects.
+    """
     col_date = mapping.get("date")
     col_desc = mapping.get("description")
     col_amount = mapping.get("amount")
@@ -51,54 +109,99 @@ def process_csv(file_bytes: bytes, mapping: Dict[str, str]) -> List[Dict[str, An
         
     if not col_amount and not (col_debit or col_credit):
         raise ValueError("Either an Amount column OR Debit/Credit columns are required")
-        
-    def clean_num(val):
-        """Helper to parse currency strings"""
-        if pd.isna(val) or val == "": return 0.0
-        s = str(val).replace("$", "").replace(",", "").strip()
-        if not s: return 0.0
-        try:
-            return float(s)
-        except:
-            return 0.0
 
-    for _, row in df.iterrows():
-        try:
-            # Parse Date
-            raw_date = str(row[col_date])
-            dt = date_parser.parse(raw_date, dayfirst=True)
-            
-            # Parse Amount
-            amount = 0.0
-            
-            if col_amount:
-                # Single Column Mode
-                amount = clean_num(row[col_amount])
-            else:
-                # Split Column Mode
-                # Logic: Credit is positive, Debit is negative.
-                # Usually statements have "Dr" or just positive numbers in Debit col.
-                # We assume values in columns are positive magnitudes usually.
-                
-                # Update: Use abs() because some CSVs put "-50.00" in Debit column, others "50.00".
-                # Both mean "Outflow", so we force it to be negative.
-                
-                credit_val = abs(clean_num(row.get(col_credit))) if col_credit else 0.0
-                debit_val = abs(clean_num(row.get(col_debit))) if col_debit else 0.0
-                
-                amount = credit_val - debit_val
-            
-            # Description
-            desc = str(row[col_desc])
-            
-            transactions.append({
-                "date": dt,
-                "description": desc,
-                "amount": amount
-            })
-        except Exception as e:
-            # Skip malformed rows? Or Log?
-            print(f"Skipping row due to error: {e}")
-            continue
-            
-    return transactions
+    mapped = [col_date, col_desc] + ([col_amount] if col_amount else [c for c in (col_debit, col_credit) if c])
+    missing = [c for c in mapped if c not in df.columns]
+    if missing:
+        raise ValueError(f"Columns not found in CSV: {', '.join(missing)}")
+
+    if df.empty:
+        return [], []
+
+    raw_dates = df[col_date].fillna("").astype(str).str.strip()
+    dates = parse_dates(raw_dates, mapping.get("date_format"))
+    bad_date = dates.isna()
+
+    if col_amount:
+        # Single Column Mode
+        amounts, bad_amount = clean_amounts(df[col_amount])
+        amount_cells = df[col_amount]
+    else:
+        # Split Column Mode
+        # Credit is positive, Debit is negative. abs() because some CSVs put
+        # "-50.00" in the Debit column, others "50.00"; both mean "Outflow".
+        credit, bad_credit = clean_amounts(df[col_credit]) if col_credit else (0.0, False)
+        debit, bad_debit = clean_amounts(df[col_debit]) if col_debit else (0.0, False)
+        amounts = pd.Series(abs(credit) - abs(debit), index=df.index)
+        bad_amount = pd.Series(bad_credit | bad_debit, index=df.index)
+        if col_credit and col_debit:
+            amount_cells = df[col_credit].where(bad_credit, df[col_debit])
+        else:
+            amount_cells = df[col_credit or col_debit]
+
+    rejects = [
+        {"row": first_line + int(pos), "field": "date", "value": value, "error": "Unrecognised date"}
+        for pos, value in zip(bad_date.to_numpy().nonzero()[0], raw_dates[bad_date])
+    ]
+    bad_amount = bad_amount & ~bad_date
+    rejects += [
+        {"row": first_line + int(pos), "field": "amount", "value": value, "error": "Not a number"}
+        for pos, value in zip(bad_amount.to_numpy().nonzero()[0], amount_cells[bad_amount])
+    ]
+    rejects.sort(key=lambda r: r["row"])
+
+    keep = ~(bad_date | bad_amount)
+    transactions = [
+        {"date": dt, "description": desc, "amount": amount}
+        for dt, desc, amount in zip(
+            dates[keep].array.to_pydatetime(),
+            df.loc[keep, col_desc].fillna("").astype(str).tolist(),
+            amounts[keep].tolist(),
+        )
+    ]
+    return transactions, rejects
+
+
+def parse_dates(values: pd.Series, date_format: Optional[str] = None) -> pd.Series:
+    """
+    Parses a column of date strings; unparseable cells become NaT.
+    Uses ``date_format`` when given, otherwise the format inferred from the
+    first value; cells that do not match fall back to day-first parsing.
+    """
+    fmt = date_format or _infer_date_format(values)
+    if fmt:
+        dates = pd.to_datetime(values, format=fmt, errors="coerce")
+    else:
+        dates = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+
+    missed = dates.isna() & values.ne("")
+    if missed.any():
+        dates = dates.copy()
+        dates[missed] = pd.to_datetime(values[missed], format="mixed", dayfirst=True, errors="coerce")
+    if getattr(dates.dt, "tz", None) is not None:
+        dates = dates.dt.tz_localize(None)
+    return dates
+
+
+def _infer_date_format(values: pd.Series) -> Optional[str]:
+    sample = next((v for v in values if v), None)
+    if sample is None:
+        return None
+    if _ISO_DATE.match(sample):
+        return "ISO8601"
+    with warnings.catch_warnings():
+        # Month-first is the expected answer when day-first is impossible (12/31/2025)
+        warnings.simplefilter("ignore", UserWarning)
+        return guess_datetime_format(sample, dayfirst=True)
+
+
+def clean_amounts(values: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    Parses a column of currency strings ("$1,234.50", "-20").
+    Returns (amounts, invalid): empty cells are 0.0; cells that are not numbers
+    are 0.0 and flagged in ``invalid``.
+    """
+    text = values.fillna("").astype(str).str.replace(_NON_NUMERIC, "", regex=True)
+    amounts = pd.to_numeric(text, errors="coerce")
+    invalid = amounts.isna() & text.ne("")
+    return amounts.fillna(0.0).astype(float), invalid
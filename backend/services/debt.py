@@ -0,0 +1,193 @@
+"""
+Debt Payoff
+
+Amortization and multi-debt payoff strategies for /analytics/debt_projection
+and /analytics/debt_payoff.
+
+A single debt at a fixed payment follows the annuity formula, so its balance
+after any number of months (and the month it is cleared) is computed directly
+rather than by stepping through months.
+
+With several debts, the monthly budget (all minimums plus any extra) is paid
+as minimums first and the remainder goes to debts in strategy order. Payments
+only change when a debt is cleared, so the simulation jumps from one payoff
+to the next: every debt's balance between payoffs is evaluated in closed form
+for all debts at once, and only the payoff month itself (where the leftover
+rolls into the next debt) is stepped explicitly. The number of steps grows
+with the number of debts, not with the number of months.
+
+Strategies:
+- "avalanche": highest interest rate first
+- "snowball":  smallest balance first
+- "custom":    caller-supplied order
+- "minimum":   minimum payments only; freed-up minimums are not reused
+"""
+import math
+from typing import Optional, Sequence
+
+import numpy as np
+
+MAX_MONTHS = 600
+CLOSED = 0.005  # Balances below half a cent count as paid off
+
+
+def monthly_rate(annual_percent):
+    return np.asarray(annual_percent, dtype=float) / 100 / 12
+
+
+def months_to_payoff(balance, rate, payment):
+    """
+    Fractional number of fixed monthly payments that clears ``balance`` at
+    monthly ``rate``; inf when the payment does not cover the interest.
+    """
+    balance, rate, payment = np.broadcast_arrays(
+        np.asarray(balance, dtype=float), np.asarray(rate, dtype=float), np.asarray(payment, dtype=float)
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = rate * balance / payment
+        n = np.where(rate > 0, -np.log1p(-ratio) / np.log1p(rate), balance / payment)
+    n = np.where((payment <= 0) | (ratio >= 1), np.inf, n)
+    return np.where(balance <= CLOSED, 0.0, n)
+
+
+def balance_after(balance, rate, payment, months):
+    """Balance after ``months`` fixed payments; ``months`` may be an array (e.g. shape (K, 1))."""
+    growth = (1 + rate) ** months
+    with np.errstate(divide="ignore", invalid="ignore"):
+        paid = np.where(rate > 0, payment * (growth - 1) / np.where(rate > 0, rate, 1), payment * months)
+    return balance * growth - paid
+
+
+def amortization_schedule(balance: float, annual_rate: float, payment: float, max_months: int = 360) -> dict:
+    """
+    Month-by-month schedule for one debt at a fixed payment.
+
+    Returns {"schedule", "total_interest", "months"}. When the payment does not
+    cover the first month's interest, a 12-month projection of the growing
+    balance is returned with infinite interest and months.
+    """
+    rate = float(monthly_rate(annual_rate))
+
+    if payment <= balance * rate:
+        ks = np.arange(12)
+        previous = balance_after(balance, rate, payment, ks)
+        interest = previous * rate
+        principal = payment - interest
+        return {
+            "schedule": [
+                {"month": int(k) + 1, "balance": max(0.0, float(b - p)), "interest": float(i), "principal": float(p)}
+                for k, b, i, p in zip(ks, previous, interest, principal)
+            ],
+            "total_interest": float("inf"),
+            "months": float("inf"),
+        }
+
+    n = float(months_to_payoff(balance, rate, payment))
+    horizon = min(max_months, math.ceil(n) + 1)
+    previous = balance_after(balance, rate, payment, np.arange(horizon))
+    interest = previous * rate
+    principal = np.minimum(payment - interest, previous)  # The final payment only clears what is left
+    remaining = previous - principal
+
+    cleared = np.flatnonzero(remaining <= 0.01)
+    months = int(cleared[0]) + 1 if cleared.size else horizon
+    return {
+        "schedule": [
+            {"month": k + 1, "balance": max(0.0, float(remaining[k])), "interest": float(interest[k]), "principal": float(principal[k])}
+            for k in range(months)
+        ],
+        "total_interest": float(interest[:months].sum()),
+        "months": months,
+    }
+
+
+def priority_order(balances, annual_rates, strategy: str, custom: Optional[Sequence[int]] = None) -> np.ndarray:
+    """Debt indices in the order extra payments are applied."""
+    balances = np.asarray(balances, dtype=float)
+    annual_rates = np.asarray(annual_rates, dtype=float)
+    avalanche = np.lexsort((balances, -annual_rates))
+    if strategy == "snowball":
+        return np.lexsort((-annual_rates, balances))
+    if strategy == "custom" and custom:
+        first = [i for i in dict.fromkeys(custom) if 0 <= i < len(balances)]
+        return np.array(first + [i for i in avalanche if i not in first], dtype=int)
+    return avalanche
+
+
+def _pay_month(balances, rates, minimums, budget, order, rollover):
+    """One explicit month: interest, minimums, then the leftover budget in priority order."""
+    interest = balances * rates
+    owed = balances + interest
+    paid = np.minimum(minimums, owed)
+    if rollover:
+        spare = max(budget - paid.sum(), 0.0)
+        remaining = (owed - paid)[order]
+        paid[order] += np.clip(spare - (np.cumsum(remaining) - remaining), 0.0, remaining)
+    return owed - paid, interest, paid
+
+
+def simulate_payoff(
+    balances,
+    annual_rates,
+    minimums,
+    extra: float = 0.0,
+    order: Optional[np.ndarray] = None,
+    rollover: bool = True,
+    max_months: int = MAX_MONTHS,
+) -> dict:
+    """
+    Pay off several debts together.
+
+    Returns a dict of arrays: ``balances`` (months x debts, month-end),
+    ``interest`` and ``payments`` (months x debts), ``payoff_month`` per debt
+    (1-based, -1 if not cleared within ``max_months``) and ``months`` until
+    debt-free (None if not reached).
+    """
+    balance = np.asarray(balances, dtype=float).copy()
+    rates = monthly_rate(annual_rates)
+    minimums = np.asarray(minimums, dtype=float)
+    debts = len(balance)
+    order = np.arange(debts) if order is None else np.asarray(order, dtype=int)
+    budget = float(minimums.sum()) + extra
+
+    payoff_month = np.full(debts, -1)
+    payoff_month[balance <= CLOSED] = 0
+    balance[balance <= CLOSED] = 0.0
+    balance_rows, interest_rows, payment_rows = [], [], []
+    month = 0
+
+    while month < max_months and (balance > 0).any():
+        # Payments hold until the next debt is cleared
+        _, _, payment = _pay_month(balance, rates, minimums, budget, order, rollover)
+        active = balance > 0
+        next_payoff = months_to_payoff(balance[active], rates[active], payment[active]).min()
+        span = max_months - month if math.isinf(next_payoff) else math.ceil(next_payoff - 1e-6)
+        span = max(1, min(span, max_months - month))
+
+        if span > 1:
+            steps = np.arange(1, span)[:, None]
+            segment = np.where(active, balance_after(balance, rates, payment, steps), 0.0)
+            previous = np.vstack([balance, segment[:-1]])
+            balance_rows.append(segment)
+            interest_rows.append(previous * rates)
+            payment_rows.append(np.broadcast_to(np.where(active, payment, 0.0), segment.shape))
+            balance = segment[-1]
+
+        balance, interest, paid = _pay_month(balance, rates, minimums, budget, order, rollover)
+        month += span
+        cleared = (balance <= CLOSED) & (payoff_month < 0)
+        payoff_month[cleared] = month
+        balance[balance <= CLOSED] = 0.0
+        balance_rows.append(balance[None, :])
+        interest_rows.append(interest[None, :])
+        payment_rows.append(paid[None, :])
+
+    empty = np.zeros((0, debts))
+    balances_out = np.vstack(balance_rows) if balance_rows else empty
+    return {
+        "balances": balances_out,
+        "interest": np.vstack(interest_rows) if interest_rows else empty,
+        "payments": np.vstack(payment_rows) if payment_rows else empty,
+        "payoff_month": payoff_month,
+        "months": None if (balance > 0).any() else month,
+    }
@@ -0,0 +1,337 @@
+"""
+Job Queue
+
+Persistent background jobs on the ``background_jobs`` table. The row a client
+polls for status is also the queue entry, so there is one source of truth:
+
+- ``enqueue`` stores a job as 'queued' with its handler name and JSON payload.
+- Worker pools (in the API process, or standalone via ``python -m backend.worker``)
+  claim queued jobs with a compare-and-set UPDATE, so any number of processes
+  can share the table without handing the same job out twice.
+- Claims are fair per user: a user already running ``JOB_PER_USER_LIMIT`` jobs
+  is skipped, so one large burst of imports cannot occupy every worker.
+- Failed jobs are retried with backoff up to ``max_attempts``.
+- Running jobs carry a heartbeat; when a process dies its jobs go stale and
+  are requeued (or failed, once out of attempts) by any surviving pool.
+- ``cancel`` stops a queued job outright and asks a running one to stop;
+  handlers poll ``cancel_requested`` and raise ``JobCancelled``.
+
+Handlers are registered by name with ``register`` and called as
+``run(job_id, user_id, **payload)``. An optional ``cleanup(payload)`` runs once
+the job reaches a terminal state (e.g. to remove a spooled upload).
+"""
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.orm import Session
+
+from .. import models
+
+logger = logging.getLogger(__name__)
+
+# Worker threads per process (0 disables the in-process pool, e.g. when a
+# dedicated worker container is running)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+# Jobs a single user may have running at once across all workers
+JOB_PER_USER_LIMIT = int(os.getenv("JOB_PER_USER_LIMIT", 1))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 1.0))
+HEARTBEAT_SECONDS = 15
+STALE_AFTER_SECONDS = 120
+RETRY_BACKOFF_SECONDS = 10
+
+QUEUED = "queued"
+PROCESSING = "processing"
+TERMINAL_STATUSES = ("complete", "failed", "cancelled")
+
+_handlers: Dict[str, tuple] = {}  # kind -> (run, cleanup)
+
+
+class JobCancelled(Exception):
+    """Raised by a handler that noticed ``cancel_requested``."""
+
+
+def register(kind: str, run: Callable, cleanup: Optional[Callable[[Dict[str, Any]], None]] = None):
+    """Register the handler for jobs of ``kind``."""
+    _handlers[kind] = (run, cleanup)
+
+
+def enqueue(
+    db: Session, user_id: str, kind: str, payload: Dict[str, Any],
+    total: int = 0, max_attempts: int = 3
+) -> str:
+    """Queue a job and return its ID. The payload must be JSON-serialisable."""
+    job_id = str(uuid.uuid4())
+    db.add(models.Job(
+        id=job_id,
+        user_id=str(user_id),
+        status=QUEUED,
+        progress=0,
+        total=total,
+        message="Queued...",
+        duplicate_count=0,
+        kind=kind,
+        payload=payload,
+        attempts=0,
+        max_attempts=max_attempts,
+        cancel_requested=False,
+    ))
+    db.commit()
+    return job_id
+
+
+def cancel(db: Session, user_id: str, job_id: str) -> Optional[str]:
+    """
+    Cancel a user's job. Queued jobs stop immediately; running jobs are flagged
+    and stop at their next checkpoint. Returns the job's status, or None if not found.
+    """
+    job = db.query(models.Job).filter(
+        models.Job.id == job_id,
+        models.Job.user_id == str(user_id)
+    ).first()
+    if not job:
+        return None
+    if job.status == QUEUED:
+        _finish(db, job, "cancelled")
+    elif job.status == PROCESSING:
+        job.cancel_requested = True
+        job.message = "Cancelling..."
+        db.commit()
+    return job.status
+
+
+def cancel_requested(db: Session, job_id: str) -> bool:
+    """Whether a running job has been asked to stop (read fresh from the database)."""
+    return bool(db.query(models.Job.cancel_requested).filter(models.Job.id == job_id).scalar())
+
+
+def claim_next(db: Session, worker_id: str) -> Optional[models.Job]:
+    """
+    Claim the oldest runnable job whose user is under the per-user limit.
+    Concurrent claimers race on ``status = 'queued'``; only one UPDATE matches.
+    """
+    now = datetime.utcnow()
+    busy_users = db.query(models.Job.user_id).filter(
+        models.Job.status == PROCESSING
+    ).group_by(models.Job.user_id).having(func.count(models.Job.id) >= JOB_PER_USER_LIMIT)
+
+    candidates = db.query(models.Job.id).filter(
+        models.Job.status == QUEUED,
+        or_(models.Job.run_after.is_(None), models.Job.run_after <= now),
+        models.Job.user_id.notin_(busy_users)
+    ).order_by(models.Job.created_at, models.Job.id).limit(10).all()
+
+    for (job_id,) in candidates:
+        claimed = db.execute(
+            update(models.Job)
+            .where(models.Job.id == job_id, models.Job.status == QUEUED)
+            .values(
+                status=PROCESSING,
+                worker_id=worker_id,
+                attempts=func.coalesce(models.Job.attempts, 0) + 1,
+                heartbeat_at=now,
+                message="Starting...",
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        if claimed:
+            return db.query(models.Job).filter(models.Job.id == job_id).first()
+    return None
+
+
+def run_next(session_factory: Callable[[], Session], worker_id: str) -> bool:
+    """Claim and run one job. Returns False when nothing was runnable."""
+    db = session_factory()
+    try:
+        job = claim_next(db, worker_id)
+        if not job:
+            return False
+
+        run, _ = _handlers.get(job.kind, (None, None))
+        if run is None:
+            _finish(db, job, "failed", f"Unknown job kind: {job.kind}")
+            return True
+
+        try:
+            run(job.id, job.user_id, **(job.payload or {}))
+        except JobCancelled:
+            db.refresh(job)
+            _finish(db, job, "cancelled")
+        except Exception as e:
+            logger.exception(f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}")
+            db.rollback()
+            db.refresh(job)
+            if job.cancel_requested:
+                _finish(db, job, "cancelled")
+            elif (job.attempts or 0) < (job.max_attempts or 1):
+                _requeue(db, job, f"Retrying after error ({job.attempts}/{job.max_attempts})...")
+            else:
+                _finish(db, job, "failed", str(e))
+        else:
+            # The handler may have finished the job itself (complete/failed)
+            db.refresh(job)
+            if job.status == PROCESSING:
+                _finish(db, job, "complete")
+            elif job.status in TERMINAL_STATUSES:
+                _run_cleanup(job)
+        return True
+    finally:
+        db.close()
+
+
+def recover_stale(db: Session) -> int:
+    """
+    Requeue (or fail, when out of attempts) running jobs whose heartbeat stopped,
+    i.e. whose process died. Jobs from before the queue existed have no handler
+    and are failed. Returns how many jobs were recovered.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=STALE_AFTER_SECONDS)
+    stale = db.query(models.Job).filter(
+        models.Job.status == PROCESSING,
+        or_(
+            models.Job.heartbeat_at < cutoff,
+            and_(models.Job.heartbeat_at.is_(None), models.Job.created_at < cutoff)
+        )
+    ).all()
+    for job in stale:
+        logger.warning(f"Recovering stale job {job.id} from worker {job.worker_id}")
+        if job.cancel_requested:
+            _finish(db, job, "cancelled")
+        elif job.kind not in _handlers:
+            _finish(db, job, "failed", "Interrupted by a server restart")
+        elif (job.attempts or 0) < (job.max_attempts or 1):
+            _requeue(db, job, "Requeued after a worker restart...", backoff=False)
+        else:
+            _finish(db, job, "failed", "Worker stopped responding")
+    return len(stale)
+
+
+def heartbeat(db: Session, worker_id: str):
+    """Mark every job this worker holds as alive."""
+    db.execute(
+        update(models.Job)
+        .where(models.Job.worker_id == worker_id, models.Job.status == PROCESSING)
+        .values(heartbeat_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def _requeue(db: Session, job: models.Job, message: str, backoff: bool = True):
+    job.status = QUEUED
+    job.worker_id = None
+    job.message = message
+    job.run_after = (
+        datetime.utcnow() + timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** max((job.attempts or 1) - 1, 0))
+        if backoff else None
+    )
+    db.commit()
+
+
+def _finish(db: Session, job: models.Job, status: str, error: str = None):
+    job.status = status
+    job.worker_id = None
+    if error:
+        job.error = error
+    if status == "cancelled":
+        job.message = "Cancelled"
+    elif status == "complete":
+        job.progress = job.total
+        job.message = "Complete"
+    db.commit()
+    _run_cleanup(job)
+
+
+def _run_cleanup(job: models.Job):
+    _, cleanup = _handlers.get(job.kind, (None, None))
+    if cleanup is None:
+        return
+    try:
+        cleanup(job.payload or {})
+    except Exception as e:
+        logger.warning(f"Cleanup for job {job.id} failed: {e}")
+
+
+class WorkerPool:
+    """Worker threads plus one heartbeat/recovery thread for this process."""
+
+    def __init__(self, size: int = JOB_WORKERS, session_factory: Callable[[], Session] = None,
+                 poll_seconds: float = JOB_POLL_SECONDS):
+        if session_factory is None:
+            from ..database import SessionLocal
+            session_factory = SessionLocal
+        self.size = size
+        self.session_factory = session_factory
+        self.poll_seconds = poll_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._threads = [
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            for i in range(self.size)
+        ]
+        self._threads.append(threading.Thread(target=self._monitor, name="job-monitor", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Job worker pool {self.worker_id} started with {self.size} workers")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop claiming jobs. Jobs still running are picked up again via recovery."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def wait(self):
+        """Block until ``stop`` is called (standalone worker process)."""
+        while not self._stop.wait(1):
+            pass
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                ran = run_next(self.session_factory, self.worker_id)
+            except Exception as e:
+                logger.error(f"Job worker error: {e}")
+                ran = False
+            if not ran:
+                self._stop.wait(self.poll_seconds)
+
+    def _monitor(self):
+        while True:
+            db = self.session_factory()
+            try:
+                heartbeat(db, self.worker_id)
+                recover_stale(db)
+            except Exception as e:
+                logger.error(f"Job heartbeat failed: {e}")
+            finally:
+                db.close()
+            if self._stop.wait(HEARTBEAT_SECONDS):
+                return
+
+
+_pool: Optional[WorkerPool] = None
+
+
+def start_workers() -> Optional[WorkerPool]:
+    """Start this process's pool (no-op when ``JOB_WORKERS`` is 0)."""
+    global _pool
+    if _pool is None and JOB_WORKERS > 0:
+        _pool = WorkerPool(JOB_WORKERS)
+        _pool.start()
+    return _pool
+
+
+def stop_workers():
+    global _pool
+    if _pool is not None:
+        _pool.stop()
+        _pool = None
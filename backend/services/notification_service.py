@@ -45,88 +45,105 @@ class NotificationService:
         Creates notifications at 80%, 100%, and 120% thresholds.
         Uses deduplication to avoid repeat alerts in the same month.
         """
+        created = NotificationService.check_budgets_exceeded(db, user_id, [bucket_id])
+        return created[0] if created else None
+
+    @staticmethod
+    def check_budgets_exceeded(db: Session, user_id: int, bucket_ids):
+        """
+        Batched check_budget_exceeded: evaluates every bucket in ``bucket_ids``
+        with one query each for buckets, limits, spending and sent alerts,
+        and commits the new notifications together. Returns the notifications created.
+        """
+        bucket_ids = list(set(bucket_ids))
+        if not bucket_ids:
+            return []
+
         # Check settings
         settings = NotificationService.get_settings(db, user_id)
         if not settings.budget_alerts:
-            return None
-        
-        # Get the bucket
-        bucket = db.query(models.BudgetBucket).filter(
-            models.BudgetBucket.id == bucket_id,
+            return []
+
+        buckets = db.query(models.BudgetBucket).filter(
+            models.BudgetBucket.id.in_(bucket_ids),
             models.BudgetBucket.user_id == user_id
-        ).first()
-        
-        if not bucket:
-            return None
-        
-        # Calculate total limit for the bucket (sum of all member limits)
-        total_limit = db.query(func.sum(models.BudgetLimit.amount)).filter(
-            models.BudgetLimit.bucket_id == bucket_id
-        ).scalar() or 0
-        
-        if total_limit <= 0:
-            return None  # No budget set
-        
-        # Get current month's spending
+        ).all()
+        if not buckets:
+            return []
+
+        # Total limit per bucket (sum of all member limits)
+        limits = dict(db.query(models.BudgetLimit.bucket_id, func.sum(models.BudgetLimit.amount)).filter(
+            models.BudgetLimit.bucket_id.in_([b.id for b in buckets])
+        ).group_by(models.BudgetLimit.bucket_id).all())
+        buckets = [b for b in buckets if (limits.get(b.id) or 0) > 0]
+        if not buckets:
+            return []  # No budget set
+
+        # Current month's spending per bucket
         now = datetime.utcnow()
         month_start = datetime(now.year, now.month, 1)
-        
-        total_spent = db.query(func.sum(models.Transaction.amount)).filter(
+        spent = dict(db.query(models.Transaction.bucket_id, func.sum(models.Transaction.amount)).filter(
             models.Transaction.user_id == user_id,
-            models.Transaction.bucket_id == bucket_id,
+            models.Transaction.bucket_id.in_([b.id for b in buckets]),
             models.Transaction.date >= month_start,
             models.Transaction.amount < 0  # Expenses are negative
-        ).scalar() or 0
-        
-        total_spent = abs(total_spent)  # Convert to positive for comparison
-        
-        # Calculate percentage
-        if total_limit <= 0:
-            return None
-        
-        percent = (total_spent / total_limit) * 100
-        
-        # Determine threshold level
-        threshold = None
-        if percent >= 120:
-            threshold = 120
-            message = f"❌ {bucket.name} is significantly over budget ({int(percent)}%)"
-        elif percent >= 100:
-            threshold = 100
-            message = f"🚨 {bucket.name} has exceeded budget!"
-        elif percent >= 80:
-            threshold = 80
-            message = f"⚠️ {bucket.name} is at {int(percent)}% of budget"
-        else:
-            return None  # Below all thresholds
-        
-        # Check for existing notification at this threshold this month
+        ).group_by(models.Transaction.bucket_id).all())
+
+        # Thresholds already notified this month, per bucket
         month_key = f"{now.year}-{now.month:02d}"
-        existing = db.query(models.Notification).filter(
+        sent = set()
+        for (meta_data,) in db.query(models.Notification.meta_data).filter(
             models.Notification.user_id == user_id,
             models.Notification.type == "budget",
-            models.Notification.meta_data.contains(f'"bucket_id": {bucket_id}'),
-            models.Notification.meta_data.contains(f'"threshold": {threshold}'),
             models.Notification.meta_data.contains(f'"month": "{month_key}"')
-        ).first()
-        
-        if existing:
-            return None  # Already notified for this threshold this month
-        
-        # Create notification with metadata for deduplication
-        meta = json.dumps({
-            "bucket_id": bucket_id,
-            "bucket_name": bucket.name,
-            "threshold": threshold,
-            "month": month_key,
-            "percent": round(percent, 1),
-            "spent": total_spent,
-            "limit": total_limit
-        })
-        
-        return NotificationService.create_notification(
-            db, user_id, "budget", message, meta
-        )
+        ):
+            try:
+                meta = json.loads(meta_data)
+            except (TypeError, ValueError):
+                continue
+            sent.add((meta.get("bucket_id"), meta.get("threshold")))
+
+        created = []
+        for bucket in buckets:
+            total_limit = limits[bucket.id]
+            total_spent = abs(spent.get(bucket.id) or 0)  # Convert to positive for comparison
+            percent = (total_spent / total_limit) * 100
+
+            # Determine threshold level
+            if percent >= 120:
+                threshold = 120
+                message = f"❌ {bucket.name} is significantly over budget ({int(percent)}%)"
+            elif percent >= 100:
+                threshold = 100
+                message = f"🚨 {bucket.name} has exceeded budget!"
+            elif percent >= 80:
+                threshold = 80
+                message = f"⚠️ {bucket.name} is at {int(percent)}% of budget"
+            else:
+                continue  # Below all thresholds
+
+            if (bucket.id, threshold) in sent:
+                continue  # Already notified for this threshold this month
+
+            # Create notification with metadata for deduplication
+            meta = json.dumps({
+                "bucket_id": bucket.id,
+                "bucket_name": bucket.name,
+                "threshold": threshold,
+                "month": month_key,
+                "percent": round(percent, 1),
+                "spent": total_spent,
+                "limit": total_limit
+            })
+            notification = models.Notification(
+                user_id=user_id, type="budget", message=message, meta_data=meta
+            )
+            db.add(notification)
+            created.append(notification)
+
+        if created:
+            db.commit()
+        return created
 
     @staticmethod
     def get_upcoming_bills(db: Session, user_id: int, days_ahead: int = 7):
@@ -0,0 +1,273 @@
+"""
+Recurring Payment Detection
+
+Finds subscriptions and regular income for /analytics/subscriptions/suggested.
+
+Transactions are streamed as (date, amount, description, bucket_id) tuples in
+date order and grouped by a normalized merchant key in a single pass. Each
+group's payment dates are then fitted against the supported cadences; an
+interval that spans a whole number of periods counts as missed payments
+rather than breaking the pattern.
+
+The grouped observations are persisted per user (``RecurringScan``) together
+with the highest transaction id seen, so a repeat call only scans transactions
+added since the previous run. Editing or deleting an already-scanned
+transaction drops the saved state and the next call starts over. The state is
+written on a session of its own, so the caller's (GET request) session is
+only ever read from.
+"""
+import re
+from datetime import datetime, timedelta
+from statistics import median
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
+
+from .. import models
+from .rollups import bulk_write_criteria
+
+WINDOW_DAYS = 365
+MIN_OCCURRENCES = 3
+AMOUNT_TOLERANCE = 0.15   # Every payment within 15% of the average
+HIGH_CONFIDENCE = 0.05    # Mean absolute deviation below 5% of the average
+MIN_FIT = 0.75            # Share of intervals that must land on a whole number of periods
+
+# (frequency, period used for fitting, nominal days for next_due / annual_cost, tolerance in days)
+CADENCES = (
+    ("Weekly", 7.0, 7, 1),
+    ("Bi-Weekly", 14.0, 14, 1),
+    ("Monthly", 30.44, 30, 5),
+    ("Quarterly", 91.31, 91, 7),
+    ("Yearly", 365.25, 365, 5),
+)
+
+# First whitespace-separated token containing a digit, and everything after it
+# (card numbers, receipt references, dates)
+_REFERENCE = re.compile(r"\s+\S*\d.*$")
+_BATCH_SIZE = 1000
+
+
+def merchant_key(description: Optional[str]) -> str:
+    """
+    Grouping key for a description: lowercased, with trailing references
+    removed. The key is always a prefix of the lowercased description, so it
+    still works as a ``description_keyword`` substring match.
+    """
+    text = (description or "").strip().lower()
+    return _REFERENCE.sub("", text) or text
+
+
+def estimate_cadence(dates: List[datetime]):
+    """
+    Fit sorted payment dates to one of ``CADENCES``.
+
+    Returns (frequency, nominal_days, missed_payments) or None. A cadence
+    matches when at least ``MIN_FIT`` of the gaps are within tolerance of a
+    whole number of periods and the typical gap is exactly one period.
+    """
+    intervals = [(b - a).days for a, b in zip(dates, dates[1:])]
+    # Same-day repeats (e.g. a charge and its retry) say nothing about the period
+    intervals = [i for i in intervals if i > 0]
+    if len(intervals) < MIN_OCCURRENCES - 1:
+        return None
+
+    for frequency, period, nominal, tolerance in CADENCES:
+        multiples = []
+        for interval in intervals:
+            k = round(interval / period)
+            if k >= 1 and abs(interval - k * period) <= tolerance:
+                multiples.append(k)
+        if len(multiples) < MIN_FIT * len(intervals) or median(multiples) != 1:
+            continue
+        return frequency, nominal, sum(k - 1 for k in multiples)
+    return None
+
+
+def _group_rows(groups: Dict[str, dict], rows) -> int:
+    """Fold (id, date, amount, description, bucket_id) rows into ``groups``; returns the max id."""
+    last_id = 0
+    unsorted = set()
+    for txn_id, txn_date, amount, description, bucket_id in rows:
+        last_id = max(last_id, txn_id)
+        key = merchant_key(description)
+        if not amount or not key or txn_date is None:
+            continue
+        group_key = f"{'E' if amount < 0 else 'I'}|{key}"
+        observation = [txn_date.isoformat(), abs(amount), bucket_id]
+
+        group = groups.get(group_key)
+        if group is None:
+            groups[group_key] = {"name": description, "obs": [observation]}
+            continue
+        obs = group["obs"]
+        if observation[0] < obs[-1][0]:
+            # Back-dated import: re-sort this group once the batch is done
+            unsorted.add(group_key)
+            if observation[0] < obs[0][0]:
+                group["name"] = description
+        obs.append(observation)
+
+    for group_key in unsorted:
+        groups[group_key]["obs"].sort(key=lambda o: o[0])
+    return last_id
+
+
+def _prune(groups: Dict[str, dict], cutoff: str) -> Dict[str, dict]:
+    pruned = {}
+    for group_key, group in groups.items():
+        obs = [o for o in group["obs"] if o[0] >= cutoff]
+        if obs:
+            pruned[group_key] = {"name": group["name"], "obs": obs}
+    return pruned
+
+
+def _observation_count(groups: Dict[str, dict]) -> int:
+    return sum(len(group["obs"]) for group in groups.values())
+
+
+def _candidate(group_key: str, group: dict) -> Optional[dict]:
+    obs = group["obs"]
+    if len(obs) < MIN_OCCURRENCES:
+        return None
+
+    amounts = [o[1] for o in obs]
+    avg_amount = sum(amounts) / len(amounts)
+    if not all(abs(a - avg_amount) < avg_amount * AMOUNT_TOLERANCE for a in amounts):
+        return None
+
+    dates = [datetime.fromisoformat(o[0]) for o in obs]
+    cadence = estimate_cadence(dates)
+    if cadence is None:
+        return None
+    frequency, nominal, missed = cadence
+
+    variance_score = sum(abs(a - avg_amount) for a in amounts) / (len(amounts) * avg_amount)
+    kind, key = group_key.split("|", 1)
+    return {
+        "name": group["name"],
+        "description_keyword": key,
+        "amount": avg_amount,
+        "type": "Expense" if kind == "E" else "Income",
+        "frequency": frequency,
+        "annual_cost": avg_amount * (365 / nominal),
+        "next_due": dates[-1] + timedelta(days=nominal),
+        "confidence": "High" if variance_score < HIGH_CONFIDENCE and not missed else "Medium",
+        "missed_payments": missed,
+        "last_payment_date": dates[-1],
+        "bucket_id": obs[-1][2],  # Inherit category from most recent transaction
+    }
+
+
+def detect_recurring(db: Session, user_id, now: Optional[datetime] = None) -> List[dict]:
+    """
+    Recurring expenses and income for a user over the last ``WINDOW_DAYS``.
+    Scans only transactions newer than the previous run and saves the updated
+    state when it changed, without writing to ``db``.
+    """
+    now = now or datetime.now()
+    window_start = now - timedelta(days=WINDOW_DAYS)
+
+    scan = db.query(models.RecurringScan).filter(models.RecurringScan.user_id == user_id).first()
+    groups = dict(scan.groups or {}) if scan else {}
+    saved_last_id = scan.last_transaction_id if scan else None
+    last_id = saved_last_id or 0
+
+    T = models.Transaction
+    rows = db.query(T.id, T.date, T.amount, T.description, T.bucket_id).filter(
+        T.user_id == user_id,
+        T.id > last_id,
+        T.date >= window_start,
+    ).order_by(T.date, T.id).yield_per(_BATCH_SIZE)
+    seen = _group_rows(groups, rows)
+    last_id = max(last_id, seen)
+    observations = _observation_count(groups)
+    groups = _prune(groups, window_start.isoformat())
+
+    # Reads that found nothing new and aged nothing out leave the saved row alone
+    if scan is None or seen or _observation_count(groups) != observations:
+        _save_scan(db, user_id, saved_last_id, groups, last_id, now)
+
+    candidates = [c for c in (_candidate(k, g) for k, g in groups.items()) if c]
+    candidates.sort(key=lambda c: (c["type"] != "Expense", -c["last_payment_date"].timestamp()))
+    return candidates
+
+
+def _save_scan(db: Session, user_id, saved_last_id: Optional[int], groups: Dict[str, dict],
+               last_id: int, now: datetime):
+    """
+    Store scan state on a separate session bound to the same database.
+    ``saved_last_id`` is the saved row's last_transaction_id when the scan started
+    (None if there was no row); if the row has been dropped or rewritten since,
+    this state is stale and is not saved.
+    """
+    with Session(bind=db.get_bind()) as writer:
+        scan = writer.get(models.RecurringScan, user_id)
+        if (scan.last_transaction_id if scan else None) != saved_last_id:
+            return
+        if scan is None:
+            scan = models.RecurringScan(user_id=user_id)
+            writer.add(scan)
+        scan.groups = groups
+        # Nested dicts may be shared with the loaded value; make sure the JSON column is rewritten
+        flag_modified(scan, "groups")
+        scan.last_transaction_id = last_id
+        scan.updated_at = now
+        try:
+            writer.commit()
+        except IntegrityError:
+            # A concurrent request saved the same user's state first
+            writer.rollback()
+
+
+# --- Invalidation ---
+
+# Attributes folded into a saved scan
+_SCANNED_ATTRS = ("user_id", "date", "amount", "description", "bucket_id", "user", "bucket")
+
+
+def _forget_scans(session: Session, user_ids):
+    user_ids = {u for u in user_ids if u is not None}
+    if user_ids:
+        table = models.RecurringScan.__table__
+        session.connection().execute(table.delete().where(table.c.user_id.in_(user_ids)))
+
+
+def _scanned_attrs_changed(obj) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in _SCANNED_ATTRS)
+
+
+@event.listens_for(Session, "before_flush")
+def _drop_stale_scans(session, flush_context, instances):
+    """Edited or deleted transactions may already be folded into a saved scan."""
+    users = set()
+    for obj in session.dirty:
+        if isinstance(obj, models.Transaction) and _scanned_attrs_changed(obj):
+            users.add(obj.user_id)
+    for obj in session.deleted:
+        # Deleting a bucket nulls bucket_id on its transactions
+        if isinstance(obj, (models.Transaction, models.BudgetBucket)):
+            users.add(obj.user_id)
+    _forget_scans(session, users)
+
+
+@event.listens_for(Session, "do_orm_execute", insert=True)
+def _drop_scans_for_bulk_writes(orm_execute_state):
+    # Registered first and never returns a result, so the rollup listener still runs
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not models.Transaction:
+        return None
+
+    session = orm_execute_state.session
+    txn = models.Transaction.__table__
+    stmt = select(txn.c.user_id).distinct()
+    whereclause = bulk_write_criteria(orm_execute_state)
+    if whereclause is not None:
+        stmt = stmt.where(whereclause)
+    _forget_scans(session, session.connection().execute(stmt).scalars())
+    return None
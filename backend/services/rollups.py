@@ -0,0 +1,364 @@
+"""
+Transaction Rollups
+
+Keeps the ``transaction_rollups`` table (monthly expense/income sums and counts
+per user, bucket, spender and account) in step with the transactions table.
+
+Session events apply deltas inside the same flush as the write that caused
+them, so a rollback undoes both. Bulk ``query.update()`` / ``query.delete()``
+calls bypass the unit of work; for those the affected (user, month)
+partitions are recomputed from the transactions table after the statement runs.
+
+Analytics endpoints read from the rollup whenever the requested range covers
+whole calendar months (see ``whole_month_span``).
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Date, and_, case, cast, event, func, inspect, literal_column, or_, select
+from sqlalchemy.orm import Session
+
+from .. import models
+
+logger = logging.getLogger(__name__)
+
+# Attributes whose change moves a transaction between rollup rows
+_KEY_ATTRS = ("user_id", "date", "amount", "bucket_id", "spender", "account_id", "user", "bucket", "account")
+_PK_COLUMNS = ("user_id", "month", "bucket_id", "spender", "account_id")
+_SUM_COLUMNS = ("expense_sum", "income_sum", "txn_count")
+
+
+# --- Month helpers ---
+
+def month_start(value) -> date:
+    """First day of the month containing ``value`` (date or datetime)."""
+    return date(value.year, value.month, 1)
+
+
+def next_month(value: date) -> date:
+    """First day of the month after ``value``."""
+    return date(value.year + (value.month // 12), value.month % 12 + 1, 1)
+
+
+def day_after(value) -> datetime:
+    """
+    Midnight after the day containing ``value``. Range scans filter
+    ``date < day_after(end)`` so the whole end day is included, as in the rollups.
+    """
+    if isinstance(value, datetime):
+        value = value.date()
+    return datetime.combine(value + timedelta(days=1), time.min)
+
+
+def whole_month_span(start, end) -> Optional[Tuple[date, date]]:
+    """
+    Return (first_month, last_month) if ``start``..``end`` covers whole calendar
+    months, otherwise None. ``start`` must be midnight on the 1st and ``end`` must
+    fall on the last day of a month (the whole end day is included; scans over
+    the same range bound it with ``day_after``).
+    """
+    if isinstance(start, datetime):
+        if start.time() != time.min:
+            return None
+        start = start.date()
+    if isinstance(end, datetime):
+        end = end.date()
+    if start.day != 1 or end < start or (end + timedelta(days=1)).day != 1:
+        return None
+    return start, month_start(end)
+
+
+def _month_expr(dialect_name: str, column):
+    """SQL expression truncating a datetime column to the first of its month."""
+    if dialect_name == "postgresql":
+        # Literal unit so SELECT and GROUP BY render identically
+        return cast(func.date_trunc(literal_column("'month'"), column), Date)
+    return func.strftime("%Y-%m-01", column)
+
+
+def _as_date(value) -> date:
+    """Normalise a month value (date on Postgres, string on SQLite) to a date."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+# --- Incremental maintenance ---
+
+def _new_deltas() -> Dict[tuple, List]:
+    return defaultdict(lambda: [0.0, 0.0, 0])
+
+
+def _accumulate(deltas, user_id, txn_date, amount, bucket_id, spender, account_id, sign: int):
+    """Add (sign=1) or remove (sign=-1) one transaction from the pending deltas."""
+    if user_id is None or not isinstance(txn_date, date):
+        return
+    key = (user_id, month_start(txn_date), bucket_id or 0, spender or "", account_id or 0)
+    amount = amount or 0.0
+    entry = deltas[key]
+    if amount < 0:
+        entry[0] += sign * amount
+    elif amount > 0:
+        entry[1] += sign * amount
+    entry[2] += sign
+
+
+def _key_changed(obj) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in _KEY_ATTRS)
+
+
+def apply_deltas(db: Session, deltas: Dict[tuple, List]):
+    """Upsert pending deltas into transaction_rollups on the session's connection."""
+    rows = [
+        {
+            "user_id": user_id, "month": month, "bucket_id": bucket_id,
+            "spender": spender, "account_id": account_id,
+            "expense_sum": expense, "income_sum": income, "txn_count": count,
+        }
+        for (user_id, month, bucket_id, spender, account_id), (expense, income, count) in deltas.items()
+        if count or expense or income
+    ]
+    if not rows:
+        return
+
+    conn = db.connection()
+    table = models.TransactionRollup.__table__
+    dialect = conn.dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c[name] for name in _PK_COLUMNS],
+            set_={name: table.c[name] + stmt.excluded[name] for name in _SUM_COLUMNS},
+        )
+        conn.execute(stmt, rows)
+        return
+
+    # Generic fallback: UPDATE, then INSERT if the row does not exist yet
+    for row in rows:
+        pk = and_(*[table.c[name] == row[name] for name in _PK_COLUMNS])
+        result = conn.execute(
+            table.update().where(pk).values(
+                {name: table.c[name] + row[name] for name in _SUM_COLUMNS}
+            )
+        )
+        if result.rowcount == 0:
+            conn.execute(table.insert().values(**row))
+
+
+def apply_inserted(db: Session, rows: Iterable[Dict]):
+    """
+    Add rollup deltas for transactions inserted with a Core INSERT, which
+    bypasses the session events below. ``rows`` are the inserted values.
+    """
+    deltas = _new_deltas()
+    for row in rows:
+        _accumulate(
+            deltas, row.get("user_id"), row.get("date"), row.get("amount"),
+            row.get("bucket_id"), row.get("spender"), row.get("account_id"), sign=1
+        )
+    apply_deltas(db, deltas)
+
+
+@event.listens_for(Session, "before_flush")
+def _capture_transaction_writes(session, flush_context, instances):
+    """Record old values of changed/deleted transactions before they are flushed."""
+    new = [obj for obj in session.new if isinstance(obj, models.Transaction)]
+    changed = [obj for obj in session.dirty if isinstance(obj, models.Transaction) and _key_changed(obj)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, models.Transaction)]
+    # Deleting a bucket nulls bucket_id on its transactions during the flush itself,
+    # so those users are rebuilt afterwards instead of tracked row by row
+    rebuild_users = {obj.user_id for obj in session.deleted if isinstance(obj, models.BudgetBucket)}
+    if not (new or changed or deleted or rebuild_users):
+        session.info.pop("rollup_flush", None)
+        return
+
+    deltas = _new_deltas()
+    old_ids = [obj.id for obj in changed + deleted if obj.id is not None]
+    if old_ids:
+        # The database still holds the pre-flush values
+        txn = models.Transaction.__table__
+        old_rows = session.connection().execute(
+            select(
+                txn.c.user_id, txn.c.date, txn.c.amount,
+                txn.c.bucket_id, txn.c.spender, txn.c.account_id
+            ).where(txn.c.id.in_(old_ids))
+        )
+        for row in old_rows:
+            _accumulate(deltas, *row, sign=-1)
+
+    session.info["rollup_flush"] = (deltas, new + changed, rebuild_users)
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_transaction_writes(session, flush_context):
+    """Apply rollup deltas once FKs and defaults of the flushed rows are populated."""
+    pending = session.info.pop("rollup_flush", None)
+    if not pending:
+        return
+    deltas, written, rebuild_users = pending
+    for obj in written:
+        _accumulate(deltas, obj.user_id, obj.date, obj.amount, obj.bucket_id, obj.spender, obj.account_id, sign=1)
+    apply_deltas(session, deltas)
+    for user_id in rebuild_users:
+        if user_id is not None:
+            rebuild_rollups(session, user_id=user_id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_transaction_writes(orm_execute_state):
+    """Recompute affected partitions around bulk UPDATE/DELETE on transactions."""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not models.Transaction:
+        return None
+
+    session = orm_execute_state.session
+    whereclause = bulk_write_criteria(orm_execute_state)
+    partitions = _affected_partitions(session, whereclause)
+
+    result = orm_execute_state.invoke_statement()
+
+    if orm_execute_state.is_update:
+        # Rows may have moved to another month/user
+        partitions |= _affected_partitions(session, whereclause)
+
+    months_by_user = defaultdict(set)
+    for user_id, month in partitions:
+        months_by_user[user_id].add(month)
+    for user_id, months in months_by_user.items():
+        rebuild_rollups(session, user_id=user_id, months=months)
+
+    return result
+
+
+def bulk_write_criteria(orm_execute_state):
+    """
+    WHERE clause for the transactions a bulk UPDATE/DELETE touches. A bulk
+    UPDATE by primary key (``execute(update(Transaction), [{"id": ...}, ...])``)
+    names its rows in the parameter list rather than the statement.
+    """
+    whereclause = orm_execute_state.statement.whereclause
+    params = orm_execute_state.parameters
+    if orm_execute_state.is_update and isinstance(params, (list, tuple)):
+        by_id = models.Transaction.__table__.c.id.in_([row["id"] for row in params])
+        whereclause = by_id if whereclause is None else and_(whereclause, by_id)
+    return whereclause
+
+
+def _affected_partitions(db: Session, whereclause) -> set:
+    conn = db.connection()
+    txn = models.Transaction.__table__
+    month_col = _month_expr(conn.dialect.name, txn.c.date)
+    stmt = select(txn.c.user_id, month_col).where(
+        txn.c.user_id.isnot(None), txn.c.date.isnot(None)
+    ).distinct()
+    if whereclause is not None:
+        stmt = stmt.where(whereclause)
+    return {(user_id, _as_date(month)) for user_id, month in conn.execute(stmt)}
+
+
+# --- Rebuild / backfill ---
+
+def rebuild_rollups(db: Session, user_id: Optional[str] = None, months: Optional[Iterable[date]] = None) -> int:
+    """
+    Recompute rollup rows from the transactions table.
+    Scoped to one user and/or a set of months when given; with no arguments the
+    whole table is rebuilt (backfill). Runs in the caller's transaction.
+    Returns the number of rollup rows written.
+    """
+    conn = db.connection()
+    table = models.TransactionRollup.__table__
+    txn = models.Transaction.__table__
+
+    delete_stmt = table.delete()
+    filters = [txn.c.user_id.isnot(None), txn.c.date.isnot(None)]
+
+    if user_id is not None:
+        delete_stmt = delete_stmt.where(table.c.user_id == user_id)
+        filters.append(txn.c.user_id == user_id)
+
+    if months is not None:
+        months = sorted({month_start(m) for m in months})
+        if not months:
+            return 0
+        delete_stmt = delete_stmt.where(table.c.month.in_(months))
+        filters.append(or_(*[
+            and_(
+                txn.c.date >= datetime.combine(m, time.min),
+                txn.c.date < datetime.combine(next_month(m), time.min)
+            )
+            for m in months
+        ]))
+
+    # Literal defaults so SELECT and GROUP BY render identically on Postgres
+    key_cols = [
+        txn.c.user_id,
+        _month_expr(conn.dialect.name, txn.c.date),
+        func.coalesce(txn.c.bucket_id, literal_column("0")),
+        func.coalesce(txn.c.spender, literal_column("''")),
+        func.coalesce(txn.c.account_id, literal_column("0")),
+    ]
+    source = select(
+        *key_cols,
+        func.sum(case((txn.c.amount < 0, txn.c.amount), else_=0.0)),
+        func.sum(case((txn.c.amount > 0, txn.c.amount), else_=0.0)),
+        func.count(txn.c.id),
+    ).where(*filters).group_by(*key_cols)
+
+    conn.execute(delete_stmt)
+    result = conn.execute(
+        table.insert().from_select(list(_PK_COLUMNS) + list(_SUM_COLUMNS), source)
+    )
+    return result.rowcount or 0
+
+
+# --- Reads ---
+
+def rollup_totals(
+    db: Session,
+    user_id: str,
+    first_month: date,
+    last_month: date,
+    group_by: Sequence[str] = ("bucket_id",),
+    spender: Optional[str] = None,
+    account_id: Optional[int] = None,
+) -> List[tuple]:
+    """
+    Sum rollup rows for ``first_month``..``last_month`` (inclusive).
+    Returns tuples of (*group_by values, expense_sum, income_sum), with the
+    0 / '' key placeholders mapped back to None. Expenses are negative.
+    """
+    R = models.TransactionRollup
+    query = db.query(
+        *[getattr(R, name) for name in group_by],
+        func.sum(R.expense_sum),
+        func.sum(R.income_sum)
+    ).filter(
+        R.user_id == user_id,
+        R.month >= first_month,
+        R.month <= last_month
+    )
+    if spender is not None:
+        query = query.filter(R.spender == spender)
+    if account_id:
+        query = query.filter(R.account_id == account_id)
+
+    rows = []
+    for row in query.group_by(*[getattr(R, name) for name in group_by]).all():
+        keys = [
+            (_as_date(value) if name == "month" else (value or None))
+            for name, value in zip(group_by, row)
+        ]
+        rows.append((*keys, row[-2] or 0.0, row[-1] or 0.0))
+    return rows
@@ -0,0 +1,138 @@
+"""
+Subscription Schedules
+
+Generates the due dates of recurring subscriptions directly instead of testing
+every day of a horizon against every subscription.
+
+Each subscription yields its occurrences from its ``next_due_date`` anchor.
+Month-based frequencies are always offset from the anchor, so a payment due on
+the 31st lands on the last day of shorter months and returns to the 31st
+afterwards (and 29 February falls back to the 28th in other years).
+``schedule_events`` merges all subscriptions through a heap keyed on each
+one's next due date, and ``cashflow_series`` accumulates the events into a
+daily balance line with NumPy, optionally downsampled to weeks or months.
+"""
+import heapq
+from datetime import date, timedelta
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+
+# frequency (lowercased) -> ("days" | "months", step)
+FREQUENCY_STEPS = {
+    "weekly": ("days", 7),
+    "bi-weekly": ("days", 14),
+    "biweekly": ("days", 14),
+    "fortnightly": ("days", 14),
+    "monthly": ("months", 1),
+    "quarterly": ("months", 3),
+    "yearly": ("months", 12),
+    "annual": ("months", 12),
+}
+
+INTERVALS = ("day", "week", "month")
+
+
+def occurrences(anchor: date, frequency: Optional[str], start: date, end: date) -> Iterator[date]:
+    """
+    Due dates of a subscription in [start, end], never before ``anchor``.
+    Unknown frequencies yield nothing.
+    """
+    step = FREQUENCY_STEPS.get((frequency or "").lower())
+    if anchor is None or step is None or anchor > end:
+        return
+    unit, size = step
+    first = max(anchor, start)
+
+    if unit == "days":
+        k = -(-(first - anchor).days // size)  # ceil: skip straight to the first due date
+        due = anchor + timedelta(days=k * size)
+        while due <= end:
+            yield due
+            due += timedelta(days=size)
+        return
+
+    k = max(0, ((first.year - anchor.year) * 12 + first.month - anchor.month) // size)
+    while True:
+        # Offset from the anchor each time so month-end clamping does not drift
+        due = anchor + relativedelta(months=k * size)
+        if due > end:
+            return
+        if due >= first:
+            yield due
+        k += 1
+
+
+def schedule_events(subscriptions: Iterable, start: date, end: date) -> Iterator[Tuple[date, object]]:
+    """
+    (due_date, subscription) pairs for all subscriptions in date order,
+    merged through a heap of each subscription's next due date.
+    """
+    heap = []
+    for index, sub in enumerate(subscriptions):
+        dates = occurrences(sub.next_due_date, sub.frequency, start, end)
+        due = next(dates, None)
+        if due is not None:
+            heap.append((due, index, sub, dates))
+    heapq.heapify(heap)
+
+    while heap:
+        due, index, sub, dates = heap[0]
+        yield due, sub
+        following = next(dates, None)
+        if following is None:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (following, index, sub, dates))
+
+
+def signed_amount(sub) -> float:
+    """Income subscriptions add to the balance; everything else is an expense."""
+    return (sub.amount or 0.0) if sub.type == "Income" else -(sub.amount or 0.0)
+
+
+def cashflow_series(
+    subscriptions: Iterable,
+    start: date,
+    end: date,
+    start_balance: float = 0.0,
+    interval: str = "day",
+) -> List[dict]:
+    """
+    Projected balance from ``start`` to ``end`` inclusive.
+
+    Returns one {"date", "balance", "flow"} point per day, or per calendar
+    week (Monday start) / month with the flows summed and the closing balance.
+    The first point of a downsampled series is dated ``start``.
+    """
+    days = (end - start).days + 1
+    if days <= 0:
+        return []
+
+    offsets, amounts = [], []
+    for due, sub in schedule_events(subscriptions, start, end):
+        offsets.append((due - start).days)
+        amounts.append(signed_amount(sub))
+    flows = np.bincount(np.asarray(offsets, dtype=np.int64), weights=np.asarray(amounts, dtype=float), minlength=days)
+    balances = start_balance + np.cumsum(flows)
+
+    day_values = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + 1)
+    if interval == "week":
+        # 1970-01-01 was a Thursday; shift so periods start on Monday
+        periods = (day_values.astype(np.int64) + 3) // 7
+    elif interval == "month":
+        periods = day_values.astype("datetime64[M]").astype(np.int64)
+    else:
+        return [
+            {"date": d.isoformat(), "balance": float(b), "flow": float(f)}
+            for d, b, f in zip(day_values.tolist(), balances, flows)
+        ]
+
+    firsts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+    lasts = np.r_[firsts[1:] - 1, days - 1]
+    period_flows = np.add.reduceat(flows, firsts)
+    return [
+        {"date": day_values[first].item().isoformat(), "balance": float(balances[last]), "flow": float(flow)}
+        for first, last, flow in zip(firsts, lasts, period_flows)
+    ]
@@ -0,0 +1,170 @@
+"""
+Transaction Search
+
+Indexed full-text search over ``description`` and ``raw_description``.
+
+- SQLite: an FTS5 external-content table (``transactions_fts``) kept in sync by
+  insert/update/delete triggers on ``transactions``.
+- PostgreSQL: a generated ``search_vector`` tsvector column with a GIN index,
+  plus ``pg_trgm`` GIN indexes on the lowered text columns so substring matches
+  (the old ``LIKE '%term%'`` behaviour) stay indexable too.
+
+Because the sync happens in the database (triggers / generated column), ORM
+writes, bulk ``query.update()`` calls and raw SQL all keep the index current.
+``ensure_search_index`` is run by auto_migrate; when the index is missing the
+search falls back to the unindexed ``LIKE`` filter.
+
+Queries are split into words; every word must match, as a prefix, so partial
+words typed into the search box already find results. On both backends the
+index match is OR'd with the substring filter, so infix terms ("flix" for
+"Netflix") match the same rows they did before the index existed.
+"""
+import logging
+import re
+import weakref
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, func, literal_column, or_, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Query, Session
+
+from .. import models
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "transactions_fts"
+
+_SQLITE_SETUP = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        description, raw_description,
+        content='transactions', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_ai AFTER INSERT ON transactions BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, description, raw_description)
+        VALUES (new.id, new.description, new.raw_description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_ad AFTER DELETE ON transactions BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, raw_description)
+        VALUES ('delete', old.id, old.description, old.raw_description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_au AFTER UPDATE OF description, raw_description ON transactions BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, raw_description)
+        VALUES ('delete', old.id, old.description, old.raw_description);
+        INSERT INTO {FTS_TABLE}(rowid, description, raw_description)
+        VALUES (new.id, new.description, new.raw_description);
+    END
+    """,
+]
+
+_POSTGRES_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE transactions ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        to_tsvector('simple', coalesce(description, '') || ' ' || coalesce(raw_description, ''))
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_transactions_search ON transactions USING gin(search_vector)",
+    "CREATE INDEX IF NOT EXISTS idx_transactions_description_trgm ON transactions USING gin(lower(description) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_transactions_raw_description_trgm ON transactions USING gin(lower(raw_description) gin_trgm_ops)",
+]
+
+# engine -> whether the search index exists (probed once per engine)
+_index_available = weakref.WeakKeyDictionary()
+
+
+def ensure_search_index(engine: Engine) -> bool:
+    """Create the search index for this engine's dialect. Returns True if it is available."""
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        statements = _SQLITE_SETUP
+    elif dialect == "postgresql":
+        statements = _POSTGRES_SETUP
+    else:
+        return False
+
+    try:
+        with engine.connect() as conn:
+            created = dialect == "sqlite" and not conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": FTS_TABLE}
+            ).first()
+            for statement in statements:
+                conn.execute(text(statement))
+            if created:
+                # Index rows that predate the FTS table
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+            conn.commit()
+    except Exception as e:
+        logger.error(f"Failed to create transaction search index: {e}")
+        _index_available[engine] = False
+        return False
+
+    _index_available[engine] = True
+    return True
+
+
+def _has_index(db: Session) -> bool:
+    engine = db.get_bind()
+    if engine not in _index_available:
+        dialect = engine.dialect.name
+        if dialect == "sqlite":
+            probe = text("SELECT 1 FROM sqlite_master WHERE name = :name").bindparams(name=FTS_TABLE)
+        elif dialect == "postgresql":
+            probe = text(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'transactions' AND column_name = 'search_vector'"
+            )
+        else:
+            _index_available[engine] = False
+            return False
+        _index_available[engine] = db.execute(probe).first() is not None
+    return _index_available[engine]
+
+
+def search_terms(search: str) -> List[str]:
+    """Lower-cased word tokens of a search string (punctuation is dropped)."""
+    return re.findall(r"\w+", search.lower())
+
+
+def apply_search(db: Session, query: Query, search: str) -> Tuple[Query, Optional[object]]:
+    """
+    Restrict a Transaction query to rows matching ``search``.
+
+    Returns (query, rank_order) where ``rank_order`` is an ORDER BY clause that
+    puts the best matches first, or None when only the LIKE fallback applies.
+    """
+    terms = search_terms(search)
+    like_term = f"%{search.lower()}%"
+    like_filter = or_(
+        func.lower(models.Transaction.description).like(like_term),
+        func.lower(models.Transaction.raw_description).like(like_term)
+    )
+    if not terms or not _has_index(db):
+        return query.filter(like_filter), None
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        # Implicit AND of quoted prefix terms: "wool"* "metro"*
+        match = " ".join(f'"{term}"*' for term in terms)
+        hits = text(
+            f"SELECT rowid AS id, bm25({FTS_TABLE}) AS rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"
+        ).bindparams(match=match).columns(id=Integer, rank=Float).subquery("search_hits")
+        # Outer join so substring matches the FTS tokenizer can't see still apply
+        query = query.outerjoin(hits, hits.c.id == models.Transaction.id)
+        query = query.filter(or_(hits.c.id.isnot(None), like_filter))
+        # bm25() is negative; more negative is a better match, substring-only hits last
+        return query, func.coalesce(hits.c.rank, 0.0).asc()
+
+    vector = literal_column("transactions.search_vector")
+    tsquery = func.to_tsquery("simple", " & ".join(f"{term}:*" for term in terms))
+    # Substring matches keep working through the trigram indexes
+    query = query.filter(or_(vector.op("@@")(tsquery), like_filter))
+    return query, func.ts_rank(vector, tsquery).desc()
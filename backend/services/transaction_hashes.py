@@ -0,0 +1,191 @@
+"""
+Transaction Hashes
+
+Duplicate detection for imports. Every imported transaction carries a
+``transaction_hash`` fingerprint, and a unique (user_id, transaction_hash)
+index makes the database the arbiter of what is a duplicate:
+
+- Previews look up only the incoming hashes (chunked ``IN`` lists against the
+  index), so the check costs the size of the file rather than the size of the
+  user's history.
+- Confirm inserts with ``ON CONFLICT DO NOTHING``; a retried or double-submitted
+  import cannot create the same row twice.
+
+``ensure_hash_index`` is run by auto_migrate: it fingerprints rows imported
+before hashes existed and creates the unique index.
+"""
+import hashlib
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import bindparam, func, inspect, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .. import models
+from . import columnar
+from .rollups import apply_inserted
+from .transaction_tags import rebuild_transaction_tags
+
+logger = logging.getLogger(__name__)
+
+HASH_INDEX = "uq_transactions_user_hash"
+_CHUNK = 500
+
+
+def generate_transaction_hash(user_id, date, raw_description: str, amount: float) -> str:
+    """
+    Generate a unique fingerprint for duplicate detection.
+    Uses: user_id + date + raw_description + absolute amount
+    """
+    date_str = date.isoformat() if hasattr(date, 'isoformat') else str(date)
+    # Ensure raw_description is string, handle None
+    desc_str = (raw_description or "").lower().strip()
+    key = f"{user_id}|{date_str}|{desc_str}|{abs(round(amount, 2))}"
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def existing_hashes(db: Session, user_id: str, hashes: Iterable[str]) -> Set[str]:
+    """The subset of ``hashes`` the user already has, looked up in index-sized chunks."""
+    txn = models.Transaction.__table__
+    wanted = list({h for h in hashes if h})
+    found = set()
+    conn = db.connection()
+    for start in range(0, len(wanted), _CHUNK):
+        found.update(conn.execute(
+            select(txn.c.transaction_hash).where(
+                txn.c.user_id == user_id,
+                txn.c.transaction_hash.in_(wanted[start:start + _CHUNK])
+            )
+        ).scalars())
+    return found
+
+
+def insert_new_transactions(db: Session, rows: List[Dict]) -> List[int]:
+    """
+    Insert transaction rows, skipping any whose (user_id, transaction_hash)
+    already exists. Runs in the caller's transaction and returns the ids of
+    the rows actually inserted.
+
+    The INSERT bypasses the unit of work, so rollups, tag rows and the
+    columnar store for the new transactions are maintained here.
+    """
+    if not rows:
+        return []
+    conn = db.connection()
+    txn = models.Transaction.__table__
+    dialect = conn.dialect.name
+
+    inserted = {}
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(txn).on_conflict_do_nothing(
+            index_elements=[txn.c.user_id, txn.c.transaction_hash]
+        ).returning(txn.c.id, txn.c.user_id, txn.c.transaction_hash)
+        by_key = {(row["user_id"], row["transaction_hash"]): row for row in rows}
+        for start in range(0, len(rows), _CHUNK):
+            for txn_id, user_id, txn_hash in conn.execute(stmt, rows[start:start + _CHUNK]):
+                inserted[txn_id] = by_key[(user_id, txn_hash)]
+    else:
+        # Generic fallback: check, then insert row by row
+        for row in rows:
+            if row["transaction_hash"] in existing_hashes(db, row["user_id"], [row["transaction_hash"]]):
+                continue
+            result = conn.execute(txn.insert().values(**row))
+            inserted[result.inserted_primary_key[0]] = row
+
+    apply_inserted(db, inserted.values())
+    tagged = [txn_id for txn_id, row in inserted.items() if row.get("tags")]
+    rebuild_transaction_tags(db, transaction_ids=tagged)
+    columnar.apply_inserted(db, inserted)
+    return list(inserted)
+
+
+# --- Backfill / index ---
+
+def backfill_transaction_hashes(db: Session, user_id: Optional[str] = None) -> int:
+    """
+    Fingerprint transactions that have no hash yet, optionally for one user.
+    A row whose fingerprint is already taken (a genuine repeat) keeps a NULL
+    hash so the unique index can be built. Returns the number of rows hashed.
+    """
+    conn = db.connection()
+    txn = models.Transaction.__table__
+    filters = [
+        txn.c.transaction_hash.is_(None),
+        txn.c.user_id.isnot(None),
+        txn.c.date.isnot(None),
+        txn.c.amount.isnot(None),
+    ]
+    if user_id is not None:
+        filters.append(txn.c.user_id == user_id)
+    page_stmt = select(
+        txn.c.id, txn.c.user_id, txn.c.date, txn.c.raw_description, txn.c.description, txn.c.amount
+    ).order_by(txn.c.id).limit(_CHUNK)
+    update_stmt = txn.update().where(txn.c.id == bindparam("_id")).values(
+        transaction_hash=bindparam("_hash")
+    )
+
+    written = 0
+    last_id = 0
+    while True:
+        page = conn.execute(page_stmt.where(*filters, txn.c.id > last_id)).all()
+        if not page:
+            return written
+        last_id = page[-1].id
+
+        # Keep the oldest row for each fingerprint
+        candidates = defaultdict(dict)
+        for row in page:
+            txn_hash = generate_transaction_hash(
+                row.user_id, row.date, row.raw_description or row.description, row.amount
+            )
+            candidates[row.user_id].setdefault(txn_hash, row.id)
+
+        updates = []
+        for owner, by_hash in candidates.items():
+            taken = existing_hashes(db, owner, by_hash)
+            updates.extend(
+                {"_id": txn_id, "_hash": txn_hash}
+                for txn_hash, txn_id in by_hash.items() if txn_hash not in taken
+            )
+        if updates:
+            conn.execute(update_stmt, updates)
+            written += len(updates)
+
+
+def _clear_repeated_hashes(db: Session) -> int:
+    """NULL the hash on all but the oldest row of each (user_id, transaction_hash)."""
+    txn = models.Transaction.__table__
+    keep = select(func.min(txn.c.id)).where(
+        txn.c.transaction_hash.isnot(None)
+    ).group_by(txn.c.user_id, txn.c.transaction_hash)
+    result = db.connection().execute(
+        txn.update().where(
+            txn.c.transaction_hash.isnot(None), txn.c.id.not_in(keep)
+        ).values(transaction_hash=None)
+    )
+    return result.rowcount or 0
+
+
+def ensure_hash_index(engine: Engine) -> bool:
+    """Backfill hashes and create the unique (user_id, transaction_hash) index. Returns True on success."""
+    if HASH_INDEX in {i["name"] for i in inspect(engine).get_indexes("transactions")}:
+        return True
+    try:
+        with Session(bind=engine) as session:
+            cleared = _clear_repeated_hashes(session)
+            hashed = backfill_transaction_hashes(session)
+            session.execute(text(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {HASH_INDEX} ON transactions(user_id, transaction_hash)"
+            ))
+            session.commit()
+    except Exception as e:
+        logger.error(f"Failed to create {HASH_INDEX}: {e}")
+        return False
+    logger.info(f"Created {HASH_INDEX}: hashed {hashed} rows, cleared {cleared} repeated hashes")
+    return True
@@ -0,0 +1,214 @@
+"""
+Transaction Tags
+
+Keeps the ``transaction_tags`` table (one row per transaction and tag) in step
+with the comma-separated ``Transaction.tags`` column, and provides the tag
+filter every router uses.
+
+Session events rewrite a transaction's tag rows inside the same flush as the
+write that changed its tags, so a rollback undoes both. Bulk ``query.update()``
+/ ``query.delete()`` calls bypass the unit of work; for those the affected
+transactions are re-indexed (or their rows dropped) around the statement.
+
+Tags are matched exactly after trimming, lower-casing and HTML-unescaping
+(text fields are stored escaped), so "car" no longer matches "carpool".
+"""
+import html
+import logging
+from itertools import chain
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from .. import models
+from .rollups import bulk_write_criteria
+
+logger = logging.getLogger(__name__)
+
+# Attributes whose change rewrites a transaction's tag rows
+_KEY_ATTRS = ("tags", "user_id", "user")
+_CHUNK = 1000
+
+
+def parse_tags(value: Optional[str]) -> List[str]:
+    """Normalized, de-duplicated tags from a comma-separated string."""
+    if not value:
+        return []
+    seen = {}
+    for part in value.split(","):
+        tag = html.unescape(part).strip().lower()
+        if tag:
+            seen.setdefault(tag, None)
+    return list(seen)
+
+
+def tag_filter(user_id: str, tags: Optional[str]):
+    """
+    WHERE clause matching a user's transactions that carry any of the
+    comma-separated ``tags`` (OR logic), or None when no tags are given.
+    Resolved through the (user_id, tag, transaction_id) primary key.
+    """
+    tag_list = parse_tags(tags)
+    if not tag_list:
+        return None
+    table = models.TransactionTag.__table__
+    return models.Transaction.id.in_(
+        select(table.c.transaction_id).where(table.c.user_id == user_id, table.c.tag.in_(tag_list))
+    )
+
+
+def _rows_for(transactions: Iterable) -> List[Dict]:
+    return [
+        {"user_id": user_id, "tag": tag, "transaction_id": txn_id}
+        for txn_id, user_id, tags in transactions
+        if user_id is not None
+        for tag in parse_tags(tags)
+    ]
+
+
+def _replace_rows(db: Session, transaction_ids: List[int], rows: List[Dict]):
+    conn = db.connection()
+    table = models.TransactionTag.__table__
+    for start in range(0, len(transaction_ids), _CHUNK):
+        conn.execute(table.delete().where(table.c.transaction_id.in_(transaction_ids[start:start + _CHUNK])))
+    if rows:
+        conn.execute(table.insert(), rows)
+
+
+def _tags_changed(obj) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in _KEY_ATTRS)
+
+
+@event.listens_for(Session, "before_flush")
+def _capture_tag_writes(session, flush_context, instances):
+    """Drop tag rows of deleted transactions and remember which ones need re-indexing."""
+    written = [
+        obj for obj in session.new if isinstance(obj, models.Transaction) and obj.tags
+    ] + [
+        obj for obj in session.dirty if isinstance(obj, models.Transaction) and _tags_changed(obj)
+    ]
+    deleted_ids = [
+        obj.id for obj in session.deleted if isinstance(obj, models.Transaction) and obj.id is not None
+    ]
+    if deleted_ids:
+        # Before the transactions themselves, for databases enforcing the FK
+        _replace_rows(session, deleted_ids, [])
+    if written:
+        session.info["tag_flush"] = written
+    else:
+        session.info.pop("tag_flush", None)
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_tag_writes(session, flush_context):
+    """Rewrite tag rows once ids of the flushed transactions are known."""
+    written = session.info.pop("tag_flush", None)
+    if not written:
+        return
+    rows = _rows_for((obj.id, obj.user_id, obj.tags) for obj in written)
+    _replace_rows(session, [obj.id for obj in written], rows)
+
+
+# Columns whose change affects tag rows
+_TAG_COLUMNS = {"tags", "user_id"}
+
+
+def _updates_tag_columns(orm_execute_state) -> bool:
+    """Whether a bulk UPDATE sets ``tags`` or ``user_id`` (True when it cannot tell)."""
+    stmt = orm_execute_state.statement
+    # .values(...) on the statement, or per-row dicts for a bulk UPDATE by primary key
+    set_keys = chain(
+        getattr(stmt, "_values", None) or {},
+        (key for key, _ in getattr(stmt, "_ordered_values", None) or ()),
+    )
+    keys = {key if isinstance(key, str) else getattr(key, "key", None) for key in set_keys}
+    params = orm_execute_state.parameters
+    for row in (params if isinstance(params, (list, tuple)) else [params or {}]):
+        keys.update(row)
+    return not keys or bool(keys & _TAG_COLUMNS)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_tag_writes(orm_execute_state):
+    """Re-index (or drop) tag rows around bulk UPDATE/DELETE on transactions."""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not models.Transaction:
+        return None
+    if orm_execute_state.is_update and not _updates_tag_columns(orm_execute_state):
+        return None
+
+    session = orm_execute_state.session
+    txn = models.Transaction.__table__
+    stmt = select(txn.c.id)
+    whereclause = bulk_write_criteria(orm_execute_state)
+    if whereclause is not None:
+        stmt = stmt.where(whereclause)
+    ids = list(session.connection().scalars(stmt))
+
+    if orm_execute_state.is_delete:
+        _replace_rows(session, ids, [])
+        return orm_execute_state.invoke_statement()
+
+    result = orm_execute_state.invoke_statement()
+    rebuild_transaction_tags(session, transaction_ids=ids)
+    return result
+
+
+# --- Rebuild / backfill ---
+
+def rebuild_transaction_tags(
+    db: Session,
+    user_id: Optional[str] = None,
+    transaction_ids: Optional[List[int]] = None
+) -> int:
+    """
+    Recompute tag rows from Transaction.tags.
+    Scoped to one user and/or a list of transactions when given; with no
+    arguments the whole table is rebuilt (backfill). Runs in the caller's
+    transaction. Returns the number of tag rows written.
+    """
+    conn = db.connection()
+    table = models.TransactionTag.__table__
+    txn = models.Transaction.__table__
+
+    if transaction_ids is not None:
+        if not transaction_ids:
+            return 0
+        written = 0
+        for start in range(0, len(transaction_ids), _CHUNK):
+            chunk = transaction_ids[start:start + _CHUNK]
+            source = conn.execute(
+                select(txn.c.id, txn.c.user_id, txn.c.tags).where(txn.c.id.in_(chunk))
+            )
+            rows = _rows_for(source)
+            _replace_rows(db, chunk, rows)
+            written += len(rows)
+        return written
+
+    delete_stmt = table.delete()
+    source_stmt = select(txn.c.id, txn.c.user_id, txn.c.tags).where(
+        txn.c.tags.isnot(None), txn.c.tags != ""
+    )
+    if user_id is not None:
+        delete_stmt = delete_stmt.where(table.c.user_id == user_id)
+        source_stmt = source_stmt.where(txn.c.user_id == user_id)
+    conn.execute(delete_stmt)
+
+    written = 0
+    batch = []
+    for row in conn.execution_options(yield_per=_CHUNK).execute(source_stmt):
+        batch.append(row)
+        if len(batch) >= _CHUNK:
+            rows = _rows_for(batch)
+            if rows:
+                conn.execute(table.insert(), rows)
+            written += len(rows)
+            batch = []
+    rows = _rows_for(batch)
+    if rows:
+        conn.execute(table.insert(), rows)
+    return written + len(rows)
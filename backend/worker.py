@@ -0,0 +1,32 @@
+"""
+Standalone job worker.
+
+Runs the background job pool (CSV imports) outside the API processes:
+
+    JOB_WORKERS=4 python -m backend.worker
+
+Start the API with JOB_WORKERS=0 when using this, so imports run only here.
+The queue lives in the database, so any number of these can run side by side.
+"""
+import logging
+import os
+import signal
+
+from .main import app  # noqa: F401 - loads models, session events and job handlers
+from .services import job_queue
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    size = int(os.getenv("JOB_WORKERS", 2)) or 1
+    pool = job_queue.WorkerPool(size)
+    signal.signal(signal.SIGTERM, lambda *_: pool.stop())
+    signal.signal(signal.SIGINT, lambda *_: pool.stop())
+    pool.start()
+    pool.wait()
+    logger.info("Job worker stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,7 +14,8 @@ export default function TransactionTable({ params = {} }) {
                 params: {
                     ...params,
                     skip: page * limit,
-                    limit: limit
+                    limit: limit,
+                    include_total: true
                 }
             });
             return res.data;
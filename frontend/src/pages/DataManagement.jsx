@@ -2,7 +2,7 @@ import React, { useState, useEffect, useRef } from 'react';
 import { useMutation, useQuery, useQueryClient } from '@tanstack/react-query';
 import { Listbox, Transition } from '@headlessui/react';
 import { UploadCloud, CheckCircle, AlertCircle, FileText, ArrowRight, Pencil, Table, ChevronDown, Check, Loader2, UserCheck, Download, Calendar, LineChart } from 'lucide-react';
-import api, { getMembers, getBucketsTree } from '../services/api';
+import api, { getMembers, getBucketsTree, downloadExport } from '../services/api';
 import ConnectBank from '../components/ConnectBank';
 import { sortBucketsByGroup } from '../utils/bucketUtils';
 
@@ -168,6 +168,7 @@ export default function Ingest() {
             formData.append("file", file);
             formData.append("map_date", mapping.date);
             formData.append("map_desc", mapping.description);
+            if (mapping.dateFormat) formData.append("date_format", mapping.dateFormat);
             formData.append("spender", spender);
 
             if (mapping.mode === 'split') {
@@ -181,23 +182,32 @@ export default function Ingest() {
 
             // Start async job
             const startRes = await api.post("/ingest/csv/start", formData);
-            const { job_id, total } = startRes.data;
+            const { job_id, total, status: startStatus } = startRes.data;
 
-            setImportProgress({ jobId: job_id, progress: 0, total, message: 'Starting...', status: 'processing' });
+            setImportProgress({ jobId: job_id, progress: 0, total, message: 'Queued...', status: startStatus || 'queued' });
 
-            // Poll for status until complete
+            // Poll for status until complete; previews stream in chunk by chunk
             let attempts = 0;
             const maxAttempts = 600; // 10 minutes max (600 * 1000ms)
+            let since = 0;
+            let rows = [];
 
             while (attempts < maxAttempts) {
                 // Check if cancelled
                 if (cancelImportRef.current) {
                     cancelImportRef.current = false;  // Reset for next import
+                    // Stop the server-side job too; it frees the worker at the next chunk
+                    api.post(`/ingest/csv/cancel/${job_id}`).catch(() => {});
                     throw new Error('Import cancelled');
                 }
                 await new Promise(resolve => setTimeout(resolve, 1000)); // Poll every 1 second
-                const statusRes = await api.get(`/ingest/csv/status/${job_id}`);
+                const statusRes = await api.get(`/ingest/csv/status/${job_id}`, { params: { since } });
                 const status = statusRes.data;
+                if (status.rows?.length) {
+                    rows = rows.concat(status.rows);
+                    setTransactions(rows);
+                }
+                since = status.next_since ?? since;
 
                 setImportProgress({
                     jobId: job_id,
@@ -209,9 +219,11 @@ export default function Ingest() {
                 });
 
                 if (status.status === 'complete') {
-                    return status.result;
+                    return rows;
                 } else if (status.status === 'failed') {
                     throw new Error(status.error || 'Import failed');
+                } else if (status.status === 'cancelled') {
+                    throw new Error('Import cancelled');
                 }
 
                 attempts++;
@@ -328,13 +340,13 @@ export default function Ingest() {
                                 <div className="flex gap-3">
                                     <button
                                         className="flex-1 py-2 px-4 rounded-lg border border-indigo-600 bg-indigo-50 dark:bg-indigo-900/20 text-indigo-600 dark:text-indigo-400 font-medium text-sm text-center"
-                                        onClick={() => window.open(`${api.defaults.baseURL}/export/transactions?format=csv`)}
+                                        onClick={() => downloadExport('transactions', { format: 'csv' }, 'transactions_export.csv')}
                                     >
                                         CSV
                                     </button>
                                     <button
                                         className="flex-1 py-2 px-4 rounded-lg border border-slate-200 dark:border-slate-700 hover:bg-slate-50 dark:hover:bg-slate-700 text-slate-600 dark:text-slate-300 font-medium text-sm text-center transition-colors"
-                                        onClick={() => window.open(`${api.defaults.baseURL}/export/transactions?format=json`)}
+                                        onClick={() => downloadExport('transactions', { format: 'json' }, 'transactions_export.json')}
                                     >
                                         JSON
                                     </button>
@@ -365,7 +377,7 @@ export default function Ingest() {
                                 <label className="block text-sm font-medium text-slate-700 dark:text-slate-300 mb-2">Format</label>
                                 <button
                                     className="w-full py-2 px-4 rounded-lg border border-emerald-600 bg-emerald-50 dark:bg-emerald-900/20 text-emerald-600 dark:text-emerald-400 font-medium text-sm text-center"
-                                    onClick={() => window.open(`${api.defaults.baseURL}/export/net-worth`)}
+                                    onClick={() => downloadExport('net-worth', { format: 'csv' }, 'net_worth_export.csv')}
                                 >
                                     Download CSV
                                 </button>
@@ -541,6 +553,20 @@ export default function Ingest() {
                                 {previewData.headers.map(h => <option key={h} value={h}>{h}</option>)}
                             </select>
                         </div>
+                        <div>
+                            <label className="block text-xs font-semibold text-slate-500 mb-1">Date Format</label>
+                            <select
+                                className="w-full px-2 py-2 border rounded-lg dark:bg-slate-700 dark:border-slate-600 dark:text-white text-sm"
+                                value={mapping.dateFormat || ""}
+                                onChange={(e) => setMapping({ ...mapping, dateFormat: e.target.value })}
+                            >
+                                <option value="">Auto-detect</option>
+                                <option value="%d/%m/%Y">DD/MM/YYYY</option>
+                                <option value="%m/%d/%Y">MM/DD/YYYY</option>
+                                <option value="%Y-%m-%d">YYYY-MM-DD</option>
+                                <option value="%d %b %Y">DD Mon YYYY</option>
+                            </select>
+                        </div>
                         <div>
                             <label className="block text-xs font-semibold text-slate-500 mb-1">Description Column</label>
                             <select
@@ -59,7 +59,7 @@ export default function Transactions() {
     const { data: transactionData, isLoading } = useQuery({
         queryKey: ['transactions', debouncedSearch, categoryFilter, spenderFilter, monthParam, yearParam, sortBy, sortDir],
         queryFn: async () => {
-            const params = { limit: 500 }; // Increase limit for better search coverage
+            const params = { limit: 500, include_total: true }; // Increase limit for better search coverage
             if (debouncedSearch) params.search = debouncedSearch;
             if (categoryFilter) params.bucket_id = categoryFilter;
             if (spenderFilter) params.spender = spenderFilter;
@@ -159,8 +159,8 @@ export default function Transactions() {
 
     // Batch Update Transactions
     const batchUpdateMutation = useMutation({
-        mutationFn: async (data) => {
-            const res = await api.post('/transactions/batch-update', data);
+        mutationFn: async ({ ids, ...patch }) => {
+            const res = await api.patch('/transactions/bulk', { filter: { ids }, patch });
             return res.data;
         },
         onSuccess: (data) => {
@@ -66,7 +66,30 @@ export const getTags = async () => {
 };
 
 // Analytics
-export const getCalendarData = async (start, end) => (await api.get('/analytics/calendar', { params: { start_date: start, end_date: end } })).data;
+export const getCalendarData = async (start, end) => {
+    // Columnar response: parallel arrays plus each referenced bucket once
+    const { columns, buckets } = (await api.get('/analytics/calendar', {
+        params: { start_date: start, end_date: end, format: 'columnar' }
+    })).data;
+    const bucketFor = (id) => {
+        const bucket = id != null ? buckets[id] : null;
+        if (!bucket) return null;
+        const parent = bucket.parent_id != null && buckets[bucket.parent_id]
+            ? { id: bucket.parent_id, ...buckets[bucket.parent_id] }
+            : null;
+        return { id, ...bucket, parent };
+    };
+    return columns.id.map((id, i) => ({
+        id,
+        date: columns.date[i],
+        description: columns.description[i],
+        amount: columns.amount[i],
+        bucket_id: columns.bucket_id[i],
+        spender: columns.spender[i],
+        account_id: columns.account_id[i],
+        bucket: bucketFor(columns.bucket_id[i])
+    }));
+};
 export const getSubscriptions = async () => (await api.get('/analytics/subscriptions')).data;
 export const getSuggestedSubscriptions = async () => (await api.get('/analytics/subscriptions/suggested')).data;
 export const createSubscription = async (data) => (await api.post('/analytics/subscriptions', data)).data;
@@ -87,6 +110,19 @@ export const createAccount = async (data) => (await api.post('/net-worth/account
 export const updateAccount = async (id, data) => (await api.put(`/net-worth/accounts/${id}`, data)).data;
 export const deleteAccount = async (id) => (await api.delete(`/net-worth/accounts/${id}`)).data;
 
+// Data exports (authenticated, so fetched as a blob rather than opened directly)
+export const downloadExport = async (path, params, filename) => {
+    const response = await api.get(`/export/${path}`, { params, responseType: 'blob' });
+    const url = window.URL.createObjectURL(new Blob([response.data]));
+    const link = document.createElement('a');
+    link.href = url;
+    link.setAttribute('download', filename);
+    document.body.appendChild(link);
+    link.click();
+    link.remove();
+    window.URL.revokeObjectURL(url);
+};
+
 // Net Worth Import/Export
 export const downloadNetWorthTemplate = async () => {
     const response = await api.get('/net-worth/template', { responseType: 'blob' });
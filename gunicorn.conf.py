@@ -13,9 +13,14 @@ import os
 bind = os.getenv("BIND", "0.0.0.0:8000")
 
 # Number of worker processes
-# Using 1 worker to ensure in-memory job store works across requests
-# For multi-worker scaling, migrate job store to Redis
-workers = int(os.getenv("WORKERS", 1))
+# Background jobs are queued in the database, so any worker can serve any job's
+# status. Each process also runs JOB_WORKERS import threads (set JOB_WORKERS=0
+# when a separate `python -m backend.worker` process handles imports).
+# Without Redis the response cache is per process, so default to one worker;
+# with REDIS_URL set, scale with the CPUs.
+workers = int(os.getenv("WORKERS", min(multiprocessing.cpu_count(), 4) if os.getenv("REDIS_URL") else 1))
+# Visible to the workers, so the cache can tell it is not running alone
+os.environ["WEB_CONCURRENCY"] = str(workers)
 
 # Worker class - use uvicorn for async support
 worker_class = "uvicorn.workers.UvicornWorker"
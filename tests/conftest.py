@@ -19,6 +19,9 @@ from sqlalchemy.pool import StaticPool
 # Add backend to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Tests run queued jobs explicitly; no background worker pool
+os.environ.setdefault("JOB_WORKERS", "0")
+
 from backend.database import Base, get_db
 from backend import models, auth
 
@@ -79,6 +82,15 @@ def client(test_db):
     app.dependency_overrides.clear()
 
 
+@pytest.fixture(autouse=True)
+def reset_response_cache():
+    """Every test gets a fresh database, so drop cached responses from earlier tests."""
+    from backend.cache import clear_local_cache
+    clear_local_cache()
+    yield
+    clear_local_cache()
+
+
 # ============================================
 # USER & AUTH FIXTURES
 # ============================================
@@ -3,6 +3,7 @@ Principal Finance - Analytics Tests
 
 Tests for:
 - Dashboard summary data
+- Dashboard sums agreeing across the rollup, column store and SQL paths
 - Spending trends
 - Sankey diagram data
 - Insights and anomaly detection
@@ -10,6 +11,11 @@ Tests for:
 import pytest
 from datetime import datetime, timedelta
 
+from backend import cache, models
+from backend.routers import analytics
+from backend.services import columnar, rollups
+from backend.services.bucket_tree import get_bucket_tree
+
 
 class TestDashboardSummary:
     """Tests for dashboard summary endpoint."""
@@ -39,6 +45,139 @@ class TestDashboardSummary:
         assert data["totals"]["expenses"] != 0
 
 
+DASHBOARD_PATHS = ["rollup", "columnar", "sql"]
+
+
+@pytest.fixture
+def dashboard_path(monkeypatch):
+    """Force the dashboard aggregation onto one path; returns a setter."""
+    def use(path):
+        monkeypatch.setenv("COLUMNAR_CACHE", "on" if path == "columnar" else "off")
+        if path != "rollup":
+            monkeypatch.setattr(rollups, "whole_month_span", lambda start, end: None)
+        cache.clear_local_cache()
+    return use
+
+
+class TestDashboardPaths:
+    """The rollup table, column store and SQL pass return the same dashboard sums."""
+
+    @pytest.fixture
+    def ledger(self, test_db, test_user):
+        groceries = models.BudgetBucket(name="Groceries", user_id=test_user.id, group="Discretionary", is_rollover=True)
+        salary = models.BudgetBucket(name="Salary", user_id=test_user.id, group="Income")
+        transfer = models.BudgetBucket(name="Transfers", user_id=test_user.id, is_transfer=True)
+        shares = models.BudgetBucket(name="Shares", user_id=test_user.id, is_investment=True)
+        test_db.add_all([groceries, salary, transfer, shares])
+        test_db.commit()
+        test_db.add(models.BudgetLimit(bucket_id=groceries.id, amount=100.0))
+
+        # (date, amount, bucket, spender, tags)
+        rows = [
+            (datetime(2025, 1, 10), -60.0, groceries, "Joint", None),   # YTD, before the view
+            (datetime(2025, 1, 12), 5.0, groceries, "Alex", None),
+            (datetime(2025, 2, 1), -80.0, groceries, "Joint", "work"),
+            (datetime(2025, 2, 3, 14, 30), 20.0, groceries, "Alex", None),  # refund
+            (datetime(2025, 2, 14), -35.5, groceries, "Alex", "Work,travel"),
+            (datetime(2025, 2, 15), 4000.0, salary, "Joint", None),
+            (datetime(2025, 2, 16), -10.0, salary, "Alex", "work"),
+            (datetime(2025, 2, 18), -700.0, transfer, "Joint", None),
+            (datetime(2025, 2, 18), 700.0, transfer, "Joint", None),
+            (datetime(2025, 2, 20), -1500.0, shares, "Joint", "travel"),
+            (datetime(2025, 2, 21), -12.25, None, "Alex", "work"),
+            (datetime(2025, 2, 22), 3.0, None, "Joint", None),
+            (datetime(2025, 3, 1), -99.0, groceries, "Joint", "work"),  # after the view
+        ]
+        for dt, amount, bucket, spender, tags in rows:
+            test_db.add(models.Transaction(
+                user_id=test_user.id, date=dt, amount=amount, bucket_id=bucket.id if bucket else None,
+                spender=spender, tags=tags, description="Ledger", raw_description="LEDGER"
+            ))
+        test_db.commit()
+        return {"groceries": groceries, "salary": salary, "transfer": transfer, "shares": shares, "rows": rows}
+
+    @staticmethod
+    def _expected(ledger, spender=None, tag=None):
+        """Per-bucket (expense, income) in February and the YTD net before it."""
+        sums, ytd = {}, {}
+        for dt, amount, bucket, row_spender, tags in ledger["rows"]:
+            if spender and row_spender != spender:
+                continue
+            if tag and tag not in (tags or "").lower().split(","):
+                continue
+            bid = bucket.id if bucket else None
+            if dt.month > 2:
+                continue
+            expense, income = sums.get(bid, (0.0, 0.0))
+            if dt.month == 2:
+                sums[bid] = (expense + min(amount, 0.0), income + max(amount, 0.0))
+            else:
+                sums[bid] = (expense, income)
+            ytd[bid] = ytd.get(bid, 0.0) + (amount if dt.month == 1 else 0.0)
+        return sums, ytd
+
+    def _bucket_rows(self, db, user_id, ledger, spender=None, tags=None):
+        groceries = ledger["groceries"]
+        rows, ytd = analytics._dashboard_bucket_rows(
+            db, user_id, get_bucket_tree(db, user_id), datetime(2025, 2, 1), datetime(2025, 2, 28),
+            spender, None, tags, datetime(2025, 1, 1), {groceries.id}
+        )
+        sums = {bid: (round(expense, 2), round(income, 2)) for bid, expense, income, _, _ in rows}
+        flags = {bid: (is_transfer, is_investment) for bid, _, _, is_transfer, is_investment in rows}
+        return sums, flags, {bid: round(net, 2) for bid, net in ytd}
+
+    @pytest.mark.parametrize("path", DASHBOARD_PATHS)
+    @pytest.mark.parametrize("spender", [None, "Alex"])
+    def test_bucket_sums(self, test_db, test_user, ledger, dashboard_path, path, spender):
+        dashboard_path(path)
+        assert (columnar.get_columns(test_db, test_user.id) is not None) == (path == "columnar")
+
+        sums, flags, ytd = self._bucket_rows(test_db, test_user.id, ledger, spender=spender)
+        expected_sums, expected_ytd = self._expected(ledger, spender=spender)
+        assert sums == expected_sums
+        # Net per bucket follows from the two sums
+        assert {bid: round(e + i, 2) for bid, (e, i) in sums.items()} == {
+            bid: round(e + i, 2) for bid, (e, i) in expected_sums.items()
+        }
+        groceries = ledger["groceries"].id
+        assert ytd == {groceries: expected_ytd[groceries]}
+        buckets = {b.id: b for b in (ledger[name] for name in ("groceries", "salary", "transfer", "shares"))}
+        assert flags == {
+            bid: (bool(buckets[bid].is_transfer), bool(buckets[bid].is_investment)) if bid else (False, False)
+            for bid in expected_sums
+        }
+
+    @pytest.mark.parametrize("tags", ["work", "travel"])
+    def test_bucket_sums_with_tags(self, test_db, test_user, ledger, tags):
+        sums, _, ytd = self._bucket_rows(test_db, test_user.id, ledger, tags=tags)
+        expected_sums, expected_ytd = self._expected(ledger, tag=tags)
+        assert sums == expected_sums
+        groceries = ledger["groceries"].id
+        assert ytd == {groceries: expected_ytd[groceries]}
+
+    @pytest.mark.parametrize("path", DASHBOARD_PATHS)
+    def test_totals(self, client, auth_headers, ledger, dashboard_path, path):
+        dashboard_path(path)
+        response = client.get(
+            "/api/analytics/dashboard?start_date=2025-02-01&end_date=2025-02-28", headers=auth_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        # Income: salary net of its negative row. Expenses: groceries net of the
+        # refund plus net uncategorized; transfers and investments are excluded
+        assert data["totals"] == {"income": 3990.0, "expenses": 104.75, "net_savings": 3885.25}
+        groceries = next(b for b in data["buckets"] if b["id"] == ledger["groceries"].id)
+        assert (groceries["spent"], groceries["rollover_amount"]) == (95.5, 45.0)
+
+    def test_totals_with_tags(self, client, auth_headers, ledger):
+        response = client.get(
+            "/api/analytics/dashboard?start_date=2025-02-01&end_date=2025-02-28&tags=work", headers=auth_headers
+        )
+        assert response.status_code == 200
+        # Negative income-bucket rows are not expenses
+        assert response.json()["totals"] == {"income": 0.0, "expenses": 127.75, "net_savings": -127.75}
+
+
 class TestSpendingHistory:
     """Tests for spending history endpoint."""
     
@@ -52,6 +191,65 @@ class TestSpendingHistory:
         data = response.json()
         assert isinstance(data, list)
 
+    def _add_history_txns(self, test_db, test_user, sample_bucket):
+        from backend import models
+        rows = [
+            (datetime(2025, 1, 3, 10, 30), -40.0),
+            (datetime(2025, 1, 3, 18, 0), -10.0),
+            (datetime(2025, 1, 20), 500.0),
+            (datetime(2025, 3, 1), -25.0),
+        ]
+        for dt, amount in rows:
+            test_db.add(models.Transaction(
+                user_id=test_user.id, bucket_id=sample_bucket.id, date=dt,
+                description="History", raw_description="HISTORY", amount=amount, spender="Joint"
+            ))
+        test_db.commit()
+
+    def test_history_monthly_buckets_zero_filled(self, client, auth_headers, test_db, test_user, sample_bucket):
+        """Monthly history returns one point per month with spent and income together."""
+        self._add_history_txns(test_db, test_user, sample_bucket)
+        response = client.get(
+            "/api/analytics/history?start_date=2025-01-15&end_date=2025-03-10",
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert [p["date"] for p in data] == ["2025-01-01", "2025-02-01", "2025-03-01"]
+        assert data[0]["spent"] == 50.0
+        assert data[0]["income"] == 500.0
+        assert data[0]["label"] == "Jan 2025"
+        assert data[1]["spent"] == 0 and data[1]["income"] == 0
+        assert data[2]["spent"] == 25.0
+
+    def test_history_daily_buckets(self, client, auth_headers, test_db, test_user, sample_bucket):
+        """Daily history returns every day in range, summing same-day rows."""
+        self._add_history_txns(test_db, test_user, sample_bucket)
+        response = client.get(
+            "/api/analytics/history?start_date=2025-01-01&end_date=2025-01-31&interval=day",
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data) == 31
+        by_date = {p["date"]: p for p in data}
+        assert by_date["2025-01-03"]["spent"] == 50.0
+        assert by_date["2025-01-03"]["label"] == "03"
+        assert by_date["2025-01-20"]["income"] == 500.0
+        assert by_date["2025-01-04"]["spent"] == 0
+
+    def test_history_weekly_buckets(self, client, auth_headers, test_db, test_user, sample_bucket):
+        """Weekly history buckets start on Mondays."""
+        self._add_history_txns(test_db, test_user, sample_bucket)
+        response = client.get(
+            "/api/analytics/history?start_date=2025-01-01&end_date=2025-01-12&interval=week",
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert [p["date"] for p in data] == ["2024-12-30", "2025-01-06"]
+        assert data[0]["spent"] == 50.0
+
 
 class TestSankeyData:
     """Tests for Sankey diagram data endpoint."""
@@ -178,3 +376,65 @@ class TestPerformanceData:
         data = response.json()
         assert "categories" in data
 
+
+
+class TestCalendar:
+    """Tests for the calendar endpoint's response formats."""
+
+    @pytest.fixture
+    def calendar_txns(self, test_db, test_user, sample_bucket):
+        from backend import models
+        transfer = models.BudgetBucket(name="Transfers", user_id=test_user.id, is_transfer=True)
+        child = models.BudgetBucket(name="Fruit & Veg", user_id=test_user.id, parent_id=sample_bucket.id)
+        test_db.add_all([transfer, child])
+        test_db.commit()
+        rows = [
+            (datetime(2025, 1, 3, 9), -20.0, child.id, "Market"),
+            (datetime(2025, 1, 3, 17), -5.0, None, "Coffee"),
+            (datetime(2025, 1, 3, 18), 100.0, sample_bucket.id, "Refund"),
+            (datetime(2025, 1, 4), -300.0, transfer.id, "To savings"),
+        ]
+        for when, amount, bucket_id, description in rows:
+            test_db.add(models.Transaction(
+                user_id=test_user.id, date=when, amount=amount, bucket_id=bucket_id,
+                description=description, raw_description=description
+            ))
+        test_db.commit()
+        return child, transfer
+
+    def test_columnar_matches_full(self, client, auth_headers, calendar_txns, sample_bucket):
+        """Columnar arrays carry the same rows, with each bucket and its parent listed once."""
+        child, _ = calendar_txns
+        params = "start_date=2025-01-01&end_date=2025-01-31"
+        full = client.get(f"/api/analytics/calendar?{params}", headers=auth_headers).json()
+        response = client.get(f"/api/analytics/calendar?{params}&format=columnar", headers=auth_headers)
+        assert response.status_code == 200
+        data = response.json()
+
+        assert data["count"] == len(full) == 4
+        columns = data["columns"]
+        assert columns["id"] == [t["id"] for t in full]
+        assert columns["date"] == [t["date"] for t in full]
+        assert columns["amount"] == [t["amount"] for t in full]
+        assert columns["bucket_id"] == [t["bucket_id"] for t in full]
+        assert data["buckets"][str(child.id)]["name"] == "Fruit &amp; Veg"
+        assert data["buckets"][str(child.id)]["parent_id"] == sample_bucket.id
+        assert str(sample_bucket.id) in data["buckets"]
+
+    def test_daily_totals_exclude_transfers(self, client, auth_headers, calendar_txns):
+        """Daily format aggregates per day in SQL and skips transfer buckets."""
+        response = client.get(
+            "/api/analytics/calendar?start_date=2025-01-01&end_date=2025-01-31&format=daily",
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert response.json()["days"] == [
+            {"date": "2025-01-03", "expenses": 25.0, "income": 100.0, "count": 3}
+        ]
+
+    def test_unknown_format(self, client, auth_headers):
+        response = client.get(
+            "/api/analytics/calendar?start_date=2025-01-01&end_date=2025-01-31&format=xml",
+            headers=auth_headers
+        )
+        assert response.status_code == 422
@@ -0,0 +1,124 @@
+"""
+Principal Finance - Anomaly Detection Tests
+
+Tests for:
+- Vectorised spike thresholds (z-score and median/MAD)
+- SQL moments and percentiles for the large-transaction threshold
+- /analytics/anomalies end to end
+"""
+import statistics
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from backend import models
+from backend.services import anomalies
+
+
+class TestSpikeThresholds:
+    """Per-bucket thresholds computed for all buckets at once."""
+
+    def test_zscore_matches_statistics(self):
+        history = np.array([
+            [100.0, 120.0, 80.0, np.nan],
+            [50.0, np.nan, np.nan, np.nan],
+        ])
+        baseline, threshold, high = anomalies.spike_thresholds(history, "zscore", 2.0)
+
+        values = [100.0, 120.0, 80.0]
+        assert baseline[0] == pytest.approx(statistics.mean(values))
+        assert threshold[0] == pytest.approx(statistics.mean(values) + 2 * statistics.stdev(values))
+        assert high[0] == pytest.approx(statistics.mean(values) + 3 * statistics.stdev(values))
+        # A single month has no spread: fall back to 1.5x the average
+        assert threshold[1] == pytest.approx(75.0)
+        assert high[1] == pytest.approx(50.0)
+
+    def test_mad_ignores_one_extreme_month(self):
+        history = np.array([[100.0, 110.0, 90.0, 105.0, 2000.0]])
+        _, z_threshold, _ = anomalies.spike_thresholds(history, "zscore", 2.0)
+        baseline, mad_threshold, _ = anomalies.spike_thresholds(history, "mad", 2.0)
+        assert baseline[0] == 105.0
+        assert mad_threshold[0] < 150.0 < z_threshold[0]
+
+    def test_sensitivity(self):
+        history = np.array([[100.0, 120.0, 80.0]])
+        _, loose, _ = anomalies.spike_thresholds(history, "zscore", 3.0)
+        _, tight, _ = anomalies.spike_thresholds(history, "zscore", 1.0)
+        assert tight[0] < loose[0]
+
+
+class TestAmountAggregates:
+    """Large-transaction statistics are computed in SQL."""
+
+    def _filters(self, user):
+        return [models.Transaction.user_id == user.id, models.Transaction.amount < 0]
+
+    def test_moments_and_percentile(self, test_db, test_user):
+        amounts = [10.0, 20.0, 30.0, 40.0, 500.0]
+        for i, amount in enumerate(amounts):
+            test_db.add(models.Transaction(
+                user_id=test_user.id, date=datetime(2025, 1, i + 1), description="x",
+                raw_description="x", amount=-amount
+            ))
+        test_db.commit()
+
+        count, mean, std = anomalies.amount_moments(test_db, self._filters(test_user))
+        assert count == 5
+        assert mean == pytest.approx(statistics.mean(amounts))
+        assert std == pytest.approx(statistics.stdev(amounts))
+
+        assert anomalies.amount_percentile(test_db, self._filters(test_user), 80) == 40.0
+        assert anomalies.amount_percentile(test_db, self._filters(test_user), 99) == 500.0
+
+    def test_empty(self, test_db, test_user):
+        assert anomalies.amount_moments(test_db, self._filters(test_user)) == (0, 0.0, 0.0)
+        assert anomalies.amount_percentile(test_db, self._filters(test_user), 95) is None
+
+
+class TestAnomaliesEndpoint:
+    """Category spikes come from monthly rollups; large expenses from SQL aggregates."""
+
+    @pytest.fixture
+    def spike_data(self, test_db, test_user, sample_bucket):
+        today = datetime.now()
+        month = today.replace(day=1, hour=12)
+        for back in range(1, 5):
+            past = (month - timedelta(days=back * 28)).replace(day=2)
+            test_db.add(models.Transaction(
+                user_id=test_user.id, bucket_id=sample_bucket.id, date=past,
+                description="Groceries", raw_description="GROCERIES", amount=-(100.0 + back)
+            ))
+        test_db.add(models.Transaction(
+            user_id=test_user.id, bucket_id=sample_bucket.id, date=month,
+            description="Big shop", raw_description="BIG SHOP", amount=-900.0
+        ))
+        test_db.commit()
+
+    def test_category_spike(self, client, auth_headers, spike_data):
+        response = client.get("/api/analytics/anomalies", headers=auth_headers)
+        assert response.status_code == 200
+        spikes = [a for a in response.json() if a["type"] == "category_spike"]
+        assert len(spikes) == 1
+        assert spikes[0]["amount"] == 900.0
+        assert spikes[0]["severity"] == "high"
+
+        # Too few recent expenses for 900 to clear mean + 2 stdev
+        assert not any(a["type"] == "large_transaction" for a in response.json())
+
+    def test_parameters(self, client, auth_headers, spike_data):
+        response = client.get(
+            "/api/analytics/anomalies?method=mad&sensitivity=3&large_percentile=95", headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert any(a["type"] == "category_spike" for a in response.json())
+        # The 95th percentile of recent expenses is the 900 itself, so nothing exceeds it
+        assert not any(a["type"] == "large_transaction" for a in response.json())
+
+        response = client.get("/api/analytics/anomalies?method=bogus", headers=auth_headers)
+        assert response.status_code == 422
+
+    def test_empty(self, client, auth_headers):
+        response = client.get("/api/analytics/anomalies", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json() == []
@@ -0,0 +1,84 @@
+"""
+Principal Finance - Bucket Hierarchy Index Tests
+
+Tests for:
+- BucketTree lookups (children, ancestors, subtrees, income groups, rollup)
+- Self-references and cycles
+- Memoization and rebuild after bucket writes
+"""
+from backend import models
+from backend.services.bucket_tree import BucketTree, get_bucket_tree
+
+
+def _tree(*rows):
+    # (id, parent_id, group, is_transfer, is_investment, display_order)
+    return BucketTree(rows)
+
+
+class TestBucketTree:
+    """Precomputed hierarchy lookups."""
+
+    def test_lookups(self):
+        tree = _tree(
+            (1, None, "Discretionary", False, False, 2),
+            (2, 1, "Discretionary", False, False, 1),
+            (3, 2, "Discretionary", False, False, 0),
+            (4, 1, "Discretionary", False, False, 0),
+            (5, None, "Income", False, False, 1),
+            (6, 5, "Discretionary", False, False, 0),
+            (7, None, "Transfers", True, False, 0),
+            (8, None, "Discretionary", False, True, 3),
+        )
+        assert tree.roots == (7, 5, 1, 8)
+        assert tree.children(1) == (4, 2)
+        assert tree.ancestors(3) == (2, 1)
+        assert tree.root(3) == 1
+        assert tree.subtree(1) == {1, 2, 3, 4}
+        assert tree.descendants(2) == {3}
+        assert tree.subtree([2, 99]) == {2, 3, 99}
+        assert tree.is_income(5) and tree.is_income(6) and not tree.is_income(1)
+        assert tree.is_transfer(7) and tree.is_investment(8)
+        assert not tree.has_children(3)
+
+        rolled = tree.rollup({1: 1.0, 2: 10.0, 3: 100.0, 4: 1000.0})
+        assert rolled[1] == 1111.0
+        assert rolled[2] == 110.0
+        assert rolled[5] == 0.0
+
+    def test_self_reference_and_cycles(self):
+        tree = _tree(
+            (1, 1, None, False, False, 0),
+            (2, 3, None, False, False, 0),
+            (3, 2, None, False, False, 0),
+            (4, 42, None, False, False, 0),
+        )
+        assert tree.roots == (1, 4)
+        assert tree.subtree(2) == {2, 3}
+        assert tree.root(2) == 3
+
+
+class TestBucketTreeCache:
+    """Trees are memoized per user and rebuilt after bucket writes."""
+
+    def test_rebuilt_after_bucket_write(self, test_db, test_user, sample_bucket):
+        tree = get_bucket_tree(test_db, test_user.id)
+        assert get_bucket_tree(test_db, test_user.id) is tree
+
+        child = models.BudgetBucket(name="Snacks", user_id=test_user.id, parent_id=sample_bucket.id)
+        test_db.add(child)
+        test_db.commit()
+
+        rebuilt = get_bucket_tree(test_db, test_user.id)
+        assert rebuilt is not tree
+        assert rebuilt.children(sample_bucket.id) == (child.id,)
+
+    def test_settings_tree_endpoint(self, client, auth_headers, test_db, test_user, sample_bucket):
+        child = models.BudgetBucket(name="Snacks", user_id=test_user.id, parent_id=sample_bucket.id)
+        test_db.add(child)
+        test_db.commit()
+
+        response = client.get("/api/settings/buckets/tree", headers=auth_headers)
+        assert response.status_code == 200
+        roots = {node["id"]: node for node in response.json()}
+        assert child.id not in roots
+        assert [c["id"] for c in roots[sample_bucket.id]["children"]] == [child.id]
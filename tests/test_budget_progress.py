@@ -0,0 +1,114 @@
+"""
+Principal Finance - Budget Progress Tests
+
+Tests for:
+- Period (bucket, spender) and history (bucket, month) sums from one statement
+- Rollup-table and transaction-table sources agreeing
+- /analytics/budget-progress totals, member breakdown and sparkline
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event
+
+from backend import models
+from backend.services import budget_progress, rollups  # noqa: F401 - rollups registers the write listeners
+
+
+def _txn(user_id, when, amount, bucket_id, spender="Joint"):
+    return models.Transaction(
+        user_id=user_id, date=when, amount=amount, bucket_id=bucket_id, spender=spender,
+        description="Shop", raw_description="SHOP"
+    )
+
+
+class TestSpendingSets:
+
+    def test_period_and_history_in_one_statement(self, test_db, test_user, sample_bucket):
+        test_db.add_all([
+            _txn(test_user.id, datetime(2025, 1, 5), -30.0, sample_bucket.id, "Alice"),
+            _txn(test_user.id, datetime(2025, 1, 20), -20.0, sample_bucket.id),
+            _txn(test_user.id, datetime(2025, 1, 22), 5.0, sample_bucket.id),  # refund
+            _txn(test_user.id, datetime(2024, 12, 10), -70.0, sample_bucket.id, "Alice"),
+            _txn(test_user.id, datetime(2024, 12, 11), -99.0, None),
+        ])
+        test_db.commit()
+        user_id, bucket_id = test_user.id, sample_bucket.id
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(test_db.get_bind(), "before_cursor_execute", listener)
+        try:
+            # Custom period (transactions table)
+            period, history = budget_progress.spending_sets(
+                test_db, user_id, date(2025, 1, 1), date(2025, 1, 21),
+                date(2024, 12, 1), date(2025, 1, 1), bucket_ids=[bucket_id]
+            )
+            # Whole month (rollup table)
+            month_period, month_history = budget_progress.spending_sets(
+                test_db, user_id, date(2025, 1, 1), date(2025, 1, 31),
+                date(2024, 12, 1), date(2025, 1, 1), bucket_ids=[bucket_id]
+            )
+        finally:
+            event.remove(test_db.get_bind(), "before_cursor_execute", listener)
+
+        assert len(statements) == 2
+        assert sorted(period) == [(sample_bucket.id, "Alice", -30.0), (sample_bucket.id, "Joint", -20.0)]
+        assert sorted(history) == [(sample_bucket.id, date(2024, 12, 1), -70.0), (sample_bucket.id, date(2025, 1, 1), -45.0)]
+        assert sorted(month_period) == [(sample_bucket.id, "Alice", -30.0), (sample_bucket.id, "Joint", -15.0)]
+        assert sorted(month_history) == sorted(history)
+
+    def test_last_day_timestamp_matches_rollup(self, test_db, test_user, sample_bucket, monkeypatch):
+        test_db.add_all([
+            _txn(test_user.id, datetime(2025, 1, 1), -10.0, sample_bucket.id),
+            _txn(test_user.id, datetime(2025, 1, 31, 18, 45), -7.0, sample_bucket.id),
+        ])
+        test_db.commit()
+        args = (test_db, test_user.id, date(2025, 1, 1), date(2025, 1, 31), date(2025, 1, 1), date(2025, 1, 1))
+        from_rollup = budget_progress.spending_sets(*args, bucket_ids=[sample_bucket.id])
+        monkeypatch.setattr(rollups, "whole_month_span", lambda start, end: None)
+        scanned = budget_progress.spending_sets(*args, bucket_ids=[sample_bucket.id])
+        assert scanned == from_rollup
+        assert scanned[0] == [(sample_bucket.id, "Joint", -17.0)]
+
+    def test_spender_filter(self, test_db, test_user, sample_bucket):
+        test_db.add_all([
+            _txn(test_user.id, datetime(2025, 1, 5), -30.0, sample_bucket.id, "Alice"),
+            _txn(test_user.id, datetime(2025, 1, 6), -20.0, sample_bucket.id),
+        ])
+        test_db.commit()
+        period, history = budget_progress.spending_sets(
+            test_db, test_user.id, date(2025, 1, 2), date(2025, 1, 31),
+            date(2025, 1, 1), date(2025, 1, 1), bucket_ids=[sample_bucket.id], spender="Alice"
+        )
+        assert period == [(sample_bucket.id, "Alice", -30.0)]
+        assert history == [(sample_bucket.id, date(2025, 1, 1), -30.0)]
+
+
+class TestBudgetProgressEndpoint:
+
+    def test_totals_members_and_sparkline(self, client, auth_headers, test_db, test_user, sample_bucket):
+        alice = models.HouseholdMember(user_id=test_user.id, name="Alice", color="#f00")
+        test_db.add(alice)
+        test_db.commit()
+        test_db.add_all([
+            models.BudgetLimit(bucket_id=sample_bucket.id, amount=100.0),
+            models.BudgetLimit(bucket_id=sample_bucket.id, member_id=alice.id, amount=50.0),
+        ])
+        this_month = date.today().replace(day=1)
+        last_month = rollups.month_start(this_month - timedelta(days=1))
+        test_db.add_all([
+            _txn(test_user.id, datetime.combine(this_month, datetime.min.time()), -60.0, sample_bucket.id, "Alice"),
+            _txn(test_user.id, datetime.combine(this_month, datetime.min.time()), -30.0, sample_bucket.id),
+            _txn(test_user.id, datetime.combine(last_month, datetime.min.time()), -45.0, sample_bucket.id),
+        ])
+        test_db.commit()
+
+        response = client.get("/api/analytics/budget-progress", headers=auth_headers)
+        assert response.status_code == 200
+        category = next(c for c in response.json()["categories"] if c["id"] == sample_bucket.id)
+        assert category["spent"] == 90.0
+        assert category["limit"] == 150.0
+        assert [m["name"] for m in category["by_member"]] == ["Alice"]
+        assert category["by_member"][0]["limit"] == 50.0
+        assert [h["amount"] for h in category["history"][-2:]] == [45.0, 90.0]
+        assert category["history"][-1]["is_selected"] is True
@@ -0,0 +1,226 @@
+"""
+Principal Finance - Response Cache Tests
+
+Tests for:
+- Analytics responses served from Redis on repeat requests
+- Per-user generation bumps on write paths
+- Pattern invalidation via SCAN
+- In-process LRU tier: limits, TTL, stats and memory-only mode
+"""
+import fnmatch
+import pytest
+
+from backend import cache
+
+
+class FakeRedis:
+    """Minimal in-memory stand-in for the redis-py calls used by backend.cache."""
+
+    def __init__(self):
+        self.store = {}
+        self.published = []
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value, nx=False):
+        if nx and key in self.store:
+            return None
+        self.store[key] = str(value)
+        return True
+
+    def setex(self, key, ttl, value):
+        self.store[key] = value
+
+    def incr(self, key):
+        self.store[key] = str(int(self.store.get(key, 0)) + 1)
+        return int(self.store[key])
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+        return 0
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self.store.pop(key, None) is not None)
+
+    def scan_iter(self, match="*", count=None):
+        return [key for key in list(self.store) if fnmatch.fnmatch(key, match)]
+
+    def pipeline(self):
+        redis = self
+
+        class Pipeline:
+            def __init__(self):
+                self.calls = []
+
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+            def execute(self):
+                return [getattr(redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+        return Pipeline()
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(cache, "get_redis", lambda: redis)
+    return redis
+
+
+def _dashboard(client, auth_headers):
+    response = client.get(
+        "/api/analytics/dashboard?start_date=2025-01-01&end_date=2025-01-31", headers=auth_headers
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+class TestCachedResponses:
+    """Analytics GETs are cached per user and invalidated by writes."""
+
+    def test_repeat_request_hits_cache(self, client, auth_headers, fake_redis, test_user, sample_bucket):
+        first = _dashboard(client, auth_headers)
+        keys = [k for k in fake_redis.store if k.startswith(f"analytics:dashboard:{test_user.id}:")]
+        assert len(keys) == 1
+
+        # A hit returns the stored payload unchanged
+        assert _dashboard(client, auth_headers) == first
+        assert len([k for k in fake_redis.store if k.startswith("analytics:dashboard:")]) == 1
+
+    def test_transaction_write_bumps_generation(self, client, auth_headers, fake_redis, test_user, sample_bucket):
+        before = _dashboard(client, auth_headers)
+        generation = cache.get_generation(test_user.id)
+
+        response = client.post("/api/transactions/", headers=auth_headers, json={
+            "date": "2025-01-10T12:00:00", "description": "Coffee", "amount": -4.5,
+            "bucket_id": sample_bucket.id, "spender": "Joint"
+        })
+        assert response.status_code == 200
+        assert cache.get_generation(test_user.id) != generation
+
+        after = _dashboard(client, auth_headers)
+        assert after["totals"]["expenses"] == before["totals"]["expenses"] + 4.5
+
+    def test_bucket_write_bumps_generation(self, client, auth_headers, fake_redis, test_user):
+        generation = cache.get_generation(test_user.id)
+        response = client.post("/api/settings/buckets", headers=auth_headers, json={"name": "Pets"})
+        assert response.status_code == 200
+        assert cache.get_generation(test_user.id) != generation
+
+    def test_local_tier_serves_repeat_hits(self, client, auth_headers, fake_redis, sample_bucket):
+        _dashboard(client, auth_headers)
+        fake_redis.store = {k: v for k, v in fake_redis.store.items() if not k.startswith("analytics:")}
+
+        hits = cache.cache_stats()["local"]["hits"]
+        _dashboard(client, auth_headers)
+        assert cache.cache_stats()["local"]["hits"] == hits + 1
+
+    def test_bump_publishes_and_drops_local_entries(self, client, auth_headers, fake_redis, test_user, sample_bucket):
+        _dashboard(client, auth_headers)
+        assert cache.cache_stats()["local"]["entries"] > 0
+
+        cache.bump_generation(test_user.id)
+        assert fake_redis.published[-1] == (cache.INVALIDATION_CHANNEL, test_user.id)
+        assert cache.cache_stats()["local"]["entries"] == 0
+
+    def test_invalidation_message_forgets_generation(self, fake_redis, test_user):
+        generation = cache.get_generation(test_user.id)
+        # Another worker bumps the counter and publishes
+        fake_redis.incr(cache._generation_key(test_user.id))
+        assert cache.get_generation(test_user.id) == generation
+        cache._forget_user(test_user.id)
+        assert cache.get_generation(test_user.id) != generation
+
+    def test_forget_during_read_is_not_undone(self, fake_redis, test_user, monkeypatch):
+        key = cache._generation_key(test_user.id)
+        fake_redis.set(key, 5)
+        read = fake_redis.get
+
+        def racing_read(name):
+            value = read(name)
+            if name == key and value == "5":
+                # Another worker bumps; its message lands before this read is remembered
+                fake_redis.incr(key)
+                cache._forget_user(test_user.id)
+            return value
+        monkeypatch.setattr(fake_redis, "get", racing_read)
+
+        assert cache.get_generation(test_user.id) == "5"
+        assert cache.get_generation(test_user.id) == "6"
+
+
+class TestMemoryOnlyMode:
+    """Without Redis the in-process tier caches on its own."""
+
+    @pytest.fixture(autouse=True)
+    def no_redis(self, monkeypatch):
+        monkeypatch.setattr(cache, "get_redis", lambda: None)
+
+    def test_cached_and_invalidated(self, client, auth_headers, test_user, sample_bucket):
+        assert cache.cache_mode() == "memory"
+        first = _dashboard(client, auth_headers)
+        hits = cache.cache_stats()["local"]["hits"]
+        assert _dashboard(client, auth_headers) == first
+        assert cache.cache_stats()["local"]["hits"] == hits + 1
+
+        response = client.post("/api/transactions/", headers=auth_headers, json={
+            "date": "2025-01-10T12:00:00", "description": "Coffee", "amount": -4.5,
+            "bucket_id": sample_bucket.id, "spender": "Joint"
+        })
+        assert response.status_code == 200
+        assert _dashboard(client, auth_headers)["totals"]["expenses"] == first["totals"]["expenses"] + 4.5
+
+    def test_auto_is_off_under_several_workers(self, monkeypatch):
+        monkeypatch.setenv("WEB_CONCURRENCY", "4")
+        assert cache.cache_mode() == "off"
+        monkeypatch.setenv("CACHE_MODE", "memory")
+        assert cache.cache_mode() == "memory"
+
+    def test_mode_off(self, client, auth_headers, monkeypatch, sample_bucket):
+        monkeypatch.setenv("CACHE_MODE", "off")
+        _dashboard(client, auth_headers)
+        _dashboard(client, auth_headers)
+        assert cache.cache_stats()["local"]["entries"] == 0
+
+
+class TestLocalCache:
+    """LRU bounds, TTL expiry and counters."""
+
+    def test_entry_limit_evicts_least_recent(self):
+        local = cache.LocalCache(max_entries=2)
+        local.set("a", 1, ttl=60)
+        local.set("b", 2, ttl=60)
+        assert local.get("a") == 1
+        local.set("c", 3, ttl=60)
+        assert local.get("b") is cache._MISSING
+        assert local.stats()["evictions"] == 1
+        assert local.stats()["entries"] == 2
+
+    def test_byte_limit(self):
+        local = cache.LocalCache(max_entries=10, max_bytes=100)
+        local.set("a", "x", ttl=60, size=60)
+        local.set("b", "y", ttl=60, size=60)
+        assert local.get("a") is cache._MISSING
+        local.set("huge", "z", ttl=60, size=500)
+        assert local.get("huge") is cache._MISSING
+        assert local.stats()["bytes"] == 60
+
+    def test_ttl_expiry(self, monkeypatch):
+        local = cache.LocalCache()
+        now = [1000.0]
+        monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+        local.set("a", 1, ttl=5)
+        now[0] += 6
+        assert local.get("a") is cache._MISSING
+        assert local.stats()["expirations"] == 1
+
+
+class TestInvalidateCache:
+    """Pattern invalidation uses SCAN and deletes only matching keys."""
+
+    def test_scan_delete(self, fake_redis):
+        fake_redis.store.update({"txn:a:1": "x", "txn:b:1": "y", "analytics:a:1": "z"})
+        cache.invalidate_cache("txn:*")
+        assert list(fake_redis.store) == ["analytics:a:1"]
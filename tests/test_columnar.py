@@ -0,0 +1,225 @@
+"""
+Principal Finance - Columnar Transaction Store Tests
+
+Tests for:
+- Column masks, per-bucket and per-period sums
+- Patching loaded columns from committed writes and following the generation
+- Invalidation on bulk writes, bucket deletion and rollback
+- Dashboard / history results with the store on and off
+"""
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+from backend import cache, models
+from backend.services import columnar
+
+
+def _txn(user_id, day, amount, bucket_id=None, **kwargs):
+    return models.Transaction(
+        user_id=user_id, date=datetime(2025, 1, day), amount=amount, bucket_id=bucket_id,
+        description="Shop", raw_description="SHOP", **kwargs
+    )
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Count column loads from the database."""
+    calls = []
+    original = columnar.load_columns
+
+    def counting(db, user_id, generation=None):
+        calls.append(user_id)
+        return original(db, user_id, generation)
+
+    monkeypatch.setattr(columnar, "load_columns", counting)
+    return calls
+
+
+class TestColumns:
+
+    ROWS = [
+        (1, datetime(2025, 1, 1), -10.0, 3, "Joint", None, 0),
+        (2, datetime(2025, 1, 7, 12), -5.0, None, "A", 2, columnar.FLAG_VERIFIED),
+        (3, datetime(2025, 1, 8), 20.0, 3, "A", 2, 0),
+        (4, None, -1.0, 4, "Joint", None, 0),
+    ]
+
+    def test_masks_and_bucket_sums(self):
+        store = columnar.TransactionColumns.from_rows(self.ROWS)
+        assert store.bucket_ids == [None, 3, 4]
+        assert store.spenders == ("Joint", "A")
+
+        rows = store.select(start=datetime(2025, 1, 1), through=datetime(2025, 1, 7, 12))
+        assert rows.tolist() == [True, True, False, False]
+        assert store.bucket_sums(rows).tolist() == [-5.0, -10.0, 0.0]
+        assert store.select(spender="A", account_id=2).tolist() == [False, True, True, False]
+        assert not store.select(spender="Nobody").any()
+        assert store.in_buckets([None]).tolist() == [False, True, False, False]
+
+    def test_period_sums(self):
+        store = columnar.TransactionColumns.from_rows(self.ROWS)
+        rows = store.select(start=datetime(2025, 1, 1))
+        keys, sums = store.period_sums("week", rows & (store.amount < 0), rows & (store.amount > 0))
+        # 2025-01-01 is a Wednesday; weeks start on Monday
+        assert keys == [date(2024, 12, 30), date(2025, 1, 6)]
+        assert sums.tolist() == [[-10.0, -5.0], [0.0, 20.0]]
+
+        keys, sums = store.period_sums("month", rows)
+        assert keys == [date(2025, 1, 1)] and sums.tolist() == [[5.0]]
+
+    def test_patched_copy(self):
+        store = columnar.TransactionColumns.from_rows(self.ROWS, generation="4")
+        patched = store.patched(
+            {5: (datetime(2025, 2, 1), 7.0, 9, "B", 1, 0), 1: (datetime(2025, 1, 1), -12.0, 3, "Joint", None, 0)},
+            {2},
+        )
+        assert patched.id.tolist() == [1, 3, 4, 5]
+        assert patched.amount.tolist() == [-12.0, 20.0, -1.0, 7.0]
+        assert patched.bucket_ids == [3, 4, 9]
+        assert [patched.spenders[c] for c in patched.spender] == ["Joint", "A", "Joint", "B"]
+        assert patched.generation == "4"
+        # The original is untouched
+        assert store.id.tolist() == [1, 2, 3, 4]
+
+
+class TestStoreFreshness:
+
+    def test_commit_patches_without_reload(self, test_db, test_user, sample_bucket, loads):
+        test_db.add(_txn(test_user.id, 2, -40.0, sample_bucket.id))
+        test_db.commit()
+        store = columnar.get_columns(test_db, test_user.id)
+        assert len(store) == 1 and loads == [test_user.id]
+
+        test_db.add(_txn(test_user.id, 3, -60.0, sample_bucket.id, spender="Partner"))
+        existing = test_db.query(models.Transaction).first()
+        existing.amount = -45.0
+        test_db.commit()
+        cache.bump_generation(test_user.id)
+
+        store = columnar.get_columns(test_db, test_user.id)
+        assert loads == [test_user.id]
+        assert store.amount.tolist() == [-45.0, -60.0]
+        assert "Partner" in store.spenders
+
+        test_db.delete(existing)
+        test_db.commit()
+        cache.bump_generation(test_user.id)
+        assert columnar.get_columns(test_db, test_user.id).amount.tolist() == [-60.0]
+        assert loads == [test_user.id]
+
+    def test_generation_jump_reloads(self, test_db, test_user, loads):
+        columnar.get_columns(test_db, test_user.id)
+        test_db.add(_txn(test_user.id, 2, -40.0))
+        test_db.commit()
+        cache.bump_generation(test_user.id)
+        columnar.get_columns(test_db, test_user.id)
+        assert len(loads) == 1  # A bump behind a patched commit is followed...
+
+        # ...one that no applied write accounts for is not
+        cache.bump_generation(test_user.id)
+        assert len(columnar.get_columns(test_db, test_user.id)) == 1
+        assert len(loads) == 2
+
+        # ...nor is a generation that moved on elsewhere
+        with cache._generations_lock:
+            cache._local_generations[test_user.id] = ("10", 0.0)
+        columnar.get_columns(test_db, test_user.id)
+        assert len(loads) == 3
+
+    def test_bulk_update_and_bucket_delete_evict(self, test_db, test_user, sample_bucket, loads):
+        test_db.add(_txn(test_user.id, 2, -40.0, sample_bucket.id))
+        test_db.commit()
+        columnar.get_columns(test_db, test_user.id)
+
+        test_db.query(models.Transaction).filter(
+            models.Transaction.user_id == test_user.id
+        ).update({models.Transaction.amount: -1.0}, synchronize_session=False)
+        test_db.commit()
+        cache.bump_generation(test_user.id)
+        assert columnar.get_columns(test_db, test_user.id).amount.tolist() == [-1.0]
+        assert len(loads) == 2
+
+        test_db.delete(sample_bucket)
+        test_db.commit()
+        cache.bump_generation(test_user.id)
+        columnar.get_columns(test_db, test_user.id)
+        assert len(loads) == 3
+
+    def test_rollback_discards_pending_writes(self, test_db, test_user, loads):
+        store = columnar.get_columns(test_db, test_user.id)
+        test_db.add(_txn(test_user.id, 2, -40.0))
+        test_db.flush()
+        test_db.rollback()
+        assert columnar.get_columns(test_db, test_user.id) is store
+        assert len(store) == 0
+
+    def test_disabled(self, test_db, test_user, monkeypatch):
+        monkeypatch.setenv("COLUMNAR_CACHE", "off")
+        assert columnar.get_columns(test_db, test_user.id) is None
+        monkeypatch.setenv("COLUMNAR_CACHE", "on")
+        monkeypatch.setenv("CACHE_MODE", "off")
+        assert columnar.get_columns(test_db, test_user.id) is None
+
+
+class TestEndpointsMatchSql:
+
+    @pytest.fixture
+    def history(self, test_db, test_user, sample_bucket):
+        transfer = models.BudgetBucket(name="Transfers", user_id=test_user.id, is_transfer=True)
+        salary = models.BudgetBucket(name="Salary", user_id=test_user.id, group="Income")
+        test_db.add_all([transfer, salary])
+        test_db.commit()
+        rng = np.random.default_rng(5)
+        buckets = [None, sample_bucket.id, transfer.id, salary.id]
+        for i in range(200):
+            test_db.add(models.Transaction(
+                user_id=test_user.id, date=datetime(2025, 1, 1 + i % 28, int(rng.integers(0, 24))),
+                amount=round(float(rng.uniform(-300, 200)), 2), bucket_id=buckets[i % 4],
+                spender=("Joint", "A")[i % 2], account_id=(None, 1, 2)[i % 3],
+                description="Shop", raw_description="SHOP"
+            ))
+        test_db.commit()
+        return sample_bucket, transfer
+
+    @pytest.mark.parametrize("url", [
+        "/api/analytics/dashboard?start_date=2025-01-03&end_date=2025-01-20T12:00:00",
+        "/api/analytics/dashboard?start_date=2025-01-05&end_date=2025-01-25&spender=A&account_id=1",
+        "/api/analytics/history?start_date=2025-01-01&end_date=2025-01-31&interval=day",
+        "/api/analytics/history?start_date=2025-01-02&end_date=2025-01-28&interval=week&spender=Joint",
+        "/api/analytics/anomalies?large_percentile=90",
+    ])
+    def test_store_matches_sql(self, client, auth_headers, history, monkeypatch, url):
+        responses = []
+        for flag in ("off", "on"):
+            monkeypatch.setenv("COLUMNAR_CACHE", flag)
+            cache.clear_local_cache()
+            response = client.get(url, headers=auth_headers)
+            assert response.status_code == 200
+            responses.append(response.json())
+        assert _rounded(responses[0]) == _rounded(responses[1])
+
+    def test_history_exclusions(self, client, auth_headers, history, monkeypatch):
+        groceries, transfer = history
+        url = (
+            "/api/analytics/history?start_date=2025-01-01&end_date=2025-01-31&interval=week"
+            f"&bucket_ids={groceries.id},{transfer.id}&exact_bucket_ids=true"
+        )
+        responses = []
+        for flag in ("off", "on"):
+            monkeypatch.setenv("COLUMNAR_CACHE", flag)
+            cache.clear_local_cache()
+            responses.append(_rounded(client.get(url, headers=auth_headers).json()))
+        assert responses[0] == responses[1]
+        assert any(point["income"] for point in responses[1])
+
+
+def _rounded(value):
+    if isinstance(value, dict):
+        return {k: _rounded(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_rounded(v) for v in value]
+    if isinstance(value, float):
+        return round(value, 6)
+    return value
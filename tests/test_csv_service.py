@@ -0,0 +1,128 @@
+"""
+Principal Finance - CSV Mapping Tests
+
+Tests for:
+- Date parsing: inferred format, user-selected format, day-first fallback
+- Currency cleaning and debit/credit combining
+- Structured reject list for malformed rows
+- Chunked streaming of spooled files through a queued import job
+"""
+import os
+import time
+from datetime import datetime
+from functools import partial
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from backend.routers import ingestion
+from backend.services import job_queue
+from backend.services.csv_service import iter_transactions, process_csv, read_transactions
+
+MAPPING = {"date": "Date", "description": "Desc", "amount": "Amount"}
+
+
+def test_single_amount_column():
+    csv = b'Date,Desc,Amount\n02/01/2025,Coffee,"$1,234.50"\n03/01/2025,Rent,-20\n04/01/2025,Empty,\n'
+    txns = process_csv(csv, MAPPING)
+    assert [t["date"] for t in txns] == [datetime(2025, 1, 2), datetime(2025, 1, 3), datetime(2025, 1, 4)]
+    assert [t["amount"] for t in txns] == [1234.5, -20.0, 0.0]
+
+
+def test_iso_dates_are_year_month_day():
+    txns = process_csv(b"Date,Desc,Amount\n2025-01-02,Coffee,-4.5\n", MAPPING)
+    assert txns[0]["date"] == datetime(2025, 1, 2)
+
+
+def test_user_selected_format_with_day_first_fallback():
+    csv = b"Date,Desc,Amount\n01/02/2025,A,-1\n2 Mar 2025,B,-2\n"
+    txns, rejects = read_transactions(csv, dict(MAPPING, date_format="%m/%d/%Y"))
+    assert [t["date"] for t in txns] == [datetime(2025, 1, 2), datetime(2025, 3, 2)]
+    assert rejects == []
+
+
+def test_debit_credit_columns():
+    csv = b"Date,Desc,Debit,Credit\n02/01/2025,Shop,-50.00,\n03/01/2025,Pay,,1000\n04/01/2025,Fee,2.5,\n"
+    txns = process_csv(csv, {"date": "Date", "description": "Desc", "debit": "Debit", "credit": "Credit"})
+    assert [t["amount"] for t in txns] == [-50.0, 1000.0, -2.5]
+
+
+def test_rejects_are_structured():
+    csv = b"Date,Desc,Amount\n02/01/2025,Good,-1\nnot a date,Bad date,-2\n03/01/2025,Bad amount,12abc\n"
+    txns, rejects = read_transactions(csv, MAPPING)
+    assert [t["description"] for t in txns] == ["Good"]
+    assert rejects == [
+        {"row": 3, "field": "date", "value": "not a date", "error": "Unrecognised date"},
+        {"row": 4, "field": "amount", "value": "12abc", "error": "Not a number"},
+    ]
+
+
+def test_missing_mapped_column():
+    with pytest.raises(ValueError, match="Amt"):
+        process_csv(b"Date,Desc,Amount\n02/01/2025,A,1\n", dict(MAPPING, amount="Amt"))
+
+
+def test_large_export_is_fast():
+    rows = "".join(f"{(i % 28) + 1:02d}/01/2025,Merchant {i},-{i % 500}.{i % 100:02d}\n" for i in range(50_000))
+    csv = ("Date,Desc,Amount\n" + rows).encode()
+    started = time.perf_counter()
+    txns = process_csv(csv, MAPPING)
+    assert len(txns) == 50_000
+    assert time.perf_counter() - started < 2.0
+
+
+def test_iter_transactions_chunks_keep_line_numbers(tmp_path):
+    path = tmp_path / "big.csv"
+    path.write_text("Date,Desc,Amount\n02/01/2025,A,-1\n03/01/2025,B,-2\nbad,C,-3\n04/01/2025,D,-4\n05/01/2025,E,-5\n")
+    chunks = list(iter_transactions(str(path), MAPPING, chunksize=2))
+    assert [rows for _, _, rows in chunks] == [2, 2, 1]
+    assert [t["description"] for txns, _, _ in chunks for t in txns] == ["A", "B", "D", "E"]
+    assert [r["row"] for _, rejects, _ in chunks for r in rejects] == [4]
+
+
+
+def test_iter_transactions_infers_date_format_once(tmp_path):
+    path = tmp_path / "us.csv"
+    path.write_text("Date,Desc,Amount\n12/31/2025,A,-1\n12/31/2025,B,-2\n01/02/2026,C,-3\n01/06/2026,D,-4\n")
+    whole, _ = read_transactions(path.read_bytes(), MAPPING)
+    chunked = [t for txns, _, _ in iter_transactions(str(path), MAPPING, chunksize=2) for t in txns]
+    assert [t["date"] for t in chunked] == [t["date"] for t in whole]
+    assert chunked[2]["date"] == datetime(2026, 1, 2)
+
+class TestStreamingImportJob:
+    """The background job stages previews chunk by chunk."""
+
+    @pytest.fixture
+    def job_env(self, monkeypatch, test_engine):
+        monkeypatch.setattr(ingestion, "SessionLocal", sessionmaker(bind=test_engine))
+        monkeypatch.setattr(ingestion, "iter_transactions", partial(iter_transactions, chunksize=2))
+        return sessionmaker(bind=test_engine)
+
+    def _run(self, job_env, test_db, user, tmp_path, body, header="Date,Desc,Amount"):
+        path = tmp_path / "upload.csv"
+        path.write_text(header + "\n" + body)
+        payload = {"path": str(path), "mapping": MAPPING, "spender": "Joint", "skip_duplicates": True}
+        job_id = job_queue.enqueue(test_db, user.id, "csv_import", payload, total=body.count("\n"))
+        assert job_queue.run_next(job_env, "test-worker")
+        assert not os.path.exists(path)
+        test_db.expire_all()
+        return job_id
+
+    def test_rows_staged_incrementally(self, job_env, test_db, test_user, tmp_path):
+        body = "".join(f"{day:02d}/01/2025,Shop {day},-{day}\n" for day in range(1, 6))
+        job_id = self._run(job_env, test_db, test_user, tmp_path, body)
+
+        status = ingestion.get_job_status(test_db, test_user.id, job_id, since=0)
+        assert status["status"] == "complete"
+        assert status["next_since"] == 3
+        assert sorted(t["id"] for t in status["rows"]) == [-5, -4, -3, -2, -1]
+
+        later = ingestion.get_job_status(test_db, test_user.id, job_id, since=2)
+        assert [t["raw_description"] for t in later["rows"]] == ["Shop 5"]
+        assert len(ingestion.get_job_status(test_db, test_user.id, job_id)["result"]) == 5
+
+    def test_bad_mapping_fails_job(self, job_env, test_db, test_user, tmp_path):
+        job_id = self._run(job_env, test_db, test_user, tmp_path, "02/01/2025,A,-1\n", header="Day,Desc,Amount")
+        status = ingestion.get_job_status(test_db, test_user.id, job_id)
+        assert status["status"] == "failed"
+        assert "Date" in status["error"]
@@ -0,0 +1,145 @@
+"""
+Principal Finance - Debt Payoff Tests
+
+Tests for:
+- Closed-form annuity schedules against a month-by-month reference
+- Multi-debt payoff (avalanche, snowball, custom, minimum-only)
+- /analytics/debt_payoff and /analytics/debt_projection end to end
+"""
+import numpy as np
+import pytest
+
+from backend import models
+from backend.services import debt
+
+
+def _step_by_step(balances, rates, minimums, extra, order, rollover=True):
+    """Reference: apply every month explicitly."""
+    balance = np.array(balances, dtype=float)
+    monthly = debt.monthly_rate(rates)
+    minimums = np.array(minimums, dtype=float)
+    rows = []
+    while (balance > debt.CLOSED).any() and len(rows) < debt.MAX_MONTHS:
+        balance, _, _ = debt._pay_month(balance, monthly, minimums, minimums.sum() + extra, order, rollover)
+        balance[balance <= debt.CLOSED] = 0.0
+        rows.append(balance.copy())
+    return np.array(rows)
+
+
+class TestAmortization:
+
+    def test_closed_form_payoff(self):
+        plan = debt.amortization_schedule(10000.0, 5.0, 500.0)
+        # n = -ln(1 - rB/P) / ln(1 + r)
+        r = 0.05 / 12
+        assert plan["months"] == int(np.ceil(-np.log(1 - r * 10000 / 500) / np.log(1 + r)))
+        assert plan["schedule"][-1]["balance"] == pytest.approx(0.0, abs=0.01)
+        assert sum(p["principal"] for p in plan["schedule"]) == pytest.approx(10000.0)
+        assert plan["total_interest"] == pytest.approx(sum(p["interest"] for p in plan["schedule"]))
+
+    def test_zero_rate_and_underpayment(self):
+        assert debt.amortization_schedule(1000.0, 0.0, 300.0)["months"] == 4
+
+        plan = debt.amortization_schedule(10000.0, 24.0, 150.0)
+        assert plan["months"] == float("inf")
+        assert len(plan["schedule"]) == 12
+        assert plan["schedule"][-1]["balance"] > 10000.0
+
+
+class TestMultiDebt:
+
+    BALANCES = [5000.0, 1200.0, 18000.0]
+    RATES = [19.99, 9.5, 6.0]
+    MINIMUMS = [150.0, 40.0, 350.0]
+
+    @pytest.mark.parametrize("strategy", ["avalanche", "snowball"])
+    def test_matches_month_by_month(self, strategy):
+        order = debt.priority_order(self.BALANCES, self.RATES, strategy)
+        result = debt.simulate_payoff(self.BALANCES, self.RATES, self.MINIMUMS, 300.0, order)
+        reference = _step_by_step(self.BALANCES, self.RATES, self.MINIMUMS, 300.0, order)
+        assert result["balances"].shape == reference.shape
+        assert np.allclose(result["balances"], reference, atol=1e-6)
+        assert result["months"] == len(reference)
+
+    def test_strategy_orders(self):
+        assert list(debt.priority_order(self.BALANCES, self.RATES, "avalanche")) == [0, 1, 2]
+        assert list(debt.priority_order(self.BALANCES, self.RATES, "snowball")) == [1, 0, 2]
+        assert list(debt.priority_order(self.BALANCES, self.RATES, "custom", [2])) == [2, 0, 1]
+
+    def test_avalanche_pays_least_interest(self):
+        results = {
+            strategy: debt.simulate_payoff(
+                self.BALANCES, self.RATES, self.MINIMUMS, 300.0,
+                debt.priority_order(self.BALANCES, self.RATES, strategy)
+            )
+            for strategy in ("avalanche", "snowball")
+        }
+        minimum = debt.simulate_payoff(self.BALANCES, self.RATES, self.MINIMUMS, rollover=False)
+
+        interest = {k: v["interest"].sum() for k, v in results.items()}
+        assert interest["avalanche"] <= interest["snowball"] < minimum["interest"].sum()
+        # Snowball clears the smallest balance first
+        assert results["snowball"]["payoff_month"].argmin() == 1
+        assert minimum["months"] > results["avalanche"]["months"]
+
+    def test_unpayable_debt_stops_at_horizon(self):
+        result = debt.simulate_payoff([10000.0], [30.0], [100.0], max_months=24)
+        assert result["months"] is None
+        assert result["payoff_month"][0] == -1
+        assert result["balances"].shape == (24, 1)
+        assert result["balances"][-1, 0] > 10000.0
+
+
+class TestDebtEndpoints:
+
+    @pytest.fixture
+    def liabilities(self, test_db, test_user):
+        accounts = [
+            models.Account(user_id=test_user.id, name="Visa", type="Liability", category="Credit Card",
+                           balance=5000.0, interest_rate=19.99, minimum_payment=150.0),
+            models.Account(user_id=test_user.id, name="Car Loan", type="Liability", category="Loan",
+                           balance=1200.0, interest_rate=9.5, minimum_payment=40.0),
+            models.Account(user_id=test_user.id, name="Store Card", type="Liability", category="Credit Card",
+                           balance=800.0, interest_rate=24.0),
+            models.Account(user_id=test_user.id, name="Savings", type="Asset", category="Savings", balance=9000.0),
+        ]
+        test_db.add_all(accounts)
+        test_db.commit()
+        return accounts
+
+    def test_strategy_comparison(self, client, auth_headers, liabilities):
+        visa, car, store, _ = liabilities
+        response = client.get(
+            f"/api/analytics/debt_payoff?extra_payment=200&order={car.id},{visa.id}", headers=auth_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+
+        assert [d["id"] for d in data["debts"]] == [visa.id, car.id, store.id]
+        store_debt = data["debts"][2]
+        assert store_debt["minimum_payment_assumed"] is True
+        assert store_debt["minimum_payment"] == 25.0  # 16 interest + 8 is below the floor
+
+        assert set(data["strategies"]) == {"minimum", "avalanche", "snowball", "custom"}
+        assert data["strategies"]["avalanche"]["order"][0] == store.id
+        assert data["strategies"]["custom"]["order"][:2] == [car.id, visa.id]
+        assert data["recommended"] == "avalanche"
+        assert data["savings"]["interest_saved"] > 0
+        schedule = data["strategies"]["avalanche"]["schedule"]
+        assert schedule[-1]["balance"] == 0.0
+        assert len(schedule) == data["strategies"]["avalanche"]["months"]
+
+    def test_no_debts(self, client, auth_headers, test_user):
+        response = client.get("/api/analytics/debt_payoff", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json()["strategies"] == {}
+
+    def test_single_debt_projection(self, client, auth_headers, test_user):
+        response = client.get(
+            "/api/analytics/debt_projection?current_balance=10000&interest_rate=5&minimum_payment=500&extra_payment=200",
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["base_plan"]["months"] > data["accelerated_plan"]["months"]
+        assert data["savings"]["interest_saved"] > 0
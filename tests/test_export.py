@@ -0,0 +1,148 @@
+"""
+Principal Finance - Export Tests
+
+Tests for:
+- Streaming transaction export in CSV, JSON and NDJSON
+- On-the-fly gzip compression
+- Parquet / Arrow IPC exports of transactions, snapshots and balances
+"""
+import csv
+import gzip
+import io
+import json
+import pytest
+from datetime import datetime
+
+from backend import models
+from backend.routers import export
+
+
+@pytest.fixture
+def export_txns(test_db, test_user, sample_bucket):
+    test_db.add_all([
+        models.Transaction(
+            user_id=test_user.id, date=datetime(2025, 1, day), amount=amount,
+            description=f"Txn {day}", bucket_id=sample_bucket.id if day % 2 else None,
+            notes="note" if day == 1 else None
+        )
+        for day, amount in [(1, -12.5), (2, 100.0), (3, -7.25)]
+    ])
+    test_db.commit()
+
+
+class TestTransactionExport:
+    """Streamed export formats carry the same rows."""
+
+    def test_csv(self, client, auth_headers, export_txns):
+        response = client.get("/api/export/transactions?format=csv", headers=auth_headers)
+        assert response.status_code == 200
+        rows = list(csv.reader(io.StringIO(response.text)))
+        assert rows[0] == ["Date", "Description", "Amount", "Type", "Category", "Account", "Notes"]
+        assert [r[1] for r in rows[1:]] == ["Txn 3", "Txn 2", "Txn 1"]
+        assert rows[3][2:] == ["-12.5", "Expense", "Groceries", "Unknown", "note"]
+        assert rows[2][4] == "Uncategorized"
+
+    def test_json_and_ndjson_match(self, client, auth_headers, export_txns):
+        as_json = client.get("/api/export/transactions?format=json", headers=auth_headers).json()
+        response = client.get("/api/export/transactions?format=ndjson", headers=auth_headers)
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        as_ndjson = [json.loads(line) for line in response.text.splitlines()]
+        assert as_json == as_ndjson
+        assert as_json[1]["type"] == "income" and as_json[1]["category"] == "Uncategorized"
+
+    def test_gzip(self, client, auth_headers, export_txns):
+        plain = client.get("/api/export/transactions?format=csv", headers=auth_headers).text
+        response = client.get("/api/export/transactions?format=csv&gzip=true", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.headers["content-disposition"].endswith(".csv.gz")
+        assert gzip.decompress(response.content).decode() == plain
+
+    def test_scoped_to_current_user(self, client, auth_headers, test_db, export_txns):
+        other = models.User(id="other-user", email="other@example.com", name="Other")
+        test_db.add(other)
+        test_db.commit()
+        test_db.add(models.Transaction(user_id=other.id, date=datetime(2025, 1, 4), amount=-1.0, description="Theirs"))
+        test_db.commit()
+
+        exported = client.get("/api/export/transactions?format=json", headers=auth_headers).json()
+        assert "Theirs" not in [t["description"] for t in exported] and len(exported) == 3
+        assert client.get("/api/export/transactions").status_code == 401
+
+    def test_streams_in_batches(self, client, test_db, test_user, monkeypatch):
+        """Large exports are emitted as several chunks, not one buffered string."""
+        monkeypatch.setattr(export, "_EXPORT_BATCH", 2)
+        test_db.add_all([
+            models.Transaction(user_id=test_user.id, date=datetime(2025, 2, 1), amount=-1.0, description=str(i))
+            for i in range(5)
+        ])
+        test_db.commit()
+        chunks = list(export._csv_chunks(export._export_rows(test_db.query(models.Transaction))))
+        assert len(chunks) == 4  # header + 2 full batches + remainder
+        assert len(json.loads("".join(export._json_chunks(export._export_rows(test_db.query(models.Transaction)))))) == 5
+
+
+class TestColumnarExport:
+    """Parquet and Arrow IPC exports with typed, dictionary-encoded columns."""
+
+    def test_transactions_parquet(self, client, auth_headers, export_txns, monkeypatch):
+        pa = pytest.importorskip("pyarrow")
+        import pyarrow.parquet as pq
+        monkeypatch.setattr(export, "_ROW_GROUP", 2)
+
+        response = client.get("/api/export/transactions?format=parquet", headers=auth_headers)
+        assert response.status_code == 200
+        parquet = pq.ParquetFile(io.BytesIO(response.content))
+        assert parquet.metadata.num_row_groups == 2
+        table = parquet.read()
+        assert table.schema.field("category").type == pa.dictionary(pa.int32(), pa.string())
+        assert table.schema.field("date").type == pa.timestamp("us")
+        assert table.column("description").to_pylist() == ["Txn 3", "Txn 2", "Txn 1"]
+        assert table.column("category").to_pylist() == ["Groceries", None, "Groceries"]
+        assert table.column("amount").to_pylist() == [-7.25, 100.0, -12.5]
+
+    def test_transactions_arrow_matches_parquet(self, client, auth_headers, export_txns):
+        pa = pytest.importorskip("pyarrow")
+        import pyarrow.parquet as pq
+        def download(format):
+            return client.get(f"/api/export/transactions?format={format}", headers=auth_headers).content
+
+        arrow = pa.ipc.open_stream(download("arrow")).read_all()
+        parquet = pq.read_table(io.BytesIO(download("parquet")))
+        assert arrow.to_pylist() == parquet.to_pylist()
+
+    def test_snapshots_and_balances(self, client, auth_headers, test_db, test_user):
+        pa = pytest.importorskip("pyarrow")
+        import pyarrow.parquet as pq
+        from datetime import date
+        account = models.Account(user_id=test_user.id, name="Savings", type="Asset", category="Cash")
+        snapshot = models.NetWorthSnapshot(
+            user_id=test_user.id, date=date(2025, 1, 1), total_assets=1000.0, total_liabilities=0.0, net_worth=1000.0
+        )
+        test_db.add_all([account, snapshot])
+        test_db.commit()
+        test_db.add(models.AccountBalance(snapshot_id=snapshot.id, account_id=account.id, balance=1000.0))
+        test_db.commit()
+
+        other = models.User(id="other-user", email="other@example.com", name="Other")
+        test_db.add(other)
+        test_db.commit()
+        test_db.add(models.NetWorthSnapshot(
+            user_id=other.id, date=date(2025, 1, 2), total_assets=5.0, total_liabilities=0.0, net_worth=5.0
+        ))
+        test_db.commit()
+
+        response = client.get("/api/export/net-worth?format=parquet", headers=auth_headers)
+        snapshots = pq.read_table(io.BytesIO(response.content))
+        assert snapshots.to_pylist() == [{
+            "date": date(2025, 1, 1), "net_worth": 1000.0, "total_assets": 1000.0, "total_liabilities": 0.0
+        }]
+
+        response = client.get("/api/export/account-balances?format=arrow", headers=auth_headers)
+        assert response.status_code == 200
+        balances = pa.ipc.open_stream(response.content).read_all().to_pylist()
+        assert balances == [{
+            "date": date(2025, 1, 1), "account_id": account.id, "account": "Savings",
+            "type": "Asset", "category": "Cash", "balance": 1000.0
+        }]
+        assert client.get("/api/export/account-balances").status_code == 401
+        assert client.get("/api/export/net-worth").status_code == 401
@@ -0,0 +1,134 @@
+"""
+Principal Finance - Probabilistic Forecast Tests
+
+Tests for:
+- Per-bucket empirical distributions (quantile tables)
+- Batched Monte Carlo balances and P10/P50/P90 bands
+- Bucket history from the rollup table
+- /analytics/forecast?mode=probabilistic end to end
+"""
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+from dateutil.relativedelta import relativedelta
+
+from backend import models
+from backend.services import forecast, rollups  # noqa: F401 - rollups registers the write listeners
+
+
+class TestSimulation:
+
+    def test_quantile_tables_keep_lumpy_months(self):
+        # An annual bill: eleven quiet months and one large payment
+        history = np.array([[0.0] * 11 + [-1200.0]])
+        table = forecast.quantile_tables(history)
+        assert table.shape == (1, forecast.LEVELS)
+        assert set(np.unique(table)) == {0.0, -1200.0}
+        assert abs((table == -1200.0).mean() - 1 / 12) <= 1 / forecast.LEVELS
+
+    def test_balances_and_bands(self):
+        rng = np.random.default_rng(0)
+        history = np.vstack([
+            rng.normal(5000, 200, 12),   # salary
+            -rng.gamma(4, 100, 12),      # groceries
+            [0.0] * 11 + [-3000.0],      # insurance
+        ])
+        tables = forecast.quantile_tables(history)
+        balances = forecast.simulate_balances(100.0, tables, 24, 4000, np.random.default_rng(1))
+        assert balances.shape == (4000, 24)
+
+        monthly = np.diff(np.c_[np.full(4000, 100.0), balances], axis=1)
+        assert monthly.mean() == pytest.approx(history.sum(axis=0).mean(), rel=0.02)
+
+        bands = forecast.balance_bands(balances)
+        assert np.all(bands["p10"] <= bands["p50"]) and np.all(bands["p50"] <= bands["p90"])
+        assert bands["prob_negative"].shape == (24,)
+
+        # Same seed, same paths
+        again = forecast.simulate_balances(100.0, tables, 24, 4000, np.random.default_rng(1))
+        assert np.array_equal(balances, again)
+
+    def test_negative_probability(self):
+        tables = forecast.quantile_tables(np.array([[-100.0, -300.0]]))
+        bands = forecast.balance_bands(forecast.simulate_balances(250.0, tables, 3, 2000, np.random.default_rng(2)))
+        # Month 1 goes negative only after a 300 month; by month 3 it always has
+        assert bands["prob_negative"][0] == pytest.approx(0.5, abs=0.05)
+        assert bands["prob_negative"][2] == 1.0
+        assert bands["prob_negative_any"] == 1.0
+
+    def test_no_history(self):
+        balances = forecast.simulate_balances(50.0, forecast.quantile_tables(np.zeros((0, 12))), 6, 100)
+        assert np.all(balances == 50.0)
+
+
+class TestBucketHistory:
+
+    def test_excludes_transfers_and_fills_quiet_months(self, test_db, test_user, sample_bucket):
+        transfer = models.BudgetBucket(name="Transfers", user_id=test_user.id, is_transfer=True)
+        test_db.add(transfer)
+        test_db.commit()
+
+        today = date.today()
+        last_month = rollups.month_start(today) - relativedelta(months=1)
+        test_db.add_all([
+            models.Transaction(
+                user_id=test_user.id, bucket_id=sample_bucket.id, date=datetime.combine(last_month, datetime.min.time()),
+                description="Shop", raw_description="SHOP", amount=-80.0
+            ),
+            models.Transaction(
+                user_id=test_user.id, bucket_id=transfer.id, date=datetime.combine(last_month, datetime.min.time()),
+                description="To savings", raw_description="TFR", amount=-500.0
+            ),
+            models.Transaction(
+                user_id=test_user.id, date=datetime.combine(last_month - relativedelta(months=2), datetime.min.time()),
+                description="Cash", raw_description="ATM", amount=-20.0
+            ),
+            # The current month is incomplete and not part of the history
+            models.Transaction(
+                user_id=test_user.id, bucket_id=sample_bucket.id, date=datetime.now(),
+                description="Shop", raw_description="SHOP", amount=-999.0
+            ),
+        ])
+        test_db.commit()
+
+        bucket_ids, history = forecast.bucket_history(test_db, test_user.id, today)
+        assert bucket_ids == [None, sample_bucket.id]
+        assert history.shape == (2, forecast.HISTORY_MONTHS)
+        assert history[1].tolist() == [0.0] * 11 + [-80.0]
+        assert history[0][-3] == -20.0
+
+
+class TestForecastEndpoint:
+
+    def test_probabilistic_mode(self, client, auth_headers, test_db, test_user, sample_bucket):
+        today = date.today()
+        for back in range(1, 13):
+            month = rollups.month_start(today) - relativedelta(months=back)
+            test_db.add(models.Transaction(
+                user_id=test_user.id, bucket_id=sample_bucket.id,
+                date=datetime.combine(month, datetime.min.time()),
+                description="Shop", raw_description="SHOP", amount=-100.0 - back
+            ))
+        test_db.commit()
+
+        response = client.get(
+            "/api/analytics/forecast?mode=probabilistic&months=6&paths=1000&seed=7", headers=auth_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["mode"] == "probabilistic"
+        assert len(data["forecast"]) == 7
+        last = data["forecast"][-1]
+        assert last["p10"] <= last["p50"] <= last["p90"] < 0
+        assert last["prob_negative"] == 1.0
+        assert data["insights"]["months_until_negative"] == 1
+        assert data["expense_breakdown"][0]["name"] == "Groceries"
+
+        # The default mode is unchanged
+        response = client.get("/api/analytics/forecast?months=6", headers=auth_headers)
+        assert response.status_code == 200
+        assert "p50" not in response.json()["forecast"][1]
+
+        response = client.get("/api/analytics/forecast?mode=bogus", headers=auth_headers)
+        assert response.status_code == 422
@@ -0,0 +1,95 @@
+"""
+Principal Finance - Import Confirm Tests
+
+Tests for:
+- Bulk edits of existing transactions on /ingest/confirm (UPDATE ... FROM VALUES)
+- Rollups and tag rows following those edits
+- One batched budget-threshold evaluation for all affected buckets
+"""
+from datetime import datetime
+
+from backend import models
+
+
+def _txn(db, user_id, **fields):
+    values = dict(
+        user_id=user_id, date=datetime(2025, 3, 4), amount=-20.0,
+        description="Txn", raw_description="TXN", spender="Alice", assigned_to="A"
+    )
+    values.update(fields)
+    txn = models.Transaction(**values)
+    db.add(txn)
+    db.commit()
+    return txn
+
+
+def _confirm(client, auth_headers, rows):
+    response = client.post("/api/ingest/confirm", json=rows, headers=auth_headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+class TestConfirmEdits:
+    """Existing rows are updated in bulk with per-row values."""
+
+    def test_per_row_values(self, client, auth_headers, test_db, test_user, sample_bucket):
+        keep = _txn(test_db, test_user.id, tags="old")
+        change = _txn(test_db, test_user.id)
+        other_user = models.User(id="other-user", email="other@example.com", name="Other")
+        test_db.add(other_user)
+        test_db.commit()
+        foreign = _txn(test_db, other_user.id)
+
+        confirmed = _confirm(client, auth_headers, [
+            {"id": keep.id, "bucket_id": sample_bucket.id},
+            {"id": change.id, "bucket_id": None, "spender": "Bob", "assigned_to": "B", "tags": "Car, trip"},
+            {"id": foreign.id, "bucket_id": sample_bucket.id},
+        ])
+        assert sorted(t["id"] for t in confirmed) == sorted([keep.id, change.id])
+
+        test_db.expire_all()
+        # Omitted fields keep their values
+        assert (keep.bucket_id, keep.spender, keep.assigned_to, keep.tags, keep.is_verified) == (
+            sample_bucket.id, "Alice", "A", "old", True
+        )
+        assert (change.bucket_id, change.spender, change.assigned_to, change.tags) == (None, "Bob", "B", "Car, trip")
+        assert foreign.bucket_id is None and not foreign.is_verified
+
+    def test_rollups_and_tags_follow_edits(self, client, auth_headers, test_db, test_user, sample_bucket):
+        txn = _txn(test_db, test_user.id)
+        _confirm(client, auth_headers, [{"id": txn.id, "bucket_id": sample_bucket.id, "tags": "work"}])
+
+        rollups = test_db.query(models.TransactionRollup).filter_by(user_id=test_user.id).all()
+        assert [(r.bucket_id, r.expense_sum, r.txn_count) for r in rollups] == [(sample_bucket.id, -20.0, 1)]
+        assert [row.tag for row in test_db.query(models.TransactionTag).filter_by(transaction_id=txn.id)] == ["work"]
+
+
+def test_budget_alerts_batched(client, auth_headers, test_db, test_user):
+    buckets = [models.BudgetBucket(name=name, user_id=test_user.id) for name in ("Fuel", "Dining", "Gifts")]
+    test_db.add_all(buckets)
+    test_db.commit()
+    fuel, dining, gifts = buckets
+    test_db.add_all([
+        models.BudgetLimit(bucket_id=fuel.id, amount=100),
+        models.BudgetLimit(bucket_id=dining.id, amount=100),
+        models.BudgetLimit(bucket_id=gifts.id, amount=1000),
+    ])
+    test_db.commit()
+
+    today = datetime.utcnow().strftime("%Y-%m-%d")
+    rows = [
+        {"id": -1, "date": today, "description": "Fuel", "amount": -85.0, "bucket_id": fuel.id},
+        {"id": -2, "date": today, "description": "Dinner", "amount": -130.0, "bucket_id": dining.id},
+        {"id": -3, "date": today, "description": "Gift", "amount": -50.0, "bucket_id": gifts.id},
+    ]
+    _confirm(client, auth_headers, rows)
+
+    def alerts():
+        return sorted(
+            n.message for n in test_db.query(models.Notification).filter_by(user_id=test_user.id, type="budget")
+        )
+
+    assert alerts() == ["⚠️ Fuel is at 85% of budget", "❌ Dining is significantly over budget (130%)"]
+    # Re-confirming (all duplicates) does not repeat alerts
+    _confirm(client, auth_headers, rows)
+    assert len(alerts()) == 2
@@ -0,0 +1,165 @@
+"""
+Principal Finance - Job Queue Tests
+
+Tests for:
+- Claiming and completing queued jobs on the background_jobs table
+- Per-user fairness when one user has a burst of jobs
+- Retries with backoff, then failure and cleanup once attempts run out
+- Cancellation of queued and running jobs
+- Recovery of jobs whose worker stopped heartbeating
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from backend import models
+from backend.services import job_queue
+
+
+@pytest.fixture
+def sessions(test_engine):
+    return sessionmaker(bind=test_engine)
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    """Register a "test" job kind; returns the call and cleanup logs."""
+    calls, cleaned = [], []
+    behaviour = {"run": lambda job_id, user_id, **payload: None}
+
+    def run(job_id, user_id, **payload):
+        calls.append((job_id, payload))
+        return behaviour["run"](job_id, user_id, **payload)
+
+    monkeypatch.setitem(job_queue._handlers, "test", (run, cleaned.append))
+    return calls, cleaned, behaviour
+
+
+def _job(db, job_id):
+    db.expire_all()
+    return db.query(models.Job).filter_by(id=job_id).one()
+
+
+def test_job_runs_and_completes(test_db, test_user, sessions, handler):
+    calls, cleaned, _ = handler
+    job_id = job_queue.enqueue(test_db, test_user.id, "test", {"n": 1}, total=5)
+    assert _job(test_db, job_id).status == "queued"
+
+    assert job_queue.run_next(sessions, "w1")
+    job = _job(test_db, job_id)
+    assert (job.status, job.progress, job.attempts, job.worker_id) == ("complete", 5, 1, None)
+    assert calls == [(job_id, {"n": 1})]
+    assert cleaned == [{"n": 1}]
+    assert not job_queue.run_next(sessions, "w1")
+
+
+def test_busy_user_does_not_block_others(test_db, test_user, sessions, handler):
+    other = models.User(id="other-user", email="other@example.com", name="Other")
+    test_db.add(other)
+    test_db.commit()
+    burst = [job_queue.enqueue(test_db, test_user.id, "test", {}) for _ in range(3)]
+    later = job_queue.enqueue(test_db, other.id, "test", {})
+    for minute, job_id in enumerate(burst + [later]):
+        test_db.get(models.Job, job_id).created_at = datetime(2025, 1, 1, 9, minute)
+    test_db.commit()
+
+    db = sessions()
+    first = job_queue.claim_next(db, "w1")
+    second = job_queue.claim_next(db, "w2")
+    assert (first.id, second.id) == (burst[0], later)
+    # Both users are at the per-user limit
+    assert job_queue.claim_next(db, "w3") is None
+    db.close()
+
+
+def test_retry_then_success(test_db, test_user, sessions, handler):
+    calls, cleaned, behaviour = handler
+
+    def flaky(job_id, user_id, **payload):
+        if len(calls) == 1:
+            raise RuntimeError("database went away")
+    behaviour["run"] = flaky
+
+    job_id = job_queue.enqueue(test_db, test_user.id, "test", {})
+    assert job_queue.run_next(sessions, "w1")
+    job = _job(test_db, job_id)
+    assert (job.status, job.attempts) == ("queued", 1)
+    assert job.run_after > datetime.utcnow()
+    assert cleaned == []
+
+    # Backoff keeps it from being claimed until run_after
+    assert not job_queue.run_next(sessions, "w1")
+    job.run_after = None
+    test_db.commit()
+    assert job_queue.run_next(sessions, "w1")
+    assert _job(test_db, job_id).status == "complete"
+
+
+def test_failed_after_max_attempts(test_db, test_user, sessions, handler):
+    _, cleaned, behaviour = handler
+
+    def broken(job_id, user_id, **payload):
+        raise RuntimeError("boom")
+    behaviour["run"] = broken
+
+    job_id = job_queue.enqueue(test_db, test_user.id, "test", {"path": "x"}, max_attempts=1)
+    assert job_queue.run_next(sessions, "w1")
+    job = _job(test_db, job_id)
+    assert (job.status, job.error) == ("failed", "boom")
+    assert cleaned == [{"path": "x"}]
+
+
+class TestCancel:
+    def test_queued_job_never_runs(self, test_db, test_user, sessions, handler):
+        calls, cleaned, _ = handler
+        job_id = job_queue.enqueue(test_db, test_user.id, "test", {})
+        assert job_queue.cancel(test_db, test_user.id, job_id) == "cancelled"
+        assert job_queue.cancel(test_db, "someone-else", job_id) is None
+
+        assert not job_queue.run_next(sessions, "w1")
+        assert calls == [] and cleaned == [{}]
+
+    def test_running_job_stops_at_checkpoint(self, test_db, test_user, sessions, handler):
+        _, cleaned, behaviour = handler
+
+        def cooperative(job_id, user_id, **payload):
+            db = sessions()
+            assert job_queue.cancel(db, user_id, job_id) == "processing"
+            if job_queue.cancel_requested(db, job_id):
+                db.close()
+                raise job_queue.JobCancelled()
+        behaviour["run"] = cooperative
+
+        job_id = job_queue.enqueue(test_db, test_user.id, "test", {})
+        assert job_queue.run_next(sessions, "w1")
+        assert _job(test_db, job_id).status == "cancelled"
+        assert cleaned == [{}]
+
+
+def test_recover_stale_jobs(test_db, test_user, sessions, handler):
+    _, cleaned, _ = handler
+    retry = job_queue.enqueue(test_db, test_user.id, "test", {})
+    exhausted = job_queue.enqueue(test_db, test_user.id, "test", {}, max_attempts=1)
+    legacy = models.Job(id="legacy", user_id=test_user.id, status="processing",
+                        created_at=datetime.utcnow() - timedelta(hours=1))
+    test_db.add(legacy)
+    test_db.commit()
+
+    stale = datetime.utcnow() - timedelta(seconds=job_queue.STALE_AFTER_SECONDS + 1)
+    for job_id in (retry, exhausted):
+        job = test_db.get(models.Job, job_id)
+        job.status, job.attempts, job.worker_id, job.heartbeat_at = "processing", 1, "dead", stale
+    test_db.commit()
+
+    assert job_queue.recover_stale(test_db) == 3
+    assert [_job(test_db, job_id).status for job_id in (retry, exhausted, "legacy")] == [
+        "queued", "failed", "failed"
+    ]
+    assert cleaned == [{}]
+
+    # A live heartbeat is left alone
+    job = _job(test_db, retry)
+    job.status, job.heartbeat_at = "processing", datetime.utcnow()
+    test_db.commit()
+    assert job_queue.recover_stale(test_db) == 0
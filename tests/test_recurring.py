@@ -0,0 +1,194 @@
+"""
+Principal Finance - Recurring Payment Detection Tests
+
+Tests for:
+- Merchant key normalization
+- Cadence estimation, including missed payments
+- Incremental scans and invalidation of saved state
+- /analytics/subscriptions/suggested end to end
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend import models
+from backend.services import recurring, rollups  # noqa: F401 - registers the rollup listeners
+
+
+def _days(start, *offsets):
+    return [start + timedelta(days=d) for d in offsets]
+
+
+class TestMerchantKey:
+
+    def test_strips_trailing_references(self):
+        assert recurring.merchant_key("NETFLIX.COM 8829 SYDNEY AU") == "netflix.com"
+        assert recurring.merchant_key("  Spotify P0A1B2 ") == "spotify"
+        # Digits in the first token are part of the name
+        assert recurring.merchant_key("7-Eleven 1234") == "7-eleven"
+        assert recurring.merchant_key("12345") == "12345"
+
+    def test_key_is_prefix_of_description(self):
+        description = "Gym Membership 02/03 REF998"
+        assert description.lower().startswith(recurring.merchant_key(description))
+
+
+class TestEstimateCadence:
+
+    @pytest.mark.parametrize("step,frequency", [
+        (7, "Weekly"), (14, "Bi-Weekly"), (30, "Monthly"), (91, "Quarterly"), (365, "Yearly"),
+    ])
+    def test_regular(self, step, frequency):
+        dates = _days(datetime(2023, 1, 3), *(step * i for i in range(4)))
+        assert recurring.estimate_cadence(dates) == (frequency, step, 0)
+
+    def test_missed_payment(self):
+        # Monthly with March skipped: the 59-day gap is two periods
+        dates = [datetime(2025, m, 15) for m in (1, 2, 4, 5, 6)]
+        assert recurring.estimate_cadence(dates) == ("Monthly", 30, 1)
+
+    def test_fortnightly_is_not_weekly(self):
+        dates = _days(datetime(2025, 1, 1), 0, 14, 28, 42)
+        assert recurring.estimate_cadence(dates)[0] == "Bi-Weekly"
+
+    def test_irregular(self):
+        assert recurring.estimate_cadence(_days(datetime(2025, 1, 1), 0, 20, 60, 64)) is None
+        assert recurring.estimate_cadence(_days(datetime(2025, 1, 1), 0, 30)) is None
+
+
+class TestDetectRecurring:
+
+    @pytest.fixture
+    def monthly(self, test_db, test_user, sample_bucket):
+        today = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+        txns = []
+        for i in range(4, 0, -1):
+            txn = models.Transaction(
+                user_id=test_user.id, bucket_id=sample_bucket.id, date=today - timedelta(days=30 * i),
+                description=f"NETFLIX.COM {1000 + i}", raw_description="NETFLIX", amount=-15.99
+            )
+            test_db.add(txn)
+            txns.append(txn)
+        test_db.commit()
+        return txns
+
+    def test_detects_and_saves_state(self, test_db, test_user, monthly):
+        found = recurring.detect_recurring(test_db, test_user.id)
+        assert len(found) == 1
+        assert found[0]["description_keyword"] == "netflix.com"
+        assert found[0]["frequency"] == "Monthly"
+        assert found[0]["confidence"] == "High"
+
+        scan = test_db.get(models.RecurringScan, test_user.id)
+        assert scan.last_transaction_id == max(t.id for t in monthly)
+
+    def test_request_session_stays_read_only(self, test_db, test_user, monkeypatch, monthly):
+        def no_writes():
+            raise AssertionError("detect_recurring committed the caller's session")
+        monkeypatch.setattr(test_db, "commit", no_writes)
+        monkeypatch.setattr(test_db, "flush", lambda *args, **kwargs: no_writes())
+
+        assert len(recurring.detect_recurring(test_db, test_user.id)) == 1
+        assert not (test_db.new or test_db.dirty)
+        assert test_db.query(models.RecurringScan.last_transaction_id).scalar() == max(t.id for t in monthly)
+
+    def test_state_dropped_mid_scan_is_not_saved(self, test_db, test_user, monkeypatch, monthly):
+        recurring.detect_recurring(test_db, test_user.id)
+        test_db.add(models.Transaction(
+            user_id=test_user.id, date=datetime.now(), description="NETFLIX.COM 2000",
+            raw_description="NETFLIX", amount=-15.99
+        ))
+        test_db.commit()
+
+        group_rows = recurring._group_rows
+
+        def edited_meanwhile(groups, rows):
+            seen = group_rows(groups, rows)
+            # Another request edits a scanned transaction while this scan runs
+            recurring._forget_scans(test_db, [test_user.id])
+            test_db.commit()
+            return seen
+        monkeypatch.setattr(recurring, "_group_rows", edited_meanwhile)
+        recurring.detect_recurring(test_db, test_user.id)
+        assert test_db.query(models.RecurringScan).count() == 0
+
+    def test_only_new_transactions_are_scanned(self, test_db, test_user, monkeypatch, monthly):
+        recurring.detect_recurring(test_db, test_user.id)
+
+        test_db.add(models.Transaction(
+            user_id=test_user.id, date=datetime.now(), description="NETFLIX.COM 2000",
+            raw_description="NETFLIX", amount=-15.99
+        ))
+        test_db.commit()
+
+        seen = []
+        group_rows = recurring._group_rows
+        monkeypatch.setattr(recurring, "_group_rows", lambda groups, rows: group_rows(groups, seen.extend(rows) or seen))
+        found = recurring.detect_recurring(test_db, test_user.id)
+        assert len(seen) == 1
+        assert len(test_db.get(models.RecurringScan, test_user.id).groups["E|netflix.com"]["obs"]) == 5
+        assert found[0]["last_payment_date"].date() == datetime.now().date()
+
+    def test_unchanged_scan_is_not_rewritten(self, test_db, test_user, monthly):
+        first = datetime(2025, 1, 1)
+        recurring.detect_recurring(test_db, test_user.id)
+        scan = test_db.get(models.RecurringScan, test_user.id)
+        scan.updated_at = first
+        test_db.commit()
+
+        assert len(recurring.detect_recurring(test_db, test_user.id)) == 1
+        test_db.expire_all()
+        assert test_db.get(models.RecurringScan, test_user.id).updated_at == first
+
+        # Aging an observation out of the window is saved
+        later = datetime.now() + timedelta(days=recurring.WINDOW_DAYS - 105)
+        recurring.detect_recurring(test_db, test_user.id, now=later)
+        test_db.expire_all()
+        scan = test_db.get(models.RecurringScan, test_user.id)
+        assert scan.updated_at == later and len(scan.groups["E|netflix.com"]["obs"]) == 3
+
+    def test_edit_drops_saved_state(self, test_db, test_user, monthly):
+        recurring.detect_recurring(test_db, test_user.id)
+
+        monthly[-1].amount = -99.0
+        test_db.commit()
+        assert test_db.get(models.RecurringScan, test_user.id) is None
+        # Inconsistent amounts: no longer a subscription
+        assert recurring.detect_recurring(test_db, test_user.id) == []
+
+    def test_bulk_delete_drops_saved_state(self, test_db, test_user, monthly):
+        recurring.detect_recurring(test_db, test_user.id)
+
+        test_db.query(models.Transaction).filter(
+            models.Transaction.id == monthly[0].id
+        ).delete(synchronize_session=False)
+        test_db.commit()
+        assert test_db.query(models.RecurringScan).count() == 0
+        # The rollup listener still ran for the same statement
+        counts = test_db.query(models.TransactionRollup.txn_count).all()
+        assert sum(c for (c,) in counts) == 3
+
+
+class TestSuggestedEndpoint:
+
+    def test_suggestions_exclude_existing(self, client, auth_headers, test_db, test_user, sample_bucket):
+        today = datetime.now().replace(hour=12)
+        for i in range(5):
+            test_db.add(models.Transaction(
+                user_id=test_user.id, bucket_id=sample_bucket.id, date=today - timedelta(days=7 * i),
+                description="Gym Direct Debit", raw_description="GYM", amount=-20.0
+            ))
+        test_db.commit()
+
+        response = client.get("/api/analytics/subscriptions/suggested", headers=auth_headers)
+        assert response.status_code == 200
+        suggestions = response.json()
+        assert [s["frequency"] for s in suggestions] == ["Weekly"]
+        assert suggestions[0]["bucket_id"] == sample_bucket.id
+
+        test_db.add(models.Subscription(
+            user_id=test_user.id, name="Gym", amount=20.0, frequency="Weekly", description_keyword="gym"
+        ))
+        test_db.commit()
+        response = client.get("/api/analytics/subscriptions/suggested", headers=auth_headers)
+        assert response.json() == []
@@ -0,0 +1,211 @@
+"""
+Principal Finance - Transaction Rollup Tests
+
+Tests for:
+- Rollup maintenance on transaction create/update/delete and batch endpoints
+- Rebuild (backfill) matching the incremental result
+- Analytics reading whole-month ranges from the rollup table
+"""
+import pytest
+from datetime import datetime
+
+from backend import models
+from backend.services import rollups
+
+
+def _snapshot(db, user_id):
+    """Non-empty rollup rows for a user as {key: (expense, income, count)}."""
+    rows = db.query(models.TransactionRollup).filter(
+        models.TransactionRollup.user_id == user_id
+    ).all()
+    return {
+        (r.month, r.bucket_id, r.spender, r.account_id): (round(r.expense_sum, 2), round(r.income_sum, 2), r.txn_count)
+        for r in rows if r.txn_count
+    }
+
+
+def _assert_matches_rebuild(db, user_id):
+    incremental = _snapshot(db, user_id)
+    rollups.rebuild_rollups(db, user_id=user_id)
+    db.commit()
+    assert _snapshot(db, user_id) == incremental
+    return incremental
+
+
+class TestRollupMaintenance:
+    """Rollup rows follow every transaction write path."""
+
+    def test_create_update_delete(self, client, auth_headers, test_db, test_user, sample_bucket):
+        response = client.post("/api/transactions/", headers=auth_headers, json={
+            "date": "2025-01-10T12:00:00", "description": "Coffee", "amount": -4.5,
+            "bucket_id": sample_bucket.id, "spender": "Joint"
+        })
+        assert response.status_code == 200
+        txn_id = response.json()["id"]
+
+        snap = _assert_matches_rebuild(test_db, test_user.id)
+        assert snap == {(datetime(2025, 1, 1).date(), sample_bucket.id, "Joint", 0): (-4.5, 0.0, 1)}
+
+        # Moving the date into another month moves the rollup row
+        response = client.put(f"/api/transactions/{txn_id}", headers=auth_headers, json={
+            "date": "2025-02-03T00:00:00", "spender": "Alex"
+        })
+        assert response.status_code == 200
+        snap = _assert_matches_rebuild(test_db, test_user.id)
+        assert snap == {(datetime(2025, 2, 1).date(), sample_bucket.id, "Alex", 0): (-4.5, 0.0, 1)}
+
+        response = client.delete(f"/api/transactions/{txn_id}", headers=auth_headers)
+        assert response.status_code == 200
+        assert _assert_matches_rebuild(test_db, test_user.id) == {}
+
+    def test_batch_update_and_delete(self, client, auth_headers, test_db, test_user, sample_bucket, sample_transactions):
+        ids = [t.id for t in sample_transactions]
+        before = _snapshot(test_db, test_user.id)
+        assert sum(count for _, _, count in before.values()) == 5
+
+        response = client.post("/api/transactions/batch-update", headers=auth_headers, json={
+            "ids": ids[:2], "bucket_id": None
+        })
+        assert response.status_code == 200
+        snap = _assert_matches_rebuild(test_db, test_user.id)
+        assert sum(count for (_, bid, _, _), (_, _, count) in snap.items() if bid == 0) == 2
+
+        response = client.post("/api/transactions/batch-delete", headers=auth_headers, json=ids[2:])
+        assert response.status_code == 200
+        snap = _assert_matches_rebuild(test_db, test_user.id)
+        assert sum(count for _, _, count in snap.values()) == 2
+
+        response = client.delete("/api/transactions/all", headers=auth_headers)
+        assert response.status_code == 200
+        assert _assert_matches_rebuild(test_db, test_user.id) == {}
+
+    def test_bulk_patch_rebuilds_once(self, client, auth_headers, test_db, test_user, sample_transactions, monkeypatch):
+        calls = []
+        rebuild = rollups.rebuild_rollups
+
+        def counting_rebuild(db, user_id=None, months=None):
+            calls.append((user_id, sorted(months or [])))
+            return rebuild(db, user_id=user_id, months=months)
+        monkeypatch.setattr(rollups, "rebuild_rollups", counting_rebuild)
+
+        first, second, third = sample_transactions[:3]
+        response = client.patch("/api/transactions/bulk", headers=auth_headers, json={"updates": [
+            {"id": first.id, "spender": "Alex"},
+            {"id": second.id, "date": "2025-03-02T09:30:00"},
+            {"id": third.id, "bucket_id": None, "tags": "Work"},
+        ]})
+        assert response.status_code == 200
+        assert response.json()["count"] == 3
+        # One UPDATE for every row, so the touched partitions are rebuilt once
+        assert len(calls) == 1 and calls[0][0] == test_user.id
+        monkeypatch.setattr(rollups, "rebuild_rollups", rebuild)
+        snap = _assert_matches_rebuild(test_db, test_user.id)
+        assert any(month.month == 3 for month, _, _, _ in snap)
+
+
+class TestWholeMonthSpan:
+    """Range alignment check used to pick the rollup read path."""
+
+    def test_aligned_ranges(self):
+        assert rollups.whole_month_span(datetime(2025, 1, 1), datetime(2025, 3, 31)) == (
+            datetime(2025, 1, 1).date(), datetime(2025, 3, 1).date()
+        )
+        assert rollups.whole_month_span(datetime(2024, 2, 1), datetime(2024, 2, 29, 23, 59)) is not None
+
+    def test_day_after(self):
+        assert rollups.day_after(datetime(2025, 1, 31)) == datetime(2025, 2, 1)
+        assert rollups.day_after(datetime(2025, 12, 31, 18, 45).date()) == datetime(2026, 1, 1)
+
+    def test_partial_ranges(self):
+        assert rollups.whole_month_span(datetime(2025, 1, 2), datetime(2025, 1, 31)) is None
+        assert rollups.whole_month_span(datetime(2025, 1, 1), datetime(2025, 1, 30)) is None
+        assert rollups.whole_month_span(datetime(2025, 1, 1, 9), datetime(2025, 1, 31)) is None
+
+
+class TestRollupReads:
+    """Whole-month analytics ranges match the transaction-scan path."""
+
+    @pytest.fixture
+    def month_data(self, test_db, test_user, sample_bucket):
+        income = models.BudgetBucket(name="Salary", user_id=test_user.id, group="Income")
+        transfer = models.BudgetBucket(name="Transfers", user_id=test_user.id, is_transfer=True)
+        test_db.add_all([income, transfer])
+        test_db.commit()
+        rows = [
+            (datetime(2025, 1, 3), -40.0, sample_bucket.id),
+            (datetime(2025, 1, 9), 12.0, sample_bucket.id),   # refund
+            (datetime(2025, 1, 15), 3000.0, income.id),
+            (datetime(2025, 1, 20), -500.0, transfer.id),
+            (datetime(2025, 1, 22), -15.0, None),
+        ]
+        for dt, amount, bid in rows:
+            test_db.add(models.Transaction(
+                user_id=test_user.id, bucket_id=bid, date=dt,
+                description="Rollup", raw_description="ROLLUP", amount=amount, spender="Joint"
+            ))
+        test_db.commit()
+
+    def test_dashboard_matches_scan(self, client, auth_headers, month_data):
+        aligned = client.get(
+            "/api/analytics/dashboard?start_date=2025-01-01&end_date=2025-01-31", headers=auth_headers
+        ).json()
+        # Starting one second early is not month-aligned, so it takes the scan path
+        scanned = client.get(
+            "/api/analytics/dashboard?start_date=2024-12-31T23:59:59&end_date=2025-01-31T23:59:59", headers=auth_headers
+        ).json()
+        assert aligned["totals"] == scanned["totals"]
+        assert aligned["totals"] == {"income": 3000.0, "expenses": 43.0, "net_savings": 2957.0}
+        assert {b["id"]: b["spent"] for b in aligned["buckets"]} == {b["id"]: b["spent"] for b in scanned["buckets"]}
+
+    def test_last_day_timestamp_counted_by_every_path(self, client, auth_headers, test_db, test_user, sample_bucket, month_data):
+        test_db.add(models.Transaction(
+            user_id=test_user.id, bucket_id=sample_bucket.id, date=datetime(2025, 1, 31, 18, 45),
+            description="Late", raw_description="LATE", amount=-7.0, spender="Joint"
+        ))
+        test_db.commit()
+        # Same date-only end; the early start sends the second request down the scan path
+        urls = {
+            endpoint: (
+                f"/api/analytics/{endpoint}?start_date=2025-01-01&end_date=2025-01-31",
+                f"/api/analytics/{endpoint}?start_date=2024-12-31T23:59:59&end_date=2025-01-31",
+            )
+            for endpoint in ("dashboard", "sankey")
+        }
+        aligned, scanned = (client.get(url, headers=auth_headers).json() for url in urls["dashboard"])
+        assert aligned["totals"] == scanned["totals"]
+        assert aligned["totals"]["expenses"] == 50.0
+        aligned, scanned = (client.get(url, headers=auth_headers).json() for url in urls["sankey"])
+        assert aligned == scanned
+
+    def test_sankey_matches_scan(self, client, auth_headers, month_data):
+        aligned = client.get(
+            "/api/analytics/sankey?start_date=2025-01-01&end_date=2025-01-31", headers=auth_headers
+        ).json()
+        scanned = client.get(
+            "/api/analytics/sankey?start_date=2024-12-31T23:59:59&end_date=2025-01-31T23:59:59", headers=auth_headers
+        ).json()
+        assert aligned == scanned
+
+    def test_history_monthly_from_rollups(self, client, auth_headers, month_data):
+        response = client.get(
+            "/api/analytics/history?start_date=2025-01-01&end_date=2025-01-31", headers=auth_headers
+        )
+        assert response.status_code == 200
+        point = response.json()[0]
+        # Transfers are excluded from spent; refunds are not netted into the monthly history
+        assert point["spent"] == 55.0
+        assert point["income"] == 3012.0
+
+    def test_bucket_delete_moves_rows_to_uncategorized(self, client, auth_headers, test_db, test_user, sample_transactions):
+        extra = models.BudgetBucket(name="Temp", user_id=test_user.id)
+        test_db.add(extra)
+        test_db.commit()
+        txn = sample_transactions[0]
+        txn.bucket_id = extra.id
+        test_db.commit()
+
+        response = client.delete(f"/api/settings/buckets/{extra.id}", headers=auth_headers)
+        assert response.status_code == 200
+        snap = _assert_matches_rebuild(test_db, test_user.id)
+        assert all(bid != extra.id for (_, bid, _, _) in snap)
+        assert sum(count for (_, bid, _, _), (_, _, count) in snap.items() if bid == 0) == 1
@@ -0,0 +1,92 @@
+"""
+Principal Finance - Subscription Schedule Tests
+
+Tests for:
+- Due-date generation per frequency, including month-end clamping
+- Heap merge of several subscriptions
+- Daily / weekly / monthly cash-flow series
+- /analytics/cashflow-projection end to end
+"""
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from backend import models
+from backend.services import schedule
+
+
+def _sub(anchor, frequency, amount=10.0, type="Expense"):
+    return SimpleNamespace(next_due_date=anchor, frequency=frequency, amount=amount, type=type)
+
+
+class TestOccurrences:
+
+    def test_month_end_clamping(self):
+        dates = list(schedule.occurrences(date(2024, 1, 31), "Monthly", date(2024, 1, 1), date(2024, 5, 31)))
+        assert dates == [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30), date(2024, 5, 31)]
+
+    def test_leap_day_yearly(self):
+        dates = list(schedule.occurrences(date(2024, 2, 29), "Yearly", date(2024, 3, 1), date(2028, 12, 31)))
+        assert dates == [date(2025, 2, 28), date(2026, 2, 28), date(2027, 2, 28), date(2028, 2, 29)]
+
+    def test_starts_from_window_not_anchor(self):
+        dates = list(schedule.occurrences(date(2020, 1, 6), "Fortnightly", date(2025, 1, 1), date(2025, 1, 31)))
+        assert dates == [date(2025, 1, 13), date(2025, 1, 27)]
+        assert all((d - date(2020, 1, 6)).days % 14 == 0 for d in dates)
+
+        dates = list(schedule.occurrences(date(2024, 11, 15), "Quarterly", date(2025, 1, 1), date(2025, 12, 31)))
+        assert dates == [date(2025, 2, 15), date(2025, 5, 15), date(2025, 8, 15), date(2025, 11, 15)]
+
+    def test_future_anchor_and_unknown_frequency(self):
+        assert list(schedule.occurrences(date(2025, 3, 10), "Weekly", date(2025, 3, 1), date(2025, 3, 20))) == [
+            date(2025, 3, 10), date(2025, 3, 17)
+        ]
+        assert list(schedule.occurrences(date(2025, 3, 10), "Sometimes", date(2025, 3, 1), date(2025, 3, 20))) == []
+        assert list(schedule.occurrences(None, "Weekly", date(2025, 3, 1), date(2025, 3, 20))) == []
+
+
+class TestSeries:
+
+    def test_events_are_merged_in_date_order(self):
+        subs = [_sub(date(2025, 1, 3), "Weekly"), _sub(date(2025, 1, 1), "Monthly")]
+        events = list(schedule.schedule_events(subs, date(2025, 1, 1), date(2025, 1, 31)))
+        assert [d for d, _ in events] == sorted(d for d, _ in events)
+        assert len(events) == 5 + 1
+
+    def test_daily_and_downsampled(self):
+        subs = [_sub(date(2025, 1, 1), "Weekly", 10.0), _sub(date(2025, 1, 15), "Monthly", 500.0, "Income")]
+        start, end = date(2025, 1, 1), date(2025, 3, 31)
+
+        daily = schedule.cashflow_series(subs, start, end, start_balance=100.0)
+        assert len(daily) == (end - start).days + 1
+        assert daily[0] == {"date": "2025-01-01", "balance": 90.0, "flow": -10.0}
+        assert daily[14]["flow"] == 500.0 - 10.0  # Both due on the 15th
+
+        weekly = schedule.cashflow_series(subs, start, end, 100.0, interval="week")
+        assert weekly[0]["date"] == "2025-01-01"
+        assert weekly[1]["date"] == "2025-01-06"  # Monday
+        assert weekly[-1]["balance"] == daily[-1]["balance"]
+
+        monthly = schedule.cashflow_series(subs, start, end, 100.0, interval="month")
+        assert [p["date"] for p in monthly] == ["2025-01-01", "2025-02-01", "2025-03-01"]
+        assert monthly[0]["flow"] == -50.0 + 500.0
+        assert monthly[0]["balance"] == daily[30]["balance"]
+        assert sum(p["flow"] for p in monthly) == sum(p["flow"] for p in daily)
+
+
+class TestCashflowEndpoint:
+
+    def test_projection(self, client, auth_headers, test_db, test_user):
+        test_db.add(models.Subscription(
+            user_id=test_user.id, name="Rent", amount=1000.0, frequency="Monthly",
+            next_due_date=date.today() + timedelta(days=1), is_active=True
+        ))
+        test_db.commit()
+
+        response = client.get("/api/analytics/cashflow-projection?months=24&interval=month", headers=auth_headers)
+        assert response.status_code == 200
+        points = response.json()
+        assert 24 <= len(points) <= 26
+        assert points[-1]["balance"] == -1000.0 * sum(1 for p in points if p["flow"])
+
+        response = client.get("/api/analytics/cashflow-projection?interval=hourly", headers=auth_headers)
+        assert response.status_code == 422
@@ -0,0 +1,98 @@
+"""
+Principal Finance - Transaction Search Tests
+
+Tests for:
+- FTS5 index creation, backfill and trigger sync on insert/update/delete
+- Prefix, infix and multi-term matching with relevance ranking
+- LIKE fallback when no search index exists
+"""
+import pytest
+from datetime import datetime
+
+from backend import models
+from backend.services import search
+
+
+def _add(db, user_id, description, raw, day=1):
+    txn = models.Transaction(
+        user_id=user_id, date=datetime(2025, 2, day), amount=-10.0,
+        description=description, raw_description=raw
+    )
+    db.add(txn)
+    db.commit()
+    return txn
+
+
+def _search_ids(client, auth_headers, term, **params):
+    response = client.get("/api/transactions/", params=dict(params, search=term), headers=auth_headers)
+    assert response.status_code == 200
+    return [t["id"] for t in response.json()["items"]]
+
+
+@pytest.fixture
+def indexed(test_engine, test_db, test_user):
+    # Rows created before the index exists are picked up by the initial rebuild
+    early = _add(test_db, test_user.id, "Woolworths Metro", "WOOLWORTHS METRO 1234 SYDNEY", day=1)
+    assert search.ensure_search_index(test_engine)
+    return early
+
+
+class TestSearchIndex:
+    """The FTS table follows transaction writes."""
+
+    def test_backfill_and_insert(self, client, auth_headers, test_db, test_user, indexed):
+        later = _add(test_db, test_user.id, "Coles", "COLES 0456 SYDNEY", day=2)
+        assert _search_ids(client, auth_headers, "woolworths") == [indexed.id]
+        assert set(_search_ids(client, auth_headers, "sydney")) == {indexed.id, later.id}
+
+    def test_update_and_delete_resync(self, client, auth_headers, test_db, test_user, indexed):
+        indexed.description = "Groceries Run"
+        indexed.raw_description = "ALDI STORES"
+        test_db.commit()
+        assert _search_ids(client, auth_headers, "woolworths") == []
+        assert _search_ids(client, auth_headers, "aldi") == [indexed.id]
+
+        test_db.delete(indexed)
+        test_db.commit()
+        assert _search_ids(client, auth_headers, "aldi") == []
+
+
+class TestSearchQueries:
+    """Prefix, multi-term and ranked queries."""
+
+    def test_prefix_and_all_terms(self, client, auth_headers, test_db, test_user, indexed):
+        metro_only = _add(test_db, test_user.id, "Metro Petroleum", "METRO PETROLEUM", day=3)
+        assert _search_ids(client, auth_headers, "wool") == [indexed.id]
+        assert _search_ids(client, auth_headers, "wool metr") == [indexed.id]
+        assert set(_search_ids(client, auth_headers, "metro")) == {indexed.id, metro_only.id}
+
+    def test_infix_term(self, client, auth_headers, test_db, test_user, indexed):
+        netflix = _add(test_db, test_user.id, "Netflix", "NETFLIX.COM", day=2)
+        assert _search_ids(client, auth_headers, "flix") == [netflix.id]
+        assert _search_ids(client, auth_headers, "worths") == [indexed.id]
+
+    def test_relevance_sort(self, client, auth_headers, test_db, test_user, indexed):
+        strong = _add(test_db, test_user.id, "Coffee Coffee", "COFFEE CLUB COFFEE", day=2)
+        weak = _add(test_db, test_user.id, "Bakery", "BAKERY AND COFFEE AND BREAD AND CAKES", day=3)
+        ids = _search_ids(client, auth_headers, "coffee", sort_by="relevance")
+        assert ids == [strong.id, weak.id]
+
+        response = client.get(
+            "/api/transactions/",
+            params={"search": "coffee", "sort_by": "relevance", "cursor": "abc"},
+            headers=auth_headers
+        )
+        assert response.status_code == 400
+
+    def test_other_users_excluded(self, client, auth_headers, test_db, test_user, indexed):
+        other = models.User(id="other-user", email="other@example.com", name="Other")
+        test_db.add(other)
+        test_db.commit()
+        _add(test_db, other.id, "Woolworths", "WOOLWORTHS", day=2)
+        assert _search_ids(client, auth_headers, "woolworths") == [indexed.id]
+
+
+def test_like_fallback_without_index(client, auth_headers, test_db, test_user):
+    """Without the FTS table, search keeps its substring behaviour."""
+    txn = _add(test_db, test_user.id, "Woolworths Metro", "WOOLWORTHS METRO")
+    assert _search_ids(client, auth_headers, "worths") == [txn.id]
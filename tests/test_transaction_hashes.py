@@ -0,0 +1,118 @@
+"""
+Principal Finance - Import Duplicate Detection Tests
+
+Tests for:
+- Chunked lookup of incoming hashes against the unique (user_id, transaction_hash) index
+- /ingest/confirm skipping rows that already exist (ON CONFLICT DO NOTHING)
+- Rollups, tag rows and dashboard totals for confirmed imports
+- Backfill of hashes for rows imported before fingerprints existed
+"""
+from datetime import datetime
+
+from backend import models
+from backend.services import transaction_hashes
+from backend.services.transaction_hashes import generate_transaction_hash
+
+
+def _preview_row(temp_id, description, amount, day=3, **extra):
+    return dict(
+        id=temp_id, date=f"2025-03-{day:02d}", description=description,
+        raw_description=description.upper(), amount=amount, **extra
+    )
+
+
+def _confirm(client, auth_headers, rows):
+    response = client.post("/api/ingest/confirm", json=rows, headers=auth_headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_existing_hashes_only_returns_incoming_matches(test_db, test_user):
+    for day in range(1, 4):
+        txn_hash = generate_transaction_hash(test_user.id, datetime(2025, 3, day), "COFFEE", -5.0)
+        test_db.add(models.Transaction(
+            user_id=test_user.id, date=datetime(2025, 3, day), amount=-5.0,
+            description="Coffee", raw_description="COFFEE", transaction_hash=txn_hash
+        ))
+    test_db.commit()
+
+    known = generate_transaction_hash(test_user.id, datetime(2025, 3, 2), "COFFEE", -5.0)
+    found = transaction_hashes.existing_hashes(test_db, test_user.id, [known, "not-a-hash"])
+    assert found == {known}
+    assert transaction_hashes.existing_hashes(test_db, "other-user", [known]) == set()
+
+
+class TestConfirmDedupe:
+    """Confirm inserts each fingerprint once per user."""
+
+    def test_double_submit_inserts_once(self, client, auth_headers, test_db, test_user, sample_bucket):
+        rows = [
+            _preview_row(-1, "Coffee Club", -4.5, bucket_id=sample_bucket.id, tags="Work"),
+            _preview_row(-2, "Rent", -1200.0),
+            _preview_row(-3, "Coffee Club", -4.5, bucket_id=sample_bucket.id),  # repeated in the request
+        ]
+        first = _confirm(client, auth_headers, rows)
+        assert sorted(t["description"] for t in first) == ["Coffee Club", "Rent"]
+
+        assert _confirm(client, auth_headers, rows) == []
+        assert test_db.query(models.Transaction).filter_by(user_id=test_user.id).count() == 2
+
+    def test_rollups_and_tags_follow_insert(self, client, auth_headers, test_db, test_user, sample_bucket):
+        confirmed = _confirm(client, auth_headers, [
+            _preview_row(-1, "Woolworths", -80.0, bucket_id=sample_bucket.id, tags="food, Weekly"),
+            _preview_row(-2, "Salary", 3000.0, day=15),
+        ])
+        woolworths = next(t for t in confirmed if t["description"] == "Woolworths")
+
+        rollups = test_db.query(models.TransactionRollup).filter_by(user_id=test_user.id).all()
+        assert sum(r.expense_sum for r in rollups) == -80.0
+        assert sum(r.income_sum for r in rollups) == 3000.0
+        assert sum(r.txn_count for r in rollups) == 2
+
+        tags = sorted(
+            row.tag for row in test_db.query(models.TransactionTag).filter_by(transaction_id=woolworths["id"])
+        )
+        assert tags == ["food", "weekly"]
+
+
+def test_backfill_hashes_legacy_rows(test_db, test_user):
+    legacy = [
+        models.Transaction(
+            user_id=test_user.id, date=datetime(2024, 6, 1), amount=-9.0,
+            description="Parking", raw_description="PARKING"
+        )
+        for _ in range(2)
+    ]
+    test_db.add_all(legacy)
+    test_db.commit()
+
+    assert transaction_hashes.backfill_transaction_hashes(test_db) == 1
+    test_db.commit()
+    # The oldest row takes the fingerprint; the genuine repeat keeps NULL
+    test_db.refresh(legacy[0])
+    test_db.refresh(legacy[1])
+    assert legacy[0].transaction_hash == generate_transaction_hash(
+        test_user.id, datetime(2024, 6, 1), "PARKING", -9.0
+    )
+    assert legacy[1].transaction_hash is None
+    assert transaction_hashes.backfill_transaction_hashes(test_db) == 0
+
+
+def test_confirm_updates_dashboard(client, auth_headers, test_db, test_user, sample_bucket):
+    for day in range(1, 6):
+        test_db.add(models.Transaction(
+            user_id=test_user.id, date=datetime(2025, 3, day), amount=-140.0, bucket_id=sample_bucket.id,
+            description="Shop", raw_description="SHOP"
+        ))
+    test_db.commit()
+    url = "/api/analytics/dashboard?start_date=2025-03-01&end_date=2025-03-20"
+
+    def expenses():
+        response = client.get(url, headers=auth_headers)
+        assert response.status_code == 200
+        return response.json()["totals"]["expenses"]
+
+    assert expenses() == 700.0
+    _confirm(client, auth_headers, [_preview_row(-1, "Big Shop", -999.0, bucket_id=sample_bucket.id)])
+    # The Core INSERT bypasses the ORM flush; the dashboard must still see the new row
+    assert expenses() == 1699.0
@@ -0,0 +1,129 @@
+"""
+Principal Finance - Transaction Tag Tests
+
+Tests for:
+- transaction_tags rows following ORM and bulk transaction writes
+- Rebuild (backfill) matching the incremental result
+- Exact tag filtering in the transaction list and analytics
+"""
+import pytest
+from datetime import datetime
+
+from sqlalchemy import update
+
+from backend import models
+from backend.services import transaction_tags
+
+
+def _tag_rows(db, user_id):
+    return sorted(
+        (row.transaction_id, row.tag)
+        for row in db.query(models.TransactionTag).filter(models.TransactionTag.user_id == user_id)
+    )
+
+
+def _add(db, user_id, tags, amount=-10.0, day=5, bucket_id=None):
+    txn = models.Transaction(
+        user_id=user_id, date=datetime(2025, 1, day), amount=amount, tags=tags,
+        description="Txn", raw_description="TXN", bucket_id=bucket_id
+    )
+    db.add(txn)
+    db.commit()
+    return txn
+
+
+def test_parse_tags():
+    assert transaction_tags.parse_tags(" Car, carpool ,,CAR, Food &amp; Drink") == ["car", "carpool", "food & drink"]
+    assert transaction_tags.parse_tags(None) == []
+
+
+class TestTagMaintenance:
+    """Tag rows follow every transaction write path."""
+
+    def test_insert_update_delete(self, test_db, test_user):
+        txn = _add(test_db, test_user.id, "Car, Holiday")
+        assert _tag_rows(test_db, test_user.id) == [(txn.id, "car"), (txn.id, "holiday")]
+
+        txn.tags = "holiday,work"
+        test_db.commit()
+        assert _tag_rows(test_db, test_user.id) == [(txn.id, "holiday"), (txn.id, "work")]
+
+        txn.tags = None
+        test_db.commit()
+        assert _tag_rows(test_db, test_user.id) == []
+
+        txn.tags = "car"
+        test_db.commit()
+        test_db.delete(txn)
+        test_db.commit()
+        assert _tag_rows(test_db, test_user.id) == []
+
+    def test_bulk_delete(self, client, auth_headers, test_db, test_user):
+        keep = _add(test_db, test_user.id, "car")
+        drop = _add(test_db, test_user.id, "car,work")
+        response = client.post("/api/transactions/batch-delete", json=[drop.id], headers=auth_headers)
+        assert response.status_code == 200
+        assert _tag_rows(test_db, test_user.id) == [(keep.id, "car")]
+
+        client.delete("/api/transactions/all", headers=auth_headers)
+        assert _tag_rows(test_db, test_user.id) == []
+
+    def test_bulk_update_reindexes_only_tag_changes(self, test_db, test_user, sample_bucket, monkeypatch):
+        txn = _add(test_db, test_user.id, "car")
+        rebuilt = []
+        rebuild = transaction_tags.rebuild_transaction_tags
+        monkeypatch.setattr(
+            transaction_tags, "rebuild_transaction_tags",
+            lambda db, **kwargs: rebuilt.append(kwargs) or rebuild(db, **kwargs)
+        )
+        T = models.Transaction
+
+        test_db.execute(update(T).where(T.id == txn.id).values(bucket_id=sample_bucket.id, spender="A"))
+        test_db.query(T).filter(T.id == txn.id).update({T.is_verified: True})
+        test_db.commit()
+        assert rebuilt == []
+
+        test_db.execute(update(T).where(T.id == txn.id).values(tags="work"))
+        test_db.commit()
+        assert rebuilt == [{"transaction_ids": [txn.id]}]
+        assert _tag_rows(test_db, test_user.id) == [(txn.id, "work")]
+
+        test_db.execute(update(T), [{"id": txn.id, "tags": "car"}])
+        test_db.commit()
+        assert _tag_rows(test_db, test_user.id) == [(txn.id, "car")]
+
+    def test_rebuild_matches_incremental(self, test_db, test_user):
+        for tags in ("car", "Car,work", None, "holiday, car"):
+            _add(test_db, test_user.id, tags)
+        incremental = _tag_rows(test_db, test_user.id)
+        assert transaction_tags.rebuild_transaction_tags(test_db, user_id=test_user.id) == len(incremental)
+        test_db.commit()
+        assert _tag_rows(test_db, test_user.id) == incremental
+
+
+class TestTagFilters:
+    """Routers filter through the tag table with exact matches."""
+
+    def test_transaction_list_exact_match(self, client, auth_headers, test_db, test_user):
+        car = _add(test_db, test_user.id, "car")
+        _add(test_db, test_user.id, "carpool")
+        work = _add(test_db, test_user.id, "Work")
+
+        ids = lambda tags: sorted(
+            t["id"] for t in client.get(
+                "/api/transactions/", params={"tags": tags}, headers=auth_headers
+            ).json()["items"]
+        )
+        assert ids("car") == [car.id]
+        assert ids("CAR, work") == sorted([car.id, work.id])
+
+    def test_dashboard_tag_filter(self, client, auth_headers, test_db, test_user, sample_bucket):
+        _add(test_db, test_user.id, "car", amount=-40.0, bucket_id=sample_bucket.id)
+        _add(test_db, test_user.id, "carpool", amount=-15.0, bucket_id=sample_bucket.id)
+        response = client.get(
+            "/api/analytics/dashboard",
+            params={"start_date": "2025-01-01", "end_date": "2025-01-31", "tags": "car"},
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert response.json()["totals"]["expenses"] == pytest.approx(40.0)
@@ -37,6 +37,132 @@ class TestTransactionList:
         assert response.status_code == 401
 
 
+class TestTransactionCursorPagination:
+    """Tests for keyset (cursor) pagination of the transaction list."""
+
+    @pytest.fixture
+    def many_transactions(self, test_db, test_user):
+        from backend import models
+        base = datetime(2025, 3, 1)
+        for i in range(12):
+            test_db.add(models.Transaction(
+                user_id=test_user.id,
+                # Pairs share a date so the id tie-breaker matters
+                date=base - timedelta(days=i // 2),
+                description=None if i % 5 == 0 else f"Txn {i % 4}",
+                raw_description=f"TXN {i}",
+                amount=-10.0 * (i % 3)
+            ))
+        test_db.commit()
+
+    def _walk(self, client, auth_headers, params):
+        ids, cursor = [], None
+        while True:
+            page_params = dict(params, limit=5)
+            if cursor:
+                page_params["cursor"] = cursor
+            data = client.get("/api/transactions/", params=page_params, headers=auth_headers).json()
+            ids += [t["id"] for t in data["items"]]
+            if not data["has_more"]:
+                assert data["next_cursor"] is None
+                return ids
+            cursor = data["next_cursor"]
+
+    @pytest.mark.parametrize("sort_by,sort_dir", [
+        ("date", "desc"), ("date", "asc"), ("description", "asc"),
+        ("description", "desc"), ("amount", "desc")
+    ])
+    def test_cursor_walk_matches_single_page(self, client, auth_headers, many_transactions, sort_by, sort_dir):
+        """Following next_cursor visits every row once, in the same order as one big page."""
+        params = {"sort_by": sort_by, "sort_dir": sort_dir}
+        full = client.get("/api/transactions/", params=dict(params, limit=100), headers=auth_headers).json()
+        expected = [t["id"] for t in full["items"]]
+        assert len(expected) == 12
+        assert self._walk(client, auth_headers, params) == expected
+
+    def test_total_is_opt_in(self, client, auth_headers, many_transactions):
+        """A partial page reports has_more instead of counting, unless include_total is set."""
+        data = client.get("/api/transactions/?limit=5", headers=auth_headers).json()
+        assert data["total"] is None
+        assert data["has_more"] is True
+
+        data = client.get("/api/transactions/?limit=5&include_total=true", headers=auth_headers).json()
+        assert data["total"] == 12
+
+    def test_invalid_cursor(self, client, auth_headers, many_transactions):
+        response = client.get("/api/transactions/?cursor=not-a-cursor", headers=auth_headers)
+        assert response.status_code == 400
+
+        cursor = client.get("/api/transactions/?limit=5", headers=auth_headers).json()["next_cursor"]
+        response = client.get(f"/api/transactions/?cursor={cursor}&sort_by=amount", headers=auth_headers)
+        assert response.status_code == 400
+
+
+class TestBulkPatch:
+    """Tests for PATCH /transactions/bulk."""
+
+    def test_per_row_updates(self, client, auth_headers, test_db, test_user, sample_transactions, sample_bucket):
+        from backend import models
+        other = models.Transaction(user_id="someone-else", date=datetime(2025, 1, 1), amount=-1.0, description="x")
+        test_db.add(other)
+        test_db.commit()
+        first, second, third = sample_transactions[:3]
+
+        response = client.patch("/api/transactions/bulk", headers=auth_headers, json={"updates": [
+            {"id": first.id, "bucket_id": None, "tags": "Work"},
+            {"id": second.id, "bucket_id": None, "tags": "Work"},
+            {"id": third.id, "is_verified": False, "notes": "check"},
+            {"id": other.id, "bucket_id": None},
+        ]})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["updated_ids"] == sorted([first.id, second.id, third.id])
+        assert data["missing_ids"] == [other.id]
+
+        test_db.expire_all()
+        assert first.bucket_id is None and first.tags == "Work"
+        assert third.bucket_id == sample_bucket.id and third.is_verified is False and third.notes == "check"
+        assert other.bucket_id is None and other.tags is None
+
+        tagged = client.get("/api/transactions/?tags=work", headers=auth_headers).json()["items"]
+        assert sorted(t["id"] for t in tagged) == sorted([first.id, second.id])
+
+    def test_filter_and_patch(self, client, auth_headers, test_db, sample_transactions, sample_bucket):
+        response = client.patch("/api/transactions/bulk", headers=auth_headers, json={
+            "filter": {"max_amount": -150.0},
+            "patch": {"is_verified": False, "assigned_to": "A"}
+        })
+        assert response.status_code == 200
+        expected = sorted(t.id for t in sample_transactions if t.amount <= -150.0)
+        assert response.json()["updated_ids"] == expected
+
+        pending = client.get("/api/transactions/pending-review", headers=auth_headers).json()
+        assert sorted(t["id"] for t in pending["items"]) == expected
+
+    def test_rejects_bad_requests(self, client, auth_headers, sample_transactions):
+        txn_id = sample_transactions[0].id
+        bad_bodies = [
+            {},
+            {"updates": [{"id": txn_id, "is_verified": True}], "patch": {"is_verified": True}},
+            {"filter": {}, "patch": {"is_verified": True}},
+            {"filter": {"ids": [txn_id]}, "patch": {}},
+            {"updates": [{"id": txn_id, "bucket_id": 999999}]},
+        ]
+        for body in bad_bodies:
+            response = client.patch("/api/transactions/bulk", headers=auth_headers, json=body)
+            assert response.status_code == 400, body
+
+    def test_rejects_clearing_required_fields(self, client, auth_headers, test_db, sample_transactions):
+        txn = sample_transactions[0]
+        for patch in [{"date": None}, {"is_verified": None}, {"description": ""}, {"spender": None}]:
+            for body in [{"updates": [dict(patch, id=txn.id)]}, {"filter": {"ids": [txn.id]}, "patch": patch}]:
+                response = client.patch("/api/transactions/bulk", headers=auth_headers, json=body)
+                assert response.status_code == 422, body
+
+        test_db.expire_all()
+        assert txn.date is not None and txn.description and txn.is_verified is not None
+
+
 @pytest.mark.skip(reason="Not implemented yet")
 class TestTransactionUpdate:
     """Tests for transaction updates."""